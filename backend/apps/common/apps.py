@@ -5,3 +5,6 @@ class CommonConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.common"
     verbose_name = "Común"
+
+    def ready(self):
+        from apps.common import signals  # noqa: F401
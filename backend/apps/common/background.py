@@ -0,0 +1,78 @@
+"""Piezas comunes de los trabajos en segundo plano con hilos del propio proceso.
+
+Los trabajos (p. ej. ``PdfRenderJob``) se ejecutan en un ``ThreadPoolExecutor``
+por worker de Gunicorn. ``ProcessExecutor`` lo crea perezosamente y lo rehace
+tras un ``fork`` (el pool heredado no tiene hilos vivos). ``resubmit_orphan``
+aplica la regla de reencolado de los trabajos ``pendiente`` que nadie reclamó:
+como mucho una vez por intervalo y por trabajo, aunque el cliente consulte el
+estado cada segundo.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from django.utils import timezone
+
+# Trabajo pendiente sin reclamar tras este tiempo: el polling lo reencola localmente.
+ORPHAN_PENDING_SEC = 30
+
+
+def env_int(name: str, default: int, minimum: int) -> int:
+    raw = (os.environ.get(name) or "").strip()
+    try:
+        return max(minimum, int(raw)) if raw else default
+    except ValueError:
+        return default
+
+
+class ProcessExecutor:
+    """``ThreadPoolExecutor`` perezoso del proceso; ``max_workers`` puede leerse del entorno al crearlo."""
+
+    def __init__(self, thread_name_prefix: str, max_workers: int | Callable[[], int] = 1) -> None:
+        self._prefix = thread_name_prefix
+        self._max_workers = max_workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    def get(self) -> ThreadPoolExecutor:
+        pid = os.getpid()
+        if self._executor is not None and self._pid == pid:
+            return self._executor
+        with self._lock:
+            if self._executor is None or self._pid != pid:
+                workers = self._max_workers() if callable(self._max_workers) else self._max_workers
+                self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=self._prefix)
+                self._pid = pid
+            return self._executor
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        return self.get().submit(fn, *args, **kwargs)
+
+
+def resubmit_orphan(job, submit: Callable[[Any], None], *, now: datetime | None = None) -> bool:
+    """Reencola un trabajo ``pendiente`` que lleva ``ORPHAN_PENDING_SEC`` sin reclamar.
+
+    El reencolado se registra en ``heartbeat_at`` con ``UPDATE ... WHERE`` sobre
+    el valor leído: solo un polling por intervalo gana y encola; los demás ven
+    el latido renovado y esperan al siguiente intervalo.
+    """
+    now = now or timezone.now()
+    last = job.heartbeat_at or job.created_at
+    if last is None or now - last <= timedelta(seconds=ORPHAN_PENDING_SEC):
+        return False
+    claimed = type(job).objects.filter(
+        pk=job.pk,
+        status=job.STATUS_PENDIENTE,
+        heartbeat_at=job.heartbeat_at,
+    ).update(heartbeat_at=now)
+    if not claimed:
+        return False
+    job.heartbeat_at = now
+    submit(job.pk)
+    return True
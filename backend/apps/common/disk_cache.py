@@ -0,0 +1,184 @@
+"""Almacén en disco ``llave → bytes`` compartido entre workers, con LRU por tamaño.
+
+Layout ``<root>/<k[:2]>/<k><suffix>``; escrituras atómicas (archivo temporal +
+``os.replace``) para que otro worker nunca lea un archivo a medias. Cada acierto
+actualiza el ``mtime`` y la expulsión borra primero lo más antiguo hasta quedar
+bajo ``max_bytes``. Si ``max_bytes`` es 0, el almacén queda desactivado.
+
+Los directorios se crean con modo ``0o700`` (por defecto bajo ``backend/var``,
+no en el ``/tmp`` compartido) y solo se sirven archivos del usuario del
+servicio que nadie más puede escribir: un archivo plantado por otra cuenta se
+ignora como si no existiera.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def env_megabytes(name: str, default_mb: int) -> int:
+    """``<name>`` en MB desde el entorno → bytes (0 desactiva)."""
+    raw = (os.environ.get(name) or "").strip()
+    try:
+        mb = int(raw) if raw else default_mb
+    except ValueError:
+        mb = default_mb
+    return max(0, mb) * 1024 * 1024
+
+
+def data_dir() -> Path:
+    """Directorio de datos locales de la aplicación (``backend/var``)."""
+    from django.conf import settings
+
+    return Path(settings.BASE_DIR) / "var"
+
+
+def env_cache_dir(name: str, default_dirname: str) -> Path:
+    raw = (os.environ.get(name) or "").strip()
+    return Path(raw) if raw else data_dir() / default_dirname
+
+
+def private_dir(path: Path) -> None:
+    """Crea ``path`` con modo ``0o700``; falla si existe y pertenece a otro usuario."""
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    st = path.stat()
+    if st.st_uid != os.getuid():
+        raise PermissionError(f"{path} pertenece a otro usuario")
+    if st.st_mode & 0o077:
+        os.chmod(path, 0o700)
+
+
+def trusted_file(fh) -> bool:
+    """Solo se confía en archivos propios que nadie más puede escribir."""
+    st = os.fstat(fh.fileno())
+    return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+
+class DiskLRUStore:
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int,
+        *,
+        suffix: str = ".bin",
+        evict_interval_s: float = 0.0,
+    ) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        # Recorrer el directorio en cada escritura es barato con pocos archivos;
+        # con miles (imágenes) se espacia la expulsión.
+        self.evict_interval_s = evict_interval_s
+        self._last_evict = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> bytes | None:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fh:
+                if not trusted_file(fh):
+                    logger.warning("Caché en disco: %s no es de este usuario; se ignora", path.name)
+                    return None
+                data = fh.read()
+        except FileNotFoundError:
+            return None
+        except OSError:
+            logger.warning("No se pudo leer %s de la caché en disco", key[:12])
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if not self.enabled or data is None or len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        try:
+            private_dir(self.root)
+            private_dir(path.parent)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    fh.write(data)
+                os.replace(tmp, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+        except OSError:
+            logger.warning("No se pudo guardar %s en la caché en disco", key[:12])
+            return
+        now = time.monotonic()
+        if now - self._last_evict >= self.evict_interval_s:
+            self._last_evict = now
+            self._evict()
+
+    def delete(self, key: str) -> None:
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+    def _iter_files(self):
+        if not self.root.is_dir():
+            return
+        for sub in self.root.iterdir():
+            if not sub.is_dir():
+                continue
+            for f in sub.iterdir():
+                if f.suffix == self.suffix:
+                    yield f
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries: list[tuple[float, int, Path]] = []
+            total = 0
+            try:
+                for f in self._iter_files():
+                    try:
+                        st = f.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, f))
+                    total += st.st_size
+            except OSError:
+                return
+            if total <= self.max_bytes:
+                return
+            entries.sort(key=lambda e: e[0])
+            for _mtime, size, f in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    f.unlink()
+                    total -= size
+                except OSError:
+                    continue
+
+    def clear(self) -> None:
+        with self._lock:
+            for f in list(self._iter_files()):
+                try:
+                    f.unlink()
+                except OSError:
+                    pass
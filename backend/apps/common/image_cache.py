@@ -0,0 +1,204 @@
+"""Caché de imágenes remotas para PDFs (memoria LRU + disco compartido).
+
+Los mismos productos de Cloudinary/SYSCOM/TVC aparecen en cientos de
+cotizaciones; sin caché cada render vuelve a descargarlos. La llave es la URL
+normalizada + el ancho de miniatura pedido. Cada proceso guarda un LRU acotado
+por bytes y detrás hay un almacén en disco que comparten los workers de
+Gunicorn. Las fallas (timeout, 404, respuesta demasiado grande) también se
+guardan por poco tiempo para que una URL rota no frene cada render.
+
+Formato en disco: ``IMG1 <expira> <content-type>\\n<bytes>`` o ``NEG1 <expira>\\n``.
+
+Variables de entorno:
+
+- ``PDF_IMAGE_CACHE_DIR`` (default ``backend/var/digitalflow-img-cache``)
+- ``PDF_IMAGE_CACHE_MAX_MB`` (default 256; ``0`` desactiva el disco)
+- ``PDF_IMAGE_CACHE_MEM_MB`` (default 32 por worker; ``0`` desactiva la memoria)
+- ``PDF_IMAGE_CACHE_TTL_SEC`` (default 604800 = 7 días)
+- ``PDF_IMAGE_CACHE_NEG_TTL_SEC`` (default 300)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple
+from urllib.parse import urlsplit, urlunsplit
+
+from apps.common.disk_cache import DiskLRUStore, env_cache_dir, env_megabytes
+
+# Con miles de miniaturas no conviene recorrer el directorio en cada escritura.
+_DISK_EVICT_INTERVAL_S = 60.0
+
+
+class CachedImage(NamedTuple):
+    data: bytes
+    content_type: str
+
+
+def _env_seconds(name: str, default: int) -> int:
+    raw = (os.environ.get(name) or "").strip()
+    try:
+        return max(0, int(raw)) if raw else default
+    except ValueError:
+        return default
+
+
+def normalize_image_url(url: str) -> str:
+    """Esquema y host en minúsculas, sin fragmento ni espacios alrededor."""
+    u = (url or "").strip()
+    try:
+        parts = urlsplit(u)
+    except ValueError:
+        return u
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, ""))
+
+
+def image_cache_key(url: str, width: int = 0) -> str:
+    raw = f"{normalize_image_url(url)}|w={int(width or 0)}"
+    return hashlib.sha256(raw.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def _encode(entry: CachedImage | None, expires: float) -> bytes:
+    if entry is None:
+        return f"NEG1 {int(expires)}\n".encode("ascii")
+    header = f"IMG1 {int(expires)} {entry.content_type or '-'}\n".encode("ascii", errors="ignore")
+    return header + entry.data
+
+
+def _decode(raw: bytes) -> tuple[float, CachedImage | None] | None:
+    nl = raw.find(b"\n", 0, 200)
+    if nl < 0:
+        return None
+    try:
+        fields = raw[:nl].decode("ascii").split(" ")
+        kind, expires = fields[0], float(fields[1])
+    except (UnicodeDecodeError, IndexError, ValueError):
+        return None
+    if kind == "NEG1":
+        return expires, None
+    if kind == "IMG1" and len(fields) >= 3:
+        ct = "" if fields[2] == "-" else fields[2]
+        return expires, CachedImage(raw[nl + 1 :], ct)
+    return None
+
+
+class RemoteImageCache:
+    """LRU en memoria (por bytes) delante de un :class:`DiskLRUStore`."""
+
+    def __init__(
+        self,
+        store: DiskLRUStore,
+        *,
+        mem_max_bytes: int,
+        ttl_s: int,
+        negative_ttl_s: int,
+    ) -> None:
+        self.store = store
+        self.mem_max_bytes = mem_max_bytes
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self._mem: OrderedDict[str, tuple[float, CachedImage | None]] = OrderedDict()
+        self._mem_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(entry: CachedImage | None) -> int:
+        return 64 + (len(entry.data) if entry is not None else 0)
+
+    def _mem_get(self, key: str):
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is None:
+                return None
+            if hit[0] <= time.time():
+                self._mem.pop(key)
+                self._mem_bytes -= self._size(hit[1])
+                return None
+            self._mem.move_to_end(key)
+            return hit
+
+    def _mem_put(self, key: str, expires: float, entry: CachedImage | None) -> None:
+        size = self._size(entry)
+        if size > self.mem_max_bytes:
+            return
+        with self._lock:
+            old = self._mem.pop(key, None)
+            if old is not None:
+                self._mem_bytes -= self._size(old[1])
+            self._mem[key] = (expires, entry)
+            self._mem_bytes += size
+            while self._mem_bytes > self.mem_max_bytes and self._mem:
+                _k, (_exp, victim) = self._mem.popitem(last=False)
+                self._mem_bytes -= self._size(victim)
+
+    def lookup(self, key: str) -> tuple[bool, CachedImage | None]:
+        """``(True, imagen)`` si hay entrada vigente (``imagen`` es ``None`` si es negativa)."""
+        hit = self._mem_get(key)
+        if hit is not None:
+            return True, hit[1]
+        raw = self.store.get(key)
+        decoded = _decode(raw) if raw else None
+        if decoded is None:
+            return False, None
+        expires, entry = decoded
+        if expires <= time.time():
+            self.store.delete(key)
+            return False, None
+        self._mem_put(key, expires, entry)
+        return True, entry
+
+    def store_result(self, key: str, entry: CachedImage | None) -> None:
+        ttl = self.ttl_s if entry is not None else self.negative_ttl_s
+        if ttl <= 0:
+            return
+        expires = time.time() + ttl
+        self._mem_put(key, expires, entry)
+        self.store.put(key, _encode(entry, expires))
+
+    def get_or_fetch(
+        self,
+        url: str,
+        fetch: Callable[[], CachedImage | None],
+        *,
+        width: int = 0,
+    ) -> CachedImage | None:
+        key = image_cache_key(url, width)
+        found, entry = self.lookup(key)
+        if found:
+            return entry
+        entry = fetch()
+        self.store_result(key, entry)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._mem_bytes = 0
+        self.store.clear()
+
+
+_cache: RemoteImageCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> RemoteImageCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = RemoteImageCache(
+                    DiskLRUStore(
+                        env_cache_dir("PDF_IMAGE_CACHE_DIR", "digitalflow-img-cache"),
+                        env_megabytes("PDF_IMAGE_CACHE_MAX_MB", 256),
+                        suffix=".img",
+                        evict_interval_s=_DISK_EVICT_INTERVAL_S,
+                    ),
+                    mem_max_bytes=env_megabytes("PDF_IMAGE_CACHE_MEM_MB", 32),
+                    ttl_s=_env_seconds("PDF_IMAGE_CACHE_TTL_SEC", 7 * 24 * 3600),
+                    negative_ttl_s=_env_seconds("PDF_IMAGE_CACHE_NEG_TTL_SEC", 300),
+                )
+    return _cache
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+import threading
 
 from apps.common.models import DEFAULT_NOMBRE, MarcaSistema
 from apps.common.pdf_html import load_public_image_data_uri
@@ -30,17 +31,59 @@ def get_marca_nombre() -> str:
     return nombre or DEFAULT_NOMBRE
 
 
-def logo_data_uri_for_pdf() -> str:
-    """Logo subido (URL remota embebida) o el PNG local de Intrax."""
-    try:
-        url = (MarcaSistema.get_solo().logo_url or "").strip()
-    except Exception:
-        logger.exception("No se pudo leer MarcaSistema.logo_url")
-        url = ""
+# Memo por proceso: (sello de versión, data URI, fue_logo_remoto_fallido).
+_logo_memo: tuple[str, str, bool] | None = None
+_logo_lock = threading.Lock()
+
+
+def _marca_logo_version() -> tuple[str, str]:
+    """``(sello, logo_url)``; el sello es ``updated_at`` de la fila, compartido por
+    todos los workers vía BD (una consulta por PK, sin escribir la fila)."""
+    row = (
+        MarcaSistema.objects.filter(pk=MarcaSistema.SINGLETON_PK)
+        .values_list("updated_at", "logo_url")
+        .first()
+    )
+    if row is None:
+        return "", ""
+    updated_at, url = row
+    return (updated_at.isoformat() if updated_at else ""), (url or "").strip()
+
+
+def _build_logo_data_uri(url: str) -> tuple[str, bool]:
     if url:
         if url.startswith("data:"):
-            return url
+            return url, False
         uri = img_url_to_data_uri(url)
         if uri:
-            return uri
-    return load_public_image_data_uri(FALLBACK_LOGO_PUBLIC_PATH)
+            return uri, False
+    return load_public_image_data_uri(FALLBACK_LOGO_PUBLIC_PATH), bool(url)
+
+
+def invalidate_logo_cache() -> None:
+    global _logo_memo
+    with _logo_lock:
+        _logo_memo = None
+
+
+def logo_data_uri_for_pdf() -> str:
+    """Logo subido (URL remota embebida) o el PNG local de Intrax.
+
+    Se memoriza por proceso hasta que cambia ``MarcaSistema.updated_at``: el
+    guardado en este worker lo invalida por señal y los demás lo detectan al
+    comparar el sello. Si la descarga del logo falló se usa el respaldo sin
+    memorizarlo, para reintentar en el siguiente render.
+    """
+    global _logo_memo
+    try:
+        stamp, url = _marca_logo_version()
+    except Exception:
+        logger.exception("No se pudo leer MarcaSistema.logo_url")
+        stamp, url = "", ""
+    memo = _logo_memo
+    if memo is not None and memo[0] == stamp and not memo[2]:
+        return memo[1]
+    uri, fallido = _build_logo_data_uri(url)
+    with _logo_lock:
+        _logo_memo = (stamp, uri, fallido)
+    return uri
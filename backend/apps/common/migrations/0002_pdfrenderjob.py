@@ -0,0 +1,43 @@
+# Generated by Django 5.1.4 on 2026-10-18 00:18
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0001_marca_sistema'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PdfRenderJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('tipo', models.CharField(max_length=60)),
+                ('filename', models.CharField(max_length=200)),
+                ('size', models.CharField(default='A4', max_length=10)),
+                ('landscape', models.BooleanField(default=False)),
+                ('timeout', models.PositiveSmallIntegerField(default=90)),
+                ('html', models.TextField(blank=True, default='')),
+                ('pdf', models.BinaryField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('listo', 'Listo'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('error', models.CharField(blank=True, default='', max_length=500)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de PDF',
+                'verbose_name_plural': 'Trabajos de PDF',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='common_pdfr_status_f1e360_idx')],
+            },
+        ),
+    ]
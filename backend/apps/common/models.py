@@ -1,3 +1,6 @@
+import uuid
+
+from django.conf import settings
 from django.db import IntegrityError, models
 
 DEFAULT_NOMBRE = "Grupo Intrax"
@@ -33,3 +36,50 @@ class MarcaSistema(models.Model):
 
     def __str__(self) -> str:
         return self.nombre
+
+
+class PdfRenderJob(models.Model):
+    """Render de PDF en segundo plano (reportes pesados fuera del hilo de Gunicorn)."""
+
+    STATUS_PENDIENTE = "pendiente"
+    STATUS_EN_PROCESO = "en_proceso"
+    STATUS_LISTO = "listo"
+    STATUS_ERROR = "error"
+    STATUS_CHOICES = [
+        (STATUS_PENDIENTE, "Pendiente"),
+        (STATUS_EN_PROCESO, "En proceso"),
+        (STATUS_LISTO, "Listo"),
+        (STATUS_ERROR, "Error"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    creado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    tipo = models.CharField(max_length=60)
+    filename = models.CharField(max_length=200)
+    size = models.CharField(max_length=10, default="A4")
+    landscape = models.BooleanField(default=False)
+    timeout = models.PositiveSmallIntegerField(default=90)
+    html = models.TextField(blank=True, default="")
+    pdf = models.BinaryField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDIENTE)
+    error = models.CharField(max_length=500, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Mientras está pendiente: último reencolado por polling (uno por intervalo).
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "created_at"])]
+        verbose_name = "Trabajo de PDF"
+        verbose_name_plural = "Trabajos de PDF"
+
+    def __str__(self) -> str:
+        return f"{self.tipo} {self.id} ({self.status})"
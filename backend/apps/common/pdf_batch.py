@@ -0,0 +1,279 @@
+"""Exportación de muchos PDFs en una sola descarga (ZIP en streaming o PDF unido).
+
+El HTML de cada documento se arma en el hilo del request (usa el ORM) y el
+render se manda a un ``ThreadPoolExecutor`` que comparte el pool de Chromium
+caliente del worker: mientras Chromium imprime el documento *n*, el request ya
+arma el HTML del *n+1*. Los resultados salen en el orden pedido y un fallo
+individual queda en ``errores.txt`` (ZIP) o en un encabezado (PDF unido) sin
+abortar el lote.
+
+Variables de entorno:
+
+- ``PDF_BATCH_WORKERS`` (default 3): renders simultáneos por lote.
+- ``PDF_BATCH_MAX_DOCS`` (default 200): tope de documentos por solicitud.
+"""
+
+from __future__ import annotations
+
+import logging
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator
+
+from apps.common.background import env_int
+
+logger = logging.getLogger(__name__)
+
+
+def batch_max_docs() -> int:
+    return env_int("PDF_BATCH_MAX_DOCS", 200, 1)
+
+
+@dataclass
+class BatchDoc:
+    """Documento del lote: ``build_html`` se llama en el hilo del request.
+
+    ``pdf`` ya generado (p. ej. desde una caché) se entrega sin renderizar y sin
+    ``build_html`` el documento solo aporta sus ``attachments`` (archivos que el
+    ZIP guarda antes del PDF). ``on_pdf`` recibe cada PDF recién renderizado.
+    """
+
+    filename: str
+    build_html: Callable[[], str] | None
+    pdf: bytes | None = None
+    attachments: tuple[tuple[str, bytes], ...] = ()
+    on_pdf: Callable[[bytes], None] | None = None
+
+
+@dataclass
+class BatchResult:
+    doc: BatchDoc
+    pdf: bytes | None = None
+    error: str = ""
+
+
+def parse_id_list(raw) -> list[int]:
+    """``"3,5, 9"`` o ``[3, 5, 9]`` → ``[3, 5, 9]`` (sin repetidos, en orden)."""
+    if isinstance(raw, str):
+        parts = raw.split(",")
+    elif isinstance(raw, (list, tuple)):
+        parts = raw
+    else:
+        return []
+    out: list[int] = []
+    for p in parts:
+        s = str(p).strip()
+        if s.isdigit() and int(s) not in out:
+            out.append(int(s))
+    return out
+
+
+def render_batch(
+    docs: Iterable[BatchDoc],
+    *,
+    size: str = "A4",
+    landscape: bool = False,
+    timeout: int = 90,
+    workers: int | None = None,
+) -> Iterator[BatchResult]:
+    """Renderiza en paralelo y entrega resultados en el orden de ``docs``."""
+    from apps.cotizaciones.pdf_render import PdfRenderError, render_html_to_pdf
+
+    n_workers = workers or env_int("PDF_BATCH_WORKERS", 3, 1)
+    # Tope de HTML/PDF retenidos en memoria a la vez.
+    max_in_flight = n_workers * 2
+
+    def _render(html: str) -> bytes:
+        return render_html_to_pdf(html, size=size, landscape=landscape, timeout=timeout)
+
+    def _collect(doc: BatchDoc, fut: Future | None, error: str) -> BatchResult:
+        if fut is None:
+            return BatchResult(doc, pdf=None if error else doc.pdf, error=error)
+        try:
+            pdf = fut.result()
+        except PdfRenderError as e:
+            logger.warning("Lote PDF: %s falló: %s", doc.filename, e.detail)
+            return BatchResult(doc, error=str(e))
+        except Exception as e:
+            logger.exception("Lote PDF: %s falló", doc.filename)
+            return BatchResult(doc, error=type(e).__name__)
+        if doc.on_pdf is not None:
+            try:
+                doc.on_pdf(pdf)
+            except Exception:
+                logger.warning("Lote PDF: on_pdf de %s falló", doc.filename, exc_info=True)
+        return BatchResult(doc, pdf=pdf)
+
+    def _ready(fut: Future | None) -> bool:
+        return fut is None or fut.done()
+
+    def _submit(doc: BatchDoc) -> tuple[BatchDoc, Future | None, str]:
+        try:
+            html = doc.build_html()
+        except Exception as e:
+            logger.exception("Lote PDF: no se pudo armar el HTML de %s", doc.filename)
+            return doc, None, f"No se pudo generar el HTML ({type(e).__name__})."
+        if not html:
+            return doc, None, "No se pudo generar el HTML del PDF."
+        return doc, pool.submit(_render, html), ""
+
+    pending: deque[tuple[BatchDoc, Future | None, str]] = deque()
+    with ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="pdf-batch") as pool:
+        try:
+            for doc in docs:
+                if doc.pdf is not None or doc.build_html is None:
+                    pending.append((doc, None, ""))
+                else:
+                    pending.append(_submit(doc))
+                while pending and (len(pending) >= max_in_flight or _ready(pending[0][1])):
+                    yield _collect(*pending.popleft())
+            while pending:
+                yield _collect(*pending.popleft())
+        finally:
+            # Cliente desconectado: no seguir renderizando lo que nadie descargará.
+            for _doc, fut, _err in pending:
+                if fut is not None:
+                    fut.cancel()
+
+
+class _ZipSink:
+    """Destino sin ``seek`` para ``ZipFile``: acumula bytes hasta que se drenan."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _unique_name(name: str, used: set[str]) -> str:
+    base, dot, ext = name.rpartition(".")
+    if not dot:
+        base, ext = name, ""
+    candidate, n = name, 2
+    while candidate in used:
+        candidate = f"{base}_{n}.{ext}" if dot else f"{base}_{n}"
+        n += 1
+    used.add(candidate)
+    return candidate
+
+
+def errors_report(errors: list[BatchResult]) -> str:
+    lines = [f"{r.doc.filename}: {r.error}" for r in errors]
+    return "Documentos que no se pudieron generar:\n" + "\n".join(lines) + "\n"
+
+
+def stream_zip(results: Iterable[BatchResult]) -> Iterator[bytes]:
+    """ZIP generado al vuelo: cada PDF se envía al cliente en cuanto está listo."""
+    sink = _ZipSink()
+    used: set[str] = set()
+    errors: list[BatchResult] = []
+    # PDFs ya vienen comprimidos: guardarlos tal cual ahorra CPU sin perder tamaño.
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as zf:
+        for res in results:
+            for name, data in res.doc.attachments:
+                zf.writestr(_unique_name(name, used), data, compress_type=zipfile.ZIP_DEFLATED)
+            if res.pdf:
+                zf.writestr(_unique_name(res.doc.filename, used), res.pdf)
+            elif res.error:
+                errors.append(res)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+        if errors:
+            zf.writestr(_unique_name("errores.txt", used), errors_report(errors).encode("utf-8"))
+    tail = sink.drain()
+    if tail:
+        yield tail
+
+
+def merge_pdfs(results: Iterable[BatchResult]) -> tuple[bytes, list[BatchResult]]:
+    """Une los PDFs en uno (requiere ``pypdf``); devuelve ``(pdf, fallidos)``."""
+    import io
+
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    errors: list[BatchResult] = []
+    for res in results:
+        if not res.pdf:
+            errors.append(res)
+            continue
+        try:
+            writer.append(io.BytesIO(res.pdf))
+        except Exception as e:
+            logger.exception("Lote PDF: no se pudo unir %s", res.doc.filename)
+            errors.append(BatchResult(res.doc, error=type(e).__name__))
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue(), errors
+
+
+def merge_available() -> bool:
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def batch_pdf_response(
+    docs: list[BatchDoc],
+    *,
+    basename: str,
+    formato: str = "zip",
+    timeout: int = 90,
+):
+    """Respuesta HTTP del lote: ZIP en streaming o PDF unido (``formato=pdf``)."""
+    from django.http import HttpResponse, StreamingHttpResponse
+    from rest_framework.response import Response
+
+    from apps.cotizaciones.pdf_render import any_provider_configured
+
+    if not docs:
+        return Response({"detail": "No hay documentos para exportar."}, status=404)
+    if len(docs) > batch_max_docs():
+        return Response(
+            {"detail": f"Máximo {batch_max_docs()} documentos por descarga."},
+            status=400,
+        )
+    if not any_provider_configured():
+        return Response({"detail": "No hay motor de PDF disponible en el servidor."}, status=503)
+
+    if formato == "pdf":
+        if not merge_available():
+            return Response(
+                {"detail": "Unir PDFs requiere el paquete pypdf en el servidor; usa formato=zip."},
+                status=501,
+            )
+        pdf_bytes, errors = merge_pdfs(render_batch(docs, timeout=timeout))
+        if len(errors) == len(docs):
+            return Response(
+                {
+                    "detail": "No se pudo generar ningún PDF.",
+                    "errores": [{"archivo": r.doc.filename, "error": r.error} for r in errors],
+                },
+                status=502,
+            )
+        response = HttpResponse(pdf_bytes, content_type="application/pdf")
+        response["Content-Disposition"] = f'attachment; filename="{basename}.pdf"'
+        response["X-Pdf-Batch-Errores"] = str(len(errors))
+        return response
+
+    response = StreamingHttpResponse(
+        stream_zip(render_batch(docs, timeout=timeout)),
+        content_type="application/zip",
+    )
+    response["Content-Disposition"] = f'attachment; filename="{basename}.zip"'
+    return response
@@ -3,39 +3,80 @@ from __future__ import annotations
 
 import base64
 import logging
+from typing import Callable
 from urllib.request import Request, urlopen
 
+from apps.common.image_cache import CachedImage, get_image_cache
 from apps.common.ssrf import is_embed_url_allowed
 
 logger = logging.getLogger(__name__)
 
 MAX_EMBED_REMOTE_BYTES = 2_500_000
+_MAX_FETCH_WORKERS = 6
 
 
-def safe_http_image_bytes(url: str, max_bytes: int = MAX_EMBED_REMOTE_BYTES) -> bytes | None:
-    if not isinstance(url, str):
-        return None
-    u = url.strip()
-    if not u or not is_embed_url_allowed(u):
-        return None
+_FETCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; system-digitalflow/1.0)",
+    "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
+}
 
-    req = Request(
-        url=u,
-        headers={
-            "User-Agent": "Mozilla/5.0 (compatible; system-digitalflow/1.0)",
-            "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
-        },
-        method="GET",
-    )
+
+def _fetch_remote_image(url: str, *, timeout: float, max_bytes: int) -> CachedImage | None:
+    """Descarga sin caché; ``None`` (se cachea como negativo) si falla o excede el tope."""
+    req = Request(url=url, headers=_FETCH_HEADERS, method="GET")
     try:
-        with urlopen(req, timeout=20) as resp:
+        with urlopen(req, timeout=timeout) as resp:
+            content_type = (resp.headers.get("Content-Type") or "").split(";")[0].strip().lower()
             data = resp.read(max_bytes + 1)
     except Exception:
         logger.exception("Failed to fetch remote image bytes for PDF")
         return None
     if not data or len(data) > max_bytes:
         return None
-    return data
+    return CachedImage(data, content_type)
+
+
+def _remote_image(
+    url: str,
+    *,
+    timeout: float,
+    max_bytes: int = MAX_EMBED_REMOTE_BYTES,
+    width: int = 0,
+) -> CachedImage | None:
+    """Imagen remota vía caché compartida (la URL ya pasó el filtro SSRF).
+
+    Se descarga siempre hasta ``MAX_EMBED_REMOTE_BYTES`` para que la entrada sirva
+    a cualquier llamador; cada uno aplica su propio ``max_bytes`` al leerla.
+    """
+    fetch_limit = max(max_bytes, MAX_EMBED_REMOTE_BYTES)
+    entry = get_image_cache().get_or_fetch(
+        url,
+        lambda: _fetch_remote_image(url, timeout=timeout, max_bytes=fetch_limit),
+        width=width,
+    )
+    if entry is None or len(entry.data) > max_bytes:
+        return None
+    return entry
+
+
+def safe_http_image_bytes(url: str, max_bytes: int = MAX_EMBED_REMOTE_BYTES) -> bytes | None:
+    if not isinstance(url, str):
+        return None
+    u = url.strip()
+    if not u or not is_embed_url_allowed(u):
+        return None
+    entry = _remote_image(u, timeout=20, max_bytes=max_bytes)
+    return entry.data if entry is not None else None
+
+
+def _sniff_image_mime(raw: bytes) -> str:
+    if raw[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if raw[:3] == b"GIF":
+        return "image/gif"
+    if len(raw) >= 12 and raw[:4] == b"RIFF" and raw[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
 
 
 def safe_pdf_thumbnail_src(url: str) -> str:
@@ -50,15 +91,17 @@ def safe_pdf_thumbnail_src(url: str) -> str:
     raw = safe_http_image_bytes(u)
     if not raw:
         return ""
-    mime = "image/jpeg"
-    if raw[:8] == b"\x89PNG\r\n\x1a\n":
-        mime = "image/png"
-    elif raw[:3] == b"GIF":
-        mime = "image/gif"
-    elif len(raw) >= 12 and raw[:4] == b"RIFF" and raw[8:12] == b"WEBP":
-        mime = "image/webp"
     b64 = base64.b64encode(raw).decode("ascii")
-    return f"data:{mime};base64,{b64}"
+    return f"data:{_sniff_image_mime(raw)};base64,{b64}"
+
+
+def safe_pdf_thumbnail_srcs(urls: list[str], *, total_budget: float | None = None) -> dict[str, str]:
+    """Versión por lote de :func:`safe_pdf_thumbnail_src` (descargas en paralelo).
+
+    Devuelve mapa url (sin espacios) → src; las que fallan o no llegaron a
+    tiempo quedan fuera del mapa.
+    """
+    return _parallel_map(_unique_urls(urls), safe_pdf_thumbnail_src, total_budget=total_budget)
 
 
 def cloudinary_pdf_thumb(url: str, *, width: int = 720) -> str:
@@ -82,13 +125,31 @@ def embed_remote_images(
     timeout: int = 8,
     max_bytes: int = 400_000,
     width: int = 720,
+    total_budget: float | None = None,
 ) -> dict[str, str]:
-    """Descarga en paralelo y devuelve mapa url original → data URI."""
-    from concurrent.futures import ThreadPoolExecutor, as_completed
+    """Descarga en paralelo y devuelve mapa url original → data URI.
+
+    ``total_budget`` (segundos) acota el documento completo: lo que no llegó a
+    tiempo se omite del mapa (la plantilla decide el placeholder) y no se espera.
+    """
+
+    def _one(orig: str) -> str:
+        if orig.startswith("data:"):
+            return orig if is_embed_url_allowed(orig) else ""
+        return img_url_to_data_uri(
+            cloudinary_pdf_thumb(orig, width=width),
+            timeout=timeout,
+            max_bytes=max_bytes,
+            width=width,
+        )
 
+    return _parallel_map(_unique_urls(urls), _one, total_budget=total_budget)
+
+
+def _unique_urls(urls) -> list[str]:
     unique: list[str] = []
     seen: set[str] = set()
-    for raw in urls:
+    for raw in urls or ():
         if not isinstance(raw, str):
             continue
         u = raw.strip()
@@ -96,58 +157,63 @@ def embed_remote_images(
             continue
         seen.add(u)
         unique.append(u)
-    if not unique:
-        return {}
+    return unique
 
-    def _one(orig: str) -> tuple[str, str]:
-        if orig.startswith("data:"):
-            return orig, orig if is_embed_url_allowed(orig) else ""
-        return orig, img_url_to_data_uri(
-            cloudinary_pdf_thumb(orig, width=width),
-            timeout=timeout,
-            max_bytes=max_bytes,
-        )
 
+def _parallel_map(
+    unique: list[str],
+    fn: Callable[[str], str],
+    *,
+    total_budget: float | None = None,
+) -> dict[str, str]:
+    """Aplica ``fn`` en paralelo; omite resultados vacíos, con error o fuera de tiempo."""
+    from concurrent.futures import ThreadPoolExecutor, wait
+
+    if not unique:
+        return {}
     out: dict[str, str] = {}
-    workers = min(6, len(unique))
-    with ThreadPoolExecutor(max_workers=workers) as pool:
-        futs = [pool.submit(_one, u) for u in unique]
-        for fut in as_completed(futs):
+    pool = ThreadPoolExecutor(max_workers=min(_MAX_FETCH_WORKERS, len(unique)))
+    try:
+        futs = {pool.submit(fn, u): u for u in unique}
+        done, pending = wait(futs, timeout=total_budget)
+        if pending:
+            logger.warning(
+                "PDF: %s de %s imágenes excedieron el presupuesto de %ss",
+                len(pending),
+                len(futs),
+                total_budget,
+            )
+        for fut in done:
             try:
-                orig, uri = fut.result()
+                uri = fut.result()
             except Exception:
                 logger.exception("Failed embedding image for PDF")
                 continue
             if uri:
-                out[orig] = uri
+                out[futs[fut]] = uri
+    finally:
+        # Las descargas rezagadas terminan solas (cada una con su timeout).
+        pool.shutdown(wait=False, cancel_futures=True)
     return out
 
 
-def img_url_to_data_uri(url: str, *, timeout: int = 30, max_bytes: int = MAX_EMBED_REMOTE_BYTES) -> str:
-    """Download an image URL and embed as data URI for reliable PDF rendering."""
+def img_url_to_data_uri(
+    url: str,
+    *,
+    timeout: int = 30,
+    max_bytes: int = MAX_EMBED_REMOTE_BYTES,
+    width: int = 0,
+) -> str:
+    """Download an image URL and embed as data URI for reliable PDF rendering.
+
+    ``width`` solo distingue la entrada de caché (miniatura pedida a ese ancho).
+    """
     if not isinstance(url, str) or not url:
         return ""
     if not is_embed_url_allowed(url):
         return ""
-    try:
-        req = Request(
-            url=url,
-            headers={
-                "User-Agent": "Mozilla/5.0",
-                "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
-            },
-            method="GET",
-        )
-        with urlopen(req, timeout=timeout) as resp:
-            content_type = (resp.headers.get("Content-Type") or "").split(";")[0].strip().lower()
-            raw = resp.read()
-
-        if raw and len(raw) > max_bytes:
-            return ""
-        if not content_type.startswith("image/"):
-            return ""
-        b64 = base64.b64encode(raw).decode("ascii")
-        return f"data:{content_type};base64,{b64}"
-    except Exception:
-        logger.exception("Failed to download and embed remote image for PDF")
+    entry = _remote_image(url, timeout=timeout, max_bytes=max_bytes, width=width)
+    if entry is None or not entry.content_type.startswith("image/"):
         return ""
+    b64 = base64.b64encode(entry.data).decode("ascii")
+    return f"data:{entry.content_type};base64,{b64}"
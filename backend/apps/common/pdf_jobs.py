@@ -0,0 +1,147 @@
+"""Cola de render de PDF asíncrona (tabla ``PdfRenderJob`` + hilos locales).
+
+El request arma el HTML (consultas y permisos del usuario) y crea el trabajo;
+un ``ThreadPoolExecutor`` del proceso lo toma tras el commit, llama a
+``render_html_to_pdf`` y guarda los bytes en la fila. El cliente consulta el
+estado y descarga cuando está ``listo``. El reclamo es atómico
+(``pendiente → en_proceso`` con ``UPDATE ... WHERE``), así que un trabajo
+huérfano (worker reciclado antes de tomarlo) puede reencolarlo cualquier
+worker que atienda el polling sin duplicar el render.
+
+Variables de entorno:
+
+- ``PDF_JOBS_WORKERS`` (default 2): hilos de render por worker de Gunicorn.
+- ``PDF_JOBS_TTL_HOURS`` (default 24): se borran trabajos terminados más viejos.
+- ``PDF_JOBS_STALE_SEC`` (default 600): ``en_proceso`` sin terminar se marca error.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from apps.common.background import ProcessExecutor, env_int, resubmit_orphan
+from apps.common.models import PdfRenderJob
+
+logger = logging.getLogger(__name__)
+
+_executor = ProcessExecutor("pdf-job", lambda: env_int("PDF_JOBS_WORKERS", 2, 1))
+
+
+def _submit(job_id) -> None:
+    _executor.submit(run_pdf_job, job_id)
+
+
+def purge_expired_pdf_jobs() -> int:
+    cutoff = timezone.now() - timedelta(hours=env_int("PDF_JOBS_TTL_HOURS", 24, 1))
+    deleted, _ = PdfRenderJob.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def create_pdf_job(
+    *,
+    user,
+    tipo: str,
+    html: str,
+    filename: str,
+    size: str = "A4",
+    landscape: bool = False,
+    timeout: int = 90,
+) -> PdfRenderJob:
+    """Registra el trabajo y lo encola al confirmar la transacción."""
+    purge_expired_pdf_jobs()
+    job = PdfRenderJob.objects.create(
+        creado_por=user if getattr(user, "is_authenticated", False) else None,
+        tipo=tipo[:60],
+        html=html,
+        filename=filename[:200],
+        size=size,
+        landscape=landscape,
+        timeout=timeout,
+    )
+    job_id = job.pk
+    transaction.on_commit(lambda: _submit(job_id))
+    return job
+
+
+def run_pdf_job(job_id) -> None:
+    """Ejecuta un trabajo si sigue pendiente (seguro ante reencolados duplicados)."""
+    from apps.cotizaciones.pdf_render import PdfRenderError, render_html_to_pdf
+
+    close_old_connections()
+    try:
+        claimed = PdfRenderJob.objects.filter(
+            pk=job_id, status=PdfRenderJob.STATUS_PENDIENTE
+        ).update(status=PdfRenderJob.STATUS_EN_PROCESO, started_at=timezone.now())
+        if not claimed:
+            return
+        job = PdfRenderJob.objects.only("html", "size", "landscape", "timeout").get(pk=job_id)
+        try:
+            pdf_bytes = render_html_to_pdf(
+                job.html,
+                size=job.size,
+                landscape=job.landscape,
+                timeout=job.timeout,
+            )
+        except PdfRenderError as e:
+            logger.warning("PDF job %s falló: %s", job_id, e.detail)
+            _finish(job_id, status=PdfRenderJob.STATUS_ERROR, error=str(e))
+        except Exception as e:
+            logger.exception("PDF job %s falló", job_id)
+            _finish(job_id, status=PdfRenderJob.STATUS_ERROR, error=f"{type(e).__name__}")
+        else:
+            _finish(job_id, status=PdfRenderJob.STATUS_LISTO, pdf=pdf_bytes)
+    finally:
+        close_old_connections()
+
+
+def _finish(job_id, *, status: str, pdf: bytes | None = None, error: str = "") -> None:
+    PdfRenderJob.objects.filter(pk=job_id).update(
+        status=status,
+        pdf=pdf,
+        error=error[:500],
+        html="",
+        finished_at=timezone.now(),
+    )
+
+
+def refresh_pdf_job_state(job: PdfRenderJob) -> PdfRenderJob:
+    """Reencola pendientes huérfanos y marca como error los que se colgaron."""
+    now = timezone.now()
+    if job.status == PdfRenderJob.STATUS_PENDIENTE:
+        resubmit_orphan(job, _submit, now=now)
+    elif job.status == PdfRenderJob.STATUS_EN_PROCESO:
+        stale = timedelta(seconds=env_int("PDF_JOBS_STALE_SEC", 600, 60))
+        if job.started_at and now - job.started_at > stale:
+            updated = PdfRenderJob.objects.filter(
+                pk=job.pk, status=PdfRenderJob.STATUS_EN_PROCESO
+            ).update(
+                status=PdfRenderJob.STATUS_ERROR,
+                error="El render no terminó (worker reiniciado o tiempo agotado).",
+                html="",
+                finished_at=now,
+            )
+            if updated:
+                job.refresh_from_db(fields=["status", "error", "finished_at"])
+    return job
+
+
+def pdf_job_payload(job: PdfRenderJob) -> dict:
+    from django.urls import reverse
+
+    data = {
+        "id": str(job.pk),
+        "tipo": job.tipo,
+        "status": job.status,
+        "filename": job.filename,
+        "error": job.error or "",
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "status_url": reverse("pdf-job-detail", args=[job.pk]),
+    }
+    if job.status == PdfRenderJob.STATUS_LISTO:
+        data["download_url"] = reverse("pdf-job-descarga", args=[job.pk])
+    return data
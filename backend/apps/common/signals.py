@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.common.marca import invalidate_logo_cache
+from apps.common.models import MarcaSistema
+
+
+@receiver(post_save, sender=MarcaSistema)
+@receiver(post_delete, sender=MarcaSistema)
+def marca_sistema_cambiada(sender, **kwargs):
+    invalidate_logo_cache()
@@ -0,0 +1,49 @@
+"""Almacén en disco: directorios privados y archivos ajenos ignorados."""
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from apps.common.disk_cache import DiskLRUStore, env_cache_dir
+
+
+class DiskLRUStoreTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name) / "store"
+        self.store = DiskLRUStore(self.root, 1024 * 1024)
+
+    def test_put_creates_private_dirs(self):
+        self.store.put("abcdef", b"x")
+        self.assertEqual(self.store.get("abcdef"), b"x")
+        self.assertEqual(self.root.stat().st_mode & 0o777, 0o700)
+        self.assertEqual((self.root / "ab").stat().st_mode & 0o777, 0o700)
+
+    def test_put_tightens_loose_root(self):
+        self.root.mkdir(mode=0o777)
+        os.chmod(self.root, 0o777)
+        self.store.put("abcdef", b"x")
+        self.assertEqual(self.root.stat().st_mode & 0o777, 0o700)
+
+    def test_file_writable_by_others_is_ignored(self):
+        self.store.put("abcdef", b"x")
+        planted = self.store._path("abcdef")
+        planted.write_bytes(b"plantado")
+        os.chmod(planted, 0o666)
+        self.assertIsNone(self.store.get("abcdef"))
+
+    def test_file_of_other_user_is_ignored(self):
+        self.store.put("abcdef", b"x")
+        with patch("apps.common.disk_cache.os.getuid", return_value=os.getuid() + 1):
+            self.assertIsNone(self.store.get("abcdef"))
+
+    def test_default_dir_is_outside_tmp(self):
+        with patch.dict(os.environ, {"PDF_CACHE_DIR": ""}):
+            root = env_cache_dir("PDF_CACHE_DIR", "pdf-cache")
+        self.assertFalse(str(root).startswith(tempfile.gettempdir()))
+        self.assertEqual(root.parent.name, "var")
@@ -0,0 +1,102 @@
+"""Caché de imágenes remotas para PDF: memoria + disco, TTL y caché negativa."""
+from __future__ import annotations
+
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from apps.common import pdf_images
+from apps.common.disk_cache import DiskLRUStore
+from apps.common.image_cache import CachedImage, RemoteImageCache, image_cache_key
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"0" * 32
+URL = "https://res.cloudinary.com/demo/image/upload/v1/a.png"
+
+
+class RemoteImageCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.cache = self._cache()
+        patcher = patch.object(pdf_images, "get_image_cache", return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _cache(self, **kwargs):
+        opts = {"mem_max_bytes": 1024 * 1024, "ttl_s": 3600, "negative_ttl_s": 60}
+        opts.update(kwargs)
+        return RemoteImageCache(DiskLRUStore(self.root, 1024 * 1024, suffix=".img"), **opts)
+
+    def test_key_normalizes_url_and_includes_width(self):
+        self.assertEqual(
+            image_cache_key(" HTTPS://Res.Cloudinary.com/demo/a.png#x "),
+            image_cache_key("https://res.cloudinary.com/demo/a.png"),
+        )
+        self.assertNotEqual(image_cache_key(URL, 720), image_cache_key(URL, 360))
+        self.assertNotEqual(image_cache_key(URL.upper()), image_cache_key(URL))
+
+    def test_second_render_does_not_refetch(self):
+        with patch.object(
+            pdf_images, "_fetch_remote_image", return_value=CachedImage(PNG, "image/png")
+        ) as mock_fetch:
+            first = pdf_images.safe_pdf_thumbnail_src(URL)
+            second = pdf_images.safe_pdf_thumbnail_src(URL)
+            uri = pdf_images.img_url_to_data_uri(URL)
+        self.assertTrue(first.startswith("data:image/png;base64,"))
+        self.assertEqual(first, second)
+        self.assertEqual(uri, first)
+        self.assertEqual(mock_fetch.call_count, 1)
+
+    def test_disk_entry_is_shared_with_fresh_process(self):
+        with patch.object(pdf_images, "_fetch_remote_image", return_value=CachedImage(PNG, "image/png")):
+            pdf_images.safe_http_image_bytes(URL)
+        other_worker = self._cache()
+        with patch.object(pdf_images, "get_image_cache", return_value=other_worker), patch.object(
+            pdf_images, "_fetch_remote_image"
+        ) as mock_fetch:
+            self.assertEqual(pdf_images.safe_http_image_bytes(URL), PNG)
+        mock_fetch.assert_not_called()
+
+    def test_failures_are_cached_negatively(self):
+        with patch.object(pdf_images, "_fetch_remote_image", return_value=None) as mock_fetch:
+            self.assertEqual(pdf_images.safe_pdf_thumbnail_src(URL), "")
+            self.assertEqual(pdf_images.safe_pdf_thumbnail_src(URL), "")
+        self.assertEqual(mock_fetch.call_count, 1)
+
+    def test_expired_entries_are_refetched(self):
+        key = image_cache_key(URL)
+        self.cache.store_result(key, CachedImage(PNG, "image/png"))
+        with patch("apps.common.image_cache.time.time", return_value=time.time() + 7200):
+            self.assertEqual(self.cache.lookup(key), (False, None))
+
+    def test_memory_lru_is_bounded_by_bytes(self):
+        cache = self._cache(mem_max_bytes=300)
+        for i in range(3):
+            cache.store_result(f"k{i}", CachedImage(b"x" * 100, "image/jpeg"))
+        self.assertLessEqual(cache._mem_bytes, 300)
+        self.assertNotIn("k0", cache._mem)
+        self.assertEqual(cache.lookup("k0")[1].data, b"x" * 100)
+
+    def test_per_call_max_bytes_applies_to_cached_entries(self):
+        with patch.object(pdf_images, "_fetch_remote_image", return_value=CachedImage(PNG, "image/png")):
+            self.assertEqual(pdf_images.img_url_to_data_uri(URL, max_bytes=10), "")
+            self.assertTrue(pdf_images.img_url_to_data_uri(URL))
+
+    def test_blocked_urls_are_not_fetched_or_cached(self):
+        with patch.object(pdf_images, "_fetch_remote_image") as mock_fetch:
+            self.assertEqual(pdf_images.safe_pdf_thumbnail_src("http://127.0.0.1/a.png"), "")
+        mock_fetch.assert_not_called()
+        self.assertEqual(list(self.root.rglob("*.img")), [])
+
+    def test_thumbnail_batch_fetches_unique_urls_in_parallel(self):
+        other = "https://res.cloudinary.com/demo/image/upload/v1/b.png"
+        with patch.object(
+            pdf_images, "_fetch_remote_image", return_value=CachedImage(PNG, "image/png")
+        ) as mock_fetch:
+            out = pdf_images.safe_pdf_thumbnail_srcs([URL, f" {URL} ", other, "", None])
+        self.assertEqual(set(out), {URL, other})
+        self.assertEqual(mock_fetch.call_count, 2)
@@ -158,3 +158,51 @@ class MarcaSistemaApiTests(APITestCase):
         )
         marca = MarcaSistema.get_solo()
         self.assertEqual(marca.logo_public_id, "marca/logo/x")
+
+
+class LogoDataUriMemoTests(APITestCase):
+    LOGO = "https://res.cloudinary.com/demo/image/upload/v1/marca/logo/x.png"
+
+    def setUp(self):
+        from apps.common import marca
+
+        self.marca = marca
+        marca.invalidate_logo_cache()
+        self.addCleanup(marca.invalidate_logo_cache)
+        MarcaSistema.objects.update_or_create(pk=1, defaults={"logo_url": self.LOGO})
+
+    def test_logo_se_descarga_una_vez(self):
+        with patch.object(
+            self.marca, "img_url_to_data_uri", return_value="data:image/png;base64,AAA"
+        ) as mock_fetch:
+            self.assertEqual(self.marca.logo_data_uri_for_pdf(), "data:image/png;base64,AAA")
+            self.assertEqual(self.marca.logo_data_uri_for_pdf(), "data:image/png;base64,AAA")
+        self.assertEqual(mock_fetch.call_count, 1)
+
+    def test_guardar_marca_invalida_el_logo(self):
+        with patch.object(
+            self.marca, "img_url_to_data_uri", side_effect=["data:image/png;base64,AAA", "data:image/png;base64,BBB"]
+        ):
+            self.marca.logo_data_uri_for_pdf()
+            marca = MarcaSistema.get_solo()
+            marca.logo_url = self.LOGO.replace("x.png", "y.png")
+            marca.save(update_fields=["logo_url", "updated_at"])
+            self.assertEqual(self.marca.logo_data_uri_for_pdf(), "data:image/png;base64,BBB")
+
+    def test_otro_worker_detecta_cambio_por_sello(self):
+        with patch.object(
+            self.marca, "img_url_to_data_uri", side_effect=["data:image/png;base64,AAA", "data:image/png;base64,BBB"]
+        ), patch("apps.common.signals.invalidate_logo_cache"):
+            self.marca.logo_data_uri_for_pdf()
+            # Simula el guardado hecho por otro worker (sin señal en este proceso).
+            marca = MarcaSistema.get_solo()
+            marca.save(update_fields=["updated_at"])
+            self.assertEqual(self.marca.logo_data_uri_for_pdf(), "data:image/png;base64,BBB")
+
+    def test_descarga_fallida_usa_respaldo_y_reintenta(self):
+        with patch.object(self.marca, "img_url_to_data_uri", return_value="") as mock_fetch, patch.object(
+            self.marca, "load_public_image_data_uri", return_value="data:image/png;base64,LOCAL"
+        ):
+            self.assertEqual(self.marca.logo_data_uri_for_pdf(), "data:image/png;base64,LOCAL")
+            self.marca.logo_data_uri_for_pdf()
+        self.assertEqual(mock_fetch.call_count, 2)
@@ -0,0 +1,135 @@
+"""Exportación de PDFs por lote: orden de salida, fallos parciales y ZIP en streaming."""
+from __future__ import annotations
+
+import io
+import zipfile
+from datetime import date
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.common.pdf_batch import BatchDoc, parse_id_list, render_batch, stream_zip
+from apps.cotizaciones.models import Cotizacion
+from apps.cotizaciones.pdf_render import PdfRenderError
+from apps.ordenes.models import Orden
+from apps.users.models import UserPermissions
+
+User = get_user_model()
+
+
+def _fake_render(html, **_kwargs):
+    if "falla" in html:
+        raise PdfRenderError("motor caído")
+    return b"%PDF-1.4 " + html.encode()
+
+
+class RenderBatchTests(SimpleTestCase):
+    def test_parse_id_list(self):
+        self.assertEqual(parse_id_list(" 3,5,x, 3 ,9"), [3, 5, 9])
+        self.assertEqual(parse_id_list(["1", 2]), [1, 2])
+        self.assertEqual(parse_id_list(None), [])
+
+    @patch("apps.cotizaciones.pdf_render.render_html_to_pdf", side_effect=_fake_render)
+    def test_keeps_order_and_reports_failures(self, _mock):
+        def _boom():
+            raise ValueError("sin datos")
+
+        docs = [BatchDoc(f"doc_{i}.pdf", lambda i=i: f"<p>{i}</p>") for i in range(7)]
+        docs.insert(2, BatchDoc("malo.pdf", lambda: "<p>falla</p>"))
+        docs.insert(4, BatchDoc("sin_html.pdf", _boom))
+        results = list(render_batch(docs, workers=2))
+        self.assertEqual([r.doc.filename for r in results], [d.filename for d in docs])
+        failed = {r.doc.filename for r in results if r.error}
+        self.assertEqual(failed, {"malo.pdf", "sin_html.pdf"})
+        self.assertEqual(results[0].pdf, b"%PDF-1.4 <p>0</p>")
+
+    @patch("apps.cotizaciones.pdf_render.render_html_to_pdf", side_effect=_fake_render)
+    def test_stream_zip_contains_pdfs_and_error_list(self, _mock):
+        docs = [
+            BatchDoc("a.pdf", lambda: "<p>a</p>"),
+            BatchDoc("a.pdf", lambda: "<p>b</p>"),
+            BatchDoc("c.pdf", lambda: "<p>falla</p>"),
+        ]
+        chunks = list(stream_zip(render_batch(docs)))
+        self.assertGreater(len(chunks), 1)
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+            self.assertEqual(zf.namelist(), ["a.pdf", "a_2.pdf", "errores.txt"])
+            self.assertIn("c.pdf", zf.read("errores.txt").decode())
+
+    @patch("apps.cotizaciones.pdf_render.render_html_to_pdf", side_effect=_fake_render)
+    def test_prerendered_docs_and_attachments(self, render):
+        kept = []
+        docs = [
+            BatchDoc("listo.pdf", lambda: "<p>no</p>", pdf=b"%PDF cache", attachments=(("listo.xml", b"<x/>"),)),
+            BatchDoc("nuevo.pdf", lambda: "<p>n</p>", on_pdf=kept.append),
+            BatchDoc("solo_xml.pdf", None, attachments=(("solo.xml", b"<y/>"),)),
+        ]
+        with zipfile.ZipFile(io.BytesIO(b"".join(stream_zip(render_batch(docs))))) as zf:
+            self.assertEqual(zf.namelist(), ["listo.xml", "listo.pdf", "nuevo.pdf", "solo.xml"])
+            self.assertEqual(zf.read("listo.pdf"), b"%PDF cache")
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(kept, [b"%PDF-1.4 <p>n</p>"])
+
+
+@patch("apps.cotizaciones.pdf_render.any_provider_configured", return_value=True)
+@patch("apps.cotizaciones.pdf_render.render_html_to_pdf", side_effect=_fake_render)
+class PdfLoteApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="oficina", password="test-pass-123")
+        UserPermissions.objects.create(
+            user=self.user,
+            permissions={
+                "cotizaciones": {"view": True, "create": False, "edit": False, "delete": False},
+                "ordenes": {"view": True, "create": False, "edit": False, "delete": False},
+            },
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _zip_names(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        body = b"".join(response.streaming_content)
+        with zipfile.ZipFile(io.BytesIO(body)) as zf:
+            return zf.namelist()
+
+    def _cotizacion(self, fecha):
+        return Cotizacion.objects.create(
+            cliente="Cliente lote",
+            prospecto=True,
+            contacto="Contacto",
+            medio_contacto="CLIENTE",
+            status="PENDIENTE",
+            fecha=fecha,
+            subtotal=100,
+            iva_pct=16,
+            iva=16,
+            total=116,
+        )
+
+    def test_cotizaciones_por_mes(self, *_mocks):
+        junio = [self._cotizacion("2026-06-05"), self._cotizacion("2026-06-20")]
+        self._cotizacion("2026-07-01")
+        res = self.client.get("/api/cotizaciones/pdf-lote/?mes=2026-06")
+        names = self._zip_names(res)
+        self.assertEqual(len(names), len(junio))
+        self.assertTrue(all(n.startswith("Cotizacion_") for n in names))
+
+    def test_cotizaciones_requiere_ids_o_mes(self, *_mocks):
+        res = self.client.get("/api/cotizaciones/pdf-lote/")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ordenes_por_ids_respeta_orden(self, *_mocks):
+        a = Orden.objects.create(cliente="A", creado_por=self.user, fecha_inicio=date(2026, 6, 1))
+        b = Orden.objects.create(cliente="B", creado_por=self.user, fecha_inicio=date(2026, 6, 2))
+        res = self.client.get(f"/api/ordenes/pdf-lote/?ids={b.id},{a.id}")
+        self.assertEqual(
+            self._zip_names(res),
+            [f"Ordenes_Servicio_{b.id}.pdf", f"Ordenes_Servicio_{a.id}.pdf"],
+        )
+
+    def test_ordenes_sin_resultados_es_404(self, *_mocks):
+        res = self.client.get("/api/ordenes/pdf-lote/?mes=2001-01")
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,99 @@
+"""Trabajos de PDF asíncronos: encolar, consultar estado y descargar."""
+from __future__ import annotations
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.common.models import PdfRenderJob
+from apps.common.pdf_jobs import run_pdf_job
+from apps.users.models import UserPermissions
+
+User = get_user_model()
+
+
+class PdfRenderJobApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="lector", password="test-pass-123")
+        UserPermissions.objects.create(
+            user=self.user,
+            permissions={"ordenes": {"view": True, "create": False, "edit": False, "delete": False}},
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _enqueue_listado(self):
+        with patch("apps.ordenes.views.any_provider_configured", return_value=True):
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                res = self.client.post("/api/ordenes/listado-mes-pdf/async/?mes=2026-06")
+        return res, callbacks
+
+    def test_view_permission_is_enough_to_enqueue(self):
+        res, callbacks = self._enqueue_listado()
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data["status"], PdfRenderJob.STATUS_PENDIENTE)
+        self.assertEqual(len(callbacks), 1)
+        job = PdfRenderJob.objects.get(pk=res.data["id"])
+        self.assertEqual(job.creado_por, self.user)
+        self.assertIn("<html", job.html.lower())
+
+    def test_invalid_month_is_400(self):
+        res = self.client.post("/api/ordenes/listado-mes-pdf/async/?mes=2026")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch("apps.cotizaciones.pdf_render.render_html_to_pdf", return_value=b"%PDF-1.4 job")
+    def test_run_then_download(self, _mock_render):
+        res, _ = self._enqueue_listado()
+        job_id = res.data["id"]
+
+        pending = self.client.get(f"/api/pdf-jobs/{job_id}/pdf/")
+        self.assertEqual(pending.status_code, status.HTTP_409_CONFLICT)
+
+        run_pdf_job(job_id)
+        detail = self.client.get(f"/api/pdf-jobs/{job_id}/")
+        self.assertEqual(detail.data["status"], PdfRenderJob.STATUS_LISTO)
+        self.assertIn("download_url", detail.data)
+
+        pdf = self.client.get(detail.data["download_url"])
+        self.assertEqual(pdf.status_code, status.HTTP_200_OK)
+        self.assertEqual(pdf.content, b"%PDF-1.4 job")
+        self.assertEqual(PdfRenderJob.objects.get(pk=job_id).html, "")
+
+    @patch("apps.cotizaciones.pdf_render.render_html_to_pdf", return_value=b"%PDF-1.4 job")
+    def test_run_is_idempotent(self, mock_render):
+        res, _ = self._enqueue_listado()
+        run_pdf_job(res.data["id"])
+        run_pdf_job(res.data["id"])
+        self.assertEqual(mock_render.call_count, 1)
+
+    def test_other_users_cannot_see_job(self):
+        res, _ = self._enqueue_listado()
+        other = User.objects.create_user(username="otro", password="test-pass-123")
+        self.client.force_authenticate(user=other)
+        detail = self.client.get(f"/api/pdf-jobs/{res.data['id']}/")
+        self.assertEqual(detail.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_stale_running_job_is_marked_error(self):
+        job = PdfRenderJob.objects.create(
+            creado_por=self.user,
+            tipo="demo",
+            filename="demo.pdf",
+            status=PdfRenderJob.STATUS_EN_PROCESO,
+            started_at=timezone.now() - timedelta(hours=1),
+        )
+        detail = self.client.get(f"/api/pdf-jobs/{job.pk}/")
+        self.assertEqual(detail.data["status"], PdfRenderJob.STATUS_ERROR)
+
+    @patch("apps.common.pdf_jobs._submit")
+    def test_orphan_is_resubmitted_once_per_interval(self, submit):
+        job = PdfRenderJob.objects.create(creado_por=self.user, tipo="demo", filename="demo.pdf")
+        PdfRenderJob.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+        for _ in range(3):
+            self.client.get(f"/api/pdf-jobs/{job.pk}/")
+        submit.assert_called_once_with(job.pk)
+        PdfRenderJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=1))
+        self.client.get(f"/api/pdf-jobs/{job.pk}/")
+        self.assertEqual(submit.call_count, 2)
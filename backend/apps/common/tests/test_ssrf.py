@@ -51,3 +51,59 @@ class PdfImageEmbedTests(SimpleTestCase):
 
         data = "data:image/png;base64,abc"
         self.assertEqual(embed_remote_images([data]).get(data), data)
+
+    def test_embed_remote_images_respects_total_budget(self):
+        import threading
+        from unittest.mock import patch
+
+        from apps.common.pdf_images import embed_remote_images
+
+        release = threading.Event()
+        fast = "https://res.cloudinary.com/demo/image/upload/v1/fast.jpg"
+        slow = "https://res.cloudinary.com/demo/image/upload/v1/slow.jpg"
+
+        def _fake(url, **_kwargs):
+            if "slow" in url:
+                release.wait(5)
+            return "data:image/jpeg;base64,AA=="
+
+        try:
+            with patch("apps.common.pdf_images.img_url_to_data_uri", side_effect=_fake):
+                out = embed_remote_images([fast, slow], total_budget=0.3)
+        finally:
+            release.set()
+        self.assertIn(fast, out)
+        self.assertNotIn(slow, out)
+
+
+class OrdenPdfImagesTests(SimpleTestCase):
+    def _orden(self, **kwargs):
+        from apps.ordenes.models import Orden
+
+        return Orden(id=7, idx=7, status="resuelto", nombre_encargado="Técnico", **kwargs)
+
+    def test_orden_embeds_photos_in_one_parallel_batch_with_placeholders(self):
+        from unittest.mock import patch
+
+        from apps.ordenes.pdf_templates.orden import generate_orden_pdf_html
+
+        ok = "https://res.cloudinary.com/demo/image/upload/v1/ok.jpg"
+        missing = "https://res.cloudinary.com/demo/image/upload/v1/missing.jpg"
+        firma = "https://res.cloudinary.com/demo/image/upload/v1/firma.png"
+        orden = self._orden(fotos_urls=[ok, missing], firma_encargado_url=firma)
+        with patch(
+            "apps.ordenes.pdf_templates.orden.embed_remote_images",
+            return_value={ok: "data:image/jpeg;base64,T0s="},
+        ) as mock_embed, patch(
+            "apps.ordenes.pdf_templates.orden.logo_data_uri_for_pdf", return_value=""
+        ):
+            html = generate_orden_pdf_html(orden)
+        mock_embed.assert_called_once()
+        urls = mock_embed.call_args.args[0]
+        self.assertIn(ok, urls)
+        self.assertIn(missing, urls)
+        self.assertIn(firma, urls)
+        self.assertIsNotNone(mock_embed.call_args.kwargs.get("total_budget"))
+        self.assertIn("data:image/jpeg;base64,T0s=", html)
+        self.assertIn("Imagen no disponible", html)
+        self.assertIn("Firma no disponible", html)
@@ -5,4 +5,6 @@ from . import views
 urlpatterns = [
     path("marca/", views.MarcaSistemaView.as_view(), name="marca-sistema"),
     path("marca/logo/", views.MarcaLogoUploadView.as_view(), name="marca-logo"),
+    path("pdf-jobs/<uuid:job_id>/", views.PdfJobDetailView.as_view(), name="pdf-job-detail"),
+    path("pdf-jobs/<uuid:job_id>/pdf/", views.PdfJobDownloadView.as_view(), name="pdf-job-descarga"),
 ]
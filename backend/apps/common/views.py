@@ -1,9 +1,11 @@
 import logging
 
 from django.db.utils import OperationalError, ProgrammingError
+from django.http import HttpResponse
 from rest_framework import status
+from rest_framework.exceptions import NotFound
 from rest_framework.exceptions import ValidationError as DRFValidationError
-from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAdminUser
+from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
@@ -13,7 +15,8 @@ from apps.ordenes.image_services import (
     upload_data_url,
 )
 
-from .models import DEFAULT_NOMBRE, MarcaSistema
+from .models import DEFAULT_NOMBRE, MarcaSistema, PdfRenderJob
+from .pdf_jobs import pdf_job_payload, refresh_pdf_job_state
 from .serializers import MarcaSistemaSerializer
 
 logger = logging.getLogger(__name__)
@@ -87,3 +90,40 @@ class MarcaLogoUploadView(APIView):
         if previa and previa != url:
             delete_cloudinary_resource(previa)
         return Response(MarcaSistemaSerializer(marca).data)
+
+
+def _pdf_job_for_user(request, job_id) -> PdfRenderJob:
+    """Solo quien lo creó (o staff) ve el trabajo; a los demás, 404."""
+    qs = PdfRenderJob.objects.defer("html", "pdf")
+    user = request.user
+    if not (user.is_staff or user.is_superuser):
+        qs = qs.filter(creado_por=user)
+    job = qs.filter(pk=job_id).first()
+    if job is None:
+        raise NotFound()
+    return job
+
+
+class PdfJobDetailView(APIView):
+    """GET estado de un trabajo de PDF asíncrono."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = refresh_pdf_job_state(_pdf_job_for_user(request, job_id))
+        return Response(pdf_job_payload(job))
+
+
+class PdfJobDownloadView(APIView):
+    """GET PDF terminado; 409 mientras siga pendiente/en proceso."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = _pdf_job_for_user(request, job_id)
+        if job.status != PdfRenderJob.STATUS_LISTO:
+            return Response(pdf_job_payload(job), status=status.HTTP_409_CONFLICT)
+        pdf_bytes = PdfRenderJob.objects.filter(pk=job.pk).values_list("pdf", flat=True).first()
+        response = HttpResponse(bytes(pdf_bytes or b""), content_type="application/pdf")
+        response["Content-Disposition"] = f'inline; filename="{job.filename}"'
+        return response
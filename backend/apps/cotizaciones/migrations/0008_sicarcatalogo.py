@@ -0,0 +1,30 @@
+# Generated by Django 5.1.4 on 2026-10-18 01:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cotizaciones', '0007_cotizacionitem_sin_iva'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SicarCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('servidor', models.CharField(max_length=40)),
+                ('nombre', models.CharField(max_length=40)),
+                ('datos', models.JSONField(default=list)),
+                ('checksum', models.CharField(blank=True, default='', max_length=64)),
+                ('fecha_actualizacion', models.DateTimeField()),
+                ('fecha_verificacion', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Catálogo SICAR',
+                'verbose_name_plural': 'Catálogos SICAR',
+                'constraints': [models.UniqueConstraint(fields=('servidor', 'nombre'), name='cotizaciones_sicar_catalogo_servidor_nombre_uniq')],
+            },
+        ),
+    ]
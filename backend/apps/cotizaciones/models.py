@@ -142,3 +142,32 @@ class CotizacionItem(models.Model):
         indexes = [
             models.Index(fields=['cotizacion']),
         ]
+
+
+class SicarCatalogo(models.Model):
+    """Copia local de un catálogo SICAR para el formulario de factura.
+
+    ``servidor`` identifica la base SICAR (host, puerto y base) y ``checksum`` el
+    contenido de ``datos``: la verificación contra SICAR solo reescribe la fila si cambió.
+    """
+
+    servidor = models.CharField(max_length=40)
+    nombre = models.CharField(max_length=40)
+    datos = models.JSONField(default=list)
+    checksum = models.CharField(max_length=64, blank=True, default='')
+    # Último cambio de contenido y última lectura en SICAR (coincida o no).
+    fecha_actualizacion = models.DateTimeField()
+    fecha_verificacion = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['servidor', 'nombre'],
+                name='cotizaciones_sicar_catalogo_servidor_nombre_uniq',
+            )
+        ]
+        verbose_name = 'Catálogo SICAR'
+        verbose_name_plural = 'Catálogos SICAR'
+
+    def __str__(self):
+        return f'{self.nombre}@{self.servidor[:8]}'
@@ -0,0 +1,330 @@
+"""Pool de Chromium caliente (Playwright) por proceso para ``render_html_to_pdf``.
+
+La API síncrona de Playwright está ligada al hilo que la inicia, así que cada
+*slot* del pool es un hilo propio con su ``sync_playwright()`` + navegador
+lanzado una sola vez. Las peticiones encolan trabajos (HTML + formato) y esperan
+el resultado; cada página usa un ``BrowserContext`` nuevo (aislado) que se
+cierra al terminar.
+
+Reciclaje: el navegador de un slot se relanza tras ``PDF_BROWSER_MAX_PAGES``
+páginas, tras ``PDF_BROWSER_MAX_AGE_SEC`` segundos, si ``is_connected()`` falla
+(chequeo antes de cada trabajo) o si un render lanza excepción.
+
+Variables de entorno:
+
+- ``PDF_BROWSER_POOL_SIZE`` (default 1): slots por worker; ``0`` desactiva el
+  pool y vuelve al arranque en frío por PDF.
+- ``PDF_BROWSER_MAX_PAGES`` (default 100)
+- ``PDF_BROWSER_MAX_AGE_SEC`` (default 1800)
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger(__name__)
+
+CHROMIUM_LAUNCH_ARGS = (
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-setuid-sandbox",
+    "--disable-gpu",
+)
+
+PDF_MARGIN_NONE = {"top": "0", "right": "0", "bottom": "0", "left": "0"}
+
+
+def _env_int(name: str, default: int, *, minimum: int = 0, maximum: int | None = None) -> int:
+    raw = (os.environ.get(name) or "").strip()
+    try:
+        value = int(raw) if raw else default
+    except ValueError:
+        value = default
+    value = max(minimum, value)
+    if maximum is not None:
+        value = min(maximum, value)
+    return value
+
+
+def pool_size() -> int:
+    return _env_int("PDF_BROWSER_POOL_SIZE", 1, minimum=0, maximum=8)
+
+
+def browser_pool_enabled() -> bool:
+    return pool_size() > 0
+
+
+class PdfBrowserPoolTimeout(Exception):
+    """El trabajo no obtuvo slot/resultado dentro del presupuesto."""
+
+
+class _Metrics:
+    """Contadores acumulados del pool (espera en cola vs tiempo de render)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.renders = 0
+            self.errors = 0
+            self.timeouts = 0
+            self.launches = 0
+            self.recycles = 0
+            self.queue_wait_ms_total = 0.0
+            self.queue_wait_ms_max = 0.0
+            self.render_ms_total = 0.0
+            self.render_ms_max = 0.0
+
+    def record_render(self, wait_ms: float, render_ms: float, *, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self.renders += 1
+            else:
+                self.errors += 1
+            self.queue_wait_ms_total += wait_ms
+            self.queue_wait_ms_max = max(self.queue_wait_ms_max, wait_ms)
+            self.render_ms_total += render_ms
+            self.render_ms_max = max(self.render_ms_max, render_ms)
+
+    def incr(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            done = self.renders + self.errors
+            return {
+                "renders": self.renders,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "launches": self.launches,
+                "recycles": self.recycles,
+                "queue_wait_ms_avg": round(self.queue_wait_ms_total / done, 1) if done else 0.0,
+                "queue_wait_ms_max": round(self.queue_wait_ms_max, 1),
+                "render_ms_avg": round(self.render_ms_total / done, 1) if done else 0.0,
+                "render_ms_max": round(self.render_ms_max, 1),
+            }
+
+
+class _Job:
+    __slots__ = ("html", "fmt", "landscape", "timeout_ms", "enqueued_at", "future")
+
+    def __init__(self, html: str, fmt: str, landscape: bool, timeout_ms: int) -> None:
+        self.html = html
+        self.fmt = fmt
+        self.landscape = landscape
+        self.timeout_ms = timeout_ms
+        self.enqueued_at = time.monotonic()
+        self.future: Future = Future()
+
+
+class _Slot(threading.Thread):
+    """Hilo dueño de un navegador; procesa trabajos de la cola compartida."""
+
+    def __init__(self, pool: BrowserPool, index: int) -> None:
+        super().__init__(name=f"pdf-chromium-{index}", daemon=True)
+        self.pool = pool
+        self.index = index
+        self._playwright = None
+        self._browser = None
+        self._pages = 0
+        self._launched_at = 0.0
+        self.busy = False
+
+    def run(self) -> None:
+        while True:
+            job = self.pool._jobs.get()
+            if job is None:
+                break
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            self.busy = True
+            wait_ms = (time.monotonic() - job.enqueued_at) * 1000
+            started = time.monotonic()
+            try:
+                pdf = self._render(job)
+            except Exception as exc:
+                self.pool.metrics.record_render(wait_ms, (time.monotonic() - started) * 1000, ok=False)
+                logger.warning("Chromium slot %s falló; se recicla: %s", self.index, type(exc).__name__)
+                self._close()
+                job.future.set_exception(exc)
+            else:
+                self.pool.metrics.record_render(wait_ms, (time.monotonic() - started) * 1000, ok=True)
+                job.future.set_result(pdf)
+            finally:
+                self.busy = False
+        self._close()
+
+    def _needs_recycle(self) -> bool:
+        if self._browser is None:
+            return True
+        if self._pages >= self.pool.max_pages:
+            return True
+        if time.monotonic() - self._launched_at >= self.pool.max_age_s:
+            return True
+        try:
+            return not self._browser.is_connected()
+        except Exception:
+            return True
+
+    def _ensure_browser(self) -> None:
+        if not self._needs_recycle():
+            return
+        if self._browser is not None:
+            self.pool.metrics.incr("recycles")
+            self._close()
+        self._playwright, self._browser = self.pool._launch()
+        self.pool.metrics.incr("launches")
+        self._pages = 0
+        self._launched_at = time.monotonic()
+
+    def _render(self, job: _Job) -> bytes:
+        self._ensure_browser()
+        context = self._browser.new_context()
+        try:
+            page = context.new_page()
+            page.set_default_timeout(job.timeout_ms)
+            # HTML embebido (sin red): domcontentloaded es suficiente y más rápido que load.
+            page.set_content(job.html, wait_until="domcontentloaded", timeout=job.timeout_ms)
+            return page.pdf(
+                format=job.fmt,
+                landscape=job.landscape,
+                print_background=True,
+                prefer_css_page_size=True,
+                margin=PDF_MARGIN_NONE,
+            )
+        finally:
+            self._pages += 1
+            try:
+                context.close()
+            except Exception:
+                logger.debug("No se pudo cerrar el contexto de Chromium")
+
+    def _close(self) -> None:
+        browser, pw = self._browser, self._playwright
+        self._browser = None
+        self._playwright = None
+        if browser is not None:
+            try:
+                browser.close()
+            except Exception:
+                logger.debug("browser.close() falló al reciclar")
+        if pw is not None:
+            try:
+                pw.stop()
+            except Exception:
+                logger.debug("playwright.stop() falló al reciclar")
+
+
+class BrowserPool:
+    """N slots de Chromium caliente; ``render`` es seguro entre hilos."""
+
+    def __init__(self, size: int, *, max_pages: int, max_age_s: int) -> None:
+        self.size = max(1, size)
+        self.max_pages = max(1, max_pages)
+        self.max_age_s = max(60, max_age_s)
+        self.metrics = _Metrics()
+        self._jobs: queue.Queue[_Job | None] = queue.Queue()
+        self._slots = [_Slot(self, i) for i in range(self.size)]
+        for slot in self._slots:
+            slot.start()
+
+    @staticmethod
+    def _launch():
+        from playwright.sync_api import sync_playwright
+
+        pw = sync_playwright().start()
+        try:
+            browser = pw.chromium.launch(headless=True, args=list(CHROMIUM_LAUNCH_ARGS))
+        except Exception:
+            pw.stop()
+            raise
+        return pw, browser
+
+    def render(self, html: str, *, fmt: str, landscape: bool, timeout_s: int) -> bytes:
+        timeout_ms = max(5_000, min(int(timeout_s * 1000), 120_000))
+        job = _Job(html, fmt, landscape, timeout_ms)
+        self._jobs.put(job)
+        try:
+            # Espera en cola + render; el arranque del navegador cuenta dentro del presupuesto.
+            return job.future.result(timeout=max(5, timeout_s))
+        except FutureTimeoutError:
+            job.future.cancel()
+            self.metrics.incr("timeouts")
+            raise PdfBrowserPoolTimeout(
+                f"Chromium no respondió en {timeout_s}s (cola={self._jobs.qsize()})"
+            ) from None
+
+    def stats(self) -> dict:
+        data = self.metrics.snapshot()
+        data.update(
+            {
+                "enabled": True,
+                "size": self.size,
+                "busy": sum(1 for s in self._slots if s.busy),
+                "queued": self._jobs.qsize(),
+                "max_pages": self.max_pages,
+                "max_age_s": self.max_age_s,
+                "pid": os.getpid(),
+            }
+        )
+        return data
+
+    def shutdown(self) -> None:
+        for _ in self._slots:
+            self._jobs.put(None)
+        for slot in self._slots:
+            slot.join(timeout=10)
+
+
+_pool: BrowserPool | None = None
+_pool_pid: int | None = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """Pool del proceso actual; se crea perezosamente (seguro tras fork de Gunicorn)."""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = BrowserPool(
+                pool_size(),
+                max_pages=_env_int("PDF_BROWSER_MAX_PAGES", 100, minimum=1),
+                max_age_s=_env_int("PDF_BROWSER_MAX_AGE_SEC", 1800, minimum=60),
+            )
+            _pool_pid = pid
+        return _pool
+
+
+def browser_pool_stats() -> dict:
+    """Métricas del pool del worker actual (sin crearlo si aún no se usó)."""
+    pool = _pool if _pool_pid == os.getpid() else None
+    if pool is None:
+        return {"enabled": browser_pool_enabled(), "size": pool_size(), "started": False, "pid": os.getpid()}
+    data = pool.stats()
+    data["started"] = True
+    return data
+
+
+def shutdown_browser_pool() -> None:
+    global _pool, _pool_pid
+    with _pool_lock:
+        pool = _pool if _pool_pid == os.getpid() else None
+        _pool, _pool_pid = None, None
+    if pool is not None:
+        pool.shutdown()
+
+
+atexit.register(shutdown_browser_pool)
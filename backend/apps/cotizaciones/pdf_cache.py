@@ -0,0 +1,100 @@
+"""Caché en disco de PDFs ya renderizados, direccionada por contenido.
+
+La llave es el SHA-256 del HTML final + tamaño + orientación: si el documento
+no cambió, el HTML es idéntico y el PDF se sirve sin volver a Chromium. El
+directorio se comparte entre workers de Gunicorn; la expulsión es LRU por
+``mtime`` (cada acierto lo actualiza) con tope total en bytes.
+
+Variables de entorno:
+
+- ``PDF_CACHE_DIR`` (default ``backend/var/digitalflow-pdf-cache``)
+- ``PDF_CACHE_MAX_MB`` (default 256; ``0`` desactiva la caché)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from pathlib import Path
+
+from apps.common.disk_cache import DiskLRUStore, env_cache_dir, env_megabytes
+
+
+def pdf_cache_key(html: str, *, size: str = "A4", landscape: bool = False) -> str:
+    """Hash estable del HTML final + opciones de página (sirve también como ETag)."""
+    h = hashlib.sha256()
+    h.update(f"{(size or 'A4').upper()}|{'L' if landscape else 'P'}|".encode("ascii"))
+    h.update((html or "").encode("utf-8", errors="surrogatepass"))
+    return h.hexdigest()
+
+
+def pdf_etag(key: str) -> str:
+    return f'"{key[:40]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """``If-None-Match`` admite lista separada por comas, ``W/`` débil y ``*``."""
+    if not if_none_match:
+        return False
+    for raw in if_none_match.split(","):
+        tag = raw.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def not_modified_response(request, key: str):
+    """304 si el cliente ya tiene este PDF (``If-None-Match``); si no, ``None``."""
+    from django.http import HttpResponseNotModified
+
+    etag = pdf_etag(key)
+    if request is None or not etag_matches(request.headers.get("If-None-Match"), etag):
+        return None
+    response = HttpResponseNotModified()
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def apply_pdf_etag(response, key: str):
+    """El navegador revalida con ``If-None-Match`` en vez de volver a descargar."""
+    response["ETag"] = pdf_etag(key)
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+class PdfDiskCache(DiskLRUStore):
+    """Almacén ``<dir>/<k[:2]>/<k>.pdf``; solo devuelve bytes con firma ``%PDF``."""
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        super().__init__(root, max_bytes, suffix=".pdf")
+
+    def get(self, key: str) -> bytes | None:
+        data = super().get(key)
+        if not data or not data.startswith(b"%PDF"):
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if data:
+            super().put(key, data)
+
+
+_cache: PdfDiskCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_pdf_cache() -> PdfDiskCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PdfDiskCache(
+                    env_cache_dir("PDF_CACHE_DIR", "digitalflow-pdf-cache"),
+                    env_megabytes("PDF_CACHE_MAX_MB", 256),
+                )
+    return _cache
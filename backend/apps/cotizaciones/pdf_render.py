@@ -7,6 +7,11 @@
    ``page.pdf``), según la API documentada en Playwright for Python.
 
 Desactivar solo el motor local: ``DISABLE_LOCAL_PDF=1``.
+
+El motor local reutiliza un Chromium caliente por worker (ver
+``pdf_browser_pool``); ``PDF_BROWSER_POOL_SIZE=0`` vuelve al arranque en frío.
+Los PDFs resultantes se guardan en ``pdf_cache`` por hash del HTML, así que
+pedir otra vez el mismo documento sin cambios no vuelve a renderizar.
 """
 
 from __future__ import annotations
@@ -18,6 +23,14 @@ from pathlib import Path
 from urllib.error import HTTPError, URLError
 from urllib.request import Request, urlopen
 
+from .pdf_browser_pool import (
+    CHROMIUM_LAUNCH_ARGS,
+    PDF_MARGIN_NONE,
+    browser_pool_enabled,
+    get_browser_pool,
+)
+from .pdf_cache import get_pdf_cache, pdf_cache_key
+
 logger = logging.getLogger(__name__)
 
 HTMLDOCS_URL = "https://htmldocs.com/api/generate"
@@ -109,45 +122,48 @@ def _playwright_browsers_path_if_bundled() -> str | None:
     return None
 
 
-def _try_playwright(html: str, size: str, landscape: bool, timeout: int) -> bytes:
-    """Genera PDF con print media (comportamiento por defecto de ``page.pdf``)."""
-    from playwright.sync_api import sync_playwright
-
+def _ensure_playwright_browsers_path() -> None:
     # Misma caché que en build.sh (Render u otros hosts donde ~/.cache no coincide).
     if not os.environ.get("PLAYWRIGHT_BROWSERS_PATH"):
         bundled = _playwright_browsers_path_if_bundled()
         if bundled:
             os.environ["PLAYWRIGHT_BROWSERS_PATH"] = bundled
 
+
+_PDF_FORMATS = (
+    "A0",
+    "A1",
+    "A2",
+    "A3",
+    "A4",
+    "A5",
+    "A6",
+    "LETTER",
+    "LEGAL",
+    "TABLOID",
+    "LEDGER",
+)
+
+
+def _pdf_format(size: str) -> str:
     fmt = (size or "A4").upper()
-    allowed = (
-        "A0",
-        "A1",
-        "A2",
-        "A3",
-        "A4",
-        "A5",
-        "A6",
-        "LETTER",
-        "LEGAL",
-        "TABLOID",
-        "LEDGER",
-    )
-    if fmt not in allowed:
-        fmt = "A4"
+    return fmt if fmt in _PDF_FORMATS else "A4"
+
+
+def _try_playwright(html: str, size: str, landscape: bool, timeout: int) -> bytes:
+    """Genera PDF con print media (comportamiento por defecto de ``page.pdf``)."""
+    _ensure_playwright_browsers_path()
+    fmt = _pdf_format(size)
+
+    if browser_pool_enabled():
+        return get_browser_pool().render(html, fmt=fmt, landscape=landscape, timeout_s=timeout)
+
+    from playwright.sync_api import sync_playwright
 
     timeout_ms = max(5_000, min(int(timeout * 1000), 120_000))
 
     with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=True,
-            args=[
-                "--no-sandbox",
-                "--disable-dev-shm-usage",
-                "--disable-setuid-sandbox",
-                "--disable-gpu",
-            ],
-        )
+        browser = p.chromium.launch(headless=True, args=list(CHROMIUM_LAUNCH_ARGS))
         try:
             page = browser.new_page()
             # HTML embebido (sin red): domcontentloaded es suficiente y más rápido que load.
@@ -158,7 +174,7 @@ def _try_playwright(html: str, size: str, landscape: bool, timeout: int) -> byte
                 landscape=landscape,
                 print_background=True,
                 prefer_css_page_size=True,
-                margin={"top": "0", "right": "0", "bottom": "0", "left": "0"},
+                margin=PDF_MARGIN_NONE,
             )
         finally:
             browser.close()
@@ -171,16 +187,42 @@ def render_html_to_pdf(
     landscape: bool = False,
     timeout: int = 30,
     prefer_local: bool = False,
+    use_cache: bool = True,
 ) -> bytes:
     """
     Genera PDF desde HTML.
 
     ``prefer_local=True`` (p. ej. envío por correo): intenta Playwright primero
     para evitar esperar a htmldocs cuando el Chromium local ya está disponible.
+    ``use_cache=False`` fuerza el render aunque exista el PDF en caché.
     """
     if not html:
         raise PdfRenderError("HTML vacío", detail="empty html")
 
+    cache = get_pdf_cache()
+    key = pdf_cache_key(html, size=size, landscape=landscape) if use_cache and cache.enabled else ""
+    if key:
+        cached = cache.get(key)
+        if cached:
+            logger.debug("PDF servido desde caché %s", key[:12])
+            return cached
+
+    data = _render_html_to_pdf_uncached(
+        html, size=size, landscape=landscape, timeout=timeout, prefer_local=prefer_local
+    )
+    if key:
+        cache.put(key, data)
+    return data
+
+
+def _render_html_to_pdf_uncached(
+    html: str,
+    *,
+    size: str,
+    landscape: bool,
+    timeout: int,
+    prefer_local: bool,
+) -> bytes:
     last_detail: str | None = None
     hdoc_cap = 0
     try_local_first = prefer_local and local_pdf_engine_available()
@@ -10,7 +10,7 @@ from apps.common.pdf_html import (
     render_terms_html,
     subtotal_iva_display_split,
 )
-from apps.common.pdf_images import safe_pdf_thumbnail_src
+from apps.common.pdf_images import safe_pdf_thumbnail_srcs
 from apps.cotizaciones.categorias_productos import categorias_nombres_por_id, normalize_categorias_productos
 from apps.cotizaciones.pdf_opciones import CotizacionPdfOpciones
 
@@ -91,6 +91,8 @@ def generate_cotizacion_pdf_html(cotizacion, pdf_opciones: CotizacionPdfOpciones
     net_subtotal_con_iva = 0.0
     has_manual_concept_lines = False
     has_product_lines = False
+    # Miniaturas en paralelo (y desde la caché de imágenes) antes de armar filas.
+    thumbs = safe_pdf_thumbnail_srcs([getattr(it, "thumbnail_url", "") or "" for it in item_list])
     for it in item_list:
         cat_id = str(getattr(it, 'categoria_id', '') or '').strip()
         if cat_id and cat_id in cat_names and cat_id != last_cat_id:
@@ -150,7 +152,7 @@ def generate_cotizacion_pdf_html(cotizacion, pdf_opciones: CotizacionPdfOpciones
             logger.exception("Failed to format cotizacion item cantidad")
             cantidad_str = str(cantidad)
 
-        thumb_src = safe_pdf_thumbnail_src(getattr(it, "thumbnail_url", "") or "")
+        thumb_src = thumbs.get(str(getattr(it, "thumbnail_url", "") or "").strip(), "")
         if not thumb_src and default_concept_img:
             thumb_src = default_concept_img
         nombre_base = str(getattr(it, 'producto_nombre', '') or '-').strip() or '-'
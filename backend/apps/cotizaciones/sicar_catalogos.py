@@ -0,0 +1,190 @@
+"""Catálogos del formulario de factura servidos desde una copia local (``SicarCatalogo``).
+
+Las series CFDI viven en SICAR (al otro lado de la VPN) pero casi no cambian:
+el formulario las lee de la tabla local y, si la última verificación tiene más
+de ``SICAR_CATALOGOS_REFRESH_SEC``, un hilo del proceso vuelve a leerlas en
+SICAR y solo reescribe la fila si cambió el checksum del contenido. El primer
+worker que reclama la fila (``UPDATE ... WHERE fecha_verificacion = <anterior>``)
+es el único que consulta; los demás siguen sirviendo la copia.
+
+``next_folio`` es una referencia para el formulario (el folio real se aparta al
+timbrar): timbrar desde este sistema lo adelanta en la copia sin ir a SICAR y
+las facturas hechas directamente en SICAR se reflejan en la siguiente verificación.
+
+Formas de pago, métodos de pago y usos CFDI son catálogos SAT fijos.
+
+Variables de entorno:
+
+- ``SICAR_CATALOGOS_REFRESH_SEC`` (default 300): antigüedad de la copia a partir
+  de la cual se verifica contra SICAR en segundo plano.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from typing import Any, Iterable
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from apps.common.background import ProcessExecutor
+from apps.cotizaciones.models import SicarCatalogo
+from apps.cotizaciones.sicar_db import _connect_sicar, fetch_all, release_sicar_connection, sicar_setting_int
+
+logger = logging.getLogger(__name__)
+
+SERIES = "series"
+
+FORMAS_PAGO = [
+    {"clave": "01", "label": "01-Efectivo"},
+    {"clave": "03", "label": "03-Transferencia electrónica de fondos"},
+    {"clave": "04", "label": "04-Tarjeta de crédito"},
+    {"clave": "28", "label": "28-Tarjeta de débito"},
+    {"clave": "99", "label": "99-Por definir"},
+]
+
+METODOS_PAGO = [
+    {"clave": "PUE", "label": "PUE-Pago en una sola exhibición"},
+    {"clave": "PPD", "label": "PPD-Pago en parcialidades o diferido"},
+]
+
+USOS_CFDI = [
+    {"clave": "G01", "label": "G01-Adquisición de mercancías"},
+    {"clave": "G02", "label": "G02-Devoluciones, descuentos o bonificaciones"},
+    {"clave": "G03", "label": "G03-Gastos en general"},
+    {"clave": "I01", "label": "I01-Construcciones"},
+    {"clave": "I04", "label": "I04-Equipo de computo y accesorios"},
+    {"clave": "I08", "label": "I08-Otra maquinaria y equipo"},
+    {"clave": "D01", "label": "D01-Honorarios médicos, dentales y gastos hospitalarios"},
+    {"clave": "P01", "label": "P01-Por definir"},
+    {"clave": "S01", "label": "S01-Sin efectos fiscales"},
+    {"clave": "CP01", "label": "CP01-Pagos"},
+]
+
+
+def list_sicar_series(cursor) -> list[dict[str, Any]]:
+    return fetch_all(
+        cursor,
+        """
+        SELECT s.scf_id, s.serie, s.folioIni, s.emp_id,
+               COALESCE((
+                   SELECT MAX(f.folio) FROM facturacfdi f WHERE f.scf_id = s.scf_id
+               ), 0) + 1 AS next_folio
+        FROM seriecfdi s
+        ORDER BY s.scf_id
+        """,
+    )
+
+
+_FETCHERS = {SERIES: list_sicar_series}
+
+
+def servidor_key(cfg: dict) -> str:
+    return hashlib.sha1(f"{cfg.get('host')}:{cfg.get('port')}:{cfg.get('database')}".encode()).hexdigest()
+
+
+def _canonical(rows: list[dict]) -> str:
+    return json.dumps(rows, cls=DjangoJSONEncoder, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def catalog_checksum(rows: list[dict]) -> str:
+    return hashlib.sha256(_canonical(rows).encode("utf-8")).hexdigest()
+
+
+def _refresh_sec() -> int:
+    return max(0, sicar_setting_int("SICAR_CATALOGOS_REFRESH_SEC", 300))
+
+
+def refresh_catalogo(cfg: dict, nombre: str) -> SicarCatalogo:
+    """Lee el catálogo en SICAR y actualiza la copia local; ``datos`` solo se reescribe si cambió."""
+    conn = _connect_sicar(cfg)
+    try:
+        with conn.cursor() as cursor:
+            rows = _FETCHERS[nombre](cursor)
+    finally:
+        release_sicar_connection(conn)
+
+    canonical = _canonical(rows)
+    checksum = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    now = timezone.now()
+    with transaction.atomic():
+        row, created = SicarCatalogo.objects.select_for_update().get_or_create(
+            servidor=servidor_key(cfg),
+            nombre=nombre,
+            defaults={"datos": json.loads(canonical), "checksum": checksum, "fecha_actualizacion": now},
+        )
+        row.fecha_verificacion = now
+        if created or row.checksum == checksum:
+            row.save(update_fields=["fecha_verificacion"])
+            return row
+        row.datos = json.loads(canonical)
+        row.checksum = checksum
+        row.fecha_actualizacion = now
+        row.save(update_fields=["datos", "checksum", "fecha_actualizacion", "fecha_verificacion"])
+    logger.info("Catálogo SICAR %s cambió (checksum %s)", nombre, checksum[:12])
+    return row
+
+
+_executor = ProcessExecutor("sicar-catalogos")
+
+
+def _run_refresh(cfg: dict, nombre: str) -> None:
+    close_old_connections()
+    try:
+        refresh_catalogo(cfg, nombre)
+    except Exception:
+        logger.warning("No se pudo verificar el catálogo SICAR %s; se sigue usando la copia local", nombre, exc_info=True)
+    finally:
+        close_old_connections()
+
+
+def _submit_refresh(cfg: dict, nombre: str) -> None:
+    _executor.submit(_run_refresh, dict(cfg), nombre)
+
+
+def get_catalogo(cfg: dict, nombre: str, *, refrescar: bool = False) -> SicarCatalogo:
+    """Copia local del catálogo; sin copia (o con ``refrescar``) se lee en SICAR en este request."""
+    row = SicarCatalogo.objects.filter(servidor=servidor_key(cfg), nombre=nombre).first()
+    if row is None or refrescar:
+        return refresh_catalogo(cfg, nombre)
+    now = timezone.now()
+    previous = row.fecha_verificacion
+    if previous is None or now - previous >= timedelta(seconds=_refresh_sec()):
+        claimed = SicarCatalogo.objects.filter(pk=row.pk, fecha_verificacion=previous).update(fecha_verificacion=now)
+        if claimed:
+            _submit_refresh(cfg, nombre)
+    return row
+
+
+def note_folios_used(cfg: dict, used: Iterable[tuple[int, int]]) -> None:
+    """Tras timbrar: adelanta ``next_folio`` de las series usadas en la copia local. Nunca lanza."""
+    following: dict[int, int] = {}
+    for scf_id, folio in used:
+        following[int(scf_id)] = max(following.get(int(scf_id), 0), int(folio) + 1)
+    if not following:
+        return
+    try:
+        with transaction.atomic():
+            row = (
+                SicarCatalogo.objects.select_for_update()
+                .filter(servidor=servidor_key(cfg), nombre=SERIES)
+                .first()
+            )
+            if row is None:
+                return
+            changed = False
+            for serie in row.datos:
+                target = following.get(int(serie.get("scf_id") or 0), 0)
+                if target > int(serie.get("next_folio") or 0):
+                    serie["next_folio"] = target
+                    changed = True
+            if changed:
+                row.checksum = catalog_checksum(row.datos)
+                row.fecha_actualizacion = timezone.now()
+                row.save(update_fields=["datos", "checksum", "fecha_actualizacion"])
+    except Exception:
+        logger.warning("No se pudo adelantar el folio de las series SICAR locales", exc_info=True)
@@ -0,0 +1,145 @@
+"""Exportación mensual de CFDI SICAR: un ZIP en streaming con el XML y el PDF de cada factura.
+
+Las facturas del mes se leen con un cursor sin buffer (``SSDictCursor``) por
+bloques: solo hay en memoria el bloque actual y los documentos que esperan
+render. Los PDFs pasan por ``render_batch`` (hilos acotados, mismo Chromium
+caliente del worker) y el ZIP sale al cliente conforme se arma. Lo que ya está
+en el almacén local de CFDI no se vuelve a renderizar y lo nuevo se guarda.
+
+La lectura usa una conexión propia, fuera del pool: una exportación dura
+minutos y no debe ocupar una conexión de lectura de los listados.
+
+Variables de entorno:
+
+- ``SICAR_EXPORT_CHUNK`` (default 50): filas por lectura del cursor.
+- ``SICAR_EXPORT_NET_WRITE_TIMEOUT`` (default 600): segundos que MySQL espera
+  mientras el cursor está detenido por el render antes de cortar la conexión.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import date
+from typing import Iterator
+
+import pymysql
+
+from apps.common.pdf_batch import BatchDoc, render_batch, stream_zip
+from apps.cotizaciones.sicar_cfdi_pdf import cfdi_download_filename, generate_cfdi_pdf_html
+from apps.cotizaciones.sicar_cfdi_store import PDF_KIND, get_cfdi_store, remember_stamped_cfdi
+from apps.cotizaciones.sicar_db import _open_sicar_connection, sicar_setting_int
+
+logger = logging.getLogger(__name__)
+
+_MONTH_ROWS_SQL = """
+SELECT f.*, x.cfdi AS xml_cfdi, x.cbb AS cbb_png, c.diasCredito AS diasCredito
+FROM facturacfdi f
+LEFT JOIN xmlcfdi x ON x.xcf_id = f.xcf_id
+LEFT JOIN cliente c ON c.cli_id = f.cli_id
+WHERE f.fecha >= %s AND f.fecha < %s
+ORDER BY f.fecha, f.fcf_id
+"""
+
+_MONTH_IMPUESTOS_SQL = """
+SELECT i.*
+FROM facturacfdiimp i
+JOIN facturacfdi f ON f.fcf_id = i.fcf_id
+WHERE f.fecha >= %s AND f.fecha < %s
+ORDER BY i.fcf_id, i.orden, i.imp_id
+"""
+
+
+def _month_impuestos(conn, bounds: tuple[date, date]) -> dict[int, list[dict]]:
+    """Impuestos del mes agrupados por ``fcf_id`` (filas cortas; se leen antes del cursor sin buffer)."""
+    out: dict[int, list[dict]] = {}
+    with conn.cursor() as cursor:
+        cursor.execute(_MONTH_IMPUESTOS_SQL, bounds)
+        for row in cursor.fetchall() or []:
+            out.setdefault(int(row.get("fcf_id") or 0), []).append(row)
+    return out
+
+
+def iter_month_rows(conn, bounds: tuple[date, date], *, chunk: int) -> Iterator[dict]:
+    """Facturas del mes con su XML/QR, leídas por bloques sin cargar el mes completo."""
+    cursor = conn.cursor(pymysql.cursors.SSDictCursor)
+    finished = False
+    try:
+        cursor.execute(_MONTH_ROWS_SQL, bounds)
+        while True:
+            rows = cursor.fetchmany(chunk)
+            if not rows:
+                break
+            yield from rows
+        finished = True
+    finally:
+        if finished:
+            cursor.close()
+        else:
+            # Cerrar el cursor drenaría el resto del mes solo para descartarlo.
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+def _doc_for_row(cfg: dict, row: dict, impuestos: list[dict], *, with_pdf: bool) -> BatchDoc:
+    fcf_id = int(row.get("fcf_id") or 0)
+    serie_folio = str(row.get("serieFolio") or "")
+    uuid = str(row.get("uuid") or "")
+    xml_bytes = row.get("xml_cfdi")
+    if isinstance(xml_bytes, str):
+        xml_bytes = xml_bytes.encode("utf-8")
+    cbb_png = row.get("cbb_png")
+    remember_stamped_cfdi(cfg, fcf_id, uuid=uuid, serie_folio=serie_folio, xml_bytes=xml_bytes, qr_png=cbb_png)
+
+    pdf_name = cfdi_download_filename(serie_folio, uuid, "pdf")
+    attachments = ((cfdi_download_filename(serie_folio, uuid, "xml"), bytes(xml_bytes)),) if xml_bytes else ()
+    if not with_pdf:
+        return BatchDoc(pdf_name, None, attachments=attachments)
+
+    store = get_cfdi_store()
+    cached = store.get_artifact(uuid, PDF_KIND) if xml_bytes else None
+
+    def _build_html() -> str:
+        return generate_cfdi_pdf_html(row, xml_bytes=xml_bytes, cbb_png=cbb_png, impuestos=impuestos)
+
+    def _keep_pdf(pdf: bytes) -> None:
+        store.put_artifact(uuid, PDF_KIND, pdf)
+
+    return BatchDoc(
+        pdf_name,
+        _build_html,
+        pdf=cached,
+        attachments=attachments,
+        on_pdf=_keep_pdf if xml_bytes else None,
+    )
+
+
+def stream_month_zip(cfg: dict, bounds: tuple[date, date], *, with_pdf: bool = True) -> Iterator[bytes]:
+    """Bytes del ZIP del mes. La conexión se abre aquí: si SICAR no responde, falla antes del primer byte."""
+    conn = _open_sicar_connection(cfg, read_timeout=120, autocommit=True)
+    return _stream(conn, cfg, bounds, with_pdf=with_pdf)
+
+
+def _stream(conn, cfg: dict, bounds: tuple[date, date], *, with_pdf: bool) -> Iterator[bytes]:
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SET SESSION net_write_timeout = %s",
+                (max(60, sicar_setting_int("SICAR_EXPORT_NET_WRITE_TIMEOUT", 600)),),
+            )
+        impuestos = _month_impuestos(conn, bounds) if with_pdf else {}
+        rows = iter_month_rows(conn, bounds, chunk=max(1, sicar_setting_int("SICAR_EXPORT_CHUNK", 50)))
+        docs = (
+            _doc_for_row(cfg, row, impuestos.get(int(row.get("fcf_id") or 0), []), with_pdf=with_pdf)
+            for row in rows
+        )
+        yield from stream_zip(render_batch(docs, size="Letter", timeout=90))
+    except Exception:
+        logger.exception("Exportación CFDI SICAR %s interrumpida", bounds[0].strftime("%Y-%m"))
+        raise
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -1,12 +1,25 @@
-"""Firma CFDI 4.0 con CSD (FIEL de sellos)."""
+"""Firma CFDI 4.0 con CSD (FIEL de sellos).
+
+Descifrar la llave PKCS#8 del SAT es lo más caro de firmar, así que el
+``CsdSigner`` ya armado (llave, certificado en base64 y número de certificado)
+se guarda en memoria por serie del certificado + hash de fCer/fKey/pwd. Si el
+CSD activo en SICAR cambia, la huella cambia y los firmantes anteriores se
+descartan; ``SICAR_CSD_CACHE_SEC`` (default 3600; ``0`` desactiva) limita su vida.
+"""
 from __future__ import annotations
 
 import base64
 import binascii
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass, field
 from functools import lru_cache
 from pathlib import Path
 
 from cfdiclient import Fiel
+from cryptography import x509
 from cryptography.hazmat.primitives.serialization import (
     Encoding,
     NoEncryption,
@@ -208,16 +221,101 @@ def _build_fiel(cer_der: bytes, key_der: bytes, key_password: str) -> Fiel:
             raise ValueError(f"No se pudo cargar la llave del CSD. {_CSD_PASSWORD_HINT}") from exc
 
 
+@dataclass
+class CsdSigner:
+    """Llave y certificado del CSD ya cargados; se reutiliza entre facturas."""
+
+    fiel: Fiel
+    certificado: str
+    no_certificado: str
+    cache_key: str
+    created: float = field(default_factory=time.monotonic)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @classmethod
+    def build(cls, cer_der: bytes, key_der: bytes, key_password: str, *, cache_key: str = "") -> CsdSigner:
+        fiel = _build_fiel(cer_der, key_der, key_password)
+        return cls(
+            fiel=fiel,
+            certificado=fiel.cer_to_base64().decode("utf-8"),
+            no_certificado="".join(ch for ch in fiel.cer_serial_number() if ch.isdigit())[-20:],
+            cache_key=cache_key,
+        )
+
+    def sello(self, cadena: str) -> str:
+        with self._lock:
+            return self.fiel.firmar_sha1(cadena.encode("utf-8")).decode("utf-8")
+
+
+_signers: dict[str, CsdSigner] = {}
+_signers_pid: int | None = None
+_signers_lock = threading.Lock()
+
+
+def _signer_ttl() -> float:
+    raw = (os.environ.get("SICAR_CSD_CACHE_SEC") or "").strip()
+    try:
+        return max(0.0, float(raw)) if raw else 3600.0
+    except ValueError:
+        return 3600.0
+
+
+def csd_cache_key(cer_der: bytes, key_der: bytes, key_password: str) -> str:
+    """``<serie del certificado>:<sha256 de fCer + fKey + pwd>`` (sin exponer la contraseña)."""
+    h = hashlib.sha256()
+    for part in (cer_der, key_der, normalize_csd_password(key_password).encode("utf-8")):
+        h.update(hashlib.sha256(part).digest())
+    try:
+        serial = format(x509.load_der_x509_certificate(cer_der).serial_number, "x")
+    except Exception:
+        serial = "?"
+    return f"{serial}:{h.hexdigest()}"
+
+
+def get_csd_signer(cer_der: bytes, key_der: bytes, key_password: str) -> tuple[CsdSigner, bool]:
+    """``(firmante, venía_de_caché)``; un CSD distinto al guardado descarta los anteriores."""
+    global _signers_pid
+    ttl = _signer_ttl()
+    key = csd_cache_key(cer_der, key_der, key_password)
+    if ttl <= 0:
+        return CsdSigner.build(cer_der, key_der, key_password, cache_key=key), False
+    now = time.monotonic()
+    with _signers_lock:
+        if _signers_pid != os.getpid():
+            _signers.clear()
+            _signers_pid = os.getpid()
+        signer = _signers.get(key)
+        if signer is not None and now - signer.created < ttl:
+            return signer, True
+    # Descifrar fuera del lock: otra factura con el CSD ya cargado no tiene que esperar.
+    signer = CsdSigner.build(cer_der, key_der, key_password, cache_key=key)
+    with _signers_lock:
+        _signers.clear()
+        _signers[key] = signer
+    return signer, False
+
+
+def invalidate_csd_signers() -> None:
+    with _signers_lock:
+        _signers.clear()
+
+
 def sign_cfdi_xml(
-    xml_bytes: bytes, cer_der: bytes, key_der: bytes, key_password: str
+    xml_bytes: bytes,
+    cer_der: bytes,
+    key_der: bytes,
+    key_password: str,
+    *,
+    signer: CsdSigner | None = None,
 ) -> tuple[bytes, dict[str, str]]:
     root = etree.fromstring(xml_bytes)
-    fiel = _build_fiel(cer_der, key_der, key_password)
+    if signer is None:
+        signer = CsdSigner.build(cer_der, key_der, key_password)
 
     cadena = str(_cadena_transform()(root)).strip()
-    sello = fiel.firmar_sha1(cadena.encode("utf-8")).decode("utf-8")
-    certificado = fiel.cer_to_base64().decode("utf-8")
-    no_certificado = "".join(ch for ch in fiel.cer_serial_number() if ch.isdigit())[-20:]
+    sello = signer.sello(cadena)
+    certificado = signer.certificado
+    no_certificado = signer.no_certificado
 
     if root.tag.endswith("Comprobante"):
         comprobante = root
@@ -0,0 +1,130 @@
+"""Almacén local de CFDI timbrados (XML, QR y PDF) por UUID del timbre.
+
+Un CFDI timbrado no cambia: su XML y el PDF que se genera de él son los mismos
+en cada descarga. Se guardan en disco la primera vez que se consultan (o al
+timbrar desde este sistema) y las siguientes descargas no tocan SICAR ni
+Chromium. Un índice pequeño ``fcf_id → UUID`` por servidor SICAR permite
+resolver la URL ``/facturas/<fcf_id>/`` sin consultar ``facturacfdi``.
+
+Los ETag son fuertes: SHA-256 del contenido servido. El directorio es privado
+del usuario del servicio (``0o700``) y un XML que no sea suyo o que otros puedan
+escribir se ignora: se vuelve a leer en SICAR en lugar de servir algo plantado.
+
+Variables de entorno:
+
+- ``CFDI_STORE_DIR`` (default ``backend/var/digitalflow-cfdi-store``)
+- ``CFDI_STORE_MAX_MB`` (default 512; ``0`` desactiva el almacén)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import threading
+from pathlib import Path
+
+from apps.common.disk_cache import DiskLRUStore, env_cache_dir, env_megabytes
+
+logger = logging.getLogger(__name__)
+
+# Subir el número si cambia la plantilla del PDF: los PDFs guardados con la anterior se ignoran.
+PDF_KIND = "pdf1"
+
+_UUID_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+def normalize_uuid(value) -> str:
+    """UUID del timbre en minúsculas; ``""`` si no tiene forma de UUID."""
+    text = str(value or "").strip().lower()
+    return text if _UUID_RE.match(text) else ""
+
+
+def content_etag(data: bytes) -> str:
+    return f'"{hashlib.sha256(data).hexdigest()[:40]}"'
+
+
+def _fcf_key(cfg: dict, fcf_id: int) -> str:
+    scope = f"{cfg.get('host')}:{cfg.get('port')}:{cfg.get('database')}:{int(fcf_id)}"
+    return hashlib.sha256(scope.encode("utf-8")).hexdigest() + "-fcf"
+
+
+class CfdiStore(DiskLRUStore):
+    """``<dir>/<k[:2]>/<uuid>-<tipo>.cfdi`` con tipos ``xml``, ``qr`` y ``pdf<versión>``."""
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        super().__init__(root, max_bytes, suffix=".cfdi", evict_interval_s=30.0)
+
+    def get_artifact(self, uuid: str, kind: str) -> bytes | None:
+        uuid = normalize_uuid(uuid)
+        if not uuid:
+            return None
+        data = self.get(f"{uuid}-{kind}")
+        if kind.startswith("pdf") and data and not data.startswith(b"%PDF"):
+            return None
+        return data or None
+
+    def put_artifact(self, uuid: str, kind: str, data: bytes | bytearray | str | None) -> None:
+        uuid = normalize_uuid(uuid)
+        if not uuid or not data:
+            return
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.put(f"{uuid}-{kind}", bytes(data))
+
+    def lookup(self, cfg: dict, fcf_id: int) -> dict | None:
+        """``{"uuid", "serie_folio"}`` ya conocidos para ``fcf_id`` en este servidor SICAR."""
+        raw = self.get(_fcf_key(cfg, fcf_id))
+        if not raw:
+            return None
+        try:
+            meta = json.loads(raw)
+        except ValueError:
+            return None
+        if not isinstance(meta, dict) or not normalize_uuid(meta.get("uuid")):
+            return None
+        return meta
+
+    def remember(
+        self,
+        cfg: dict,
+        fcf_id: int,
+        *,
+        uuid: str,
+        serie_folio: str,
+        xml_bytes: bytes | bytearray | str | None,
+        qr_png: bytes | bytearray | None = None,
+    ) -> None:
+        """Guarda XML/QR de un CFDI timbrado y lo indexa por ``fcf_id``; sin UUID o XML no hace nada."""
+        uuid = normalize_uuid(uuid)
+        if not self.enabled or not uuid or not xml_bytes:
+            return
+        self.put_artifact(uuid, "xml", xml_bytes)
+        self.put_artifact(uuid, "qr", qr_png)
+        meta = {"uuid": uuid, "serie_folio": str(serie_folio or "")}
+        self.put(_fcf_key(cfg, fcf_id), json.dumps(meta).encode("utf-8"))
+
+
+_store: CfdiStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_cfdi_store() -> CfdiStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CfdiStore(
+                    env_cache_dir("CFDI_STORE_DIR", "digitalflow-cfdi-store"),
+                    env_megabytes("CFDI_STORE_MAX_MB", 512),
+                )
+    return _store
+
+
+def remember_stamped_cfdi(cfg: dict, fcf_id: int, **kwargs) -> None:
+    """Como ``CfdiStore.remember`` pero nunca falla: el almacén es solo una aceleración."""
+    try:
+        get_cfdi_store().remember(cfg, fcf_id, **kwargs)
+    except Exception:
+        logger.warning("No se pudo guardar el CFDI fcf_id=%s en el almacén local", fcf_id, exc_info=True)
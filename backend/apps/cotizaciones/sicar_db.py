@@ -1,17 +1,45 @@
-"""Conexión y utilidades compartidas para MySQL SICAR."""
+"""Conexión y utilidades compartidas para MySQL SICAR.
+
+SICAR vive detrás de VPN/túnel: abrir una conexión cuesta varios viajes de red,
+así que cada proceso mantiene pools acotados (uno de lectura y otro de
+escritura) por servidor:
+
+- ``_connect_sicar`` / ``release_sicar_connection``: pool de lectura, conexiones
+  en ``autocommit`` (cada consulta ve datos actuales, sin snapshot viejo).
+- ``connect_sicar_exclusive`` / ``close_sicar_connection``: pool de escritura,
+  transacción explícita (``begin``/``commit``). Si una conexión vuelve con una
+  transacción abierta se hace ``rollback`` antes de reutilizarla.
+- Solo se hace ``ping`` a una conexión que estuvo inactiva más de
+  ``SICAR_DB_POOL_CHECK_SEC``; las inactivas más de ``SICAR_DB_POOL_IDLE_SEC`` o
+  abiertas más de ``SICAR_DB_POOL_LIFETIME_SEC`` se cierran.
+- Si todas están ocupadas se espera hasta ``SICAR_DB_POOL_WAIT_SEC`` y luego
+  falla con :class:`SicarPoolExhausted`.
+
+Variables de entorno (además de ``SICAR_DB_*`` de conexión):
+
+- ``SICAR_DB_POOL_SIZE`` (default 4): conexiones de lectura por proceso.
+- ``SICAR_DB_WRITE_POOL_SIZE`` (default 2): conexiones de escritura por proceso.
+- ``SICAR_DB_POOL_IDLE_SEC`` (default 300), ``SICAR_DB_POOL_LIFETIME_SEC``
+  (default 1800), ``SICAR_DB_POOL_CHECK_SEC`` (default 30),
+  ``SICAR_DB_POOL_WAIT_SEC`` (default 10).
+"""
 from __future__ import annotations
 
 import logging
 import os
 import threading
 import time
+from dataclasses import dataclass
 from typing import Any
 
 import pymysql
+from pymysql.constants import SERVER_STATUS
 
 logger = logging.getLogger(__name__)
 
-_tls = threading.local()
+
+class SicarPoolExhausted(pymysql.err.OperationalError):
+    """Todas las conexiones del pool siguen ocupadas tras ``SICAR_DB_POOL_WAIT_SEC``."""
 
 
 def _sicar_db_config() -> dict:
@@ -33,21 +61,6 @@ def _is_retryable_connect_error(exc: Exception) -> bool:
     return "timed out" in msg or "can't connect" in msg or "connection refused" in msg
 
 
-def _connection_key(cfg: dict, read_timeout: int) -> tuple:
-    return (cfg["host"], cfg["port"], cfg["user"], cfg["database"], read_timeout)
-
-
-def _clear_thread_sicar_connection() -> None:
-    conn = getattr(_tls, "sicar_conn", None)
-    _tls.sicar_conn = None
-    _tls.sicar_conn_key = None
-    if conn is not None:
-        try:
-            conn.close()
-        except Exception:
-            pass
-
-
 def _is_production_runtime() -> bool:
     raw = os.environ.get("DEBUG", "").strip().lower()
     return raw not in ("true", "1", "yes", "on")
@@ -83,7 +96,7 @@ def _sicar_connect_policy() -> tuple[int, int, int]:
     )
 
 
-def _open_sicar_connection(cfg: dict, read_timeout: int = 10):
+def _open_sicar_connection(cfg: dict, read_timeout: int = 10, *, autocommit: bool = False):
     connect_timeout, max_attempts, retry_delay_ms = _sicar_connect_policy()
 
     last_exc: Exception | None = None
@@ -100,6 +113,7 @@ def _open_sicar_connection(cfg: dict, read_timeout: int = 10):
                 connect_timeout=connect_timeout,
                 read_timeout=read_timeout,
                 write_timeout=read_timeout,
+                autocommit=autocommit,
             )
         except pymysql.err.OperationalError as exc:
             last_exc = exc
@@ -122,53 +136,261 @@ def _open_sicar_connection(cfg: dict, read_timeout: int = 10):
     raise pymysql.err.OperationalError(2003, "No se pudo conectar a SICAR.")
 
 
-def _connect_sicar(cfg: dict, read_timeout: int = 10):
-    """Conexión reutilizable por hilo (evita TCP/VPN en cada petición GET)."""
-    key = _connection_key(cfg, read_timeout)
-    conn = getattr(_tls, "sicar_conn", None)
-    stored_key = getattr(_tls, "sicar_conn_key", None)
-    if conn is not None and stored_key == key:
+@dataclass
+class _PooledConnection:
+    conn: Any
+    created_at: float
+    last_used: float
+
+
+class _SicarPool:
+    """Pool acotado de conexiones PyMySQL (LIFO: la más reciente es la más probable de seguir viva)."""
+
+    def __init__(self, name: str, cfg: dict, *, max_size: int, autocommit: bool) -> None:
+        self.name = name
+        self.host = cfg["host"]
+        self.max_size = max(1, max_size)
+        self.autocommit = autocommit
+        self.idle_timeout_s = max(1, sicar_setting_int("SICAR_DB_POOL_IDLE_SEC", 300))
+        self.max_lifetime_s = max(1, sicar_setting_int("SICAR_DB_POOL_LIFETIME_SEC", 1800))
+        self.check_after_s = max(0, sicar_setting_int("SICAR_DB_POOL_CHECK_SEC", 30))
+        self.wait_s = max(0, sicar_setting_int("SICAR_DB_POOL_WAIT_SEC", 10))
+        self._cfg = dict(cfg)
+        self._cond = threading.Condition()
+        self._idle: list[_PooledConnection] = []
+        self._in_use: dict[int, _PooledConnection] = {}
+        self._size = 0
+        self.opened = 0
+        self.closed = 0
+        self.reused = 0
+        self.health_checks = 0
+        self.health_failures = 0
+        self.waits = 0
+        self.wait_ms_max = 0.0
+        self.timeouts = 0
+
+    def owns(self, conn) -> bool:
+        with self._cond:
+            return id(conn) in self._in_use
+
+    def _expired(self, entry: _PooledConnection, now: float) -> bool:
+        return now - entry.last_used > self.idle_timeout_s or now - entry.created_at > self.max_lifetime_s
+
+    def _take_slot(self) -> _PooledConnection | None:
+        """Conexión inactiva o ``None`` con un lugar reservado para abrir otra."""
+        deadline = time.monotonic() + self.wait_s
+        waited_from: float | None = None
+        stale: list[_PooledConnection] = []
+        try:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    while self._idle and self._expired(self._idle[0], now):
+                        stale.append(self._idle.pop(0))
+                        self._size -= 1
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        entry = None
+                        break
+                    if waited_from is None:
+                        waited_from = now
+                        self.waits += 1
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise SicarPoolExhausted(
+                            2003,
+                            f"Pool SICAR {self.name} sin conexiones libres tras {self.wait_s}s "
+                            f"({self.max_size} en uso).",
+                        )
+                    self._cond.wait(remaining)
+                if waited_from is not None:
+                    self.wait_ms_max = max(self.wait_ms_max, (time.monotonic() - waited_from) * 1000)
+                return entry
+        finally:
+            for old in stale:
+                self._close(old.conn)
+
+    def acquire(self, read_timeout: int):
+        while True:
+            entry = self._take_slot()
+            if entry is None:
+                try:
+                    conn = _open_sicar_connection(self._cfg, read_timeout, autocommit=self.autocommit)
+                except BaseException:
+                    self._forget()
+                    raise
+                now = time.monotonic()
+                entry = _PooledConnection(conn, now, now)
+                with self._cond:
+                    self.opened += 1
+            elif time.monotonic() - entry.last_used > self.check_after_s:
+                # Solo tras inactividad: un túnel/VPN pudo cortar el socket mientras tanto.
+                with self._cond:
+                    self.health_checks += 1
+                try:
+                    entry.conn.ping(reconnect=False)
+                except Exception:
+                    with self._cond:
+                        self.health_failures += 1
+                    self._close(entry.conn)
+                    self._forget()
+                    continue
+            else:
+                with self._cond:
+                    self.reused += 1
+            if entry.conn._read_timeout != read_timeout:
+                # PyMySQL aplica el timeout del socket en el siguiente paquete.
+                entry.conn._read_timeout = read_timeout
+                entry.conn._write_timeout = read_timeout
+            with self._cond:
+                self._in_use[id(entry.conn)] = entry
+            return entry.conn
+
+    def release(self, conn, *, discard: bool = False) -> None:
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            self._close(conn)
+            return
+        healthy = not discard and bool(getattr(conn, "open", False))
+        if healthy and getattr(conn, "server_status", 0) & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+            try:
+                conn.rollback()
+            except Exception:
+                healthy = False
+        now = time.monotonic()
+        if healthy and now - entry.created_at > self.max_lifetime_s:
+            healthy = False
+        if not healthy:
+            self._close(conn)
+            self._forget()
+            return
+        entry.last_used = now
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def _forget(self) -> None:
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _close(self, conn) -> None:
+        with self._cond:
+            self.closed += 1
         try:
-            conn.ping(reconnect=True)
-            return conn
+            conn.close()
         except Exception:
-            _clear_thread_sicar_connection()
+            pass
+
+    def close_idle(self) -> None:
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            self._close(entry.conn)
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "name": self.name,
+                "host": self.host,
+                "max_size": self.max_size,
+                "open": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "opened": self.opened,
+                "closed": self.closed,
+                "reused": self.reused,
+                "health_checks": self.health_checks,
+                "health_failures": self.health_failures,
+                "waits": self.waits,
+                "wait_ms_max": round(self.wait_ms_max, 1),
+                "timeouts": self.timeouts,
+            }
+
+
+_pools: dict[tuple, _SicarPool] = {}
+_pools_pid: int | None = None
+_pools_lock = threading.Lock()
+
+
+def _get_pool(cfg: dict, *, write: bool) -> _SicarPool:
+    global _pools_pid
+    key = ("write" if write else "read", cfg["host"], cfg["port"], cfg["user"], cfg["database"])
+    pid = os.getpid()
+    pool = _pools.get(key) if _pools_pid == pid else None
+    if pool is not None:
+        return pool
+    with _pools_lock:
+        if _pools_pid != pid:
+            # Tras fork los sockets son del proceso padre: no se cierran, solo se olvidan.
+            _pools.clear()
+            _pools_pid = pid
+        pool = _pools.get(key)
+        if pool is None:
+            if write:
+                size = sicar_setting_int("SICAR_DB_WRITE_POOL_SIZE", 2)
+                pool = _SicarPool("escritura", cfg, max_size=size, autocommit=False)
+            else:
+                size = sicar_setting_int("SICAR_DB_POOL_SIZE", 4)
+                pool = _SicarPool("lectura", cfg, max_size=size, autocommit=True)
+            _pools[key] = pool
+        return pool
+
+
+def _pool_for(conn) -> _SicarPool | None:
+    for pool in list(_pools.values()) if _pools_pid == os.getpid() else []:
+        if pool.owns(conn):
+            return pool
+    return None
+
 
-    conn = _open_sicar_connection(cfg, read_timeout)
-    _tls.sicar_conn = conn
-    _tls.sicar_conn_key = key
-    return conn
+def _connect_sicar(cfg: dict, read_timeout: int = 10):
+    """Conexión de lectura del pool del proceso; devolver con ``release_sicar_connection``."""
+    return _get_pool(cfg, write=False).acquire(read_timeout)
 
 
 def connect_sicar_exclusive(cfg: dict, read_timeout: int = 10):
-    """Conexión nueva para transacciones de escritura."""
-    _clear_thread_sicar_connection()
-    return _open_sicar_connection(cfg, read_timeout)
+    """Conexión para transacciones de escritura (pool propio, sin ``autocommit``)."""
+    return _get_pool(cfg, write=True).acquire(read_timeout)
 
 
 def release_sicar_connection(conn) -> None:
-    """Devuelve la conexión al pool del hilo (no cerrar tras lecturas)."""
-    if conn is not getattr(_tls, "sicar_conn", None):
+    """Devuelve la conexión a su pool (no cerrar tras lecturas)."""
+    pool = _pool_for(conn)
+    if pool is None:
         try:
             conn.close()
         except Exception:
             pass
         return
-    try:
-        conn.ping(reconnect=True)
-    except Exception:
-        _clear_thread_sicar_connection()
+    pool.release(conn)
 
 
 def close_sicar_connection(conn) -> None:
-    """Cierra conexión exclusiva y limpia el pool del hilo."""
-    if conn is getattr(_tls, "sicar_conn", None):
-        _clear_thread_sicar_connection()
-        return
-    try:
-        conn.close()
-    except Exception:
-        pass
+    """Devuelve la conexión a su pool tras commit/rollback; cierra la que no es del pool."""
+    release_sicar_connection(conn)
+
+
+def sicar_pool_stats() -> dict[str, Any]:
+    """Estado y contadores de los pools SICAR de este proceso."""
+    pools = list(_pools.values()) if _pools_pid == os.getpid() else []
+    return {"pid": os.getpid(), "pools": [pool.stats() for pool in pools]}
+
+
+def reset_sicar_pools() -> None:
+    """Cierra las conexiones inactivas y olvida los pools (pruebas / cambio de configuración)."""
+    with _pools_lock:
+        pools = list(_pools.values()) if _pools_pid == os.getpid() else []
+        _pools.clear()
+    for pool in pools:
+        pool.close_idle()
 
 
 def _render_private_host_hint(host: str) -> str:
@@ -185,6 +407,8 @@ def _sicar_error_detail(exc: Exception, cfg: dict | None = None) -> str:
     port = int((cfg or {}).get("port") or 3306)
     render_hint = _render_private_host_hint(host)
 
+    if isinstance(exc, SicarPoolExhausted):
+        return "SICAR está ocupado: todas las conexiones están en uso. Intenta de nuevo en unos segundos."
     if isinstance(exc, pymysql.err.OperationalError) and exc.args:
         code = exc.args[0]
         msg = str(exc.args[1] if len(exc.args) > 1 else exc).lower()
@@ -3,15 +3,27 @@ from __future__ import annotations
 
 import logging
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
 from decimal import ROUND_HALF_UP, Decimal
 from typing import Any
 
 from num2words import num2words
 
+from apps.cotizaciones.sicar_catalogos import note_folios_used
 from apps.cotizaciones.sicar_cfdi_builder import build_cfdi_xml
-from apps.cotizaciones.sicar_cfdi_sign import csd_row_label, normalize_csd_blob, normalize_csd_password, sign_cfdi_xml
+from apps.cotizaciones.sicar_cfdi_sign import (
+    csd_row_label,
+    get_csd_signer,
+    normalize_csd_blob,
+    normalize_csd_password,
+    sign_cfdi_xml,
+)
 from apps.cotizaciones.sicar_cfdi_stamp import SicarStampError, build_qr_png, stamp_cfdi_xml
+from apps.cotizaciones.sicar_cfdi_store import remember_stamped_cfdi
 from apps.cotizaciones.sicar_db import (
     _sicar_db_config,
     close_sicar_connection,
@@ -20,7 +32,9 @@ from apps.cotizaciones.sicar_db import (
     fetch_all,
     fetch_one,
     last_insert_id,
+    sicar_setting_int,
 )
+from apps.cotizaciones.sicar_facturas_cache import invalidate_facturas_cache
 
 # Valores por defecto en SICAR para venta/detallev cuando el concepto no trae artículo.
 _DEFAULT_ART_ID = 1300
@@ -91,17 +105,17 @@ def _load_serie(cursor, scf_id: int) -> dict[str, Any]:
     return row
 
 
-def _reserve_folio(cursor, scf_id: int) -> tuple[int, str]:
+def _reserve_folios(cursor, scf_id: int, count: int) -> tuple[str, list[tuple[int, str]]]:
+    """``count`` folios consecutivos de la serie; el ``FOR UPDATE`` los aparta hasta el commit."""
     row = fetch_one(
         cursor,
         "SELECT COALESCE(MAX(folio), 0) + 1 AS next_folio FROM facturacfdi WHERE scf_id = %s FOR UPDATE",
         (scf_id,),
     )
     serie_row = _load_serie(cursor, scf_id)
-    folio = int((row or {}).get("next_folio") or 1)
+    first = int((row or {}).get("next_folio") or 1)
     serie = str(serie_row.get("serie") or "").strip()
-    serie_folio = f"{serie}-{folio}" if serie else str(folio)
-    return folio, serie_folio
+    return serie, [(folio, f"{serie}-{folio}" if serie else str(folio)) for folio in range(first, first + count)]
 
 
 def _emisor_from_empresa(empresa: dict[str, Any]) -> dict[str, Any]:
@@ -407,123 +421,225 @@ def _insert_facturacfdiven(cursor, fcf_id: int, ven_id: int) -> None:
     )
 
 
-def create_timbrada_factura(payload: dict[str, Any]) -> dict[str, Any]:
-    """Crea venta + CFDI timbrado + registros SICAR en una transacción."""
-    cli_id = int(payload.get("cli_id") or 0)
-    scf_id = int(payload.get("scf_id") or 2)
+class _StageTimer:
+    """Milisegundos por etapa del timbrado; se devuelven en ``timings_ms`` y van al log."""
+
+    def __init__(self) -> None:
+        self.ms: dict[str, float] = {}
+
+    @contextmanager
+    def __call__(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.ms[name] = round(self.ms.get(name, 0.0) + (time.perf_counter() - started) * 1000, 1)
+
+
+@dataclass
+class _FacturaDraft:
+    """Una factura en proceso: datos del payload, folio apartado y, tras timbrar, el CFDI."""
+
+    payload: dict[str, Any]
+    cli_id: int
+    scf_id: int
+    conceptos: list[dict[str, Any]]
+    forma_pago: str
+    metodo_pago: str
+    uso_cfdi: str
+    receptor: dict[str, Any] = field(default_factory=dict)
+    serie: str = ""
+    folio: int = 0
+    serie_folio: str = ""
+    build_totals: dict[str, Any] = field(default_factory=dict)
+    totals: dict[str, Decimal] = field(default_factory=dict)
+    sign_meta: dict[str, str] = field(default_factory=dict)
+    stamped_xml: bytes = b""
+    stamp_meta: dict[str, str] = field(default_factory=dict)
+    qr_png: bytes = b""
+    timings: _StageTimer = field(default_factory=_StageTimer)
+
+
+def _draft_from_payload(payload: Any) -> _FacturaDraft:
+    """Valida el payload sin tocar SICAR."""
+    if not isinstance(payload, dict):
+        raise SicarFacturaError("Cada factura debe ser un objeto JSON.")
+    try:
+        cli_id = int(payload.get("cli_id") or 0)
+        scf_id = int(payload.get("scf_id") or 2)
+    except (TypeError, ValueError) as exc:
+        raise SicarFacturaError("cli_id y scf_id deben ser enteros.") from exc
     conceptos = payload.get("conceptos") or []
     if not cli_id:
         raise SicarFacturaError("cli_id es obligatorio.")
     if not conceptos:
         raise SicarFacturaError("Agrega al menos un concepto.")
+    if not isinstance(conceptos, list) or not all(isinstance(item, dict) for item in conceptos):
+        raise SicarFacturaError("conceptos debe ser una lista de objetos.")
+    return _FacturaDraft(
+        payload=payload,
+        cli_id=cli_id,
+        scf_id=scf_id,
+        conceptos=conceptos,
+        forma_pago=str(payload.get("forma_pago") or "99-Por definir"),
+        metodo_pago=str(payload.get("metodo_pago") or "PPD-Pago en parcialidades o diferido"),
+        uso_cfdi=str(payload.get("uso_cfdi") or "G03-Gastos en general"),
+    )
 
-    forma_pago = str(payload.get("forma_pago") or "99-Por definir")
-    metodo_pago = str(payload.get("metodo_pago") or "PPD-Pago en parcialidades o diferido")
-    uso_cfdi = str(payload.get("uso_cfdi") or "G03-Gastos en general")
-
-    cfg = _sicar_db_config()
-    art_id = _DEFAULT_ART_ID
-    vnd_id = _DEFAULT_VND_ID
 
-    conn = connect_sicar_exclusive(cfg, read_timeout=60)
+def _csd_signer(csd: dict[str, Any]):
     try:
-        conn.begin()
-        cursor = conn.cursor()
-
-        empresa = _load_empresa(cursor)
-        csd = _load_csd(cursor)
-        cliente = _load_cliente(cursor, cli_id)
-        emisor = _emisor_from_empresa(empresa)
-        receptor = _receptor_from_cliente(cliente, payload)
+        return get_csd_signer(bytes(csd["fCer"]), bytes(csd["fKey"]), str(csd["_password"]))
+    except ValueError as exc:
+        raise SicarFacturaError(f"{exc} ({csd_row_label(csd)})") from exc
 
-        folio, serie_folio = _reserve_folio(cursor, scf_id)
-        serie_row = _load_serie(cursor, scf_id)
-        serie = str(serie_row.get("serie") or "")
 
-        xml_unsigned, build_totals = build_cfdi_xml(
+def _issue_cfdi(draft: _FacturaDraft, *, emisor: dict[str, Any], csd: dict[str, Any], signer, pac_token: str) -> None:
+    """Arma, firma, timbra y genera el QR; no usa la conexión SICAR (se puede llamar desde otro hilo)."""
+    stage = draft.timings
+    with stage("build"):
+        xml_unsigned, draft.build_totals = build_cfdi_xml(
             emisor=emisor,
-            receptor=receptor,
-            conceptos=conceptos,
-            forma_pago=forma_pago,
-            metodo_pago=metodo_pago,
+            receptor=draft.receptor,
+            conceptos=draft.conceptos,
+            forma_pago=draft.forma_pago,
+            metodo_pago=draft.metodo_pago,
             lugar_expedicion=str(emisor.get("lugar_expedicion") or ""),
-            serie=serie,
-            folio=folio,
+            serie=draft.serie,
+            folio=draft.folio,
         )
 
+    with stage("sign"):
         try:
-            signed_xml, sign_meta = sign_cfdi_xml(
+            signed_xml, draft.sign_meta = sign_cfdi_xml(
                 xml_unsigned,
                 bytes(csd["fCer"]),
                 bytes(csd["fKey"]),
                 str(csd["_password"]),
+                signer=signer,
             )
         except ValueError as exc:
-            label = csd_row_label(csd)
-            raise SicarFacturaError(f"{exc} ({label})") from exc
+            raise SicarFacturaError(f"{exc} ({csd_row_label(csd)})") from exc
 
-        pac_token = str(empresa.get("claveApi") or "")
+    with stage("stamp"):
         try:
-            stamped_xml, stamp_meta = stamp_cfdi_xml(signed_xml, token=pac_token)
+            draft.stamped_xml, draft.stamp_meta = stamp_cfdi_xml(signed_xml, token=pac_token)
         except SicarStampError as exc:
             raise SicarFacturaError(str(exc)) from exc
 
-        totals = {
-            "subtotal0": _money(build_totals["subtotal"]),
-            "subtotal": _money(build_totals["subtotal"]),
-            "descuento": Decimal("0"),
-            "total": _money(build_totals["total"]),
-        }
-        letra = _total_letra(totals["total"])
-        fecha = build_totals["fecha"]
-
-        qr_png = build_qr_png(
-            uuid=stamp_meta["uuid"],
+    draft.totals = {
+        "subtotal0": _money(draft.build_totals["subtotal"]),
+        "subtotal": _money(draft.build_totals["subtotal"]),
+        "descuento": Decimal("0"),
+        "total": _money(draft.build_totals["total"]),
+    }
+    with stage("qr"):
+        draft.qr_png = build_qr_png(
+            uuid=draft.stamp_meta["uuid"],
             rfc_emisor=str(emisor["rfc"]),
-            rfc_receptor=str(receptor["rfc"]),
-            total=str(totals["total"]),
-            sello_cfd=sign_meta.get("sello") or stamp_meta.get("sello_cfd") or "",
+            rfc_receptor=str(draft.receptor["rfc"]),
+            total=str(draft.totals["total"]),
+            sello_cfd=draft.sign_meta.get("sello") or draft.stamp_meta.get("sello_cfd") or "",
         )
 
-        ven_id = _insert_venta(cursor, totals=totals, letra=letra, fecha=fecha, vnd_id=vnd_id)
-        for orden, item in enumerate(conceptos):
-            _insert_detallev(cursor, ven_id, art_id, item, orden)
-        _insert_ventaimp(cursor, ven_id, totals["subtotal"], _money(build_totals["iva"]))
 
-        xcf_id = _insert_xmlcfdi(cursor, stamped_xml, qr_png)
-        fcf_id = _insert_facturacfdi(
-            cursor,
-            payload=payload,
-            empresa=empresa,
-            emisor=emisor,
-            receptor=receptor,
-            totals=totals,
-            letra=letra,
-            folio=folio,
-            serie_folio=serie_folio,
-            scf_id=scf_id,
-            cli_id=cli_id,
-            xcf_id=xcf_id,
-            stamp_meta=stamp_meta,
-            sign_meta=sign_meta,
-            forma_pago=forma_pago,
-            metodo_pago=metodo_pago,
-            uso_cfdi=uso_cfdi,
-            fecha=fecha,
+def _insert_factura(cursor, draft: _FacturaDraft, *, empresa: dict[str, Any], emisor: dict[str, Any]) -> dict[str, Any]:
+    """Venta + XML + facturacfdi de un CFDI ya timbrado; no hace commit."""
+    totals = draft.totals
+    letra = _total_letra(totals["total"])
+    fecha = draft.build_totals["fecha"]
+    iva = _money(draft.build_totals["iva"])
+
+    ven_id = _insert_venta(cursor, totals=totals, letra=letra, fecha=fecha, vnd_id=_DEFAULT_VND_ID)
+    for orden, item in enumerate(draft.conceptos):
+        _insert_detallev(cursor, ven_id, _DEFAULT_ART_ID, item, orden)
+    _insert_ventaimp(cursor, ven_id, totals["subtotal"], iva)
+
+    xcf_id = _insert_xmlcfdi(cursor, draft.stamped_xml, draft.qr_png)
+    fcf_id = _insert_facturacfdi(
+        cursor,
+        payload=draft.payload,
+        empresa=empresa,
+        emisor=emisor,
+        receptor=draft.receptor,
+        totals=totals,
+        letra=letra,
+        folio=draft.folio,
+        serie_folio=draft.serie_folio,
+        scf_id=draft.scf_id,
+        cli_id=draft.cli_id,
+        xcf_id=xcf_id,
+        stamp_meta=draft.stamp_meta,
+        sign_meta=draft.sign_meta,
+        forma_pago=draft.forma_pago,
+        metodo_pago=draft.metodo_pago,
+        uso_cfdi=draft.uso_cfdi,
+        fecha=fecha,
+    )
+    _insert_facturacfdiimp(cursor, fcf_id, totals["subtotal"], iva)
+    _insert_facturacfdiven(cursor, fcf_id, ven_id)
+    return {
+        "fcf_id": fcf_id,
+        "ven_id": ven_id,
+        "xcf_id": xcf_id,
+        "uuid": draft.stamp_meta.get("uuid"),
+        "serie_folio": draft.serie_folio,
+        "folio": draft.folio,
+        "total": float(totals["total"]),
+    }
+
+
+def _after_commit(cfg: dict, committed: list[tuple[dict[str, Any], _FacturaDraft]]) -> None:
+    if not committed:
+        return
+    invalidate_facturas_cache()
+    note_folios_used(cfg, [(draft.scf_id, draft.folio) for _, draft in committed])
+    for result, draft in committed:
+        remember_stamped_cfdi(
+            cfg,
+            result["fcf_id"],
+            uuid=result.get("uuid"),
+            serie_folio=draft.serie_folio,
+            xml_bytes=draft.stamped_xml,
+            qr_png=draft.qr_png,
         )
-        _insert_facturacfdiimp(cursor, fcf_id, totals["subtotal"], _money(build_totals["iva"]))
-        _insert_facturacfdiven(cursor, fcf_id, ven_id)
-
-        conn.commit()
-        return {
-            "fcf_id": fcf_id,
-            "ven_id": ven_id,
-            "xcf_id": xcf_id,
-            "uuid": stamp_meta.get("uuid"),
-            "serie_folio": serie_folio,
-            "folio": folio,
-            "total": float(totals["total"]),
-        }
+
+
+def create_timbrada_factura(payload: dict[str, Any]) -> dict[str, Any]:
+    """Crea venta + CFDI timbrado + registros SICAR en una transacción."""
+    draft = _draft_from_payload(payload)
+    cfg = _sicar_db_config()
+    stage = draft.timings
+
+    conn = connect_sicar_exclusive(cfg, read_timeout=60)
+    try:
+        conn.begin()
+        cursor = conn.cursor()
+
+        with stage("load"):
+            empresa = _load_empresa(cursor)
+            csd = _load_csd(cursor)
+            cliente = _load_cliente(cursor, draft.cli_id)
+            emisor = _emisor_from_empresa(empresa)
+            draft.receptor = _receptor_from_cliente(cliente, payload)
+            draft.serie, folios = _reserve_folios(cursor, draft.scf_id, 1)
+            draft.folio, draft.serie_folio = folios[0]
+
+        with stage("sign"):
+            signer, csd_cached = _csd_signer(csd)
+        _issue_cfdi(draft, emisor=emisor, csd=csd, signer=signer, pac_token=str(empresa.get("claveApi") or ""))
+
+        with stage("db"):
+            result = _insert_factura(cursor, draft, empresa=empresa, emisor=emisor)
+            conn.commit()
+        _after_commit(cfg, [(result, draft)])
+        logger.info(
+            "Factura SICAR %s timbrada (CSD %s): %s",
+            draft.serie_folio,
+            "en caché" if csd_cached else "cargado",
+            " ".join(f"{name}={ms}ms" for name, ms in stage.ms.items()),
+        )
+        return {**result, "csd_cached": csd_cached, "timings_ms": stage.ms}
     except SicarFacturaError:
         conn.rollback()
         raise
@@ -535,18 +651,192 @@ def create_timbrada_factura(payload: dict[str, Any]) -> dict[str, Any]:
         close_sicar_connection(conn)
 
 
-def list_sicar_series(cursor) -> list[dict[str, Any]]:
-    return fetch_all(
-        cursor,
-        """
-        SELECT s.scf_id, s.serie, s.folioIni, s.emp_id,
-               COALESCE((
-                   SELECT MAX(f.folio) FROM facturacfdi f WHERE f.scf_id = s.scf_id
-               ), 0) + 1 AS next_folio
-        FROM seriecfdi s
-        ORDER BY s.scf_id
-        """,
+class SicarFacturaLoteError(SicarFacturaError):
+    """Payloads del lote inválidos; ``errores`` trae ``{"index", "detail"}`` por factura."""
+
+    def __init__(self, message: str, errores: list[dict[str, Any]] | None = None) -> None:
+        super().__init__(message)
+        self.errores = errores or []
+
+
+class SicarFacturaLoteInterrumpido(SicarFacturaLoteError):
+    """El lote se abortó con CFDI ya timbrados en el PAC que no quedaron confirmados en SICAR.
+
+    ``errores`` trae ``{"index", "serie_folio", "uuid", "detail"}`` de cada uno:
+    son comprobantes válidos ante el SAT que hay que registrar o cancelar a mano.
+    """
+
+
+def _stamped_drafts(drafts: list[_FacturaDraft]) -> list[dict[str, Any]]:
+    return [
+        {
+            "index": index,
+            "serie_folio": draft.serie_folio,
+            "uuid": draft.stamp_meta["uuid"],
+            "detail": "Timbrada en el PAC; su registro en SICAR no se confirmó.",
+        }
+        for index, draft in enumerate(drafts)
+        if draft.stamp_meta.get("uuid")
+    ]
+
+
+def create_timbradas_lote(payloads: Any) -> dict[str, Any]:
+    """Timbra varias facturas con una sola conexión de escritura.
+
+    Todo se valida antes de tocar SICAR. En una transacción se apartan los
+    folios de cada serie de una vez; armar/firmar/timbrar corre en
+    ``SICAR_LOTE_WORKERS`` hilos y cada CFDI se inserta (en orden de folio, con
+    su propio SAVEPOINT) en cuanto está timbrado, mientras los siguientes
+    siguen en el PAC. Una factura que falla no detiene al resto; su folio queda
+    sin usar.
+
+    El ``FOR UPDATE`` de ``_reserve_folios`` bloquea las series del lote hasta el
+    ``COMMIT``: mientras todo el lote pasa por el PAC nadie más (SICAR incluido)
+    puede timbrar en esas series. Por eso ``SICAR_LOTE_MAX`` es bajo (10).
+
+    Un error que pierde la transacción (conexión caída, SAVEPOINT o ``COMMIT``
+    fallidos) cancela los timbrados en cola y lanza ``SicarFacturaLoteInterrumpido``
+    con el UUID de cada CFDI que ya se había timbrado.
+    """
+    if not isinstance(payloads, list) or not payloads:
+        raise SicarFacturaLoteError("Envía al menos una factura en facturas.")
+    max_docs = max(1, sicar_setting_int("SICAR_LOTE_MAX", 10))
+    if len(payloads) > max_docs:
+        raise SicarFacturaLoteError(f"Máximo {max_docs} facturas por lote.")
+    drafts: list[_FacturaDraft] = []
+    errores: list[dict[str, Any]] = []
+    for index, payload in enumerate(payloads):
+        try:
+            drafts.append(_draft_from_payload(payload))
+        except SicarFacturaError as exc:
+            errores.append({"index": index, "detail": str(exc)})
+    if errores:
+        raise SicarFacturaLoteError("Hay facturas inválidas en el lote; no se timbró ninguna.", errores)
+
+    cfg = _sicar_db_config()
+    stage = _StageTimer()
+    outcomes: list[dict[str, Any] | None] = [None] * len(drafts)
+    committed: list[tuple[dict[str, Any], _FacturaDraft]] = []
+
+    def _fail(index: int, detail: str) -> None:
+        outcomes[index] = {"index": index, "ok": False, "detail": detail}
+
+    pool: ThreadPoolExecutor | None = None
+    conn = connect_sicar_exclusive(cfg, read_timeout=60)
+    try:
+        conn.begin()
+        cursor = conn.cursor()
+
+        with stage("load"):
+            empresa = _load_empresa(cursor)
+            csd = _load_csd(cursor)
+            emisor = _emisor_from_empresa(empresa)
+            clientes: dict[int, dict[str, Any]] = {}
+            for index, draft in enumerate(drafts):
+                try:
+                    if draft.cli_id not in clientes:
+                        clientes[draft.cli_id] = _load_cliente(cursor, draft.cli_id)
+                    draft.receptor = _receptor_from_cliente(clientes[draft.cli_id], draft.payload)
+                except SicarFacturaError as exc:
+                    _fail(index, str(exc))
+            ready = [index for index in range(len(drafts)) if outcomes[index] is None]
+            by_serie: dict[int, list[int]] = {}
+            for index in ready:
+                by_serie.setdefault(drafts[index].scf_id, []).append(index)
+            for scf_id, indexes in by_serie.items():
+                serie, folios = _reserve_folios(cursor, scf_id, len(indexes))
+                for index, (folio, serie_folio) in zip(indexes, folios):
+                    drafts[index].serie, drafts[index].folio, drafts[index].serie_folio = serie, folio, serie_folio
+
+        with stage("sign"):
+            signer, csd_cached = _csd_signer(csd)
+        pac_token = str(empresa.get("claveApi") or "")
+        ready.sort(key=lambda index: (drafts[index].scf_id, drafts[index].folio))
+        workers = max(1, min(sicar_setting_int("SICAR_LOTE_WORKERS", 3), len(ready) or 1))
+
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sicar-lote")
+        with stage("pipeline"):
+            futures = [
+                (
+                    index,
+                    pool.submit(
+                        _issue_cfdi, drafts[index], emisor=emisor, csd=csd, signer=signer, pac_token=pac_token
+                    ),
+                )
+                for index in ready
+            ]
+            for index, future in futures:
+                draft = drafts[index]
+                try:
+                    future.result()
+                except SicarFacturaError as exc:
+                    _fail(index, str(exc))
+                    continue
+                except Exception as exc:
+                    logger.exception("Lote SICAR: no se pudo timbrar %s", draft.serie_folio)
+                    _fail(index, f"No se pudo timbrar: {exc}")
+                    continue
+                with stage("db"):
+                    execute(cursor, "SAVEPOINT factura_lote")
+                    try:
+                        result = _insert_factura(cursor, draft, empresa=empresa, emisor=emisor)
+                    except Exception as exc:
+                        execute(cursor, "ROLLBACK TO SAVEPOINT factura_lote")
+                        logger.exception("Lote SICAR: %s timbrada pero no registrada", draft.serie_folio)
+                        _fail(
+                            index,
+                            f"Timbrada (UUID {draft.stamp_meta.get('uuid')}) pero no se pudo registrar en SICAR: {exc}",
+                        )
+                        continue
+                    execute(cursor, "RELEASE SAVEPOINT factura_lote")
+                outcomes[index] = {"index": index, "ok": True, **result, "timings_ms": draft.timings.ms}
+                committed.append((result, draft))
+        pool.shutdown()
+
+        with stage("db"):
+            conn.commit()
+    except Exception as exc:
+        if pool is not None:
+            # Lo que sigue en cola ya no tendría dónde registrarse: no se timbra.
+            pool.shutdown(wait=True, cancel_futures=True)
+        try:
+            conn.rollback()
+        except Exception:
+            logger.warning("Lote SICAR: no se pudo hacer ROLLBACK", exc_info=True)
+        stamped = _stamped_drafts(drafts)
+        if stamped:
+            logger.error(
+                "Lote SICAR interrumpido con %s CFDI timbrados sin registro confirmado: %s",
+                len(stamped),
+                ", ".join(f"{row['serie_folio']} ({row['uuid']})" for row in stamped),
+                exc_info=True,
+            )
+            raise SicarFacturaLoteInterrumpido(
+                f"El lote se interrumpió después de timbrar {len(stamped)} factura(s): {exc}", stamped
+            ) from exc
+        if isinstance(exc, SicarFacturaError):
+            raise
+        logger.exception("Error creando lote de facturas SICAR")
+        raise SicarFacturaError(f"No se pudo crear el lote de facturas: {exc}") from exc
+    finally:
+        close_sicar_connection(conn)
+
+    _after_commit(cfg, committed)
+    logger.info(
+        "Lote SICAR: %s de %s facturas timbradas (CSD %s): %s",
+        len(committed),
+        len(drafts),
+        "en caché" if csd_cached else "cargado",
+        " ".join(f"{name}={ms}ms" for name, ms in stage.ms.items()),
     )
+    return {
+        "total": len(drafts),
+        "timbradas": len(committed),
+        "fallidas": len(drafts) - len(committed),
+        "csd_cached": csd_cached,
+        "timings_ms": stage.ms,
+        "resultados": outcomes,
+    }
 
 
 _SICAR_CLIENTE_FORM_SQL = """
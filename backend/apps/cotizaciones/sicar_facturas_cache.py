@@ -0,0 +1,69 @@
+"""Caché corta del listado de facturas CFDI de SICAR (meses y conteos).
+
+Los meses con su total y los conteos de búsqueda salen de ``GROUP BY`` /
+``COUNT(*)`` sobre toda ``facturacfdi``; cambian solo cuando se timbra una
+factura. Se guardan en ``django.core.cache`` (Redis si hay ``REDIS_URL``, así
+lo comparten los workers) bajo una generación: timbrar desde este sistema la
+incrementa y todos dejan de ver lo anterior. Las altas hechas directamente en
+SICAR aparecen al vencer el TTL.
+
+Variables de entorno:
+
+- ``SICAR_FACTURAS_CACHE_SEC`` (default 60; ``0`` desactiva la caché).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import uuid
+from typing import Callable, TypeVar
+
+from django.core.cache import cache
+
+from apps.cotizaciones.sicar_db import sicar_setting_int
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_GEN_KEY = "sicar:facturas:gen"
+
+
+def _ttl() -> int:
+    return max(0, sicar_setting_int("SICAR_FACTURAS_CACHE_SEC", 60))
+
+
+def _generation() -> str:
+    return str(cache.get(_GEN_KEY) or "0")
+
+
+def cached_facturas_value(cfg: dict, name: str, build: Callable[[], T]) -> T:
+    """``build()`` cacheado por servidor SICAR + ``name``; si la caché falla, consulta directo."""
+    ttl = _ttl()
+    if ttl <= 0:
+        return build()
+    scope = hashlib.sha1(f"{cfg.get('host')}:{cfg.get('port')}:{cfg.get('database')}:{name}".encode()).hexdigest()
+    try:
+        key = f"sicar:facturas:{_generation()}:{scope}"
+        hit = cache.get(key)
+    except Exception:
+        logger.warning("Caché de facturas SICAR no disponible", exc_info=True)
+        return build()
+    if hit is not None:
+        return hit
+    value = build()
+    try:
+        cache.set(key, value, ttl)
+    except Exception:
+        logger.warning("No se pudo guardar en la caché de facturas SICAR", exc_info=True)
+    return value
+
+
+def invalidate_facturas_cache() -> None:
+    """Tras timbrar: meses y conteos se recalculan en la siguiente consulta (todos los workers)."""
+    try:
+        cache.set(_GEN_KEY, uuid.uuid4().hex[:12], None)
+    except Exception:
+        logger.warning("No se pudo invalidar la caché de facturas SICAR", exc_info=True)
+
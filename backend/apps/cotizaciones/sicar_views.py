@@ -1,29 +1,41 @@
+import base64
+import json
 import logging
+import re
 from datetime import date, datetime
 from decimal import Decimal
 
-from django.http import HttpResponse
-from rest_framework.permissions import IsAuthenticated
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.cotizaciones.pdf_cache import etag_matches
 from apps.cotizaciones.pdf_render import PdfRenderError, any_provider_configured, render_html_to_pdf
+from apps.cotizaciones.sicar_catalogos import FORMAS_PAGO, METODOS_PAGO, SERIES, USOS_CFDI, get_catalogo
+from apps.cotizaciones.sicar_cfdi_export import stream_month_zip
 from apps.cotizaciones.sicar_cfdi_pdf import cfdi_download_filename, generate_cfdi_pdf_html
+from apps.cotizaciones.sicar_cfdi_store import PDF_KIND, content_etag, get_cfdi_store, remember_stamped_cfdi
 from apps.cotizaciones.sicar_db import (
     _connect_sicar,
     _sicar_db_config,
     _sicar_error_detail,
     release_sicar_connection,
+    sicar_pool_stats,
 )
 from apps.cotizaciones.sicar_factura_service import (
     SicarFacturaError,
+    SicarFacturaLoteError,
+    SicarFacturaLoteInterrumpido,
     create_timbrada_factura,
+    create_timbradas_lote,
     get_sicar_cliente,
     get_sicar_cotizacion,
-    list_sicar_series,
     search_sicar_clientes,
     search_sicar_cotizaciones,
 )
+from apps.cotizaciones.sicar_facturas_cache import cached_facturas_value
 from apps.cotizaciones.views import CotizacionesPermission
 
 logger = logging.getLogger(__name__)
@@ -79,11 +91,31 @@ def _serialize_rows(rows: list[dict]) -> list[dict]:
     return [_serialize_row(r) for r in rows]
 
 
-def _month_filter_sql(month: str | None) -> tuple[str, tuple]:
+def _month_range(month: str | None) -> tuple[date, date] | None:
+    """``"2024-03"`` → ``(2024-03-01, 2024-04-01)``; ``None`` si no es un mes válido."""
     month_value = (month or "").strip()
-    if not month_value or len(month_value) != 7 or month_value[4] != "-":
+    if len(month_value) != 7 or month_value[4] != "-":
+        return None
+    try:
+        year, mon = int(month_value[:4]), int(month_value[5:])
+        start = date(year, mon, 1)
+    except ValueError:
+        return None
+    end = date(year + 1, 1, 1) if mon == 12 else date(year, mon + 1, 1)
+    return start, end
+
+
+def _month_filter_sql(month: str | None) -> tuple[str, tuple]:
+    # Rango sobre ``fecha`` (aprovecha su índice) en vez de calcular YEAR/MONTH por fila.
+    bounds = _month_range(month)
+    if bounds is None:
         return "", ()
-    return f" {_MONTH_KEY_SQL} = %s ", (month_value,)
+    return " fecha >= %s AND fecha < %s ", bounds
+
+
+_UUID_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", re.IGNORECASE)
+_RFC_RE = re.compile(r"^[A-ZÑ&]{3,4}\d{6}[A-Z0-9]{3}$", re.IGNORECASE)
+_SERIE_FOLIO_RE = re.compile(r"^[A-Z]{1,10}-?\d{1,10}$", re.IGNORECASE)
 
 
 def _search_filter_sql(q: str | None) -> tuple[str, tuple]:
@@ -104,6 +136,20 @@ def _search_filter_sql(q: str | None) -> tuple[str, tuple]:
     )
 
 
+def _exact_search_sql(q: str | None) -> tuple[str, tuple]:
+    """Igualdad exacta cuando ``q`` parece UUID, RFC, folio o serie-folio; ``""`` si no aplica."""
+    q_value = (q or "").strip()
+    if _UUID_RE.match(q_value):
+        return " uuid = %s ", (q_value,)
+    if _RFC_RE.match(q_value):
+        return " rfcC = %s ", (q_value.upper(),)
+    if q_value.isdigit():
+        return f" ({PRIMARY_KEY} = %s OR folio = %s) ", (int(q_value), int(q_value))
+    if _SERIE_FOLIO_RE.match(q_value):
+        return " serieFolio = %s ", (q_value,)
+    return "", ()
+
+
 def _list_where_sql(month: str | None, q: str | None) -> tuple[str, tuple]:
     parts: list[str] = []
     params: list = []
@@ -129,20 +175,81 @@ def _fetch_month_buckets(cursor) -> list[dict]:
         ORDER BY month_key DESC
         """
     )
-    return cursor.fetchall() or []
-
-
-def _resolve_default_month(cursor) -> str:
+    return [
+        {"month_key": str(r.get("month_key") or ""), "total": int(r.get("total") or 0)}
+        for r in cursor.fetchall() or []
+    ]
+
+
+def _count_where(cursor, cfg: dict, where_sql: str, where_params: tuple) -> int:
+    def _count() -> int:
+        cursor.execute(f"SELECT COUNT(*) AS total FROM {PRIMARY_TABLE}{where_sql}", where_params)
+        return int((cursor.fetchone() or {}).get("total") or 0)
+
+    return cached_facturas_value(cfg, f"count:{where_sql}:{where_params!r}", _count)
+
+
+def _resolve_search_where(cursor, cfg: dict, q: str) -> tuple[str, tuple, int]:
+    """Primero la igualdad exacta (usa índices); si no encuentra nada, el ``LIKE`` de siempre."""
+    exact_sql, exact_params = _exact_search_sql(q)
+    if exact_sql:
+        where_sql = f" WHERE {exact_sql.strip()} "
+        total = _count_where(cursor, cfg, where_sql, exact_params)
+        if total:
+            return where_sql, exact_params, total
+    where_sql, where_params = _list_where_sql(None, q)
+    return where_sql, where_params, _count_where(cursor, cfg, where_sql, where_params)
+
+
+def _encode_list_cursor(fecha, fcf_id) -> str:
+    raw = json.dumps([_json_value(fecha), int(fcf_id)], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_list_cursor(value: str) -> tuple[str, int]:
+    """``(fecha, fcf_id)`` de la última fila vista; ``ValueError`` si el cursor no es válido."""
+    try:
+        padded = value + "=" * (-len(value) % 4)
+        fecha, fcf_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        datetime.fromisoformat(str(fecha))
+        return str(fecha), int(fcf_id)
+    except (TypeError, ValueError, UnicodeError) as exc:
+        raise ValueError("cursor inválido") from exc
+
+
+def _fetch_list_page(
+    cursor,
+    where_sql: str,
+    where_params: tuple,
+    *,
+    page_size: int,
+    after: tuple[str, int] | None = None,
+    offset: int = 0,
+) -> tuple[list[dict], str | None]:
+    """Página por ``(fecha, fcf_id)`` descendente; con ``after`` continúa por keyset en lugar de OFFSET."""
+    params = list(where_params)
+    if after is not None:
+        keyset = f"(fecha < %s OR (fecha = %s AND {PRIMARY_KEY} < %s))"
+        where_sql = f"{where_sql} AND {keyset} " if where_sql else f" WHERE {keyset} "
+        params.extend((after[0], after[0], after[1]))
+        offset = 0
     cursor.execute(
         f"""
-        SELECT {_MONTH_KEY_SQL} AS month_key
+        SELECT {LIST_SELECT}
         FROM {PRIMARY_TABLE}
+        {where_sql}
         ORDER BY fecha DESC, {PRIMARY_KEY} DESC
-        LIMIT 1
-        """
+        LIMIT %s OFFSET %s
+        """,
+        (*params, page_size + 1, offset),
     )
-    row = cursor.fetchone() or {}
-    return str(row.get("month_key") or "")
+    rows = list(cursor.fetchall() or [])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = _encode_list_cursor(last.get("fecha"), last.get(PRIMARY_KEY))
+    return rows, next_cursor
 
 
 def _sicar_config_or_response():
@@ -202,6 +309,13 @@ class SicarFacturasListView(APIView):
         offset = (page - 1) * page_size
         month = (request.query_params.get("month", "") or "").strip()
         q = (request.query_params.get("q", "") or "").strip()
+        after = None
+        raw_cursor = (request.query_params.get("cursor", "") or "").strip()
+        if raw_cursor:
+            try:
+                after = _decode_list_cursor(raw_cursor)
+            except ValueError:
+                return Response({"detail": "cursor inválido."}, status=400)
 
         cfg = _sicar_db_config()
         missing = [k for k in ("host", "user", "password", "database") if not cfg.get(k)]
@@ -212,12 +326,12 @@ class SicarFacturasListView(APIView):
         try:
             conn = _connect_sicar(cfg)
             with conn.cursor() as cursor:
-                months = _fetch_month_buckets(cursor)
+                months = cached_facturas_value(cfg, "months", lambda: _fetch_month_buckets(cursor))
                 active_month = month
                 if q:
-                    where_sql, where_params = _list_where_sql(None, q)
+                    where_sql, where_params, total = _resolve_search_where(cursor, cfg, q)
                 else:
-                    active_month = month or _resolve_default_month(cursor)
+                    active_month = month or (months[0]["month_key"] if months else "")
                     if not active_month:
                         return Response({"detail": "No hay facturas CFDI registradas."}, status=404)
                     where_sql, where_params = _list_where_sql(active_month, None)
@@ -234,24 +348,16 @@ class SicarFacturasListView(APIView):
                                     "page_size": page_size,
                                     "total": 0,
                                     "total_pages": 1,
+                                    "next_cursor": None,
                                 },
                             }
                         )
+                    total = next((m["total"] for m in months if m["month_key"] == active_month), 0)
 
-                cursor.execute(f"SELECT COUNT(*) AS total FROM {PRIMARY_TABLE}{where_sql}", where_params)
-                total = int((cursor.fetchone() or {}).get("total") or 0)
-
-                cursor.execute(
-                    f"""
-                    SELECT {LIST_SELECT}
-                    FROM {PRIMARY_TABLE}
-                    {where_sql}
-                    ORDER BY fecha DESC, {PRIMARY_KEY} DESC
-                    LIMIT %s OFFSET %s
-                    """,
-                    (*where_params, page_size, offset),
+                rows, next_cursor = _fetch_list_page(
+                    cursor, where_sql, where_params, page_size=page_size, after=after, offset=offset
                 )
-                rows = _serialize_rows(cursor.fetchall() or [])
+                rows = _serialize_rows(rows)
 
             total_pages = (total + page_size - 1) // page_size if total > 0 else 1
             return Response(
@@ -266,6 +372,7 @@ class SicarFacturasListView(APIView):
                         "page_size": page_size,
                         "total": total,
                         "total_pages": total_pages,
+                        "next_cursor": next_cursor,
                     },
                 }
             )
@@ -294,7 +401,11 @@ class SicarFacturasListView(APIView):
             return Response({"detail": f"Faltan variables SICAR en entorno: {', '.join(missing)}"}, status=500)
         try:
             result = create_timbrada_factura(data)
-            return Response(result, status=201)
+            response = Response(result, status=201)
+            timings = result.get("timings_ms") or {}
+            if timings:
+                response["Server-Timing"] = ", ".join(f"{name};dur={ms}" for name, ms in timings.items())
+            return response
         except SicarFacturaError as exc:
             logger.warning("Alta factura SICAR rechazada: %s", exc)
             return Response({"detail": str(exc)}, status=400)
@@ -303,50 +414,67 @@ class SicarFacturasListView(APIView):
             return Response({"detail": _sicar_error_detail(exc, cfg)}, status=502)
 
 
-class SicarFacturaCatalogosView(APIView):
-    """Series CFDI y catálogos mínimos para el formulario."""
+class SicarFacturasLoteView(APIView):
+    """Timbra varias facturas en un solo request (``{"facturas": [payload, ...]}``).
+
+    Las series usadas quedan bloqueadas en SICAR (``FOR UPDATE``) hasta que todo
+    el lote termina de timbrar, hasta ``SICAR_LOTE_MAX`` facturas (default 10).
+    En ese tiempo las demás facturas de esas series, también las de SICAR, esperan.
+    """
+
+    permission_classes = [IsAuthenticated, CotizacionesPermission]
+
+    def post(self, request):
+        data = request.data if isinstance(request.data, dict) else {}
+        cfg, err = _sicar_config_or_response()
+        if err:
+            return err
+        try:
+            result = create_timbradas_lote(data.get("facturas"))
+        except SicarFacturaLoteInterrumpido as exc:
+            return Response({"detail": str(exc), "errores": exc.errores}, status=502)
+        except SicarFacturaLoteError as exc:
+            return Response({"detail": str(exc), "errores": exc.errores}, status=400)
+        except SicarFacturaError as exc:
+            logger.warning("Lote de facturas SICAR rechazado: %s", exc)
+            return Response({"detail": str(exc)}, status=400)
+        except Exception as exc:
+            logger.exception("Error creando lote de facturas SICAR")
+            return Response({"detail": _sicar_error_detail(exc, cfg)}, status=502)
+        if not result["fallidas"]:
+            code = status.HTTP_201_CREATED
+        elif result["timbradas"]:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response(result, status=code)
+
+
+class SicarFacturasExportView(APIView):
+    """ZIP con XML y PDF de todas las facturas CFDI de un mes (``?month=YYYY-MM``; ``pdf=0`` solo XML)."""
 
     permission_classes = [IsAuthenticated, CotizacionesPermission]
 
     def get(self, request):
+        month = (request.query_params.get("month", "") or "").strip()
+        bounds = _month_range(month)
+        if bounds is None:
+            return Response({"detail": "month debe tener formato YYYY-MM."}, status=400)
+        with_pdf = (request.query_params.get("pdf") or "1").strip().lower() not in ("0", "false", "no")
+        if with_pdf and not any_provider_configured():
+            return Response({"detail": "No hay motor de PDF disponible en el servidor."}, status=503)
+
         cfg, err = _sicar_config_or_response()
         if err:
             return err
+
         conn = None
         try:
             conn = _connect_sicar(cfg)
             with conn.cursor() as cursor:
-                series = _serialize_rows(list_sicar_series(cursor))
-            return Response(
-                {
-                    "series": series,
-                    "forma_pago": [
-                        {"clave": "01", "label": "01-Efectivo"},
-                        {"clave": "03", "label": "03-Transferencia electrónica de fondos"},
-                        {"clave": "04", "label": "04-Tarjeta de crédito"},
-                        {"clave": "28", "label": "28-Tarjeta de débito"},
-                        {"clave": "99", "label": "99-Por definir"},
-                    ],
-                    "metodo_pago": [
-                        {"clave": "PUE", "label": "PUE-Pago en una sola exhibición"},
-                        {"clave": "PPD", "label": "PPD-Pago en parcialidades o diferido"},
-                    ],
-                    "uso_cfdi": [
-                        {"clave": "G01", "label": "G01-Adquisición de mercancías"},
-                        {"clave": "G02", "label": "G02-Devoluciones, descuentos o bonificaciones"},
-                        {"clave": "G03", "label": "G03-Gastos en general"},
-                        {"clave": "I01", "label": "I01-Construcciones"},
-                        {"clave": "I04", "label": "I04-Equipo de computo y accesorios"},
-                        {"clave": "I08", "label": "I08-Otra maquinaria y equipo"},
-                        {"clave": "D01", "label": "D01-Honorarios médicos, dentales y gastos hospitalarios"},
-                        {"clave": "P01", "label": "P01-Por definir"},
-                        {"clave": "S01", "label": "S01-Sin efectos fiscales"},
-                        {"clave": "CP01", "label": "CP01-Pagos"},
-                    ],
-                }
-            )
+                months = cached_facturas_value(cfg, "months", lambda: _fetch_month_buckets(cursor))
         except Exception as exc:
-            logger.exception("Error cargando catálogos SICAR")
+            logger.exception("Error consultando meses CFDI en SICAR")
             return Response({"detail": _sicar_error_detail(exc, cfg)}, status=502)
         finally:
             if conn is not None:
@@ -354,6 +482,48 @@ class SicarFacturaCatalogosView(APIView):
                     release_sicar_connection(conn)
                 except Exception:
                     pass
+        if not any(m["month_key"] == month and m["total"] for m in months):
+            return Response({"detail": f"No hay facturas CFDI en {month}."}, status=404)
+
+        try:
+            chunks = stream_month_zip(cfg, bounds, with_pdf=with_pdf)
+        except Exception as exc:
+            logger.exception("Error abriendo exportación CFDI SICAR %s", month)
+            return Response({"detail": _sicar_error_detail(exc, cfg)}, status=502)
+        response = StreamingHttpResponse(chunks, content_type="application/zip")
+        response["Content-Disposition"] = f'attachment; filename="facturas_cfdi_{month}.zip"'
+        return response
+
+
+class SicarFacturaCatalogosView(APIView):
+    """Series CFDI (copia local de SICAR) y catálogos SAT para el formulario.
+
+    ``?refrescar=1`` vuelve a leer las series en SICAR en este request.
+    """
+
+    permission_classes = [IsAuthenticated, CotizacionesPermission]
+
+    def get(self, request):
+        cfg, err = _sicar_config_or_response()
+        if err:
+            return err
+        refrescar = (request.query_params.get("refrescar") or "").strip().lower() in ("1", "true", "si")
+        try:
+            series = get_catalogo(cfg, SERIES, refrescar=refrescar)
+        except Exception as exc:
+            logger.exception("Error cargando catálogos SICAR")
+            return Response({"detail": _sicar_error_detail(exc, cfg)}, status=502)
+        return Response(
+            {
+                "series": series.datos,
+                "series_checksum": series.checksum,
+                "series_actualizado": series.fecha_actualizacion,
+                "series_verificado": series.fecha_verificacion,
+                "forma_pago": FORMAS_PAGO,
+                "metodo_pago": METODOS_PAGO,
+                "uso_cfdi": USOS_CFDI,
+            }
+        )
 
 
 class SicarClientesSearchView(APIView):
@@ -528,6 +698,18 @@ class SicarFacturaDetalleView(APIView):
                     pass
 
 
+def _cfdi_file_response(request, data: bytes, content_type: str, filename: str, *, inline: bool = False):
+    """Archivo de un CFDI timbrado con ETag fuerte; 304 si el cliente ya lo tiene."""
+    etag = content_etag(data)
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        response = HttpResponseNotModified()
+    else:
+        response = _attachment_response(data, content_type, filename, inline=inline)
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
 class SicarFacturaXmlView(APIView):
     """Descarga el XML timbrado original desde xmlcfdi (solo lectura)."""
 
@@ -538,6 +720,14 @@ class SicarFacturaXmlView(APIView):
         if err:
             return err
 
+        store = get_cfdi_store()
+        meta = store.lookup(cfg, fcf_id)
+        if meta:
+            xml_bytes = store.get_artifact(meta["uuid"], "xml")
+            if xml_bytes:
+                filename = cfdi_download_filename(meta["serie_folio"], meta["uuid"], "xml")
+                return _cfdi_file_response(request, xml_bytes, "application/xml; charset=utf-8", filename)
+
         conn = None
         try:
             conn = _connect_sicar(cfg, read_timeout=20)
@@ -557,7 +747,16 @@ class SicarFacturaXmlView(APIView):
             )
             if isinstance(xml_bytes, str):
                 xml_bytes = xml_bytes.encode("utf-8")
-            return _attachment_response(bytes(xml_bytes), "application/xml; charset=utf-8", filename)
+            xml_bytes = bytes(xml_bytes)
+            remember_stamped_cfdi(
+                cfg,
+                fcf_id,
+                uuid=str(row.get("uuid") or ""),
+                serie_folio=str(row.get("serieFolio") or ""),
+                xml_bytes=xml_bytes,
+                qr_png=row.get("cbb_png"),
+            )
+            return _cfdi_file_response(request, xml_bytes, "application/xml; charset=utf-8", filename)
         except Exception as exc:
             logger.exception("Error descargando XML SICAR fcf_id=%s", fcf_id)
             return Response({"detail": _sicar_error_detail(exc, cfg)}, status=502)
@@ -580,6 +779,15 @@ class SicarFacturaPdfView(APIView):
             return err
 
         wants_html = (request.query_params.get("format") or "").lower() == "html"
+        wants_pdf = not wants_html and any_provider_configured()
+
+        store = get_cfdi_store()
+        if wants_pdf:
+            meta = store.lookup(cfg, fcf_id)
+            pdf_bytes = store.get_artifact(meta["uuid"], PDF_KIND) if meta else None
+            if pdf_bytes:
+                filename = cfdi_download_filename(meta["serie_folio"], meta["uuid"], "pdf")
+                return _cfdi_file_response(request, pdf_bytes, "application/pdf", filename, inline=True)
 
         conn = None
         try:
@@ -595,6 +803,9 @@ class SicarFacturaPdfView(APIView):
             serie_folio = str(row.get("serieFolio") or "")
             uuid = str(row.get("uuid") or "")
             filename = cfdi_download_filename(serie_folio, uuid, "pdf")
+            remember_stamped_cfdi(
+                cfg, fcf_id, uuid=uuid, serie_folio=serie_folio, xml_bytes=xml_bytes, qr_png=cbb_png
+            )
 
             html = generate_cfdi_pdf_html(
                 row,
@@ -605,7 +816,7 @@ class SicarFacturaPdfView(APIView):
             if not html:
                 return Response({"detail": "No se pudo generar la representación del CFDI."}, status=500)
 
-            if wants_html or not any_provider_configured():
+            if not wants_pdf:
                 response = HttpResponse(html, content_type="text/html; charset=utf-8")
                 response["Content-Disposition"] = f'inline; filename="{filename.replace(".pdf", ".html")}"'
                 return response
@@ -616,7 +827,10 @@ class SicarFacturaPdfView(APIView):
                 logger.exception("PDF CFDI render failed fcf_id=%s", fcf_id)
                 return Response({"detail": "No se pudo generar el PDF."}, status=502)
 
-            return _attachment_response(pdf_bytes, "application/pdf", filename, inline=True)
+            # Solo CFDI con XML timbrado: sin él el PDF depende de datos que aún pueden cambiar.
+            if xml_bytes:
+                store.put_artifact(uuid, PDF_KIND, pdf_bytes)
+            return _cfdi_file_response(request, pdf_bytes, "application/pdf", filename, inline=True)
         except Exception as exc:
             logger.exception("Error generando PDF SICAR fcf_id=%s", fcf_id)
             return Response({"detail": _sicar_error_detail(exc, cfg)}, status=502)
@@ -626,3 +840,12 @@ class SicarFacturaPdfView(APIView):
                     release_sicar_connection(conn)
                 except Exception:
                     pass
+
+
+class SicarPoolEstadoView(APIView):
+    """GET estado de los pools de conexiones SICAR del worker que atiende (solo admin)."""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(sicar_pool_stats())
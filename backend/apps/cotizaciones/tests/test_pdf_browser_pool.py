@@ -0,0 +1,136 @@
+"""Pool de Chromium caliente: reutilización, reciclaje y métricas (sin Playwright real)."""
+from __future__ import annotations
+
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.cotizaciones.pdf_browser_pool import BrowserPool
+
+User = get_user_model()
+
+
+class _FakePage:
+    def __init__(self, browser):
+        self.browser = browser
+
+    def set_default_timeout(self, _ms):
+        pass
+
+    def set_content(self, html, **_kwargs):
+        if "boom" in html:
+            raise RuntimeError("crash")
+        self.html = html
+
+    def pdf(self, **kwargs):
+        return f"%PDF {kwargs['format']} {self.html}".encode()
+
+
+class _FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+
+    def new_page(self):
+        return _FakePage(self.browser)
+
+    def close(self):
+        self.browser.contexts_closed += 1
+
+
+class _FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+        self.contexts_closed = 0
+
+    def is_connected(self):
+        return self.connected and not self.closed
+
+    def new_context(self):
+        return _FakeContext(self)
+
+    def close(self):
+        self.closed = True
+
+
+class _FakePlaywright:
+    def stop(self):
+        pass
+
+
+class BrowserPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.browsers: list[_FakeBrowser] = []
+
+        def _launch():
+            browser = _FakeBrowser()
+            self.browsers.append(browser)
+            return _FakePlaywright(), browser
+
+        patcher = patch.object(BrowserPool, "_launch", staticmethod(_launch))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _pool(self, **kwargs) -> BrowserPool:
+        opts = {"max_pages": 100, "max_age_s": 600}
+        opts.update(kwargs)
+        pool = BrowserPool(1, **opts)
+        self.addCleanup(pool.shutdown)
+        return pool
+
+    def test_reuses_warm_browser_between_renders(self):
+        pool = self._pool()
+        first = pool.render("<p>a</p>", fmt="A4", landscape=False, timeout_s=10)
+        second = pool.render("<p>b</p>", fmt="LETTER", landscape=False, timeout_s=10)
+        self.assertEqual(first, b"%PDF A4 <p>a</p>")
+        self.assertEqual(second, b"%PDF LETTER <p>b</p>")
+        self.assertEqual(len(self.browsers), 1)
+        self.assertEqual(self.browsers[0].contexts_closed, 2)
+        stats = pool.stats()
+        self.assertEqual(stats["renders"], 2)
+        self.assertEqual(stats["launches"], 1)
+        self.assertIn("queue_wait_ms_avg", stats)
+        self.assertIn("render_ms_avg", stats)
+
+    def test_recycles_after_max_pages(self):
+        pool = self._pool(max_pages=2)
+        for i in range(3):
+            pool.render(f"<p>{i}</p>", fmt="A4", landscape=False, timeout_s=10)
+        self.assertEqual(len(self.browsers), 2)
+        self.assertTrue(self.browsers[0].closed)
+        self.assertEqual(pool.stats()["recycles"], 1)
+
+    def test_crash_relaunches_on_next_job(self):
+        pool = self._pool()
+        with self.assertRaises(RuntimeError):
+            pool.render("boom", fmt="A4", landscape=False, timeout_s=10)
+        self.assertTrue(self.browsers[0].closed)
+        out = pool.render("<p>ok</p>", fmt="A4", landscape=False, timeout_s=10)
+        self.assertTrue(out.startswith(b"%PDF"))
+        self.assertEqual(len(self.browsers), 2)
+        self.assertEqual(pool.stats()["errors"], 1)
+
+    def test_disconnected_browser_fails_health_check(self):
+        pool = self._pool()
+        pool.render("<p>1</p>", fmt="A4", landscape=False, timeout_s=10)
+        self.browsers[0].connected = False
+        pool.render("<p>2</p>", fmt="A4", landscape=False, timeout_s=10)
+        self.assertEqual(len(self.browsers), 2)
+
+
+class PdfMotorEstadoViewTests(TestCase):
+    def test_requires_admin(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="op", password="x"))
+        res = client.get("/api/cotizaciones-pdf/motor/")
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_admin_gets_stats(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="adm", password="x", is_staff=True))
+        res = client.get("/api/cotizaciones-pdf/motor/")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("enabled", res.data)
@@ -0,0 +1,118 @@
+"""Caché de PDF por hash de HTML + ETag/If-None-Match en el endpoint de cotización."""
+from __future__ import annotations
+
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.cotizaciones import pdf_render
+from apps.cotizaciones.models import Cotizacion
+from apps.cotizaciones.pdf_cache import PdfDiskCache, etag_matches, pdf_cache_key, pdf_etag
+from apps.users.models import UserPermissions
+
+User = get_user_model()
+
+
+class PdfDiskCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+
+    def test_key_depends_on_html_and_page_options(self):
+        base = pdf_cache_key("<p>x</p>", size="A4", landscape=False)
+        self.assertEqual(base, pdf_cache_key("<p>x</p>", size="a4", landscape=False))
+        self.assertNotEqual(base, pdf_cache_key("<p>y</p>", size="A4", landscape=False))
+        self.assertNotEqual(base, pdf_cache_key("<p>x</p>", size="Letter", landscape=False))
+        self.assertNotEqual(base, pdf_cache_key("<p>x</p>", size="A4", landscape=True))
+
+    def test_put_get_roundtrip(self):
+        cache = PdfDiskCache(self.root, 1024 * 1024)
+        key = pdf_cache_key("<p>x</p>")
+        self.assertIsNone(cache.get(key))
+        cache.put(key, b"%PDF-1.4 data")
+        self.assertEqual(cache.get(key), b"%PDF-1.4 data")
+
+    def test_evicts_least_recently_used(self):
+        cache = PdfDiskCache(self.root, 250)
+        keys = [pdf_cache_key(f"<p>{i}</p>") for i in range(3)]
+        cache.put(keys[0], b"%PDF" + b"a" * 96)
+        cache.put(keys[1], b"%PDF" + b"b" * 96)
+        old = time.time() - 60
+        os.utime(cache._path(keys[1]), (old, old))
+        os.utime(cache._path(keys[0]), (old + 30, old + 30))
+        cache.put(keys[2], b"%PDF" + b"c" * 96)
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNotNone(cache.get(keys[2]))
+
+    def test_disabled_when_max_is_zero(self):
+        cache = PdfDiskCache(self.root, 0)
+        key = pdf_cache_key("<p>x</p>")
+        cache.put(key, b"%PDF-1.4")
+        self.assertIsNone(cache.get(key))
+
+    def test_etag_matching(self):
+        etag = pdf_etag(pdf_cache_key("<p>x</p>"))
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(f'"otro", W/{etag}', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('"otro"', etag))
+        self.assertFalse(etag_matches(None, etag))
+
+    def test_render_html_to_pdf_reuses_cached_bytes(self):
+        cache = PdfDiskCache(self.root, 1024 * 1024)
+        with patch.object(pdf_render, "get_pdf_cache", return_value=cache), patch.object(
+            pdf_render, "_render_html_to_pdf_uncached", return_value=b"%PDF-1.4 render"
+        ) as mock_render:
+            first = pdf_render.render_html_to_pdf("<p>doc</p>")
+            second = pdf_render.render_html_to_pdf("<p>doc</p>")
+            pdf_render.render_html_to_pdf("<p>doc</p>", use_cache=False)
+        self.assertEqual(first, second)
+        self.assertEqual(mock_render.call_count, 2)
+
+
+class CotizacionPdfEtagTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cotizador", password="test-pass-123")
+        UserPermissions.objects.create(
+            user=self.user,
+            permissions={"cotizaciones": {"view": True, "create": False, "edit": False, "delete": False}},
+        )
+        self.client.force_authenticate(user=self.user)
+        self.cotizacion = Cotizacion.objects.create(
+            cliente="Cliente ETag",
+            prospecto=True,
+            contacto="Contacto",
+            medio_contacto="CLIENTE",
+            status="PENDIENTE",
+            fecha="2026-06-05",
+            subtotal=100,
+            iva_pct=16,
+            iva=16,
+            total=116,
+        )
+
+    def test_if_none_match_returns_304_without_render(self):
+        url = f"/api/cotizaciones/{self.cotizacion.id}/pdf/"
+        with patch(
+            "apps.cotizaciones.views.any_provider_configured", return_value=True
+        ), patch(
+            "apps.cotizaciones.views.render_html_to_pdf", return_value=b"%PDF-1.4 test"
+        ) as mock_render:
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, status.HTTP_200_OK)
+            etag = first["ETag"]
+            self.assertTrue(etag.startswith('"'))
+
+            second = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(second["ETag"], etag)
+        self.assertEqual(mock_render.call_count, 1)
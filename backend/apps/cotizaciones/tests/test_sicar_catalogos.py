@@ -0,0 +1,120 @@
+"""Catálogos del formulario de factura: copia local de las series SICAR con verificación en segundo plano."""
+from __future__ import annotations
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.cotizaciones import sicar_catalogos
+from apps.cotizaciones.models import SicarCatalogo
+from apps.cotizaciones.sicar_catalogos import SERIES, catalog_checksum, note_folios_used, refresh_catalogo
+from apps.users.models import UserPermissions
+
+User = get_user_model()
+
+_CFG = {"host": "sicar.test", "port": 3306, "user": "u", "password": "p", "database": "sicar"}
+
+
+class _FakeCursor:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        if self.owner.down:
+            raise ConnectionError("VPN caída")
+        self.owner.queries += 1
+
+    def fetchall(self):
+        return [dict(row) for row in self.owner.series]
+
+
+class _FakeConn:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def cursor(self):
+        return _FakeCursor(self.owner)
+
+
+class SicarCatalogosTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        user = User.objects.create_user(username="facturacion", password="x")
+        UserPermissions.objects.create(user=user, permissions={"cotizaciones": {"view": True, "create": True}})
+        self.client.force_authenticate(user=user)
+        self.queries = 0
+        self.down = False
+        self.series = [{"scf_id": 2, "serie": "A", "folioIni": 1, "emp_id": 1, "next_folio": 15}]
+        for target, kwargs in (
+            ("apps.cotizaciones.sicar_views._sicar_db_config", {"side_effect": lambda: dict(_CFG)}),
+            ("apps.cotizaciones.sicar_catalogos._connect_sicar", {"side_effect": lambda cfg: _FakeConn(self)}),
+            ("apps.cotizaciones.sicar_catalogos.release_sicar_connection", {}),
+            ("apps.cotizaciones.sicar_catalogos._submit_refresh", {}),
+        ):
+            patcher = patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _get(self, **params):
+        return self.client.get("/api/cotizaciones-sicar/catalogos/", params)
+
+    def test_form_loads_from_local_copy(self):
+        first = self._get()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data["series"][0]["next_folio"], 15)
+        self.assertEqual(first.data["series_checksum"], catalog_checksum(self.series))
+        self.assertEqual(first.data["uso_cfdi"][2]["clave"], "G03")
+        self.down = True
+        again = self._get()
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.data["series"], first.data["series"])
+        self.assertEqual(self.queries, 1)
+        sicar_catalogos._submit_refresh.assert_not_called()
+
+    def test_stale_copy_is_served_and_refreshed_once(self):
+        self._get()
+        old = timezone.now() - timedelta(hours=1)
+        SicarCatalogo.objects.update(fecha_verificacion=old)
+        self.down = True
+        self.assertEqual(self._get().status_code, 200)
+        self.assertEqual(self._get().status_code, 200)
+        sicar_catalogos._submit_refresh.assert_called_once_with(_CFG, SERIES)
+
+    def test_refresh_rewrites_only_on_checksum_change(self):
+        row = refresh_catalogo(_CFG, SERIES)
+        changed_at = row.fecha_actualizacion
+        self.assertEqual(refresh_catalogo(_CFG, SERIES).fecha_actualizacion, changed_at)
+        self.series.append({"scf_id": 3, "serie": "B", "folioIni": 1, "emp_id": 1, "next_folio": 1})
+        row = refresh_catalogo(_CFG, SERIES)
+        self.assertEqual(len(row.datos), 2)
+        self.assertEqual(row.checksum, catalog_checksum(self.series))
+        self.assertGreater(row.fecha_actualizacion, changed_at)
+
+    def test_refrescar_reads_sicar_in_request(self):
+        self._get()
+        self.series[0]["next_folio"] = 20
+        res = self._get(refrescar="1")
+        self.assertEqual(res.data["series"][0]["next_folio"], 20)
+        self.assertEqual(self.queries, 2)
+
+    def test_without_copy_sicar_errors_surface(self):
+        self.down = True
+        self.assertEqual(self._get().status_code, 502)
+
+    def test_stamping_advances_next_folio_locally(self):
+        refresh_catalogo(_CFG, SERIES)
+        note_folios_used(_CFG, [(2, 15), (2, 16), (9, 1)])
+        row = SicarCatalogo.objects.get()
+        self.assertEqual(row.datos[0]["next_folio"], 17)
+        self.series[0]["next_folio"] = 17
+        self.assertEqual(row.checksum, catalog_checksum(self.series))
@@ -0,0 +1,154 @@
+"""Exportación mensual de CFDI SICAR: ZIP en streaming leído por bloques."""
+from __future__ import annotations
+
+import io
+import tempfile
+import zipfile
+from datetime import date
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.cotizaciones.sicar_cfdi_store import PDF_KIND, CfdiStore
+from apps.users.models import UserPermissions
+
+User = get_user_model()
+
+_CFG = {"host": "sicar.test", "port": 3306, "user": "u", "password": "p", "database": "sicar"}
+
+
+def _uuid(i: int) -> str:
+    return f"00000000-0000-4000-8000-{i:012d}"
+
+
+_ROWS = [
+    {"fcf_id": i, "serieFolio": f"A-{i}", "uuid": _uuid(i), "xml_cfdi": f"<cfdi n='{i}'/>".encode(), "cbb_png": b""}
+    for i in range(1, 6)
+]
+
+
+class _FakeCursor:
+    def __init__(self, conn, unbuffered):
+        self.conn = conn
+        self.unbuffered = unbuffered
+        self._rows: list[dict] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        self.conn.queries.append(" ".join(sql.split()))
+        if "GROUP BY" in sql:
+            self._rows = [{"month_key": "2024-03", "total": len(_ROWS)}]
+        elif "FROM facturacfdi f" in sql and not self.unbuffered:
+            raise AssertionError("las facturas del mes deben leerse con cursor sin buffer")
+        elif self.unbuffered:
+            self.conn.month_params = params
+            self._rows = list(_ROWS)
+        else:
+            self._rows = [{"fcf_id": 1, "nombreImp": "IVA", "total": 16}]
+
+    def fetchmany(self, size):
+        self.conn.fetch_sizes.append(size)
+        out, self._rows = self._rows[:size], self._rows[size:]
+        return out
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def close(self):
+        pass
+
+
+class _FakeConn:
+    def __init__(self):
+        self.queries: list[str] = []
+        self.fetch_sizes: list[int] = []
+        self.month_params = None
+        self.closed = False
+
+    def cursor(self, cursorclass=None):
+        return _FakeCursor(self, unbuffered=cursorclass is not None)
+
+    def close(self):
+        self.closed = True
+
+
+class SicarFacturasExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        user = User.objects.create_user(username="contabilidad", password="x")
+        UserPermissions.objects.create(user=user, permissions={"cotizaciones": {"view": True}})
+        self.client.force_authenticate(user=user)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = CfdiStore(Path(tmp.name), 1024 * 1024)
+        self.export_conn = _FakeConn()
+        self.rendered: list[str] = []
+
+        def _render(html, **kwargs):
+            self.rendered.append(html)
+            return b"%PDF " + html.encode()
+
+        for target, kwargs in (
+            ("apps.cotizaciones.sicar_cfdi_store._store", {"new": self.store}),
+            ("apps.cotizaciones.sicar_views._sicar_db_config", {"side_effect": lambda: dict(_CFG)}),
+            ("apps.cotizaciones.sicar_views._connect_sicar", {"side_effect": lambda cfg, **kw: _FakeConn()}),
+            ("apps.cotizaciones.sicar_views.release_sicar_connection", {"side_effect": lambda conn: None}),
+            ("apps.cotizaciones.sicar_views.any_provider_configured", {"return_value": True}),
+            (
+                "apps.cotizaciones.sicar_cfdi_export._open_sicar_connection",
+                {"side_effect": lambda cfg, **kw: self.export_conn},
+            ),
+            (
+                "apps.cotizaciones.sicar_cfdi_export.generate_cfdi_pdf_html",
+                {"side_effect": lambda row, **kw: f"<p>{row['fcf_id']}:{len(kw['impuestos'])}</p>"},
+            ),
+            ("apps.cotizaciones.pdf_render.render_html_to_pdf", {"side_effect": _render}),
+        ):
+            patcher = patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _zip(self, response) -> zipfile.ZipFile:
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        return zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+
+    def test_streams_xml_and_pdf_for_month(self):
+        self.store.put_artifact(_uuid(2), PDF_KIND, b"%PDF guardado")
+        with patch.dict("os.environ", {"SICAR_EXPORT_CHUNK": "2"}):
+            res = self.client.get("/api/cotizaciones-sicar/facturas/exportar/", {"month": "2024-03"})
+            zf = self._zip(res)
+        names = zf.namelist()
+        self.assertEqual(len(names), 10)
+        self.assertEqual(sum(n.endswith(".xml") for n in names), 5)
+        self.assertEqual(len(self.rendered), 4)
+        self.assertIn("<p>1:1</p>", self.rendered)
+        self.assertEqual(self.export_conn.fetch_sizes[0], 2)
+        self.assertEqual(self.export_conn.month_params, (date(2024, 3, 1), date(2024, 4, 1)))
+        self.assertTrue(self.export_conn.closed)
+        self.assertIsNotNone(self.store.get_artifact(_uuid(3), PDF_KIND))
+        self.assertEqual(self.store.lookup(_CFG, 4)["serie_folio"], "A-4")
+
+    def test_xml_only(self):
+        res = self.client.get("/api/cotizaciones-sicar/facturas/exportar/", {"month": "2024-03", "pdf": "0"})
+        self.assertTrue(all(n.endswith(".xml") for n in self._zip(res).namelist()))
+        self.assertEqual(self.rendered, [])
+
+    def test_rejects_bad_or_empty_month(self):
+        res = self.client.get("/api/cotizaciones-sicar/facturas/exportar/", {"month": "marzo"})
+        self.assertEqual(res.status_code, 400)
+        res = self.client.get("/api/cotizaciones-sicar/facturas/exportar/", {"month": "2023-01"})
+        self.assertEqual(res.status_code, 404)
@@ -1,4 +1,9 @@
-"""Tests para carga de llave CSD (formato SAT DER encriptado)."""
+"""Tests para carga de llave CSD (formato SAT DER encriptado) y caché de firmantes."""
+import datetime
+from unittest.mock import patch
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.primitives.serialization import (
     BestAvailableEncryption,
@@ -6,9 +11,18 @@ from cryptography.hazmat.primitives.serialization import (
     NoEncryption,
     PrivateFormat,
 )
+from cryptography.x509.oid import NameOID
 from django.test import SimpleTestCase
 
-from apps.cotizaciones.sicar_cfdi_sign import _prepare_csd_private_key, normalize_csd_blob, normalize_csd_password
+from apps.cotizaciones import sicar_cfdi_sign
+from apps.cotizaciones.sicar_cfdi_sign import (
+    _prepare_csd_private_key,
+    get_csd_signer,
+    invalidate_csd_signers,
+    normalize_csd_blob,
+    normalize_csd_password,
+    sign_cfdi_xml,
+)
 
 
 class SicarCsdKeyTests(SimpleTestCase):
@@ -62,3 +76,64 @@ class SicarCsdKeyTests(SimpleTestCase):
         pem, passphrase = _prepare_csd_private_key(raw, "cualquier-cosa")
         self.assertIn(b"BEGIN RSA PRIVATE KEY", pem)
         self.assertEqual(passphrase, b"")
+
+
+def _csd_pair(password: bytes, serial: int = 30001000000500003416):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "EMISOR TEST")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(serial)
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=30))
+        .sign(key, hashes.SHA256())
+    )
+    key_der = key.private_bytes(Encoding.DER, PrivateFormat.PKCS8, BestAvailableEncryption(password))
+    return cert.public_bytes(Encoding.DER), key_der
+
+
+_XML = (
+    b'<cfdi:Comprobante xmlns:cfdi="http://www.sat.gob.mx/cfd/4" Version="4.0" Serie="A" Folio="1" '
+    b'Fecha="2024-03-01T10:00:00" SubTotal="100" Moneda="MXN" Total="116" TipoDeComprobante="I" '
+    b'Exportacion="01" LugarExpedicion="28219"/>'
+)
+
+
+class CsdSignerCacheTests(SimpleTestCase):
+    def setUp(self):
+        invalidate_csd_signers()
+        self.addCleanup(invalidate_csd_signers)
+        self.cer, self.key = _csd_pair(b"clave")
+
+    def test_reuses_signer_for_same_csd(self):
+        with patch("apps.cotizaciones.sicar_cfdi_sign._build_fiel", wraps=sicar_cfdi_sign._build_fiel) as build:
+            first, cached_first = get_csd_signer(self.cer, self.key, "clave")
+            second, cached_second = get_csd_signer(self.cer, self.key, "clave")
+        self.assertIs(first, second)
+        self.assertEqual((cached_first, cached_second, build.call_count), (False, True, 1))
+        self.assertEqual(first.no_certificado, "30001000000500003416")
+
+        # La XSLT del SAT incluye plantillas remotas; aquí basta una cadena fija.
+        with patch("apps.cotizaciones.sicar_cfdi_sign._cadena_transform", return_value=lambda root: "||4.0|A|1||"):
+            signed, meta = sign_cfdi_xml(_XML, self.cer, self.key, "clave", signer=second)
+        self.assertIn(b'NoCertificado="30001000000500003416"', signed)
+        self.assertEqual(meta["sello"], second.sello(meta["cadena_original"]))
+
+    def test_new_csd_replaces_previous(self):
+        old, _ = get_csd_signer(self.cer, self.key, "clave")
+        cer, key = _csd_pair(b"otra", serial=30001000000500009999)
+        new, cached = get_csd_signer(cer, key, "otra")
+        self.assertFalse(cached)
+        self.assertNotEqual(old.cache_key, new.cache_key)
+        self.assertFalse(get_csd_signer(self.cer, self.key, "clave")[1])
+
+    def test_expired_signer_is_rebuilt(self):
+        first, _ = get_csd_signer(self.cer, self.key, "clave")
+        with patch.dict("os.environ", {"SICAR_CSD_CACHE_SEC": "0"}):
+            again, cached = get_csd_signer(self.cer, self.key, "clave")
+        self.assertFalse(cached)
+        self.assertIsNot(first, again)
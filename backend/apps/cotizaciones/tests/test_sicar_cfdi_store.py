@@ -0,0 +1,138 @@
+"""Almacén local de CFDI timbrados: XML/PDF por UUID y descargas sin volver a SICAR."""
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.cotizaciones import sicar_cfdi_store
+from apps.cotizaciones.sicar_cfdi_store import PDF_KIND, CfdiStore, content_etag
+from apps.users.models import UserPermissions
+
+User = get_user_model()
+
+_CFG = {"host": "sicar.test", "port": 3306, "user": "u", "password": "p", "database": "sicar"}
+_UUID = "0F8B2C1E-1234-4ABC-9DEF-0123456789AB"
+_XML = b'<?xml version="1.0"?><cfdi:Comprobante xmlns:cfdi="http://www.sat.gob.mx/cfd/4"/>'
+
+
+def _tmp_store(test) -> CfdiStore:
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    return CfdiStore(Path(tmp.name), 1024 * 1024)
+
+
+class CfdiStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.store = _tmp_store(self)
+
+    def test_remember_indexes_by_fcf_id(self):
+        self.store.remember(_CFG, 7, uuid=_UUID, serie_folio="A-7", xml_bytes=_XML, qr_png=b"\x89PNG")
+        meta = self.store.lookup(_CFG, 7)
+        self.assertEqual(meta, {"uuid": _UUID.lower(), "serie_folio": "A-7"})
+        self.assertEqual(self.store.get_artifact(_UUID, "xml"), _XML)
+        self.assertEqual(self.store.get_artifact(_UUID, "qr"), b"\x89PNG")
+        self.assertIsNone(self.store.lookup({**_CFG, "database": "otra"}, 7))
+
+    def test_without_uuid_nothing_is_stored(self):
+        self.store.remember(_CFG, 8, uuid="", serie_folio="A-8", xml_bytes=_XML)
+        self.assertIsNone(self.store.lookup(_CFG, 8))
+
+    def test_pdf_requires_pdf_signature(self):
+        self.store.put_artifact(_UUID, PDF_KIND, b"<html>")
+        self.assertIsNone(self.store.get_artifact(_UUID, PDF_KIND))
+
+    def test_planted_xml_is_not_served(self):
+        self.store.put_artifact(_UUID, "xml", _XML)
+        path = self.store._path(f"{_UUID.lower()}-xml")
+        path.write_bytes(b"<cfdi:Comprobante Total='0'/>")
+        os.chmod(path, 0o666)
+        self.assertIsNone(self.store.get_artifact(_UUID, "xml"))
+
+    def test_default_dir_is_private_data_dir(self):
+        with patch.dict(os.environ, {"CFDI_STORE_DIR": ""}), patch.object(sicar_cfdi_store, "_store", None):
+            root = sicar_cfdi_store.get_cfdi_store().root
+        self.assertFalse(str(root).startswith(tempfile.gettempdir()))
+        self.assertEqual(root.parent.name, "var")
+
+
+class _FakeCursor:
+    def __init__(self):
+        self.calls = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        self.calls += 1
+
+    def fetchone(self):
+        return {"fcf_id": 7, "serieFolio": "A-7", "uuid": _UUID, "xml_cfdi": _XML, "cbb_png": b"\x89PNG"}
+
+    def fetchall(self):
+        return []
+
+
+class _FakeConn:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+
+class SicarCfdiDownloadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        user = User.objects.create_user(username="descarga_cfdi", password="x")
+        UserPermissions.objects.create(user=user, permissions={"cotizaciones": {"view": True}})
+        self.client.force_authenticate(user=user)
+        self.cursor = _FakeCursor()
+        self.renders = 0
+
+        def _render(html, **kwargs):
+            self.renders += 1
+            return b"%PDF-1.7 cfdi"
+
+        for target, kwargs in (
+            ("apps.cotizaciones.sicar_cfdi_store._store", {"new": _tmp_store(self)}),
+            ("apps.cotizaciones.sicar_views._sicar_db_config", {"side_effect": lambda: dict(_CFG)}),
+            ("apps.cotizaciones.sicar_views._connect_sicar", {"side_effect": lambda cfg, **kw: _FakeConn(self.cursor)}),
+            ("apps.cotizaciones.sicar_views.release_sicar_connection", {"side_effect": lambda conn: None}),
+            ("apps.cotizaciones.sicar_views.any_provider_configured", {"return_value": True}),
+            ("apps.cotizaciones.sicar_views.render_html_to_pdf", {"side_effect": _render}),
+        ):
+            patcher = patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_xml_second_download_skips_sicar(self):
+        first = self.client.get("/api/cotizaciones-sicar/facturas/7/xml/")
+        self.assertEqual(first.content, _XML)
+        queries = self.cursor.calls
+        second = self.client.get("/api/cotizaciones-sicar/facturas/7/xml/")
+        self.assertEqual(second.content, _XML)
+        self.assertEqual(self.cursor.calls, queries)
+        self.assertEqual(second["ETag"], content_etag(_XML))
+
+    def test_pdf_is_rendered_once_and_revalidates(self):
+        first = self.client.get("/api/cotizaciones-sicar/facturas/7/pdf/")
+        self.assertEqual(first.content, b"%PDF-1.7 cfdi")
+        queries = self.cursor.calls
+        again = self.client.get("/api/cotizaciones-sicar/facturas/7/pdf/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual((self.renders, self.cursor.calls), (1, queries))
+
+    def test_stamping_populates_store(self):
+        sicar_cfdi_store.remember_stamped_cfdi(_CFG, 9, uuid=_UUID, serie_folio="A-9", xml_bytes=_XML)
+        res = self.client.get("/api/cotizaciones-sicar/facturas/9/xml/")
+        self.assertEqual(res.content, _XML)
+        self.assertEqual(self.cursor.calls, 0)
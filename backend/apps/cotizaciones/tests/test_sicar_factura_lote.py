@@ -0,0 +1,192 @@
+"""Timbrado por lote: validación previa, folios apartados juntos y resultado por factura."""
+from __future__ import annotations
+
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.cotizaciones import sicar_factura_service as service
+from apps.cotizaciones.sicar_factura_service import (
+    SicarFacturaError,
+    SicarFacturaLoteError,
+    SicarFacturaLoteInterrumpido,
+    create_timbradas_lote,
+)
+from apps.users.models import UserPermissions
+
+User = get_user_model()
+
+_CFG = {"host": "sicar.test", "port": 3306, "user": "u", "password": "p", "database": "sicar"}
+
+
+def _payload(cli_id=1, total=100, **extra):
+    return {"cli_id": cli_id, "conceptos": [{"descripcion": "Póliza", "cantidad": 1, "precio_sin": total}], **extra}
+
+
+class _FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=()):
+        if sql in self.conn.fail_on:
+            raise ConnectionError("MySQL server has gone away")
+        self.conn.statements.append(sql)
+
+
+class _FakeConn:
+    def __init__(self):
+        self.statements: list[str] = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.fail_on: set[str] = set()
+        self.fail_commit = False
+
+    def begin(self):
+        pass
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+    def commit(self):
+        if self.fail_commit:
+            raise ConnectionError("Lost connection to MySQL server during query")
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class CreateTimbradasLoteTests(SimpleTestCase):
+    def setUp(self):
+        self.conn = _FakeConn()
+        self.reserved: list[tuple[int, int]] = []
+        self.inserted: list[int] = []
+        self.issued: list[int] = []
+        self.slow_pac = threading.Event()
+
+        def _reserve(cursor, scf_id, count):
+            self.reserved.append((scf_id, count))
+            return "A", [(10 + i, f"A-{10 + i}") for i in range(count)]
+
+        def _issue(draft, **kwargs):
+            self.issued.append(draft.folio)
+            if draft.payload.get("lento"):
+                self.slow_pac.wait(0.3)
+            if draft.payload.get("falla_pac"):
+                raise SicarFacturaError("PAC rechazó el CFDI")
+            draft.stamp_meta = {"uuid": f"uuid-{draft.folio}"}
+
+        def _insert(cursor, draft, **kwargs):
+            if draft.payload.get("falla_db"):
+                raise RuntimeError("deadlock")
+            self.inserted.append(draft.folio)
+            return {"fcf_id": 500 + draft.folio, "uuid": draft.stamp_meta["uuid"], "folio": draft.folio}
+
+        for name, kwargs in (
+            ("_sicar_db_config", {"return_value": dict(_CFG)}),
+            ("connect_sicar_exclusive", {"return_value": self.conn}),
+            ("close_sicar_connection", {}),
+            ("_load_empresa", {"return_value": {"rfc": "EKU9003173C9", "claveApi": "t"}}),
+            ("_load_csd", {"return_value": {"sdi_id": 1}}),
+            ("_load_cliente", {"side_effect": lambda cursor, cli_id: {"cli_id": cli_id, "rfc": "XAXX010101000"}}),
+            ("_reserve_folios", {"side_effect": _reserve}),
+            ("_csd_signer", {"return_value": (object(), True)}),
+            ("_issue_cfdi", {"side_effect": _issue}),
+            ("_insert_factura", {"side_effect": _insert}),
+            ("invalidate_facturas_cache", {}),
+            ("note_folios_used", {}),
+            ("remember_stamped_cfdi", {}),
+        ):
+            patcher = patch.object(service, name, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_invalid_payloads_stop_the_batch_before_sicar(self):
+        with self.assertRaises(SicarFacturaLoteError) as ctx:
+            create_timbradas_lote([_payload(), {"cli_id": 0, "conceptos": []}, "x"])
+        self.assertEqual([e["index"] for e in ctx.exception.errores], [1, 2])
+        self.assertFalse(service.connect_sicar_exclusive.called)
+
+    def test_default_cap_keeps_series_lock_short(self):
+        with self.assertRaises(SicarFacturaLoteError) as ctx:
+            create_timbradas_lote([_payload() for _ in range(11)])
+        self.assertIn("10", str(ctx.exception))
+        self.assertFalse(service.connect_sicar_exclusive.called)
+
+    def test_reserves_folios_once_and_reports_each_invoice(self):
+        result = create_timbradas_lote([_payload(), _payload(falla_pac=True), _payload(cli_id=2), _payload()])
+        self.assertEqual(self.reserved, [(2, 4)])
+        self.assertEqual(self.inserted, [10, 12, 13])
+        self.assertEqual((result["total"], result["timbradas"], result["fallidas"]), (4, 3, 1))
+        ok = [r["ok"] for r in result["resultados"]]
+        self.assertEqual(ok, [True, False, True, True])
+        self.assertIn("PAC", result["resultados"][1]["detail"])
+        self.assertEqual(self.conn.commits, 1)
+        self.assertEqual(service._load_cliente.call_count, 2)
+        service.invalidate_facturas_cache.assert_called_once()
+        service.note_folios_used.assert_called_once_with(_CFG, [(2, 10), (2, 12), (2, 13)])
+        self.assertEqual(service.remember_stamped_cfdi.call_count, 3)
+
+    def test_failed_insert_rolls_back_only_that_invoice(self):
+        result = create_timbradas_lote([_payload(falla_db=True), _payload()])
+        self.assertEqual(self.inserted, [11])
+        self.assertIn("ROLLBACK TO SAVEPOINT factura_lote", self.conn.statements)
+        self.assertIn("uuid-10", result["resultados"][0]["detail"])
+        self.assertTrue(result["resultados"][1]["ok"])
+
+    def test_failed_commit_reports_stamped_uuids(self):
+        self.conn.fail_commit = True
+        with self.assertRaises(SicarFacturaLoteInterrumpido) as ctx:
+            create_timbradas_lote([_payload(), _payload(falla_pac=True), _payload()])
+        self.assertEqual([e["uuid"] for e in ctx.exception.errores], ["uuid-10", "uuid-12"])
+        self.assertEqual(ctx.exception.errores[1]["serie_folio"], "A-12")
+        self.assertEqual(self.conn.rollbacks, 1)
+        service.invalidate_facturas_cache.assert_not_called()
+
+    def test_lost_connection_stops_pending_stamps(self):
+        self.conn.fail_on.add("ROLLBACK TO SAVEPOINT factura_lote")
+        with patch.dict("os.environ", {"SICAR_LOTE_WORKERS": "1"}):
+            with self.assertRaises(SicarFacturaLoteInterrumpido) as ctx:
+                create_timbradas_lote([_payload(falla_db=True), _payload(lento=True), _payload(), _payload()])
+        # 11 tarda en el PAC con un solo hilo: 12 y 13 seguían en cola y se cancelan.
+        self.assertNotIn(12, self.issued)
+        self.assertNotIn(13, self.issued)
+        self.assertEqual([e["uuid"] for e in ctx.exception.errores], [f"uuid-{folio}" for folio in self.issued])
+
+    def test_series_get_their_own_folios(self):
+        create_timbradas_lote([_payload(scf_id=2), _payload(scf_id=3), _payload(scf_id=2)])
+        self.assertEqual(sorted(self.reserved), [(2, 2), (3, 1)])
+
+
+class SicarFacturasLoteViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        user = User.objects.create_user(username="polizas", password="x")
+        UserPermissions.objects.create(user=user, permissions={"cotizaciones": {"view": True, "create": True}})
+        self.client.force_authenticate(user=user)
+        patcher = patch("apps.cotizaciones.sicar_views._sicar_db_config", return_value=dict(_CFG))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_invalid_batch_returns_errors_per_index(self):
+        res = self.client.post(
+            "/api/cotizaciones-sicar/facturas/lote/", {"facturas": [_payload(), {"cli_id": 3}]}, format="json"
+        )
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.data["errores"][0]["index"], 1)
+
+    def test_interrupted_batch_returns_stamped_uuids(self):
+        exc = SicarFacturaLoteInterrumpido("lote interrumpido", [{"index": 0, "uuid": "uuid-10"}])
+        with patch("apps.cotizaciones.sicar_views.create_timbradas_lote", side_effect=exc):
+            res = self.client.post("/api/cotizaciones-sicar/facturas/lote/", {"facturas": []}, format="json")
+        self.assertEqual(res.status_code, 502)
+        self.assertEqual(res.data["errores"][0]["uuid"], "uuid-10")
+
+    def test_partial_batch_is_multi_status(self):
+        outcome = {"total": 2, "timbradas": 1, "fallidas": 1, "resultados": []}
+        with patch("apps.cotizaciones.sicar_views.create_timbradas_lote", return_value=outcome):
+            res = self.client.post("/api/cotizaciones-sicar/facturas/lote/", {"facturas": []}, format="json")
+        self.assertEqual(res.status_code, 207)
@@ -0,0 +1,135 @@
+"""Listado de facturas SICAR: rango de mes, cursor keyset, búsqueda exacta y caché de meses."""
+from __future__ import annotations
+
+from datetime import date, datetime
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.cotizaciones.sicar_facturas_cache import invalidate_facturas_cache
+from apps.cotizaciones.sicar_views import _decode_list_cursor, _encode_list_cursor, _month_filter_sql
+from apps.users.models import UserPermissions
+
+User = get_user_model()
+
+_CFG = {"host": "sicar.test", "port": 3306, "user": "u", "password": "p", "database": "sicar"}
+_UUID = "0f8b2c1e-1234-4abc-9def-0123456789ab"
+
+
+class _FakeCursor:
+    """Responde según el SQL; guarda cada consulta para revisar qué se ejecutó."""
+
+    def __init__(self, counts=None):
+        self.queries: list[tuple[str, tuple]] = []
+        self.counts = counts or {}
+        self._result: list[dict] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        self.queries.append((sql, tuple(params or ())))
+        if "GROUP BY" in sql:
+            self._result = [{"month_key": "2024-03", "total": 3}, {"month_key": "2024-02", "total": 7}]
+        elif sql.startswith("SELECT COUNT(*)"):
+            key = next((k for k in self.counts if k in sql), None)
+            self._result = [{"total": self.counts.get(key, 0)}]
+        else:
+            limit = params[-2]
+            rows = [
+                {"fcf_id": 30 - i, "fecha": datetime(2024, 3, 20 - i, 10, 0), "serie_folio": f"A{30 - i}"}
+                for i in range(3)
+            ]
+            self._result = rows[:limit]
+
+    def fetchall(self):
+        return self._result
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+
+class _FakeConn:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+
+class SicarFacturasListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        user = User.objects.create_user(username="lista_facturas", password="x")
+        UserPermissions.objects.create(user=user, permissions={"cotizaciones": {"view": True}})
+        self.client.force_authenticate(user=user)
+        self.cursor = _FakeCursor()
+        for target, value in (
+            ("_sicar_db_config", lambda: dict(_CFG)),
+            ("_connect_sicar", lambda cfg: _FakeConn(self.cursor)),
+            ("release_sicar_connection", lambda conn: None),
+        ):
+            patcher = patch(f"apps.cotizaciones.sicar_views.{target}", side_effect=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _sql(self, fragment):
+        return [q for q in self.cursor.queries if fragment in q[0]]
+
+    def test_month_filter_uses_date_range(self):
+        sql, params = _month_filter_sql("2024-12")
+        self.assertEqual(sql.strip(), "fecha >= %s AND fecha < %s")
+        self.assertEqual(params, (date(2024, 12, 1), date(2025, 1, 1)))
+        self.assertEqual(_month_filter_sql("2024-13"), ("", ()))
+
+    def test_default_month_and_total_come_from_buckets(self):
+        res = self.client.get("/api/cotizaciones-sicar/facturas/", {"page_size": 2})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["month"], "2024-03")
+        self.assertEqual(res.data["pagination"]["total"], 3)
+        self.assertFalse(self._sql("SELECT COUNT(*)"))
+        self.assertEqual(len(res.data["rows"]), 2)
+        self.assertTrue(res.data["pagination"]["next_cursor"])
+
+    def test_cursor_continues_after_last_row(self):
+        first = self.client.get("/api/cotizaciones-sicar/facturas/", {"page_size": 2})
+        token = first.data["pagination"]["next_cursor"]
+        self.assertEqual(_decode_list_cursor(token), ("2024-03-19 10:00:00", 29))
+        self.client.get("/api/cotizaciones-sicar/facturas/", {"page_size": 2, "cursor": token})
+        sql, params = self.cursor.queries[-1]
+        self.assertIn("fcf_id < %s", sql)
+        self.assertEqual(params[-5:], ("2024-03-19 10:00:00", "2024-03-19 10:00:00", 29, 3, 0))
+
+    def test_invalid_cursor_is_rejected(self):
+        res = self.client.get("/api/cotizaciones-sicar/facturas/", {"cursor": "no-es-cursor"})
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(_decode_list_cursor(_encode_list_cursor("2024-01-02", 5)), ("2024-01-02", 5))
+
+    def test_uuid_search_uses_exact_match(self):
+        self.cursor.counts = {"uuid = %s": 1}
+        res = self.client.get("/api/cotizaciones-sicar/facturas/", {"q": _UUID})
+        self.assertEqual(res.data["pagination"]["total"], 1)
+        self.assertFalse(self._sql("LIKE"))
+
+    def test_search_falls_back_to_like(self):
+        self.cursor.counts = {"LIKE": 4}
+        res = self.client.get("/api/cotizaciones-sicar/facturas/", {"q": "123"})
+        self.assertEqual(res.data["pagination"]["total"], 4)
+        self.assertTrue(self._sql("folio = %s"))
+        self.assertTrue(self._sql("LIKE"))
+
+    def test_buckets_are_cached_until_invalidated(self):
+        self.client.get("/api/cotizaciones-sicar/facturas/")
+        self.client.get("/api/cotizaciones-sicar/facturas/")
+        self.assertEqual(len(self._sql("GROUP BY")), 1)
+        invalidate_facturas_cache()
+        self.client.get("/api/cotizaciones-sicar/facturas/")
+        self.assertEqual(len(self._sql("GROUP BY")), 2)
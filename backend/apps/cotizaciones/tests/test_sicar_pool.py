@@ -0,0 +1,150 @@
+"""Pools de conexiones SICAR: reutilización, límites, chequeos tras inactividad y estadísticas."""
+from __future__ import annotations
+
+import os
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.cotizaciones import sicar_db
+from apps.cotizaciones.sicar_db import SicarPoolExhausted
+
+User = get_user_model()
+
+_CFG = {"host": "sicar.test", "port": 3306, "user": "u", "password": "p", "database": "sicar"}
+
+
+class _FakeConn:
+    def __init__(self, autocommit):
+        self.autocommit_mode = autocommit
+        self.open = True
+        self.server_status = 0
+        self.pings = 0
+        self.rollbacks = 0
+        self.ping_fails = False
+        self._read_timeout = None
+        self._write_timeout = None
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if self.ping_fails:
+            raise OSError("socket cerrado")
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.server_status = 0
+
+    def close(self):
+        self.open = False
+
+
+class SicarPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.env = patch.dict(
+            os.environ,
+            {"SICAR_DB_POOL_SIZE": "2", "SICAR_DB_POOL_WAIT_SEC": "0", "SICAR_DB_POOL_CHECK_SEC": "30"},
+        )
+        self.env.start()
+        sicar_db.reset_sicar_pools()
+        self.opened = []
+
+        def _open(cfg, read_timeout=10, *, autocommit=False):
+            conn = _FakeConn(autocommit)
+            self.opened.append(conn)
+            return conn
+
+        self.open_patch = patch.object(sicar_db, "_open_sicar_connection", side_effect=_open)
+        self.open_patch.start()
+
+    def tearDown(self):
+        sicar_db.reset_sicar_pools()
+        self.open_patch.stop()
+        self.env.stop()
+
+    def test_reuses_connection_without_ping(self):
+        first = sicar_db._connect_sicar(_CFG)
+        sicar_db.release_sicar_connection(first)
+        second = sicar_db._connect_sicar(_CFG, read_timeout=20)
+        self.assertIs(first, second)
+        self.assertEqual(first.pings, 0)
+        self.assertEqual(second._read_timeout, 20)
+        self.assertTrue(first.autocommit_mode)
+        stats = sicar_db.sicar_pool_stats()["pools"][0]
+        self.assertEqual((stats["opened"], stats["reused"], stats["in_use"]), (1, 1, 1))
+
+    def test_pool_is_bounded(self):
+        held = [sicar_db._connect_sicar(_CFG), sicar_db._connect_sicar(_CFG)]
+        with self.assertRaises(SicarPoolExhausted):
+            sicar_db._connect_sicar(_CFG)
+        self.assertIn("ocupado", sicar_db._sicar_error_detail(SicarPoolExhausted(2003, "x"), _CFG))
+        for conn in held:
+            sicar_db.release_sicar_connection(conn)
+        self.assertEqual(sicar_db.sicar_pool_stats()["pools"][0]["timeouts"], 1)
+
+    def test_waiter_gets_released_connection(self):
+        with patch.dict(os.environ, {"SICAR_DB_POOL_SIZE": "1", "SICAR_DB_POOL_WAIT_SEC": "5"}):
+            sicar_db.reset_sicar_pools()
+            held = sicar_db._connect_sicar(_CFG)
+            got = []
+            waiter = threading.Thread(target=lambda: got.append(sicar_db._connect_sicar(_CFG)))
+            waiter.start()
+            sicar_db.release_sicar_connection(held)
+            waiter.join(5)
+        self.assertEqual(got, [held])
+        self.assertEqual(len(self.opened), 1)
+
+    def test_idle_connection_is_checked_and_replaced(self):
+        conn = sicar_db._connect_sicar(_CFG)
+        sicar_db.release_sicar_connection(conn)
+        conn.ping_fails = True
+        pool = sicar_db._get_pool(_CFG, write=False)
+        pool.check_after_s = -1
+        fresh = sicar_db._connect_sicar(_CFG)
+        self.assertIsNot(fresh, conn)
+        self.assertFalse(conn.open)
+        self.assertEqual(pool.stats()["health_failures"], 1)
+
+    def test_expired_connection_is_closed(self):
+        conn = sicar_db._connect_sicar(_CFG)
+        sicar_db.release_sicar_connection(conn)
+        sicar_db._get_pool(_CFG, write=False).idle_timeout_s = -1
+        fresh = sicar_db._connect_sicar(_CFG)
+        self.assertIsNot(fresh, conn)
+        self.assertFalse(conn.open)
+
+    def test_write_pool_is_separate_and_rolls_back_open_transaction(self):
+        read = sicar_db._connect_sicar(_CFG)
+        write = sicar_db.connect_sicar_exclusive(_CFG, read_timeout=60)
+        self.assertIsNot(read, write)
+        self.assertFalse(write.autocommit_mode)
+        write.server_status = 1
+        sicar_db.close_sicar_connection(write)
+        self.assertEqual(write.rollbacks, 1)
+        self.assertIs(sicar_db.connect_sicar_exclusive(_CFG), write)
+        names = sorted(p["name"] for p in sicar_db.sicar_pool_stats()["pools"])
+        self.assertEqual(names, ["escritura", "lectura"])
+
+    def test_closed_connection_is_not_pooled(self):
+        conn = sicar_db._connect_sicar(_CFG)
+        conn.open = False
+        sicar_db.release_sicar_connection(conn)
+        self.assertIsNot(sicar_db._connect_sicar(_CFG), conn)
+
+
+class SicarPoolEstadoViewTests(TestCase):
+    def test_requires_admin(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="op_sicar", password="x"))
+        res = client.get("/api/cotizaciones-sicar/pool/")
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_admin_gets_stats(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="adm_sicar", password="x", is_staff=True))
+        res = client.get("/api/cotizaciones-sicar/pool/")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("pools", res.data)
@@ -9,17 +9,32 @@ from .sicar_views import (
     SicarFacturaCatalogosView,
     SicarFacturaDetalleView,
     SicarFacturaPdfView,
+    SicarFacturasExportView,
     SicarFacturasListView,
+    SicarFacturasLoteView,
     SicarFacturaXmlView,
+    SicarPoolEstadoView,
 )
-from .views import CotizacionViewSet
+from .views import CotizacionViewSet, PdfMotorEstadoView
 
 router = DefaultRouter()
 router.register(r'cotizaciones', CotizacionViewSet, basename='cotizacion')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('cotizaciones-pdf/motor/', PdfMotorEstadoView.as_view(), name='cotizaciones-pdf-motor'),
+    path('cotizaciones-sicar/pool/', SicarPoolEstadoView.as_view(), name='cotizaciones-sicar-pool'),
     path('cotizaciones-sicar/facturas/', SicarFacturasListView.as_view(), name='cotizaciones-sicar-facturas'),
+    path(
+        'cotizaciones-sicar/facturas/lote/',
+        SicarFacturasLoteView.as_view(),
+        name='cotizaciones-sicar-facturas-lote',
+    ),
+    path(
+        'cotizaciones-sicar/facturas/exportar/',
+        SicarFacturasExportView.as_view(),
+        name='cotizaciones-sicar-facturas-exportar',
+    ),
     path('cotizaciones-sicar/catalogos/', SicarFacturaCatalogosView.as_view(), name='cotizaciones-sicar-catalogos'),
     path('cotizaciones-sicar/clientes/', SicarClientesSearchView.as_view(), name='cotizaciones-sicar-clientes'),
     path(
@@ -14,10 +14,12 @@ from PIL import Image as PILImage
 from rest_framework import filters, viewsets
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from apps.common.document_folio import FOLIO_SERIE_COT, format_document_folio
+from apps.common.pdf_batch import BatchDoc, batch_max_docs, batch_pdf_response, parse_id_list
 from apps.common.pdf_html import subtotal_iva_display_split as _subtotal_iva_display_split
 from apps.common.pdf_images import safe_http_image_bytes as _safe_http_image_bytes
 from apps.ordenes.email_pdf import (
@@ -35,6 +37,8 @@ from apps.users.permissions import CotizacionesSendPdfPermission, ModulePermissi
 from .categorias_productos import categorias_nombres_por_id, normalize_categorias_productos
 from .email_pdf import build_cotizacion_email_body, build_cotizacion_email_subject
 from .models import Cotizacion
+from .pdf_browser_pool import browser_pool_stats
+from .pdf_cache import apply_pdf_etag, not_modified_response, pdf_cache_key
 from .pdf_render import PdfRenderError, any_provider_configured, render_html_to_pdf
 from .serializers import CotizacionSerializer
 
@@ -79,6 +83,11 @@ def _aggregate_month_stats(queryset):
     }
 
 
+def _cotizacion_pdf_filename(cotizacion: Cotizacion) -> str:
+    idx = format_document_folio(FOLIO_SERIE_COT, getattr(cotizacion, "idx", None) or cotizacion.id)
+    return f"Cotizacion_{idx}.pdf"
+
+
 class CotizacionPagination(PageNumberPagination):
     page_size = 25
     page_size_query_param = "page_size"
@@ -630,6 +639,11 @@ class CotizacionViewSet(viewsets.ModelViewSet):
                 response["Content-Disposition"] = f'inline; filename="Cotizacion_{idx}.html"'
             return response
 
+        cache_key = pdf_cache_key(html, size="A4", landscape=False)
+        not_modified = not_modified_response(request, cache_key)
+        if not_modified is not None:
+            return not_modified
+
         try:
             pdf_bytes = render_html_to_pdf(html, size="A4", landscape=False, timeout=90)
         except PdfRenderError as e:
@@ -638,7 +652,46 @@ class CotizacionViewSet(viewsets.ModelViewSet):
 
         response = HttpResponse(pdf_bytes, content_type="application/pdf")
         response["Content-Disposition"] = f'inline; filename="{filename}"'
-        return response
+        return apply_pdf_etag(response, cache_key)
+
+    @action(detail=False, methods=['get'], url_path='pdf-lote')
+    def pdf_lote(self, request):
+        """Varias cotizaciones en un ZIP (o un PDF unido con ``formato=pdf``).
+
+        Query: ``ids=1,2,3`` o ``mes=YYYY-MM``. Los que fallan se listan en
+        ``errores.txt`` dentro del ZIP sin cortar la descarga.
+        """
+        from .pdf_opciones import parse_pdf_opciones_from_cotizacion
+
+        params = request.query_params
+        ids = parse_id_list(params.get('ids') or '')
+        mes = (params.get('mes') or '').strip()
+        queryset = self.get_queryset()
+        if ids:
+            queryset = queryset.filter(pk__in=ids)
+            basename = 'Cotizaciones'
+        else:
+            parsed = _parse_year_month(mes)
+            if not parsed:
+                return Response(
+                    {"detail": "Indica ids=1,2,3 o mes=YYYY-MM."},
+                    status=400,
+                )
+            queryset = queryset.filter(fecha__year=parsed[0], fecha__month=parsed[1])
+            basename = f'Cotizaciones_{mes}'
+        cotizaciones = list(queryset[: batch_max_docs() + 1])
+        if ids:
+            orden_ids = {pk: i for i, pk in enumerate(ids)}
+            cotizaciones.sort(key=lambda c: orden_ids.get(c.pk, 0))
+
+        def _builder(cotizacion):
+            return lambda: self._generate_pdf_html(
+                cotizacion, pdf_opciones=parse_pdf_opciones_from_cotizacion(cotizacion)
+            )
+
+        docs = [BatchDoc(_cotizacion_pdf_filename(c), _builder(c)) for c in cotizaciones]
+        formato = (params.get('formato') or 'zip').strip().lower()
+        return batch_pdf_response(docs, basename=basename, formato=formato)
 
     @action(
         detail=True,
@@ -855,3 +908,12 @@ class CotizacionViewSet(viewsets.ModelViewSet):
         response = HttpResponse(pdf_bytes, content_type="application/pdf")
         response["Content-Disposition"] = 'inline; filename="Cotizacion_Preview.pdf"'
         return response
+
+
+class PdfMotorEstadoView(APIView):
+    """GET métricas del pool Chromium del worker que atiende (solo admin)."""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(browser_pool_stats())
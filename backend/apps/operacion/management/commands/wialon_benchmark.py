@@ -0,0 +1,174 @@
+"""Mide ``wialon_client`` contra el simulador local de Wialon (sin tocar la API real).
+
+Para cada tamaño de flota levanta ``WialonSimulator`` y toma, por función:
+frío (cachés vacías), caliente (mediana de ``--rounds`` lecturas con caché),
+llamadas HTTP del arranque en frío y bytes del resultado. Al final de cada
+tamaño reporta la memoria total de las cachés del proceso.
+
+Uso:
+  python manage.py wialon_benchmark
+  python manage.py wialon_benchmark --sizes 1000,10000 --latency-ms 40 --rounds 5
+  python manage.py wialon_benchmark --sizes 50000 --trace-memory --json
+"""
+from __future__ import annotations
+
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.operacion import wialon_cache, wialon_client, wialon_metrics
+from apps.operacion.wialon_records import UserRecord, deep_sizeof
+from apps.operacion.wialon_simulator import FleetSpec, SyntheticFleet, WialonSimulator, use_simulator
+
+
+def _parse_sizes(raw: str) -> list[int]:
+    try:
+        sizes = [int(part) for part in raw.split(",") if part.strip()]
+    except ValueError as exc:
+        raise CommandError("--sizes debe ser una lista de enteros separada por comas.") from exc
+    if not sizes or any(size < 1 for size in sizes):
+        raise CommandError("--sizes debe tener al menos un tamaño positivo.")
+    return sizes
+
+
+def _api_calls() -> int:
+    return sum(row["count"] for row in wialon_metrics.metrics_snapshot()["calls"].values())
+
+
+def _raw_users() -> list[dict[str, Any]]:
+    sid = wialon_client.get_session()
+    items = wialon_client._search_items(
+        sid, items_type="user", prop_name="sys_name", flags=wialon_client.USER_FLAGS, force=0
+    )
+    return [UserRecord.from_item(item) for item in items]
+
+
+def _cold_users_payload() -> Callable[[], Any]:
+    """Prepara sesión y usuarios crudos fuera del tiempo medido; mide solo ``_build_users_payload``."""
+    wialon_client.invalidate_wialon_cache()
+    users = _raw_users()
+    sid = wialon_client.get_session()
+    return lambda: wialon_client._build_users_payload(sid, users)
+
+
+def _cold_default(fn: Callable[[], Any]) -> Callable[[], Callable[[], Any]]:
+    def _prepare() -> Callable[[], Any]:
+        wialon_client.invalidate_wialon_cache()
+        return fn
+
+    return _prepare
+
+
+# (nombre, prepara y devuelve la función del arranque en frío, lectura en caliente)
+_TARGETS: list[tuple[str, Callable[[], Callable[[], Any]], Callable[[], Any]]] = [
+    ("fetch_users", _cold_default(wialon_client.fetch_users), wialon_client.fetch_users),
+    ("_build_users_payload", _cold_users_payload, None),
+    (
+        "fetch_units_search_index",
+        _cold_default(wialon_client.fetch_units_search_index),
+        wialon_client.fetch_units_search_index,
+    ),
+]
+
+
+class Command(BaseCommand):
+    help = "Benchmark de wialon_client (frío/caliente, llamadas y memoria) contra un Wialon simulado."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="1000,10000,50000",
+            help="Unidades por flota, separadas por comas (default 1000,10000,50000).",
+        )
+        parser.add_argument(
+            "--units-per-user",
+            type=int,
+            default=10,
+            help="Unidades por usuario; define cuántos usuarios tiene cada flota (default 10).",
+        )
+        parser.add_argument("--latency-ms", type=float, default=0.0, help="Latencia por petición HTTP.")
+        parser.add_argument("--jitter-ms", type=float, default=0.0, help="Variación aleatoria extra por petición.")
+        parser.add_argument("--rounds", type=int, default=3, help="Lecturas en caliente por función (default 3).")
+        parser.add_argument("--seed", type=int, default=1, help="Semilla de la flota sintética.")
+        parser.add_argument(
+            "--trace-memory",
+            action="store_true",
+            help="Pico de memoria del arranque en frío con tracemalloc (más lento).",
+        )
+        parser.add_argument("--json", action="store_true", help="Salida en JSON.")
+
+    def handle(self, *args, **options):
+        sizes = _parse_sizes(str(options["sizes"]))
+        per_user = max(1, int(options["units_per_user"]))
+        rounds = max(1, int(options["rounds"]))
+        report = []
+        for size in sizes:
+            spec = FleetSpec(users=max(1, size // per_user), units=size, seed=int(options["seed"]))
+            fleet = SyntheticFleet(spec)
+            sim = WialonSimulator(fleet, latency_ms=options["latency_ms"], jitter_ms=options["jitter_ms"])
+            with sim, use_simulator(sim):
+                row = self._run_size(spec, rounds=rounds, trace=bool(options["trace_memory"]))
+            report.append(row)
+            if not options["json"]:
+                self._print_size(row)
+        if options["json"]:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+
+    def _run_size(self, spec: FleetSpec, *, rounds: int, trace: bool) -> dict[str, Any]:
+        results = []
+        for name, prepare, warm in _TARGETS:
+            fn = prepare()
+            wialon_metrics.reset_metrics()
+            gc.collect()
+            if trace:
+                tracemalloc.start()
+            started = time.perf_counter()
+            try:
+                value = fn()
+                cold_ms = (time.perf_counter() - started) * 1000
+                peak = tracemalloc.get_traced_memory()[1] if trace else None
+            except wialon_client.WialonError as exc:
+                raise CommandError(f"{name} falló contra el simulador: {exc}") from exc
+            finally:
+                if trace:
+                    tracemalloc.stop()
+            row: dict[str, Any] = {
+                "function": name,
+                "cold_ms": round(cold_ms, 1),
+                "cold_api_calls": _api_calls(),
+                "rows": len(value),
+                "result_bytes": deep_sizeof(value),
+                "warm_ms": None,
+            }
+            if peak is not None:
+                row["cold_peak_bytes"] = peak
+            if warm is not None:
+                timings = []
+                for _ in range(rounds):
+                    started = time.perf_counter()
+                    warm()
+                    timings.append((time.perf_counter() - started) * 1000)
+                row["warm_ms"] = round(statistics.median(timings), 3)
+            results.append(row)
+        return {
+            "units": spec.units,
+            "users": spec.users,
+            "cache_bytes": wialon_cache.memory_report()["total_bytes"],
+            "functions": results,
+        }
+
+    def _print_size(self, row: dict[str, Any]) -> None:
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{row['units']} unidades / {row['users']} usuarios"))
+        for fn in row["functions"]:
+            warm = f"{fn['warm_ms']} ms" if fn["warm_ms"] is not None else "—"
+            peak = f", pico {fn['cold_peak_bytes'] / 1e6:.1f} MB" if "cold_peak_bytes" in fn else ""
+            self.stdout.write(
+                f"  {fn['function']:<26} frío {fn['cold_ms']:>9} ms ({fn['cold_api_calls']} llamadas)"
+                f"  caliente {warm:>10}  {fn['rows']} filas, {fn['result_bytes'] / 1e6:.1f} MB{peak}"
+            )
+        self.stdout.write(f"  cachés del proceso: {row['cache_bytes'] / 1e6:.1f} MB")
@@ -0,0 +1,37 @@
+"""Reconstruye las cachés Wialon y escribe el volcado de arranque en caliente.
+
+Pensado para correr en el build/release (mismo servidor que los workers), así el
+primer usuario tras un deploy no espera login + usuarios + índice de unidades.
+
+Uso:
+  python manage.py wialon_prewarm
+"""
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.operacion.wialon_cache import snapshot_path
+from apps.operacion.wialon_client import WialonError, prewarm_wialon_cache
+
+
+class Command(BaseCommand):
+    help = "Precalienta las cachés Wialon y guarda el volcado que cargan los workers al arrancar."
+
+    def handle(self, *args, **options):
+        path = snapshot_path()
+        if path is None:
+            raise CommandError("WIALON_SNAPSHOT_PATH=off: el volcado está desactivado.")
+        try:
+            result = prewarm_wialon_cache()
+        except WialonError as exc:
+            raise CommandError(str(exc)) from exc
+
+        if not result.get("slots"):
+            raise CommandError(f"No se pudo escribir el volcado en {path}.")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Volcado Wialon en {path}: {result['slots']} caché(s), "
+                f"{result['users']} usuario(s), {result['units']} unidad(es), "
+                f"{result['hw_types']} tipo(s) de equipo en {result['elapsed_sec']}s."
+            )
+        )
@@ -6,6 +6,8 @@ Uso:
   python manage.py wialon_purge_blocked
   python manage.py wialon_purge_blocked --days=35
   python manage.py wialon_purge_blocked --dry-run
+  python manage.py wialon_purge_blocked --job          # con avance guardado (WialonPurgeJob)
+  python manage.py wialon_purge_blocked --resume <id>  # reanuda un trabajo interrumpido
 """
 from __future__ import annotations
 
@@ -36,6 +38,16 @@ class Command(BaseCommand):
             action="store_true",
             help="Solo lista candidatos; no desactiva ni elimina.",
         )
+        parser.add_argument(
+            "--job",
+            action="store_true",
+            help="Registra el avance por cuenta en un WialonPurgeJob (reanudable con --resume).",
+        )
+        parser.add_argument(
+            "--resume",
+            metavar="JOB_ID",
+            help="Reanuda un trabajo de purga interrumpido con las cuentas pendientes.",
+        )
 
     def handle(self, *args, **options):
         days = int(options["days"])
@@ -43,14 +55,18 @@ class Command(BaseCommand):
         if days < 1:
             raise CommandError("--days debe ser al menos 1.")
 
-        try:
-            result = purge_blocked_accounts(days=days, dry_run=dry_run)
-        except WialonError as exc:
-            raise CommandError(str(exc)) from exc
+        if options.get("job") or options.get("resume"):
+            result = self._run_job(options.get("resume"), days=days, dry_run=dry_run)
+        else:
+            try:
+                result = purge_blocked_accounts(days=days, dry_run=dry_run)
+            except WialonError as exc:
+                raise CommandError(str(exc)) from exc
 
         purged = result.get("purged_count", 0)
         skipped = result.get("skipped_count", 0)
         errors = result.get("error_count", 0)
+        dry_run = bool(result.get("dry_run", dry_run))
         mode = "dry-run" if dry_run else "aplicado"
         self.stdout.write(
             self.style.SUCCESS(
@@ -69,3 +85,33 @@ class Command(BaseCommand):
                     f"  ! user={err.get('wialon_id')} step={err.get('step')}: {err.get('detail')}"
                 )
             )
+
+    def _run_job(self, resume_id, *, days: int, dry_run: bool) -> dict:
+        from django.core.exceptions import ValidationError
+
+        from apps.operacion.models import WialonPurgeJob
+        from apps.operacion.wialon_purge_jobs import (
+            create_purge_job,
+            purge_job_payload,
+            resume_purge_job,
+            run_purge_job,
+        )
+
+        if resume_id:
+            try:
+                job = WialonPurgeJob.objects.get(pk=resume_id)
+            except (WialonPurgeJob.DoesNotExist, ValidationError) as exc:
+                raise CommandError(f"No existe el trabajo {resume_id}.") from exc
+            if job.status == WialonPurgeJob.STATUS_EN_PROCESO:
+                resume_purge_job(job)
+            elif job.status != WialonPurgeJob.STATUS_PENDIENTE:
+                raise CommandError(f"El trabajo {resume_id} ya terminó ({job.status}).")
+        else:
+            job = create_purge_job(user=None, days=days, dry_run=dry_run, enqueue=False)
+            self.stdout.write(f"Trabajo {job.pk}")
+
+        run_purge_job(job.pk)
+        job.refresh_from_db()
+        if job.status == WialonPurgeJob.STATUS_ERROR:
+            raise CommandError(f"Trabajo {job.pk}: {job.error}")
+        return purge_job_payload(job)
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.4 on 2026-10-18 00:53
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operacion', '0008_polizamantenimiento_intervalo_meses'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WialonPurgeJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('days', models.PositiveSmallIntegerField()),
+                ('dry_run', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('listo', 'Listo'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('cutoff', models.BigIntegerField(blank=True, null=True)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('purged_count', models.PositiveIntegerField(default=0)),
+                ('skipped_count', models.PositiveIntegerField(default=0)),
+                ('error_count', models.PositiveIntegerField(default=0)),
+                ('items', models.JSONField(blank=True, default=list)),
+                ('skipped', models.JSONField(blank=True, default=list)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('error', models.CharField(blank=True, default='', max_length=500)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Purga Wialon',
+                'verbose_name_plural': 'Purgas Wialon',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='operacion_w_status_5d1e70_idx')],
+            },
+        ),
+    ]
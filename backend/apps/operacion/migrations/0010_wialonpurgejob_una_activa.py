@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 02:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+ACTIVE = ("pendiente", "en_proceso")
+
+
+def close_duplicate_active_jobs(apps, schema_editor):
+    """Deja activa solo la purga más reciente para poder crear la restricción."""
+    WialonPurgeJob = apps.get_model("operacion", "WialonPurgeJob")
+    active = WialonPurgeJob.objects.filter(status__in=ACTIVE).order_by("-created_at")
+    keep = active.values_list("pk", flat=True).first()
+    if keep is not None:
+        active.exclude(pk=keep).update(status="error", error="Cerrada: había otra purga activa.")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operacion', '0009_wialonpurgejob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(close_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='wialonpurgejob',
+            constraint=models.UniqueConstraint(models.Value(True), condition=models.Q(('status__in', ('pendiente', 'en_proceso'))), name='operacion_wialonpurgejob_una_activa'),
+        ),
+    ]
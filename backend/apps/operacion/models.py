@@ -1,3 +1,6 @@
+import uuid
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.db import models
@@ -292,3 +295,66 @@ class PolizaMantenimiento(models.Model):
     def __str__(self):
         display = (self.folio or "").strip() or self.idx
         return f"Póliza #{display} - {self.cliente_nombre or 'Sin cliente'}"
+
+
+class WialonPurgeJob(models.Model):
+    """Purga de cuentas Wialon bloqueadas en segundo plano, con avance por cuenta.
+
+    ``items`` guarda cada cuenta candidata con su ``estado`` (pendiente/listo/error):
+    si el worker se recicla a la mitad, el trabajo se reanuda con las pendientes.
+    """
+
+    STATUS_PENDIENTE = "pendiente"
+    STATUS_EN_PROCESO = "en_proceso"
+    STATUS_LISTO = "listo"
+    STATUS_ERROR = "error"
+    STATUS_CHOICES = [
+        (STATUS_PENDIENTE, "Pendiente"),
+        (STATUS_EN_PROCESO, "En proceso"),
+        (STATUS_LISTO, "Listo"),
+        (STATUS_ERROR, "Error"),
+    ]
+    ACTIVE_STATUSES = (STATUS_PENDIENTE, STATUS_EN_PROCESO)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    creado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    days = models.PositiveSmallIntegerField()
+    dry_run = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDIENTE)
+    cutoff = models.BigIntegerField(null=True, blank=True)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    purged_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    items = models.JSONField(default=list, blank=True)
+    skipped = models.JSONField(default=list, blank=True)
+    errors = models.JSONField(default=list, blank=True)
+    error = models.CharField(max_length=500, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "created_at"], name="operacion_w_status_5d1e70_idx")]
+        constraints = [
+            # Una sola purga activa: dos POST simultáneos no pueden crear dos trabajos.
+            models.UniqueConstraint(
+                models.Value(True),
+                condition=models.Q(status__in=("pendiente", "en_proceso")),
+                name="operacion_wialonpurgejob_una_activa",
+            ),
+        ]
+        verbose_name = "Purga Wialon"
+        verbose_name_plural = "Purgas Wialon"
+
+    def __str__(self) -> str:
+        return f"Purga Wialon {self.id} ({self.status})"
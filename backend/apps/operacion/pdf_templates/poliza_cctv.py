@@ -14,7 +14,7 @@ from apps.common.pdf_html import (
     load_public_image_data_uri,
     subtotal_iva_display_split,
 )
-from apps.common.pdf_images import safe_pdf_thumbnail_src
+from apps.common.pdf_images import safe_pdf_thumbnail_srcs
 from apps.cotizaciones.categorias_productos import (
     categorias_nombres_por_id,
     normalize_categorias_productos,
@@ -352,6 +352,7 @@ def overlay_from_cotizacion(cotizacion) -> dict[str, Any]:
     if related is not None:
         items = list(related.all()) if hasattr(related, "all") else list(related)
 
+    thumbs = safe_pdf_thumbnail_srcs([getattr(it, "thumbnail_url", "") or "" for it in items])
     conceptos: list[dict[str, Any]] = []
     for it in items:
         cat_id = str(getattr(it, "categoria_id", "") or "").strip()
@@ -371,7 +372,7 @@ def overlay_from_cotizacion(cotizacion) -> dict[str, Any]:
         pu_sin_iva = precio if solo_concepto else (precio / IVA_MX_DISPLAY)
         importe = round(qty * pu_sin_iva * (1 - desc_pct / 100.0), 2)
         cantidad_str = str(int(qty)) if qty.is_integer() else str(qty)
-        thumb = safe_pdf_thumbnail_src(getattr(it, "thumbnail_url", "") or "")
+        thumb = thumbs.get(str(getattr(it, "thumbnail_url", "") or "").strip(), "")
         if not thumb:
             thumb = default_img or ""
         detalle = (
@@ -232,7 +232,7 @@ class PolizaMantenimientoPdfView(APIView):
         folio = str(overlay.get("folio") or POLIZA_CCTV_DEMO.get("folio") or "POL-CCTV")
         filename = f"Poliza_{folio}.pdf"
         wants_html = (request.query_params.get("format") or "").lower() == "html"
-        return _pdf_response_from_html(html, filename, wants_html=wants_html)
+        return _pdf_response_from_html(html, filename, wants_html=wants_html, request=request)
 
 
 class PolizaMantenimientoXmlView(APIView):
@@ -317,7 +317,7 @@ class PolizaMantenimientoViewSet(viewsets.ModelViewSet):
         folio = poliza.folio or f"POL-{poliza.idx or poliza.id}"
         filename = f"Poliza_{folio}.pdf"
         wants_html = (request.query_params.get("format") or "").lower() == "html"
-        return _pdf_response_from_html(html, filename, wants_html=wants_html)
+        return _pdf_response_from_html(html, filename, wants_html=wants_html, request=request)
 
     @action(detail=True, methods=["get"], url_path="xml")
     def xml(self, request, pk=None):
@@ -0,0 +1,248 @@
+"""Caché Wialon compartida: tier en archivos, generaciones y reconstrucción única."""
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from apps.common.disk_cache import private_dir
+from apps.operacion import wialon_cache, wialon_client
+from apps.operacion.wialon_cache import CacheSlot, bump_generation, single_flight
+
+
+class WialonFileTierTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.env = patch.dict(
+            os.environ,
+            {
+                "WIALON_CACHE_BACKEND": "file",
+                "WIALON_CACHE_DIR": self.tmp,
+                "WIALON_CACHE_CHECK_SEC": "0",
+            },
+        )
+        self.env.start()
+        wialon_cache.reset_tier()
+        self.slot = CacheSlot("test_rows", 60)
+
+    def tearDown(self):
+        self.env.stop()
+        wialon_cache.reset_tier()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _other_worker(self):
+        """Simula otro proceso: sin copia L1 ni generación memorizada."""
+        self.slot.clear_local()
+        wialon_cache._gen_memo = None
+
+    def test_value_is_visible_to_other_worker(self):
+        self.slot.set([{"id": 1}])
+        self._other_worker()
+        self.assertEqual(self.slot.get(), [{"id": 1}])
+
+    def test_files_writable_by_others_are_not_unpickled(self):
+        self.slot.set([{"id": 1}])
+        for name in os.listdir(self.tmp):
+            os.chmod(os.path.join(self.tmp, name), 0o666)
+        self._other_worker()
+        self.assertIsNone(self.slot.get())
+
+    def test_default_dir_is_private_and_outside_tmp(self):
+        with patch.dict(os.environ, {"WIALON_CACHE_DIR": ""}):
+            root = wialon_cache._build_tier().root
+        self.assertFalse(str(root).startswith(tempfile.gettempdir()))
+        private = Path(self.tmp) / "privado"
+        private_dir(private)
+        self.assertEqual(private.stat().st_mode & 0o777, 0o700)
+
+    def test_bump_generation_invalidates_every_worker(self):
+        self.slot.set([{"id": 1}])
+        bump_generation()
+        self._other_worker()
+        self.assertIsNone(self.slot.get())
+
+    def test_update_keeps_expiry_and_requires_value(self):
+        self.assertFalse(self.slot.update(lambda rows: rows + [{"id": 2}]))
+        self.slot.set([{"id": 1}])
+        expires = self.slot._local.expires_at
+        self.assertTrue(self.slot.update(lambda rows: rows + [{"id": 2}]))
+        self._other_worker()
+        self.assertEqual(self.slot.get(), [{"id": 1}, {"id": 2}])
+        self.assertEqual(self.slot._local.expires_at, expires)
+
+    def test_single_flight_waits_for_worker_holding_lock(self):
+        tier = wialon_cache.get_tier()
+        lock_key = wialon_cache._key(wialon_cache.current_generation(), "test_rows:lock")
+        self.assertTrue(tier.add(lock_key, "otro-worker", 30))
+
+        def _publish():
+            time.sleep(0.3)
+            self.slot.set(["publicado"])
+
+        publisher = threading.Thread(target=_publish)
+        publisher.start()
+        built = []
+        result = single_flight(
+            "test_rows",
+            lambda: built.append(1) or ["propio"],
+            peek=self.slot.get,
+        )
+        publisher.join()
+        self.assertEqual(result, ["publicado"])
+        self.assertEqual(built, [])
+
+    def test_session_stores_token_fingerprint_only(self):
+        with (
+            patch.object(wialon_client, "_require_access_token", return_value="secreto"),
+            patch.object(wialon_client, "_login_fresh", return_value="sid-1") as login,
+        ):
+            self.assertEqual(wialon_client.get_session(), "sid-1")
+            wialon_client._session.clear_local()
+            self.assertEqual(wialon_client.get_session(), "sid-1")
+        login.assert_called_once()
+        for name in os.listdir(self.tmp):
+            with open(os.path.join(self.tmp, name), "rb") as fh:
+                self.assertNotIn(b"secreto", fh.read())
+
+
+class WialonStaleWhileRevalidateTests(SimpleTestCase):
+    def setUp(self):
+        self.env = patch.dict(
+            os.environ,
+            {"WIALON_CACHE_BACKEND": "local", "WIALON_CACHE_STALE_SEC": "60"},
+        )
+        self.env.start()
+        wialon_cache.reset_tier()
+        self.slot = CacheSlot("test_swr", 0.05, stale_s=wialon_cache.stale_window)
+
+    def tearDown(self):
+        self.env.stop()
+        wialon_cache.reset_tier()
+
+    def test_serves_stale_and_refreshes_once_in_background(self):
+        self.slot.set(["viejo"])
+        time.sleep(0.1)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def _build():
+            calls.append(1)
+            started.set()
+            release.wait(2)
+            self.slot.set(["nuevo"])
+            return ["nuevo"]
+
+        self.assertEqual(wialon_cache.get_or_refresh(self.slot, _build), ["viejo"])
+        self.assertTrue(started.wait(2))
+        self.assertEqual(wialon_cache.get_or_refresh(self.slot, _build), ["viejo"])
+        self.assertFalse(self.slot.snapshot().fresh)
+        release.set()
+        deadline = time.monotonic() + 2
+        while self.slot.get() is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.slot.get(), ["nuevo"])
+        self.assertEqual(calls, [1])
+
+    def test_builds_synchronously_without_snapshot(self):
+        self.assertEqual(wialon_cache.get_or_refresh(self.slot, lambda: ["propio"]), ["propio"])
+
+    def test_stale_window_expires(self):
+        with patch.dict(os.environ, {"WIALON_CACHE_STALE_SEC": "0"}):
+            self.slot.set(["viejo"])
+            time.sleep(0.1)
+            self.assertIsNone(self.slot.snapshot())
+            self.assertIsNone(self.slot.peek())
+
+
+class WialonWarmStartSnapshotTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "snap.pkl.gz")
+        self.env = patch.dict(
+            os.environ,
+            {"WIALON_CACHE_BACKEND": "local", "WIALON_SNAPSHOT_PATH": self.path, "WIALON_CACHE_STALE_SEC": "60"},
+        )
+        self.env.start()
+        wialon_cache.reset_tier()
+        self.owner = patch.object(wialon_cache, "_snapshot_owner", lambda: "huella-a")
+        self.owner.start()
+        # Un volcado programado por otra prueba no debe tapar los de esta clase.
+        wialon_cache._snapshot_pending = False
+        self.slot = CacheSlot("test_persist", 60, stale_s=wialon_cache.stale_window, persist=True)
+
+    def tearDown(self):
+        self.owner.stop()
+        self.env.stop()
+        wialon_cache._slots.remove(self.slot)
+        wialon_cache.reset_tier()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _new_worker(self):
+        self.slot.clear_local()
+        wialon_cache._warm_pid = None
+
+    def test_new_worker_serves_snapshot_as_stale(self):
+        self.slot.set(["volcado"], _snapshot=False)
+        self.assertEqual(wialon_cache.write_snapshot(), 1)
+        self._new_worker()
+        snap = self.slot.snapshot()
+        self.assertEqual(snap.value, ["volcado"])
+        self.assertFalse(snap.fresh)
+        self.assertIsNone(self.slot.get())
+
+    def test_snapshot_older_than_stale_window_is_served_until_max_age(self):
+        self.slot.set(["volcado"], stored_at=time.time() - 7200, _snapshot=False)
+        self.assertEqual(wialon_cache.write_snapshot(), 1)
+        self._new_worker()
+        self.assertEqual(wialon_cache.warm_start(), 1)
+        refreshed = threading.Event()
+        value = wialon_cache.get_or_refresh(self.slot, lambda: refreshed.set() or ["nuevo"])
+        self.assertEqual(value, ["volcado"])
+        self.assertTrue(refreshed.wait(2))
+
+    def test_seed_too_old_to_serve_is_not_counted(self):
+        self.slot.set(["volcado"], stored_at=time.time() - 7200, _snapshot=False)
+        wialon_cache.write_snapshot()
+        self._new_worker()
+        with patch.dict(os.environ, {"WIALON_SNAPSHOT_MAX_AGE_SEC": "3600"}):
+            self.assertEqual(wialon_cache.warm_start(), 0)
+            self.assertIsNone(self.slot.peek())
+
+    def test_snapshot_writable_by_others_is_ignored(self):
+        self.slot.set(["volcado"], _snapshot=False)
+        wialon_cache.write_snapshot()
+        os.chmod(self.path, 0o666)
+        self._new_worker()
+        self.assertEqual(wialon_cache.read_snapshot(), {})
+
+    def test_snapshot_of_other_token_is_ignored(self):
+        self.slot.set(["volcado"], _snapshot=False)
+        wialon_cache.write_snapshot()
+        self._new_worker()
+        with patch.object(wialon_cache, "_snapshot_owner", lambda: "huella-b"):
+            self.assertIsNone(self.slot.peek())
+
+    def test_seed_never_overwrites_current_value(self):
+        self.slot.set(["volcado"], _snapshot=False)
+        wialon_cache.write_snapshot()
+        wialon_cache._warm_pid = None
+        self.assertEqual(self.slot.get(), ["volcado"])
+        self.slot.set(["nuevo"], _snapshot=False)
+        self.assertEqual(wialon_cache.warm_start(force=True), 0)
+        self.assertEqual(self.slot.get(), ["nuevo"])
+
+    def test_set_schedules_one_write(self):
+        with patch.dict(os.environ, {"WIALON_SNAPSHOT_DELAY_SEC": "0.05"}):
+            self.slot.set(["a"])
+            self.slot.set(["b"])
+            deadline = time.monotonic() + 2
+            while not os.path.exists(self.path) and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertEqual(wialon_cache.read_snapshot()["test_persist"][1], ["b"])
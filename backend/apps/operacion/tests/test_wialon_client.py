@@ -0,0 +1,193 @@
+"""Cliente Wialon: core/batch, conexiones keep-alive e índice incremental de unidades."""
+from __future__ import annotations
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+from urllib.parse import parse_qs, urlsplit
+
+from django.test import SimpleTestCase
+
+from apps.operacion import wialon_cache, wialon_client
+from apps.operacion.wialon_client import WialonError
+
+
+class WialonBatchTests(SimpleTestCase):
+    def _fake_call(self, svc, params, sid=None):
+        self.requests.append((svc, params))
+        if svc != "core/batch":
+            return {"item": {"id": params["id"], "nm": f"Item {params['id']}"}}
+        out = []
+        for call in params["params"]:
+            item_id = call["params"]["id"]
+            if item_id == 2:
+                out.append({"error": 7})
+            else:
+                out.append({"item": {"id": item_id, "nm": f"Item {item_id}"}})
+        return out
+
+    def setUp(self):
+        self.requests = []
+
+    def test_groups_calls_and_maps_item_errors(self):
+        calls = [("core/search_item", {"id": i, "flags": 1}) for i in range(1, 6)]
+        with (
+            patch.object(wialon_client, "_BATCH_MAX_CALLS", 2),
+            patch.object(wialon_client, "_call", side_effect=self._fake_call),
+        ):
+            results = wialon_client._call_batch(calls, "sid")
+
+        self.assertEqual(len(self.requests), 3)
+        self.assertEqual(sorted(svc for svc, _ in self.requests), ["core/batch", "core/batch", "core/search_item"])
+        self.assertIsInstance(results[1], WialonError)
+        self.assertEqual(results[1].code, 7)
+        self.assertEqual([r["item"]["id"] for i, r in enumerate(results) if i != 1], [1, 3, 4, 5])
+
+    def test_failed_batch_request_marks_every_call(self):
+        with patch.object(wialon_client, "_call", side_effect=WialonError("sin red")):
+            results = wialon_client._call_batch(
+                [("core/search_item", {"id": 1}), ("core/search_item", {"id": 2})],
+                "sid",
+            )
+        self.assertTrue(all(isinstance(r, WialonError) for r in results))
+
+    def test_write_batches_are_not_retried_on_read_timeout(self):
+        def _batch(svcs):
+            return {"params": [{"svc": svc, "params": {}} for svc in svcs], "flags": 0}
+
+        pool = MagicMock()
+        pool.request.return_value = MagicMock(status=200, data=b"[]")
+        with patch.object(wialon_client, "_http_pool", return_value=pool):
+            wialon_client._call("core/batch", _batch(["core/search_item", "core/get_account_data"]), sid="sid")
+            wialon_client._call("core/batch", _batch(["core/search_item", "unit/set_active"]), sid="sid")
+        self.assertEqual([c.kwargs["retries"].read for c in pool.request.call_args_list], [1, 0])
+
+    def test_resolve_item_names_uses_single_batch(self):
+        names = {1: "Ya conocido"}
+        with patch.object(wialon_client, "_call", side_effect=self._fake_call):
+            wialon_client._resolve_item_names("sid", {1, 2, 3, 4}, names)
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(names, {1: "Ya conocido", 3: "Item 3", 4: "Item 4"})
+
+
+class _WialonStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, fields):
+        self.server.seen.append((self.command, self.client_address[1], fields))
+        body = json.dumps({"ok": 1, "svc": fields.get("svc", [""])[0]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply(parse_qs(urlsplit(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self._reply(parse_qs(self.rfile.read(length).decode()))
+
+    def log_message(self, *args):
+        pass
+
+
+class WialonHttpPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _WialonStubHandler)
+        self.server.seen = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{self.server.server_address[1]}/wialon/ajax.html"
+        self.patches = [
+            patch.object(wialon_client, "WIALON_API_BASE", base),
+            patch.object(wialon_client, "_http_pool_state", None),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reuses_connection_across_calls(self):
+        for _ in range(3):
+            self.assertEqual(wialon_client._call("core/search_item", {"id": 1}, sid="s")["ok"], 1)
+        ports = {port for _method, port, _fields in self.server.seen}
+        self.assertEqual(len(self.server.seen), 3)
+        self.assertEqual(len(ports), 1)
+
+    def test_large_params_go_in_post_body(self):
+        big = {"params": [{"svc": "core/search_item", "params": {"id": i}} for i in range(200)]}
+        payload = wialon_client._call("core/batch", big, sid="s")
+        method, _port, fields = self.server.seen[-1]
+        self.assertEqual(method, "POST")
+        self.assertEqual(payload["svc"], "core/batch")
+        self.assertEqual(json.loads(fields["params"][0]), big)
+        self.assertEqual(fields["sid"], ["s"])
+
+
+class WialonIncrementalUnitsIndexTests(SimpleTestCase):
+    def setUp(self):
+        wialon_cache.bump_generation()
+        self.calls = []
+        self.events = []
+        self.evts_error = None
+        self.logins = 0
+        self.patches = [
+            patch.object(wialon_client, "_require_access_token", return_value="t"),
+            patch.object(wialon_client, "_login_fresh", side_effect=self._login),
+            patch.object(wialon_client, "_call", side_effect=self._call),
+            patch.object(wialon_client, "_request_json", side_effect=self._avl_evts),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        wialon_cache.bump_generation()
+
+    def _login(self, token):
+        self.logins += 1
+        return f"stream-{self.logins}"
+
+    def _call(self, svc, params, sid=None):
+        self.calls.append(svc)
+        if svc == "core/update_data_flags":
+            return [{"i": 1, "d": {"id": 1, "nm": "Uno"}, "f": 1}, {"i": 2, "d": {"id": 2, "nm": "Dos"}, "f": 1}]
+        if svc == "core/search_item":
+            return {"item": {"id": params["id"], "nm": "Nueva"}}
+        return {}
+
+    def _avl_evts(self, url, fields, *, label, **kwargs):
+        self.assertTrue(url.endswith("/avl_evts"))
+        if self.evts_error:
+            raise self.evts_error
+        events, self.events = self.events, []
+        return {"tm": 1, "events": events}
+
+    def test_registers_once_then_applies_deltas(self):
+        index = wialon_client._sync_units_index()
+        self.assertEqual(sorted(index), [1, 2])
+        self.events = [
+            {"i": 1, "t": "u", "d": {"nm": "Uno bis"}},
+            {"i": 2, "t": "d", "d": None},
+            {"i": 3, "t": "u", "d": {"nm": "Nueva"}},
+        ]
+        index = wialon_client._sync_units_index()
+        self.assertEqual(index[1]["nm"], "Uno bis")
+        self.assertNotIn(2, index)
+        self.assertEqual(index[3]["nm"], "Nueva")
+        self.assertEqual(self.calls.count("core/update_data_flags"), 1)
+        self.assertEqual(self.logins, 1)
+
+    def test_session_loss_registers_again(self):
+        wialon_client._sync_units_index()
+        self.evts_error = WialonError("Sesión inválida", code=1)
+        wialon_client._sync_units_index()
+        self.assertEqual(self.logins, 2)
+        self.assertEqual(self.calls.count("core/update_data_flags"), 2)
@@ -0,0 +1,97 @@
+"""Métricas de Wialon: latencia por servicio, aciertos de caché y ``Server-Timing``."""
+from __future__ import annotations
+
+import os
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.operacion import wialon_cache, wialon_metrics
+from apps.operacion.wialon_cache import CacheSlot, get_or_refresh
+from apps.users.models import UserPermissions
+
+User = get_user_model()
+
+
+class WialonMetricsTests(SimpleTestCase):
+    def setUp(self):
+        self.env = patch.dict(os.environ, {"WIALON_CACHE_BACKEND": "local"})
+        self.env.start()
+        wialon_cache.reset_tier()
+        wialon_metrics.reset_metrics()
+
+    def tearDown(self):
+        self.env.stop()
+        wialon_cache.reset_tier()
+        wialon_metrics.reset_metrics()
+
+    def test_calls_aggregate_latency_bytes_and_error_codes(self):
+        wialon_metrics.record_call("core/search_items", 30, nbytes=100)
+        wialon_metrics.record_call("core/search_items", 700, nbytes=50)
+        wialon_metrics.record_call("core/search_items", 20, error="api_1")
+        row = wialon_metrics.metrics_snapshot()["calls"]["core/search_items"]
+        self.assertEqual(row["count"], 3)
+        self.assertEqual(row["bytes"], 150)
+        self.assertEqual(row["error_codes"], {"api_1": 1})
+        self.assertEqual(row["p50_ms"], 50.0)
+        self.assertEqual(row["p95_ms"], 1000.0)
+        self.assertEqual(row["max_ms"], 700.0)
+
+    def test_get_or_refresh_counts_miss_hit_and_stale(self):
+        slot = CacheSlot("metricas_prueba", 60)
+
+        def build():
+            slot.set(["a"])
+            return ["a"]
+
+        get_or_refresh(slot, build)
+        get_or_refresh(slot, build)
+        row = wialon_metrics.metrics_snapshot()["caches"]["metricas_prueba"]
+        self.assertEqual((row["hits"], row["stale"], row["misses"]), (1, 0, 1))
+        self.assertEqual(row["rebuilds"], 1)
+        self.assertEqual(row["hit_ratio"], 0.5)
+
+    def test_request_timing_collects_calls_from_wrapped_tasks(self):
+        with wialon_metrics.request_timing() as timing:
+            task = wialon_metrics.in_request_context(lambda: wialon_metrics.record_call("core/batch", 12.5))
+            task()
+            wialon_metrics.record_cache("users", "hits")
+        header = timing.header()
+        self.assertIn('wialon;dur=12.5;desc="1 llamadas"', header)
+        self.assertIn('cache;desc="hit=1 stale=0 miss=0"', header)
+        wialon_metrics.record_call("core/batch", 1)
+        self.assertEqual(timing.api_calls, 1)
+
+
+class WialonMetricsEndpointTests(TestCase):
+    def setUp(self):
+        wialon_metrics.reset_metrics()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="wialon_metrics", password="x")
+        UserPermissions.objects.create(
+            user=self.user,
+            permissions={"cuentas_antarix": {"view": True, "create": False, "edit": False, "delete": False}},
+        )
+
+    def _fake_catalogs(self):
+        wialon_metrics.record_call("core/get_hw_types", 8.0)
+        return {"hw_types": [], "vehicle_types": []}
+
+    def test_wialon_views_send_server_timing(self):
+        self.client.force_authenticate(user=self.user)
+        with patch("apps.operacion.wialon_unit_views.fetch_unit_catalogs", side_effect=self._fake_catalogs):
+            res = self.client.get("/api/wialon/catalogos/unidades/")
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('wialon;dur=8.0;desc="1 llamadas"', res["Server-Timing"])
+
+    def test_metrics_endpoint_is_staff_only(self):
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get("/api/wialon/metricas/").status_code, 403)
+        staff = User.objects.create_user(username="wialon_metrics_staff", password="x", is_staff=True)
+        self.client.force_authenticate(user=staff)
+        wialon_metrics.record_call("token/login", 40)
+        res = self.client.get("/api/wialon/metricas/")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["calls"]["token/login"]["count"], 1)
@@ -0,0 +1,168 @@
+"""Purga de bloqueados en segundo plano: avance por cuenta, reanudación y endpoints."""
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.operacion import wialon_purge_jobs
+from apps.operacion.models import WialonPurgeJob
+from apps.operacion.wialon_purge_jobs import create_purge_job, refresh_purge_job_state, run_purge_job
+from apps.users.models import UserPermissions
+
+User = get_user_model()
+
+
+def _blocked(wialon_id, days_ago):
+    return {
+        "wialon_id": wialon_id,
+        "user_id": f"u{wialon_id}",
+        "name": f"Usuario {wialon_id}",
+        "status": "Bloqueado",
+        "blocked_at": int(time.time()) - days_ago * 86400,
+    }
+
+
+USERS = [_blocked(1, 40), _blocked(2, 50), _blocked(3, 5)]
+
+
+@patch("apps.operacion.wialon_client.invalidate_wialon_cache")
+@patch("apps.operacion.wialon_client.delete_wialon_user")
+@patch("apps.operacion.wialon_client.deactivate_wialon_units", return_value={})
+@patch("apps.operacion.wialon_client.fetch_user_units")
+@patch("apps.operacion.wialon_client.fetch_users", return_value=USERS)
+class WialonPurgeJobRunTests(TestCase):
+    def _units(self, user_id):
+        return {"units": [{"wialon_id": user_id * 100}, {"wialon_id": user_id * 100 + 1}]}
+
+    def test_job_records_progress_per_account(self, _users, units, deactivate, delete, invalidate):
+        units.side_effect = self._units
+        job = create_purge_job(user=None, days=35, dry_run=False, enqueue=False)
+        run_purge_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, WialonPurgeJob.STATUS_LISTO)
+        self.assertEqual((job.total, job.processed, job.purged_count, job.skipped_count), (2, 2, 2, 1))
+        self.assertEqual(sorted(c.args[0] for c in deactivate.call_args_list), [[100, 101], [200, 201]])
+        self.assertEqual(sorted(c.args[0] for c in delete.call_args_list), [1, 2])
+        invalidate.assert_called_once()
+
+    def test_resume_only_processes_pending_accounts(self, _users, units, deactivate, delete, invalidate):
+        units.side_effect = self._units
+        job = create_purge_job(user=None, days=35, dry_run=False, enqueue=False)
+        job.cutoff = int(time.time()) - 35 * 86400
+        job.items = [
+            {**_blocked(1, 40), "estado": "listo", "units_deactivated": [100]},
+            {**_blocked(2, 50), "estado": "pendiente"},
+        ]
+        job.total, job.processed, job.purged_count = 2, 1, 1
+        job.status = WialonPurgeJob.STATUS_EN_PROCESO
+        job.heartbeat_at = timezone.now() - timedelta(hours=1)
+        job.save()
+
+        with patch("apps.operacion.wialon_purge_jobs._submit") as submit:
+            refresh_purge_job_state(job)
+        submit.assert_called_once_with(job.pk)
+        run_purge_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, WialonPurgeJob.STATUS_LISTO)
+        self.assertEqual((job.processed, job.purged_count), (2, 2))
+        delete.assert_called_once_with(2)
+        _users.assert_not_called()
+
+    def test_failed_delete_marks_account_error(self, _users, units, deactivate, delete, invalidate):
+        from apps.operacion.wialon_client import WialonError
+
+        units.side_effect = self._units
+        deactivate.side_effect = lambda ids: {ids[0]: "sin permiso"}
+        delete.side_effect = lambda uid: (_ for _ in ()).throw(WialonError("no")) if uid == 2 else None
+        job = create_purge_job(user=None, days=35, dry_run=False, enqueue=False)
+        run_purge_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.purged_count, 1)
+        self.assertEqual({row["wialon_id"]: row["estado"] for row in job.items}, {1: "listo", 2: "error"})
+        self.assertEqual(sorted(e["step"] for e in job.errors), ["deactivate_unit", "deactivate_unit", "delete_user"])
+
+
+    def test_duplicate_runners_merge_outcomes(self, _users, units, deactivate, delete, invalidate):
+        job = create_purge_job(user=None, days=35, dry_run=False, enqueue=False)
+        job.cutoff = int(time.time()) - 35 * 86400
+        job.items = [{**_blocked(1, 40), "estado": "pendiente"}, {**_blocked(2, 50), "estado": "pendiente"}]
+        job.total = 2
+        job.save()
+        first = WialonPurgeJob.objects.get(pk=job.pk)
+        second = WialonPurgeJob.objects.get(pk=job.pk)
+        wialon_purge_jobs._apply_outcome(first, 0, {"purged": {"units_deactivated": [100]}, "errors": []})
+        wialon_purge_jobs._apply_outcome(second, 1, {"purged": None, "errors": [{"step": "delete_user"}]})
+        wialon_purge_jobs._apply_outcome(second, 0, {"purged": None, "errors": [{"step": "deactivate_unit"}]})
+        job.refresh_from_db()
+        self.assertEqual([row["estado"] for row in job.items], ["listo", "error"])
+        self.assertEqual((job.processed, job.purged_count, job.error_count), (2, 1, 1))
+        self.assertEqual(second.purged_count, 1)
+
+
+class WialonPurgeHeartbeatTests(TransactionTestCase):
+    def test_heartbeat_is_renewed_while_an_account_is_slow(self):
+        job = create_purge_job(user=None, days=35, dry_run=False, enqueue=False)
+        old = timezone.now() - timedelta(hours=1)
+        WialonPurgeJob.objects.filter(pk=job.pk).update(status=WialonPurgeJob.STATUS_EN_PROCESO, heartbeat_at=old)
+        with patch.object(wialon_purge_jobs, "_heartbeat_interval", return_value=0.05):
+            with wialon_purge_jobs._heartbeat(job.pk):
+                time.sleep(0.3)
+        job.refresh_from_db()
+        self.assertGreater(job.heartbeat_at, old)
+        self.assertFalse(wialon_purge_jobs.resume_purge_job(WialonPurgeJob(pk=job.pk, heartbeat_at=old)))
+
+
+class WialonPurgeJobEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="wialon_purge_job", password="x")
+        UserPermissions.objects.create(
+            user=self.user,
+            permissions={"cuentas_antarix": {"view": True, "create": True, "edit": True, "delete": False}},
+        )
+        self.client.force_authenticate(user=self.user)
+
+    @patch("apps.operacion.wialon_purge_jobs._submit")
+    def test_create_returns_202_and_rejects_second_job(self, submit):
+        url = "/api/wialon/usuarios/limpiar-bloqueados/trabajos/"
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(url, {"days": 35, "dry_run": True}, format="json")
+        self.assertEqual(res.status_code, 202)
+        submit.assert_called_once()
+        self.assertEqual(res.data["status"], "pendiente")
+        status_res = self.client.get(res.data["status_url"])
+        self.assertEqual(status_res.status_code, 200)
+        self.assertTrue(status_res.data["dry_run"])
+        self.assertEqual(self.client.post(url, {"days": 35}, format="json").status_code, 409)
+
+    def test_concurrent_create_loses_to_constraint_and_returns_409(self):
+        running = create_purge_job(user=None, days=35, dry_run=False, enqueue=False)
+        url = "/api/wialon/usuarios/limpiar-bloqueados/trabajos/"
+        # El otro request ya pasó la consulta de "hay purga activa" antes del INSERT.
+        with patch("apps.operacion.wialon_views.active_purge_job", side_effect=[None, running]):
+            res = self.client.post(url, {"days": 35}, format="json")
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(res.data["job"]["id"], str(running.pk))
+        self.assertEqual(WialonPurgeJob.objects.filter(status__in=WialonPurgeJob.ACTIVE_STATUSES).count(), 1)
+
+    def test_finished_jobs_do_not_block_a_new_one(self):
+        done = create_purge_job(user=None, days=35, dry_run=False, enqueue=False)
+        WialonPurgeJob.objects.filter(pk=done.pk).update(status=WialonPurgeJob.STATUS_LISTO)
+        create_purge_job(user=None, days=35, dry_run=False, enqueue=False)
+        with self.assertRaises(IntegrityError):
+            create_purge_job(user=None, days=35, dry_run=True, enqueue=False)
+
+    def test_create_requires_edit(self):
+        limited = User.objects.create_user(username="wialon_purge_view", password="x")
+        UserPermissions.objects.create(user=limited, permissions={"cuentas_antarix": {"view": True, "edit": False}})
+        self.client.force_authenticate(user=limited)
+        res = self.client.post("/api/wialon/usuarios/limpiar-bloqueados/trabajos/", {"days": 35}, format="json")
+        self.assertEqual(res.status_code, 403)
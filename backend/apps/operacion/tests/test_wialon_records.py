@@ -0,0 +1,103 @@
+"""Registros compactos de Wialon y reporte de memoria de las cachés."""
+from __future__ import annotations
+
+import os
+import pickle
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.operacion import wialon_cache, wialon_client
+from apps.operacion.wialon_records import UnitRecord, UserRecord
+from apps.users.models import UserPermissions
+
+User = get_user_model()
+
+_RAW_UNIT = {
+    "id": 7,
+    "nm": "Camión 7",
+    "netconn": 0,
+    "hw": 3,
+    "uid": "861000",
+    "psw": "secreta",
+    "lmsg": {"t": 1700000000, "p": {"ign": 1, "adc1": 12.5, "gsm": 4}, "pos": {"s": 40, "x": -99.1}},
+    "pos": {"t": 1700000000, "s": 0, "x": -99.1, "y": 19.4, "c": 90, "sc": 8},
+    "sens": {
+        "1": {"id": 1, "tp": "engine operation", "nm": "Motor", "p": "in1", "tbl": []},
+        "2": {"id": 2, "tp": "fuel level", "nm": "Combustible", "p": "adc1", "tbl": [1, 2]},
+    },
+    "pflds": {"1": {"id": 1, "n": "vehicle_class", "v": "Camión"}, "2": {"id": 2, "n": "brand", "v": "X"}},
+    "aflds": {"1": {"id": 1, "n": "admin", "v": "no se usa"}},
+}
+
+
+class WialonRecordTests(SimpleTestCase):
+    def test_unit_record_reads_like_a_dict(self):
+        rec = UnitRecord.from_item(_RAW_UNIT)
+        self.assertEqual(rec.get("nm"), "Camión 7")
+        self.assertEqual(rec["hw"], 3)
+        self.assertIn("netconn", rec)
+        self.assertNotIn("aflds", rec)
+        self.assertIsNone(rec.get("ph"))
+        with self.assertRaises(KeyError):
+            rec["ph"]
+        self.assertEqual(set(dict(rec)), set(rec))
+
+    def test_unit_record_drops_unused_payload(self):
+        rec = UnitRecord.from_item(_RAW_UNIT)
+        self.assertEqual(rec["psw"], "*")
+        self.assertEqual(rec["lmsg"]["p"], {"ign": 1})
+        self.assertEqual(list(rec["sens"]), ["1"])
+        self.assertEqual([f["n"] for f in rec["pflds"].values()], ["vehicle_class"])
+
+    def test_normalizers_match_raw_item(self):
+        rec = UnitRecord.from_item(_RAW_UNIT)
+        for fn in (
+            wialon_client._unit_online_from_item,
+            wialon_client._unit_motion_from_item,
+            wialon_client._engine_from_message_params,
+            wialon_client._ignition_sensor_ids,
+        ):
+            self.assertEqual(fn(rec), fn(_RAW_UNIT), fn.__name__)
+
+    def test_records_survive_pickle(self):
+        unit = UnitRecord.from_item({"id": 1, "nm": "A"})
+        user = UserRecord.from_item({"id": 2, "nm": "u", "prp": {"monu": "[1]", "tz": "0"}})
+        self.assertEqual(dict(pickle.loads(pickle.dumps(unit))), {"id": 1, "nm": "A"})
+        restored = pickle.loads(pickle.dumps(user))
+        self.assertEqual(restored["prp"], {"monu": "[1]"})
+        self.assertNotIn("crt", restored)
+
+
+class WialonCacheMemoryEndpointTests(TestCase):
+    def setUp(self):
+        self.env = patch.dict(os.environ, {"WIALON_CACHE_BACKEND": "local"})
+        self.env.start()
+        wialon_cache.reset_tier()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="wialon_mem", password="x")
+        UserPermissions.objects.create(
+            user=self.user,
+            permissions={"cuentas_antarix": {"view": True, "create": False, "edit": False, "delete": False}},
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        wialon_client.invalidate_wialon_cache()
+        self.env.stop()
+        wialon_cache.reset_tier()
+
+    def test_reports_loaded_slots_only(self):
+        wialon_client.invalidate_wialon_cache()
+        wialon_client._units_index_cache.set({7: UnitRecord.from_item(_RAW_UNIT)})
+        res = self.client.get("/api/wialon/cache/memoria/")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["pid"], os.getpid())
+        names = [row["name"] for row in res.data["slots"]]
+        self.assertEqual(names, ["units_index"])
+        row = res.data["slots"][0]
+        self.assertEqual(row["entries"], 1)
+        self.assertGreater(row["bytes"], 0)
+        self.assertTrue(row["fresh"])
@@ -0,0 +1,119 @@
+"""Búsqueda de unidades en el servidor: índice invertido y paginación por cursor."""
+from __future__ import annotations
+
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.operacion.wialon_search import UnitSearchIndex, decode_cursor, search_index_for
+from apps.users.models import UserPermissions
+
+User = get_user_model()
+
+
+def _row(unit_id, name, uid="", phone="", custom="", owners=()):
+    return {
+        "unit_id": unit_id,
+        "name": name,
+        "uid": uid,
+        "phone": phone,
+        "custom_fields": custom,
+        "search_text": " ".join(p for p in (name, uid, phone, custom, str(unit_id)) if p),
+        "users": [{"wialon_id": w, "user_id": u, "name": u.title()} for w, u in owners],
+    }
+
+
+ROWS = (
+    _row(1, "Camión Reparto 01", uid="861000111", phone="+52 55 1234 5678", owners=[(10, "logistica")]),
+    _row(2, "Camioneta Ventas", uid="861000222", custom="Placa ABC-123", owners=[(11, "ventas")]),
+    _row(3, "Auto Dirección", uid="359000333", owners=[(10, "logistica"), (12, "direccion")]),
+    _row(4, "Moto 7", uid="359000444"),
+)
+
+
+class UnitSearchIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = UnitSearchIndex(ROWS)
+
+    def _ids(self, query="", **kwargs):
+        return [r["unit_id"] for r in self.index.search(query, limit=50, **kwargs).results]
+
+    def test_substring_ignores_case_accents_and_separators(self):
+        self.assertEqual(self._ids("camion"), [1, 2])
+        self.assertEqual(self._ids("abc123"), [2])
+        self.assertEqual(self._ids("5512345"), [1])
+        self.assertEqual(self._ids("direccion"), [3])
+
+    def test_short_terms_match_token_prefix(self):
+        self.assertEqual(self._ids("mo"), [4])
+        self.assertEqual(self._ids("7"), [4])
+
+    def test_terms_and_owner_filter_combine(self):
+        self.assertEqual(self._ids("logistica"), [3, 1])
+        self.assertEqual(self._ids(owners=[10]), [3, 1])
+        self.assertEqual(self._ids("auto", owners=[10]), [3])
+        self.assertEqual(self._ids("camion", owners=[12]), [])
+
+    def test_results_omit_haystack(self):
+        page = self.index.search("moto")
+        self.assertNotIn("search_text", page.results[0])
+
+    def test_cursor_walks_every_match_once(self):
+        seen, cursor = [], None
+        while True:
+            page = self.index.search("", cursor=cursor, limit=3)
+            self.assertEqual(page.total, 4)
+            seen.extend(r["unit_id"] for r in page.results)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(sorted(seen), [1, 2, 3, 4])
+        self.assertEqual(len(seen), 4)
+
+    def test_cursor_survives_rebuild(self):
+        first = self.index.search("", limit=2)
+        rebuilt = UnitSearchIndex(ROWS + (_row(5, "Auto Nuevo"),))
+        second = rebuilt.search("", cursor=first.next_cursor, limit=10)
+        self.assertEqual([r["unit_id"] for r in first.results], [3, 1])
+        self.assertEqual([r["unit_id"] for r in second.results], [2, 4])
+        self.assertEqual(decode_cursor(first.next_cursor), ("camion reparto 01", 1))
+
+    def test_index_is_reused_for_same_tuple(self):
+        self.assertIs(search_index_for(ROWS), search_index_for(ROWS))
+        self.assertIsNot(search_index_for(ROWS), search_index_for(tuple(ROWS)[:2]))
+
+
+class WialonUnitsSearchEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="wialon_search", password="x")
+        UserPermissions.objects.create(
+            user=self.user,
+            permissions={"cuentas_antarix": {"view": True, "create": False, "edit": False, "delete": False}},
+        )
+        self.client.force_authenticate(user=self.user)
+
+    @patch("apps.operacion.wialon_views.fetch_units_search_index", return_value=ROWS)
+    def test_returns_only_requested_page(self, _fetch):
+        res = self.client.get("/api/wialon/unidades/buscar/", {"q": "camion", "limit": 1})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["count"], 2)
+        self.assertEqual([u["unit_id"] for u in res.data["units"]], [1])
+        res = self.client.get("/api/wialon/unidades/buscar/", {"q": "camion", "cursor": res.data["next_cursor"]})
+        self.assertEqual([u["unit_id"] for u in res.data["units"]], [2])
+        self.assertIsNone(res.data["next_cursor"])
+
+    @patch("apps.operacion.wialon_views.fetch_units_search_index", return_value=ROWS)
+    def test_rejects_bad_cursor_and_owner(self, _fetch):
+        self.assertEqual(self.client.get("/api/wialon/unidades/buscar/", {"cursor": "%%%"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/wialon/unidades/buscar/", {"owner": "x"}).status_code, 400)
+
+    @patch("apps.operacion.wialon_views.fetch_units_search_index")
+    @patch("apps.operacion.wialon_views.fetch_users", return_value=[{"wialon_id": 10, "name": "Cuenta"}])
+    def test_users_list_does_not_embed_units(self, _users, fetch_index):
+        res = self.client.get("/api/wialon/usuarios/")
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn("units_index", res.data)
+        fetch_index.assert_not_called()
@@ -0,0 +1,64 @@
+"""Simulador local de Wialon: ``wialon_client`` completo contra la flota sintética."""
+from __future__ import annotations
+
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from apps.operacion import wialon_client
+from apps.operacion.wialon_simulator import FleetSpec, SyntheticFleet, WialonSimulator, use_simulator
+
+
+class WialonSimulatorTests(SimpleTestCase):
+    def setUp(self):
+        self.fleet = SyntheticFleet(FleetSpec(users=12, units=60, blocked_ratio=0.3, seed=7))
+        self.sim = WialonSimulator(self.fleet).start()
+        self.addCleanup(self.sim.stop)
+        ctx = use_simulator(self.sim)
+        ctx.__enter__()
+        self.addCleanup(ctx.__exit__, None, None, None)
+
+    def test_fleet_is_deterministic(self):
+        again = SyntheticFleet(FleetSpec(users=12, units=60, blocked_ratio=0.3, seed=7))
+        self.assertEqual(again.blocked.keys(), self.fleet.blocked.keys())
+        self.assertEqual(again.users, self.fleet.users)
+
+    def test_users_and_search_index_match_fleet(self):
+        users = wialon_client.fetch_users()
+        self.assertEqual(len(users), 12)
+        blocked = [u for u in users if u["status"] == "Bloqueado"]
+        self.assertEqual(len(blocked), sum(1 for u in self.fleet.users.values() if u["bact"] in self.fleet.blocked))
+        self.assertTrue(all(u["blocked_at"] for u in blocked))
+
+        index = wialon_client.fetch_units_search_index()
+        self.assertEqual(len(index), 60)
+        self.assertTrue(all(row["users"] for row in index))
+        self.assertEqual(self.sim.calls["token/login"], 1)
+
+    def test_unit_updates_reach_the_fleet(self):
+        unit_id = next(iter(self.fleet.units))
+        detail = wialon_client.update_wialon_unit(unit_id, name="Unidad renombrada", phone="+5215500000000")
+        self.assertEqual(detail["name"], "Unidad renombrada")
+        self.assertEqual(self.fleet.units[unit_id]["ph"], "+5215500000000")
+        wialon_client.set_wialon_unit_active(unit_id, False)
+        self.assertEqual(self.fleet.units[unit_id]["act"], 0)
+
+    def test_invalid_session_is_reported(self):
+        payload = self.sim.handle_call("core/search_item", {"id": 1}, "sin-sesion")
+        self.assertEqual(payload, {"error": 1})
+
+
+class WialonBenchmarkCommandTests(SimpleTestCase):
+    def test_reports_cold_and_warm_per_function(self):
+        out = StringIO()
+        call_command("wialon_benchmark", sizes="40", units_per_user=4, rounds=1, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report[0]["units"], 40)
+        rows = {row["function"]: row for row in report[0]["functions"]}
+        self.assertEqual(set(rows), {"fetch_users", "_build_users_payload", "fetch_units_search_index"})
+        self.assertEqual(rows["fetch_users"]["rows"], 10)
+        self.assertGreater(rows["fetch_users"]["cold_api_calls"], 0)
+        self.assertIsNotNone(rows["fetch_units_search_index"]["warm_ms"])
+        self.assertGreater(report[0]["cache_bytes"], 0)
@@ -79,7 +79,7 @@ class WialonUnitActiveAndPurgeTests(TestCase):
         mock_purge.assert_called_once_with(days=35, dry_run=True)
 
     @patch("apps.operacion.wialon_client.delete_wialon_user")
-    @patch("apps.operacion.wialon_client.set_wialon_unit_active")
+    @patch("apps.operacion.wialon_client.deactivate_wialon_units")
     @patch("apps.operacion.wialon_client.fetch_user_units")
     @patch("apps.operacion.wialon_client.fetch_users")
     @patch("apps.operacion.wialon_client.invalidate_wialon_cache")
@@ -121,12 +121,12 @@ class WialonUnitActiveAndPurgeTests(TestCase):
         mock_fetch_units.return_value = {
             "units": [{"wialon_id": 100, "is_active": True}],
         }
-        mock_set_active.return_value = {"wialon_id": 100, "is_active": False}
+        mock_set_active.return_value = {}
 
         result = purge_blocked_accounts(days=35, dry_run=False)
         self.assertEqual(result["purged_count"], 1)
         self.assertEqual(result["purged"][0]["wialon_id"], 1)
-        mock_set_active.assert_called_once_with(100, False)
+        mock_set_active.assert_called_once_with([100])
         mock_delete_user.assert_called_once_with(1)
         mock_invalidate.assert_called_once()
 
@@ -146,7 +146,7 @@ class WialonUnitActiveAndPurgeTests(TestCase):
         ]
         with patch("apps.operacion.wialon_client.fetch_user_units") as mock_units:
             mock_units.return_value = {"units": [{"wialon_id": 100}]}
-            with patch("apps.operacion.wialon_client.set_wialon_unit_active") as mock_set:
+            with patch("apps.operacion.wialon_client.deactivate_wialon_units") as mock_set:
                 with patch("apps.operacion.wialon_client.delete_wialon_user") as mock_del:
                     result = purge_blocked_accounts(days=35, dry_run=True)
                     self.assertEqual(result["purged_count"], 1)
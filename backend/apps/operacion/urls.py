@@ -16,8 +16,13 @@ from .wialon_unit_views import (
     WialonUnitDetailView,
 )
 from .wialon_views import (
+    WialonCacheMemoryView,
+    WialonMetricsView,
     WialonPurgeBlockedView,
+    WialonPurgeJobCreateView,
+    WialonPurgeJobDetailView,
     WialonUnitsSearchIndexView,
+    WialonUnitsSearchView,
     WialonUsuarioDetailView,
     WialonUsuariosView,
     WialonUsuarioUnidadesView,
@@ -45,11 +50,36 @@ urlpatterns = [
         WialonPurgeBlockedView.as_view(),
         name="wialon-purge-blocked",
     ),
+    path(
+        "wialon/usuarios/limpiar-bloqueados/trabajos/",
+        WialonPurgeJobCreateView.as_view(),
+        name="wialon-purge-jobs",
+    ),
+    path(
+        "wialon/usuarios/limpiar-bloqueados/trabajos/<uuid:job_id>/",
+        WialonPurgeJobDetailView.as_view(),
+        name="wialon-purge-job-detail",
+    ),
     path(
         "wialon/indice-unidades/",
         WialonUnitsSearchIndexView.as_view(),
         name="wialon-units-search-index",
     ),
+    path(
+        "wialon/unidades/buscar/",
+        WialonUnitsSearchView.as_view(),
+        name="wialon-units-search",
+    ),
+    path(
+        "wialon/cache/memoria/",
+        WialonCacheMemoryView.as_view(),
+        name="wialon-cache-memory",
+    ),
+    path(
+        "wialon/metricas/",
+        WialonMetricsView.as_view(),
+        name="wialon-metrics",
+    ),
     path(
         "wialon/usuarios/<int:wialon_user_id>/",
         WialonUsuarioDetailView.as_view(),
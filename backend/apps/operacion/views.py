@@ -10,6 +10,7 @@ from rest_framework.exceptions import ValidationError as DRFValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from apps.cotizaciones.pdf_cache import apply_pdf_etag, not_modified_response, pdf_cache_key
 from apps.cotizaciones.pdf_render import PdfRenderError, any_provider_configured, render_html_to_pdf
 from apps.ordenes.image_services import (
     ALLOWED_CLOUDINARY_PUBLIC_ID_PREFIXES,
@@ -70,8 +71,11 @@ def _firma_cloudinary_overrides(validated_data: dict) -> dict:
     return overrides
 
 
-def _pdf_response_from_html(html: str, filename: str, *, wants_html: bool = False):
-    """HTML → PDF; si no hay motor o se pide HTML, regresa HTML imprimible."""
+def _pdf_response_from_html(html: str, filename: str, *, wants_html: bool = False, request=None):
+    """HTML → PDF; si no hay motor o se pide HTML, regresa HTML imprimible.
+
+    Con ``request`` responde 304 cuando ``If-None-Match`` coincide con el ETag.
+    """
     if not html:
         return Response({"detail": "No se pudo generar el HTML del PDF."}, status=500)
 
@@ -82,6 +86,11 @@ def _pdf_response_from_html(html: str, filename: str, *, wants_html: bool = Fals
         response["Content-Disposition"] = f'inline; filename="{stem}.html"'
         return response
 
+    cache_key = pdf_cache_key(html, size="A4", landscape=False)
+    not_modified = not_modified_response(request, cache_key)
+    if not_modified is not None:
+        return not_modified
+
     try:
         pdf_bytes = render_html_to_pdf(
             html, size="A4", landscape=False, timeout=45, prefer_local=True
@@ -96,7 +105,7 @@ def _pdf_response_from_html(html: str, filename: str, *, wants_html: bool = Fals
 
     response = HttpResponse(pdf_bytes, content_type="application/pdf")
     response["Content-Disposition"] = f'inline; filename="{filename}"'
-    return response
+    return apply_pdf_etag(response, cache_key)
 
 
 class ProyectoViewSet(viewsets.ModelViewSet):
@@ -178,7 +187,7 @@ class ProyectoViewSet(viewsets.ModelViewSet):
         folio = getattr(proyecto, "folio", None) or getattr(proyecto, "idx", None) or proyecto.id
         filename = f"Proyecto_{folio}.pdf"
         wants_html = (request.query_params.get("format") or "").lower() == "html"
-        return _pdf_response_from_html(html, filename, wants_html=wants_html)
+        return _pdf_response_from_html(html, filename, wants_html=wants_html, request=request)
 
     @action(detail=True, methods=["get"], url_path="correo-sugerido")
     def correo_sugerido(self, request, pk=None):
@@ -0,0 +1,768 @@
+"""Caché de Wialon compartida entre workers (sesión, usuarios, índice de unidades…).
+
+Cada estructura vive en un :class:`CacheSlot`. El slot guarda una copia local
+(L1, sin deserializar en cada acceso) y, si el backend es compartido, la publica
+en un *tier* común para que los demás workers de Gunicorn no vuelvan a iniciar
+sesión ni reconstruir el índice completo.
+
+- Llaves versionadas: ``wialon:<esquema>:<generación>:<nombre>``. Invalidar
+  incrementa la generación en el tier, así que todos los workers dejan de ver
+  lo anterior a más tardar ``WIALON_CACHE_CHECK_SEC`` después.
+- Cada escritura publica un sello; el L1 se revalida contra ese sello (una
+  lectura pequeña) como mucho cada ``WIALON_CACHE_CHECK_SEC``.
+- :func:`single_flight` garantiza una sola reconstrucción a la vez: los hilos
+  del proceso esperan el candado local y los demás workers esperan el candado
+  del tier (``add`` atómico) y leen el resultado publicado.
+- Los slots con ``stale_s`` conservan la copia vencida ese tiempo extra:
+  :func:`get_or_refresh` la entrega de inmediato y la renueva en un hilo de
+  fondo (una sola renovación por nombre entre hilos y workers).
+
+Variables de entorno:
+
+- ``WIALON_CACHE_BACKEND``: ``local`` (default; solo este proceso), ``django``
+  (alias de ``CACHES``, p. ej. Redis con ``REDIS_URL``) o ``file`` (directorio
+  compartido en el mismo servidor, sin servicios extra).
+- ``WIALON_CACHE_ALIAS`` (default ``default``) para ``django``.
+- ``WIALON_CACHE_DIR`` (default ``backend/var/wialon-cache``) para ``file``.
+- ``WIALON_CACHE_CHECK_SEC`` (default 2): frecuencia de revalidación del L1.
+- ``WIALON_CACHE_BUILD_WAIT_SEC`` (default 90): espera máxima por otro worker.
+- ``WIALON_CACHE_STALE_SEC`` (default 1800): cuánto tiempo después de vencer se
+  sigue sirviendo una copia mientras se renueva (``0`` = reconstrucción síncrona).
+
+Arranque en caliente: los slots con ``persist=True`` se vuelcan (pickle + gzip)
+a un archivo local unos segundos después de cada escritura. El primer acceso de
+un worker nuevo siembra esos slots con el volcado como copia vencida, así que el
+primer usuario tras un deploy ve datos de inmediato mientras se renuevan. Una
+copia sembrada se sirve hasta ``WIALON_SNAPSHOT_MAX_AGE_SEC`` después de
+haberse leído en Wialon, aunque ya haya salido de ``stale_s``. El archivo lleva
+el esquema y la huella del token; si no coinciden, se ignora.
+
+- ``WIALON_SNAPSHOT_PATH`` (default ``backend/var/wialon-snapshot.pkl.gz``;
+  ``off`` lo desactiva).
+- ``WIALON_SNAPSHOT_MAX_AGE_SEC`` (default 86400): volcados y copias más viejos
+  se ignoran.
+- ``WIALON_SNAPSHOT_DELAY_SEC`` (default 10): agrupa escrituras seguidas en un volcado.
+
+Los archivos son ``pickle``: nunca van en el ``/tmp`` compartido. Los
+directorios se crean con modo ``0o700`` y solo se cargan archivos del usuario
+del proceso que nadie más puede escribir.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, TypeVar
+
+from apps.common.disk_cache import data_dir, private_dir, trusted_file
+from apps.operacion.wialon_metrics import record_cache, record_rebuild, timed_rebuild
+from apps.operacion.wialon_records import deep_sizeof
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Subir si cambia la forma de lo que se guarda (evita leer estructuras viejas).
+_SCHEMA = "v2"
+_GEN_KEY = f"wialon:{_SCHEMA}:gen"
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = (os.environ.get(name) or "").strip()
+    try:
+        return max(0.0, float(raw)) if raw else default
+    except ValueError:
+        return default
+
+
+class _LocalTier:
+    """Sin tier compartido: el L1 de cada slot es la única copia."""
+
+    shared = False
+
+    def get(self, key: str) -> Any:
+        return None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        pass
+
+    def add(self, key: str, value: Any, ttl: float) -> bool:
+        return True
+
+    def delete(self, key: str) -> None:
+        pass
+
+
+class _DjangoTier:
+    """Backend de ``django.core.cache`` (Redis/Memcached comparten entre workers)."""
+
+    def __init__(self, alias: str) -> None:
+        from django.core.cache import caches
+
+        self._cache = caches[alias]
+        # LocMemCache es por proceso: funciona, pero no comparte nada.
+        self.shared = type(self._cache).__name__ != "LocMemCache"
+
+    def get(self, key: str) -> Any:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._cache.set(key, value, timeout=max(1, int(ttl)))
+
+    def add(self, key: str, value: Any, ttl: float) -> bool:
+        return bool(self._cache.add(key, value, timeout=max(1, int(ttl))))
+
+    def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+
+class _FileTier:
+    """Archivos ``pickle`` en un directorio local compartido por los workers.
+
+    Escritura atómica (temporal + ``os.replace``); ``add`` usa ``O_EXCL`` para
+    que solo un proceso tome un candado.
+    """
+
+    shared = True
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.pkl"
+
+    def _read(self, path: Path) -> tuple[float, Any] | None:
+        try:
+            with open(path, "rb") as fh:
+                if not trusted_file(fh):
+                    logger.warning("Wialon caché: %s no es de este usuario; se ignora", path.name)
+                    return None
+                expires, value = pickle.load(fh)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.warning("Wialon caché: entrada ilegible %s", path.name)
+            return None
+        return expires, value
+
+    def get(self, key: str) -> Any:
+        path = self._path(key)
+        hit = self._read(path)
+        if hit is None:
+            return None
+        if hit[0] <= time.time():
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+        return hit[1]
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        path = self._path(key)
+        try:
+            private_dir(self.root)
+            fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    pickle.dump((time.time() + ttl, value), fh, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+        except OSError:
+            logger.warning("Wialon caché: no se pudo escribir %s", key)
+
+    def add(self, key: str, value: Any, ttl: float) -> bool:
+        path = self._path(key)
+        private_dir(self.root)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+            except FileExistsError:
+                hit = self._read(path)
+                if hit is not None and hit[0] > time.time():
+                    return False
+                # Candado vencido (worker muerto): se libera y se reintenta una vez.
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+                continue
+            with os.fdopen(fd, "wb") as fh:
+                pickle.dump((time.time() + ttl, value), fh, protocol=pickle.HIGHEST_PROTOCOL)
+            return True
+        return False
+
+    def delete(self, key: str) -> None:
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+
+_tier: Any = None
+_tier_lock = threading.Lock()
+
+
+def _build_tier():
+    backend = (os.environ.get("WIALON_CACHE_BACKEND") or "local").strip().lower()
+    if backend == "django":
+        try:
+            return _DjangoTier((os.environ.get("WIALON_CACHE_ALIAS") or "default").strip())
+        except Exception:
+            logger.exception("Wialon caché: alias de Django inválido; se usa caché local")
+            return _LocalTier()
+    if backend == "file":
+        raw = (os.environ.get("WIALON_CACHE_DIR") or "").strip()
+        root = Path(raw) if raw else data_dir() / "wialon-cache"
+        return _FileTier(root)
+    return _LocalTier()
+
+
+def get_tier():
+    global _tier
+    if _tier is None:
+        with _tier_lock:
+            if _tier is None:
+                _tier = _build_tier()
+    return _tier
+
+
+def reset_tier() -> None:
+    """Vuelve a leer ``WIALON_CACHE_BACKEND`` (pruebas / cambio de configuración)."""
+    global _tier, _gen_memo, _warm_pid
+    with _tier_lock:
+        _tier = None
+    _gen_memo = None
+    _warm_pid = None
+    for slot in list(_slots):
+        slot.clear_local()
+
+
+def _check_interval() -> float:
+    return _env_float("WIALON_CACHE_CHECK_SEC", 2.0)
+
+
+# (generación, leída en monotonic)
+_gen_memo: tuple[str, float] | None = None
+_local_gen = "0"
+
+
+def current_generation() -> str:
+    global _gen_memo
+    tier = get_tier()
+    if not tier.shared:
+        return _local_gen
+    now = time.monotonic()
+    memo = _gen_memo
+    if memo is not None and now - memo[1] < _check_interval():
+        return memo[0]
+    gen = tier.get(_GEN_KEY)
+    gen = str(gen) if gen is not None else "0"
+    _gen_memo = (gen, now)
+    return gen
+
+
+def bump_generation() -> None:
+    """Invalida todo lo publicado por cualquier worker (llaves de la generación vieja)."""
+    global _gen_memo, _local_gen
+    new_gen = uuid.uuid4().hex[:12]
+    tier = get_tier()
+    if tier.shared:
+        # Sin TTL práctico: si se pierde, todos vuelven a la generación "0" y reconstruyen.
+        tier.set(_GEN_KEY, new_gen, 30 * 86400)
+    _local_gen = new_gen
+    _gen_memo = (new_gen, time.monotonic())
+    for slot in list(_slots):
+        slot.clear_local()
+
+
+def _key(gen: str, name: str) -> str:
+    return f"wialon:{_SCHEMA}:{gen}:{name}"
+
+
+@dataclass
+class _Local:
+    gen: str
+    stamp: str
+    stored_at: float
+    expires_at: float
+    value: Any
+    checked_at: float
+    # Límite para servir la copia vencida; ``None`` = ``expires_at + stale_s``.
+    stale_until: float | None = None
+
+
+class Snapshot(NamedTuple):
+    value: Any
+    stored_at: float
+    fresh: bool
+
+    @property
+    def age_s(self) -> float:
+        return max(0.0, time.time() - self.stored_at)
+
+
+def stale_window() -> float:
+    return _env_float("WIALON_CACHE_STALE_SEC", 1800.0)
+
+
+def snapshot_max_age() -> float:
+    return _env_float("WIALON_SNAPSHOT_MAX_AGE_SEC", 86400.0)
+
+
+_slots: list["CacheSlot"] = []
+
+
+class CacheSlot:
+    """Una estructura cacheada con TTL y, opcionalmente, ventana de copia vencida.
+
+    ``ttl_s`` y ``stale_s`` pueden ser funciones para leer el entorno al usarse.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl_s: Callable[[], float] | float,
+        *,
+        stale_s: Callable[[], float] | float = 0.0,
+        persist: bool = False,
+    ) -> None:
+        self.name = name
+        self._ttl = ttl_s
+        self._stale = stale_s
+        self.persist = persist
+        self._local: _Local | None = None
+        self._lock = threading.RLock()
+        _slots.append(self)
+
+    @property
+    def ttl(self) -> float:
+        return float(self._ttl() if callable(self._ttl) else self._ttl)
+
+    @property
+    def stale(self) -> float:
+        return float(self._stale() if callable(self._stale) else self._stale)
+
+    def _load_shared(self, tier, gen: str) -> _Local | None:
+        raw = tier.get(_key(gen, self.name))
+        if not isinstance(raw, tuple) or len(raw) not in (4, 5):
+            return None
+        stamp, stored_at, expires_at, value, *rest = raw
+        return _Local(gen, stamp, stored_at, expires_at, value, time.monotonic(), rest[0] if rest else None)
+
+    def _serve_until(self, local: _Local) -> float:
+        if local.stale_until is not None:
+            return local.stale_until
+        return local.expires_at + self.stale
+
+    def _resolve(self, *, revalidate: bool = False) -> _Local | None:
+        if self.persist and _warm_pid != os.getpid():
+            warm_start()
+        tier = get_tier()
+        gen = current_generation()
+        local = self._local
+        if local is not None and local.gen != gen:
+            local = None
+        if not tier.shared:
+            return local
+        now_m = time.monotonic()
+        if (
+            not revalidate
+            and local is not None
+            and local.expires_at > time.time()
+            and now_m - local.checked_at < _check_interval()
+        ):
+            return local
+        stamp = tier.get(_key(gen, f"{self.name}:stamp"))
+        if local is not None and stamp is not None and stamp == local.stamp:
+            local.checked_at = now_m
+            return local
+        fresh = self._load_shared(tier, gen) if stamp is not None else None
+        self._local = fresh
+        return fresh
+
+    def get(self) -> Any:
+        """Valor vigente o ``None``."""
+        local = self._resolve()
+        if local is None or local.expires_at <= time.time():
+            return None
+        return local.value
+
+    def snapshot(self, *, revalidate: bool = False) -> Snapshot | None:
+        """Valor con su antigüedad; vencido dentro de ``stale_s`` cuenta como ``fresh=False``.
+
+        ``revalidate`` consulta el tier aunque el L1 se haya revisado hace poco.
+        """
+        local = self._resolve(revalidate=revalidate)
+        if local is None:
+            return None
+        now = time.time()
+        if local.expires_at > now:
+            return Snapshot(local.value, local.stored_at, True)
+        if self._serve_until(local) > now:
+            return Snapshot(local.value, local.stored_at, False)
+        return None
+
+    def peek(self, *, revalidate: bool = False) -> Any:
+        """Valor vigente o vencido dentro de ``stale_s`` (lo que se le está mostrando al usuario)."""
+        snap = self.snapshot(revalidate=revalidate)
+        return snap.value if snap is not None else None
+
+    def set(
+        self,
+        value: Any,
+        *,
+        expires_at: float | None = None,
+        stored_at: float | None = None,
+        stale_until: float | None = None,
+        _snapshot: bool = True,
+    ) -> None:
+        now = time.time()
+        stored = stored_at if stored_at is not None else now
+        expires = expires_at if expires_at is not None else now + self.ttl
+        gen = current_generation()
+        stamp = uuid.uuid4().hex
+        local = _Local(gen, stamp, stored, expires, value, time.monotonic(), stale_until)
+        with self._lock:
+            self._local = local
+        tier = get_tier()
+        if tier.shared:
+            keep = max(1.0, self._serve_until(local) - now)
+            tier.set(_key(gen, self.name), (stamp, stored, expires, value, stale_until), keep)
+            tier.set(_key(gen, f"{self.name}:stamp"), stamp, keep)
+        if self.persist and _snapshot:
+            schedule_snapshot()
+
+    def seed(self, value: Any, stored_at: float) -> bool:
+        """Carga un valor del volcado si el slot está vacío.
+
+        Con ventana ``stale_s`` entra vencido (se sirve y se renueva en fondo) hasta
+        ``WIALON_SNAPSHOT_MAX_AGE_SEC`` después de ``stored_at``; sin ella solo vale
+        mientras siga dentro de su TTL original. ``False`` si ya había un valor o
+        si el sembrado no se podría servir.
+        """
+        with self._lock:
+            if self._resolve() is not None:
+                return False
+            now = time.time()
+            expires = stored_at + self.ttl
+            stale_until = None
+            if self.stale > 0:
+                stale_until = max(expires + self.stale, stored_at + snapshot_max_age())
+                if stale_until <= now:
+                    return False
+                expires = min(expires, now)
+            elif expires <= now:
+                return False
+            self.set(value, expires_at=expires, stored_at=stored_at, stale_until=stale_until, _snapshot=False)
+            return True
+
+    def update(self, fn: Callable[[Any], Any]) -> bool:
+        """Lee-modifica-escribe conservando la expiración; ``False`` si no había valor.
+
+        También parcha una copia vencida que se sigue sirviendo (``stale_s``).
+        """
+        with self._lock:
+            local = self._resolve()
+            if local is None or self._serve_until(local) <= time.time():
+                return False
+            new_value = fn(local.value)
+            expires = local.expires_at
+            stale_until = local.stale_until
+        self.set(new_value, expires_at=expires, stale_until=stale_until)
+        return True
+
+    def clear(self) -> None:
+        gen = current_generation()
+        with self._lock:
+            self._local = None
+        tier = get_tier()
+        if tier.shared:
+            tier.delete(_key(gen, f"{self.name}:stamp"))
+            tier.delete(_key(gen, self.name))
+
+    def clear_local(self) -> None:
+        with self._lock:
+            self._local = None
+
+
+_flight_locks: dict[str, threading.Lock] = {}
+_flight_guard = threading.Lock()
+_refreshing: set[str] = set()
+
+
+def _flight_lock(name: str) -> threading.Lock:
+    with _flight_guard:
+        return _flight_locks.setdefault(name, threading.Lock())
+
+
+def single_flight(
+    name: str,
+    build: Callable[[], T],
+    *,
+    peek: Callable[[], T | None],
+    lock_ttl_s: float = 120.0,
+) -> T:
+    """Ejecuta ``build`` una sola vez entre hilos y workers; los demás leen ``peek``."""
+    with _flight_lock(name):
+        value = peek()
+        if value is not None:
+            record_cache(name, "hits")
+            return value
+        tier = get_tier()
+        if not tier.shared:
+            with timed_rebuild(name):
+                return build()
+        lock_key = _key(current_generation(), f"{name}:lock")
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + _env_float("WIALON_CACHE_BUILD_WAIT_SEC", 90.0)
+        while True:
+            if tier.add(lock_key, token, lock_ttl_s):
+                try:
+                    with timed_rebuild(name):
+                        return build()
+                finally:
+                    if tier.get(lock_key) == token:
+                        tier.delete(lock_key)
+            time.sleep(0.2)
+            value = peek()
+            if value is not None:
+                # Lo armó otro worker: fallo para este request, sin costo de reconstrucción.
+                record_cache(name, "misses")
+                return value
+            if time.monotonic() > deadline:
+                logger.warning("Wialon caché: otro worker no terminó %s a tiempo; se reconstruye", name)
+                with timed_rebuild(name):
+                    return build()
+
+
+def refresh_in_background(name: str, build: Callable[[], Any], *, lock_ttl_s: float = 120.0) -> bool:
+    """Lanza ``build`` en un hilo; ``False`` si ya hay una renovación en curso."""
+    with _flight_guard:
+        if name in _refreshing:
+            return False
+        _refreshing.add(name)
+
+    def _run() -> None:
+        try:
+            with _flight_lock(name):
+                tier = get_tier()
+                lock_key = _key(current_generation(), f"{name}:lock")
+                token = uuid.uuid4().hex
+                # Si otro worker ya renueva, su resultado llega por el tier.
+                if tier.shared and not tier.add(lock_key, token, lock_ttl_s):
+                    return
+                started = time.monotonic()
+                failed = True
+                try:
+                    build()
+                    failed = False
+                finally:
+                    record_rebuild(name, (time.monotonic() - started) * 1000, failed=failed)
+                    if tier.shared and tier.get(lock_key) == token:
+                        tier.delete(lock_key)
+        except Exception:
+            logger.warning("Wialon caché: falló la renovación en segundo plano de %s", name, exc_info=True)
+        finally:
+            with _flight_guard:
+                _refreshing.discard(name)
+
+    threading.Thread(target=_run, name=f"wialon-refresh-{name}", daemon=True).start()
+    return True
+
+
+def get_or_refresh(slot: CacheSlot, build: Callable[[], T], *, name: str | None = None) -> T:
+    """Stale-while-revalidate: copia vigente, o vencida + renovación en fondo, o build síncrono."""
+    flight = name or slot.name
+    snap = slot.snapshot()
+    if snap is not None:
+        if not snap.fresh:
+            record_cache(flight, "stale")
+            refresh_in_background(flight, build)
+        else:
+            record_cache(flight, "hits")
+        return snap.value
+    return single_flight(flight, build, peek=slot.get)
+
+
+def memory_report() -> dict[str, Any]:
+    """Tamaño de la copia L1 de cada slot en este worker (para diagnóstico).
+
+    Solo mide lo que ya está en memoria: no consulta el tier ni reconstruye nada.
+    """
+    now = time.time()
+    gen = current_generation()
+    slots: list[dict[str, Any]] = []
+    total = 0
+    for slot in list(_slots):
+        local = slot._local
+        if local is None or local.gen != gen:
+            continue
+        value = local.value
+        size = deep_sizeof(value)
+        total += size
+        slots.append(
+            {
+                "name": slot.name,
+                "entries": len(value) if hasattr(value, "__len__") and not isinstance(value, str) else None,
+                "bytes": size,
+                "age_sec": int(max(0.0, now - local.stored_at)),
+                "fresh": local.expires_at > now,
+            }
+        )
+    slots.sort(key=lambda row: row["bytes"], reverse=True)
+    return {"pid": os.getpid(), "total_bytes": total, "slots": slots}
+
+
+# --- Arranque en caliente ---------------------------------------------------
+
+_SNAPSHOT_FORMAT = 1
+
+
+def _no_owner() -> str | None:
+    return None
+
+
+_snapshot_owner: Callable[[], str | None] = _no_owner
+_warm_pid: int | None = None
+_warm_lock = threading.Lock()
+_snapshot_pending = False
+_snapshot_lock = threading.Lock()
+
+
+def snapshot_path() -> Path | None:
+    raw = (os.environ.get("WIALON_SNAPSHOT_PATH") or "").strip()
+    if raw.lower() in ("off", "0", "false", "no"):
+        return None
+    return Path(raw) if raw else data_dir() / "wialon-snapshot.pkl.gz"
+
+
+def configure_snapshot(owner: Callable[[], str | None]) -> None:
+    """``owner`` devuelve la huella del token vigente (``None`` = sin volcado)."""
+    global _snapshot_owner
+    _snapshot_owner = owner
+
+
+def _current_owner() -> str | None:
+    try:
+        return _snapshot_owner()
+    except Exception:
+        return None
+
+
+def write_snapshot() -> int:
+    """Vuelca los slots persistentes que este worker tiene en memoria; devuelve cuántos."""
+    path = snapshot_path()
+    owner = _current_owner()
+    if path is None or not owner:
+        return 0
+    slots: dict[str, tuple[float, Any]] = {}
+    for slot in list(_slots):
+        if not slot.persist:
+            continue
+        local = slot._local
+        if local is not None and local.gen == current_generation():
+            slots[slot.name] = (local.stored_at, local.value)
+    if not slots:
+        return 0
+    payload = {"format": _SNAPSHOT_FORMAT, "schema": _SCHEMA, "owner": owner, "slots": slots}
+    try:
+        if not path.parent.exists():
+            private_dir(path.parent)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".wialon-snap-")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as fh:
+                pickle.dump(payload, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+    except Exception:
+        logger.warning("Wialon caché: no se pudo escribir el volcado %s", path, exc_info=True)
+        return 0
+    return len(slots)
+
+
+def read_snapshot() -> dict[str, tuple[float, Any]]:
+    """Slots del volcado si coincide esquema y token y no es demasiado viejo."""
+    path = snapshot_path()
+    owner = _current_owner()
+    if path is None or not owner:
+        return {}
+    try:
+        if time.time() - path.stat().st_mtime > snapshot_max_age():
+            return {}
+        with open(path, "rb") as raw:
+            if not trusted_file(raw):
+                logger.warning("Wialon caché: el volcado %s no es de este usuario; se ignora", path)
+                return {}
+            with gzip.GzipFile(fileobj=raw, mode="rb") as fh:
+                payload = pickle.load(fh)
+    except FileNotFoundError:
+        return {}
+    except Exception:
+        logger.warning("Wialon caché: volcado ilegible en %s; se ignora", path, exc_info=True)
+        return {}
+    if (
+        not isinstance(payload, dict)
+        or payload.get("format") != _SNAPSHOT_FORMAT
+        or payload.get("schema") != _SCHEMA
+        or payload.get("owner") != owner
+    ):
+        return {}
+    slots = payload.get("slots")
+    return slots if isinstance(slots, dict) else {}
+
+
+def warm_start(*, force: bool = False) -> int:
+    """Siembra los slots persistentes desde el volcado (una vez por proceso)."""
+    global _warm_pid
+    pid = os.getpid()
+    with _warm_lock:
+        if _warm_pid == pid and not force:
+            return 0
+        # Antes de leer: ``seed`` vuelve a pasar por ``_resolve``.
+        _warm_pid = pid
+    by_name = {slot.name: slot for slot in _slots if slot.persist}
+    seeded = 0
+    for name, (stored_at, value) in read_snapshot().items():
+        slot = by_name.get(name)
+        if slot is not None and value is not None and slot.seed(value, float(stored_at)):
+            seeded += 1
+    if seeded:
+        logger.info("Wialon caché: %s slot(s) sembrados desde el volcado", seeded)
+    return seeded
+
+
+def schedule_snapshot() -> None:
+    """Programa un volcado; las escrituras de los siguientes segundos se agrupan."""
+    global _snapshot_pending
+    if snapshot_path() is None:
+        return
+    with _snapshot_lock:
+        if _snapshot_pending:
+            return
+        _snapshot_pending = True
+
+    def _run() -> None:
+        global _snapshot_pending
+        time.sleep(_env_float("WIALON_SNAPSHOT_DELAY_SEC", 10.0))
+        with _snapshot_lock:
+            _snapshot_pending = False
+        write_snapshot()
+
+    threading.Thread(target=_run, name="wialon-snapshot", daemon=True).start()
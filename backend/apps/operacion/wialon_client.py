@@ -1,20 +1,40 @@
 """Cliente mínimo para Remote API de Wialon Hosting."""
+import hashlib
 import json
 import logging
 import os
 import re
 import threading
 import time
-import urllib.error
 import urllib.parse
-import urllib.request
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Any, Callable, TypeVar
+from typing import Any, Callable, Sequence, TypeVar
 from zoneinfo import ZoneInfo
 
+import urllib3
 from django.conf import settings
 
+from apps.operacion.wialon_cache import (
+    CacheSlot,
+    bump_generation,
+    configure_snapshot,
+    get_or_refresh,
+    single_flight,
+    stale_window,
+    write_snapshot,
+)
+from apps.operacion.wialon_metrics import in_request_context, record_cache, record_call, timed_rebuild
+from apps.operacion.wialon_records import (
+    IGNITION_NAME_HINTS,
+    IGNITION_PARAM_KEYS,
+    IGNITION_TYPE_HINTS,
+    UnitRecord,
+    UserRecord,
+    compact_user_prp,
+    intern_str,
+)
+
 T = TypeVar("T")
 
 try:
@@ -53,23 +73,9 @@ UNIT_DETAIL_FLAGS = UNIT_FLAGS | 0x00800000
 # Umbral de respaldo si Wialon no envía netconn: minutos desde el último mensaje.
 _ONLINE_FALLBACK_MINUTES = int(os.environ.get("WIALON_ONLINE_FALLBACK_MINUTES", "10"))
 
-_IGNITION_PARAM_KEYS = frozenset(
-    {
-        "acc",
-        "ign",
-        "ignition",
-        "engine",
-        "motor",
-        "io_239",
-        "io239",
-        "din1",
-        "digital_1",
-        "ignicion",
-        "encendido",
-    }
-)
-_IGNITION_NAME_HINTS = ("ignition", "ignici", "motor", "acc", "encendido", "engine")
-_IGNITION_TYPE_HINTS = ("engine operation", "ignition", "engine")
+_IGNITION_PARAM_KEYS = IGNITION_PARAM_KEYS
+_IGNITION_NAME_HINTS = IGNITION_NAME_HINTS
+_IGNITION_TYPE_HINTS = IGNITION_TYPE_HINTS
 
 # Máscara de acceso por defecto al compartir unidad (ver + detalle + conectividad).
 WIALON_UNIT_ACCESS_DEFAULT = 0x1 | 0x2 | 0x1000000
@@ -97,20 +103,42 @@ _SESSION_TTL_SEC = int(os.environ.get("WIALON_SESSION_TTL_SEC", "300"))
 _USERS_CACHE_TTL_SEC = int(os.environ.get("WIALON_USERS_CACHE_TTL_SEC", "90"))
 _UNITS_INDEX_TTL_SEC = int(os.environ.get("WIALON_UNITS_INDEX_TTL_SEC", "300"))
 _PARALLEL_WORKERS = int(os.environ.get("WIALON_PARALLEL_WORKERS", "8"))
-
-_cache_lock = threading.Lock()
-# (sid, expiración, token con el que se abrió la sesión)
-_session: tuple[str, float, str] | None = None
-_users_list_cache: tuple[list[dict[str, Any]], float] | None = None
-_users_raw_cache: tuple[list[dict[str, Any]], float] | None = None
-_users_prp_cache: tuple[dict[int, dict[str, Any]], float] | None = None
-_accounts_context_cache: tuple[dict[str, Any], float] | None = None
-_units_index_cache: tuple[dict[int, dict[str, Any]], float] | None = None
-_hw_names_cache: tuple[dict[int, str], float] | None = None
-_hw_catalog_cache: tuple[list[dict[str, Any]], float] | None = None
-_vehicle_types_cache: tuple[list[dict[str, str]], float] | None = None
-_unit_sharing_cache: tuple[dict[int, list[dict[str, Any]]], float] | None = None
-_units_search_index_cache: tuple[list[dict[str, Any]], float] | None = None
+_HTTP_TIMEOUT_SEC = float(os.environ.get("WIALON_HTTP_TIMEOUT_SEC", "45"))
+# Conexiones keep-alive al host de Wialon por worker (compartidas por los hilos de _parallel_map).
+_HTTP_POOL_SIZE = max(1, int(os.environ.get("WIALON_HTTP_POOL_SIZE", "12")))
+# Con params más grandes la petición va como POST (evita URLs enormes en core/batch).
+_POST_MIN_BYTES = int(os.environ.get("WIALON_POST_MIN_BYTES", "1500"))
+# full: índice de unidades completo con core/search_items cada WIALON_UNITS_INDEX_TTL_SEC.
+# incremental: una sesión propia registra las unidades (core/update_data_flags) y cada
+# WIALON_UNITS_POLL_SEC solo se aplican los cambios de avl_evts.
+_UNITS_INDEX_MODE = (os.environ.get("WIALON_UNITS_INDEX_MODE") or "full").strip().lower()
+_UNITS_POLL_SEC = int(os.environ.get("WIALON_UNITS_POLL_SEC", "20"))
+# Re-registro completo periódico (recoge unidades creadas después del registro).
+_UNITS_RESYNC_SEC = int(os.environ.get("WIALON_UNITS_RESYNC_SEC", "3600"))
+# Wialon cierra sesiones sin actividad a los ~5 min; sin sondeo en ese lapso se re-registra.
+_UNITS_STREAM_IDLE_SEC = 240
+_WIALON_INVALID_SESSION = 1
+# Llamadas por petición core/batch (nombres, fechas de bloqueo, unidades faltantes…).
+_BATCH_MAX_CALLS = max(1, int(os.environ.get("WIALON_BATCH_MAX_CALLS", "50")))
+# Cuentas que la purga de bloqueados procesa a la vez (cada una: unidades → lote → borrado).
+_PURGE_WORKERS = max(1, int(os.environ.get("WIALON_PURGE_WORKERS", "4")))
+
+# Cachés compartibles entre workers (ver ``wialon_cache``; backend por ``WIALON_CACHE_BACKEND``).
+# Usuarios e índices se siguen sirviendo vencidos (stale_window) mientras se renuevan en fondo.
+# (sid, huella del token con el que se abrió la sesión)
+_session = CacheSlot("session", _SESSION_TTL_SEC)
+_users_list_cache = CacheSlot("users_list", _USERS_CACHE_TTL_SEC, stale_s=stale_window, persist=True)
+_users_raw_cache = CacheSlot("users_raw", _USERS_CACHE_TTL_SEC, stale_s=stale_window, persist=True)
+_users_prp_cache = CacheSlot("users_prp", _USERS_CACHE_TTL_SEC, stale_s=stale_window, persist=True)
+_accounts_context_cache = CacheSlot("accounts_context", _USERS_CACHE_TTL_SEC, persist=True)
+_units_index_cache = CacheSlot("units_index", lambda: _units_index_ttl(), stale_s=stale_window, persist=True)
+# {"sid": sesión dedicada a avl_evts, "resync_at": epoch del próximo registro completo}
+_units_stream_cache = CacheSlot("units_stream", _UNITS_STREAM_IDLE_SEC)
+_hw_names_cache = CacheSlot("hw_names", _UNITS_INDEX_TTL_SEC, persist=True)
+_hw_catalog_cache = CacheSlot("hw_catalog", _UNITS_INDEX_TTL_SEC, persist=True)
+_vehicle_types_cache = CacheSlot("vehicle_types", _UNITS_INDEX_TTL_SEC, persist=True)
+_unit_sharing_cache = CacheSlot("unit_sharing", _USERS_CACHE_TTL_SEC, stale_s=stale_window, persist=True)
+_units_search_index_cache = CacheSlot("units_search_index", _UNITS_INDEX_TTL_SEC, stale_s=stale_window, persist=True)
 
 
 class WialonError(Exception):
@@ -146,33 +174,197 @@ def _wialon_error_message(code: Any, reason: str) -> str:
     return "Error de comunicación con Wialon."
 
 
-def _call(svc: str, params: dict[str, Any], sid: str | None = None) -> dict[str, Any] | list[Any]:
-    query: dict[str, str] = {
+# (pid, pool): después de un fork del worker no se reutilizan sockets del padre.
+_http_pool_state: tuple[int, urllib3.PoolManager] | None = None
+_http_pool_lock = threading.Lock()
+
+# Servicios de solo lectura: se reintentan si el socket reutilizado ya estaba cerrado.
+_READ_ONLY_SVC_PREFIXES = ("core/search_item", "core/get_", "unit/calc_last", "account/get_", "file/")
+
+
+def _is_read_only_call(svc: str, params: dict[str, Any]) -> bool:
+    """``core/batch`` es de solo lectura solo si todas las llamadas que agrupa lo son."""
+    if svc == "core/batch":
+        inner = params.get("params") or []
+        return bool(inner) and all(
+            isinstance(call, dict) and str(call.get("svc") or "").startswith(_READ_ONLY_SVC_PREFIXES)
+            for call in inner
+        )
+    return svc.startswith(_READ_ONLY_SVC_PREFIXES)
+
+
+def _http_pool() -> urllib3.PoolManager:
+    global _http_pool_state
+    pid = os.getpid()
+    state = _http_pool_state
+    if state is not None and state[0] == pid:
+        return state[1]
+    with _http_pool_lock:
+        state = _http_pool_state
+        if state is None or state[0] != pid:
+            pool = urllib3.PoolManager(
+                num_pools=4,
+                maxsize=_HTTP_POOL_SIZE,
+                # Los hilos esperan una conexión libre en vez de abrir sockets desechables.
+                block=True,
+                headers={"Accept": "application/json"},
+            )
+            state = (pid, pool)
+            _http_pool_state = state
+    return state[1]
+
+
+def _call(
+    svc: str,
+    params: dict[str, Any],
+    sid: str | None = None,
+    *,
+    timeout: float | None = None,
+) -> dict[str, Any] | list[Any]:
+    fields: dict[str, str] = {
         "svc": svc,
         "params": json.dumps(params, separators=(",", ":")),
     }
     if sid:
-        query["sid"] = sid
-    url = f"{WIALON_API_BASE}?{urllib.parse.urlencode(query)}"
+        fields["sid"] = sid
+    return _request_json(
+        WIALON_API_BASE,
+        fields,
+        label=svc,
+        timeout=timeout,
+        retry_read=_is_read_only_call(svc, params),
+    )
+
+
+def _request_json(
+    url: str,
+    fields: dict[str, str],
+    *,
+    label: str,
+    timeout: float | None = None,
+    retry_read: bool = False,
+) -> dict[str, Any] | list[Any]:
+    encoded = urllib.parse.urlencode(fields)
+    read_timeout = timeout if timeout is not None else _HTTP_TIMEOUT_SEC
+    # Un socket keep-alive que el servidor ya cerró falla al reutilizarse: reintento solo en lecturas.
+    retries = urllib3.Retry(
+        total=2,
+        connect=2,
+        read=1 if retry_read else 0,
+        status=0,
+        other=0,
+        allowed_methods=None,
+        redirect=False,
+        raise_on_status=False,
+    )
+    request_kwargs: dict[str, Any] = {
+        "timeout": urllib3.Timeout(connect=min(10.0, read_timeout), read=read_timeout),
+        "retries": retries,
+    }
+    started = time.monotonic()
+    nbytes = 0
+    error_label: str | None = None
     try:
-        with urllib.request.urlopen(url, timeout=45) as response:
-            payload = json.loads(response.read().decode("utf-8", errors="replace"))
-    except urllib.error.URLError as exc:
-        logger.exception("Wialon request failed svc=%s", svc)
-        raise WialonError("No se pudo conectar con Wialon.") from exc
-    except json.JSONDecodeError as exc:
-        raise WialonError("Respuesta inválida de Wialon.") from exc
-
-    if isinstance(payload, dict) and payload.get("error"):
-        code = payload.get("error")
-        reason = payload.get("reason") or payload.get("message") or "Error de Wialon"
-        code_int = int(code) if code is not None else None
-        raise WialonError(_wialon_error_message(code, str(reason)), code=code_int)
+        response = _send_request(url, encoded, request_kwargs, label=label)
+        nbytes = len(response.data or b"")
+        if response.status >= 400:
+            error_label = f"http_{response.status}"
+            logger.error("Wialon request failed svc=%s status=%s", label, response.status)
+            raise WialonError("No se pudo conectar con Wialon.")
+        try:
+            payload = json.loads(response.data.decode("utf-8", errors="replace"))
+        except json.JSONDecodeError as exc:
+            error_label = "json"
+            raise WialonError("Respuesta inválida de Wialon.") from exc
+
+        error = _error_from_payload(payload)
+        if error is not None:
+            error_label = str(error.code) if error.code is not None else "api"
+            raise error
+    except WialonError:
+        if error_label is None:
+            error_label = "network"
+        raise
+    finally:
+        record_call(label, (time.monotonic() - started) * 1000, nbytes=nbytes, error=error_label)
     if isinstance(payload, (dict, list)):
         return payload
     return {}
 
 
+def _send_request(url: str, encoded: str, request_kwargs: dict[str, Any], *, label: str):
+    try:
+        if len(encoded) > _POST_MIN_BYTES:
+            response = _http_pool().request(
+                "POST",
+                url,
+                body=encoded.encode("utf-8"),
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                **request_kwargs,
+            )
+        else:
+            response = _http_pool().request("GET", f"{url}?{encoded}", **request_kwargs)
+    except urllib3.exceptions.HTTPError as exc:
+        logger.exception("Wialon request failed svc=%s", label)
+        raise WialonError("No se pudo conectar con Wialon.") from exc
+    return response
+
+
+def _error_from_payload(payload: Any) -> WialonError | None:
+    if not isinstance(payload, dict) or not payload.get("error"):
+        return None
+    code = payload.get("error")
+    reason = payload.get("reason") or payload.get("message") or "Error de Wialon"
+    try:
+        code_int = int(code)
+    except (TypeError, ValueError):
+        code_int = None
+    return WialonError(_wialon_error_message(code, str(reason)), code=code_int)
+
+
+def _call_batch(
+    calls: list[tuple[str, dict[str, Any]]],
+    sid: str,
+) -> list[dict[str, Any] | list[Any] | WialonError]:
+    """
+    Agrupa llamadas independientes en peticiones ``core/batch`` (``WIALON_BATCH_MAX_CALLS``
+    por petición; los lotes viajan en paralelo). Devuelve un resultado por llamada, en el
+    mismo orden: la respuesta o el ``WialonError`` de esa llamada, sin abortar las demás.
+    """
+    if not calls:
+        return []
+    chunks = [
+        (start, calls[start : start + _BATCH_MAX_CALLS])
+        for start in range(0, len(calls), _BATCH_MAX_CALLS)
+    ]
+
+    def _run(chunk: tuple[int, list[tuple[str, dict[str, Any]]]]) -> tuple[int, list[Any]]:
+        start, part = chunk
+        try:
+            if len(part) == 1:
+                return start, [_call(part[0][0], part[0][1], sid=sid)]
+            payload = _call(
+                "core/batch",
+                {"params": [{"svc": svc, "params": params} for svc, params in part], "flags": 0},
+                sid=sid,
+            )
+        except WialonError as exc:
+            return start, [exc] * len(part)
+        rows = payload if isinstance(payload, list) else []
+        out: list[Any] = []
+        for i, (svc, _params) in enumerate(part):
+            if i >= len(rows):
+                out.append(WialonError(f"Wialon no devolvió respuesta para {svc} en core/batch."))
+                continue
+            out.append(_error_from_payload(rows[i]) or rows[i])
+        return start, out
+
+    results: list[Any] = [None] * len(calls)
+    for start, out in _parallel_map(_run, chunks, max_workers=4):
+        results[start : start + len(out)] = out
+    return results
+
+
 def _resolve_access_token() -> str:
     """
     Token vigente. En DEBUG gana el valor de backend/.env sobre el del entorno del
@@ -220,25 +412,41 @@ def _login_fresh(token: str) -> str:
     return str(sid)
 
 
+def _token_fingerprint(token: str) -> str:
+    # El token nunca se guarda en la caché compartida, solo su huella.
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+
+def _snapshot_owner() -> str | None:
+    """Huella del token para el volcado en disco (sin token no se vuelca ni se siembra)."""
+    token = _resolve_access_token()
+    return _token_fingerprint(token) if token and _TOKEN_PATTERN.fullmatch(token) else None
+
+
+configure_snapshot(_snapshot_owner)
+
+
 def get_session() -> str:
-    """Sesión Wialon reutilizable (evita token/login en cada petición)."""
-    global _session
+    """Sesión Wialon reutilizable (evita token/login en cada petición y en cada worker)."""
     token = _require_access_token()
-    now = time.monotonic()
-    token_changed = False
-    with _cache_lock:
-        if _session:
-            if _session[2] != token:
-                token_changed = True
-            elif _session[1] > now:
-                return _session[0]
-    # Los datos cacheados pertenecen a la cuenta del token anterior.
-    if token_changed:
+    fingerprint = _token_fingerprint(token)
+    cached = _session.get()
+    if cached:
+        if cached[1] == fingerprint:
+            return cached[0]
+        # Los datos cacheados pertenecen a la cuenta del token anterior.
         invalidate_wialon_cache()
-    sid = _login_fresh(token)
-    with _cache_lock:
-        _session = (sid, time.monotonic() + _SESSION_TTL_SEC, token)
-    return sid
+
+    def _peek() -> str | None:
+        hit = _session.get()
+        return hit[0] if hit and hit[1] == fingerprint else None
+
+    def _login() -> str:
+        sid = _login_fresh(token)
+        _session.set((sid, fingerprint))
+        return sid
+
+    return single_flight("session", _login, peek=_peek, lock_ttl_s=60)
 
 
 def login_session() -> str:
@@ -246,22 +454,26 @@ def login_session() -> str:
 
 
 def invalidate_wialon_cache() -> None:
-    """Limpia cachés en memoria (p. ej. tras cambiar token o refresh forzado)."""
-    global _session, _users_list_cache, _users_raw_cache, _users_prp_cache, _accounts_context_cache
-    global _units_index_cache, _hw_names_cache, _hw_catalog_cache, _unit_sharing_cache
-    global _vehicle_types_cache, _units_search_index_cache
-    with _cache_lock:
-        _session = None
-        _users_list_cache = None
-        _users_raw_cache = None
-        _users_prp_cache = None
-        _accounts_context_cache = None
-        _units_index_cache = None
-        _hw_names_cache = None
-        _hw_catalog_cache = None
-        _unit_sharing_cache = None
-        _vehicle_types_cache = None
-        _units_search_index_cache = None
+    """Invalida las cachés de todos los workers (p. ej. tras cambiar token o refresh forzado)."""
+    bump_generation()
+
+
+def prewarm_wialon_cache() -> dict[str, Any]:
+    """Reconstruye usuarios, índices y catálogos y escribe el volcado de arranque en caliente."""
+    started = time.monotonic()
+    # Sin invalidar: con caché compartida los workers siguen sirviendo mientras tanto.
+    sid = get_session()
+    users = _build_users_list()
+    _build_units_index(sid)
+    units = _build_units_search_index()
+    catalogs = fetch_unit_catalogs()
+    return {
+        "users": len(users),
+        "units": len(units),
+        "hw_types": len(catalogs.get("hw_types") or []),
+        "slots": write_snapshot(),
+        "elapsed_sec": round(time.monotonic() - started, 2),
+    }
 
 
 def _coerce_wialon_id(value: Any) -> int | None:
@@ -275,11 +487,9 @@ def _coerce_wialon_id(value: Any) -> int | None:
 
 def _cached_user_row(wialon_user_id: int) -> dict[str, Any] | None:
     target = int(wialon_user_id)
-    with _cache_lock:
-        if _users_list_cache and _users_list_cache[1] > time.monotonic():
-            for row in _users_list_cache[0]:
-                if _coerce_wialon_id(row.get("wialon_id")) == target:
-                    return dict(row)
+    for row in _users_list_cache.peek() or []:
+        if _coerce_wialon_id(row.get("wialon_id")) == target:
+            return dict(row)
     return None
 
 
@@ -293,19 +503,18 @@ def _raw_user_from_cache(wialon_user_id: int) -> dict[str, Any] | None:
 
 def _upsert_user_list_cache(row: dict[str, Any]) -> None:
     """Actualiza una fila en la lista cacheada sin reconstruir todo Wialon."""
-    global _users_list_cache
     user_id = _coerce_wialon_id(row.get("wialon_id"))
     if user_id is None:
         return
-    with _cache_lock:
-        if not _users_list_cache or _users_list_cache[1] <= time.monotonic():
-            return
-        rows, expires = _users_list_cache
+
+    def _patch(rows: Sequence[dict[str, Any]]) -> tuple[dict[str, Any], ...]:
         updated_rows = [row if _coerce_wialon_id(r.get("wialon_id")) == user_id else r for r in rows]
         if not any(_coerce_wialon_id(r.get("wialon_id")) == user_id for r in updated_rows):
             updated_rows.append(row)
         updated_rows.sort(key=lambda u: (u.get("name") or u.get("user_id") or "").lower())
-        _users_list_cache = (updated_rows, expires)
+        return tuple(updated_rows)
+
+    _users_list_cache.update(_patch)
 
 
 def _parallel_map(
@@ -321,7 +530,7 @@ def _parallel_map(
         return [fn(item) for item in items]
     results: list[T] = []
     with ThreadPoolExecutor(max_workers=workers) as executor:
-        futures = [executor.submit(fn, item) for item in items]
+        futures = [executor.submit(in_request_context(fn), item) for item in items]
         for future in as_completed(futures):
             results.append(future.result())
     return results
@@ -548,17 +757,16 @@ def _engine_label(engine_on: bool | None) -> str:
 
 
 def _calc_last_for_units(sid: str, unit_ids: list[int]) -> dict[int, dict[str, Any]]:
-    """unit/calc_last en lotes → mapa unit_id → payload."""
+    """unit/calc_last en lotes de 40 ids (todos en core/batch) → mapa unit_id → payload."""
     if not unit_ids:
         return {}
     result: dict[int, dict[str, Any]] = {}
     chunk_size = 40
-    for start in range(0, len(unit_ids), chunk_size):
-        chunk = unit_ids[start : start + chunk_size]
-        try:
-            payload = _call("unit/calc_last", {"itemIds": chunk}, sid=sid)
-        except WialonError as exc:
-            logger.warning("Wialon unit/calc_last falló (%s ids): %s", len(chunk), exc)
+    chunks = [unit_ids[start : start + chunk_size] for start in range(0, len(unit_ids), chunk_size)]
+    payloads = _call_batch([("unit/calc_last", {"itemIds": chunk}) for chunk in chunks], sid)
+    for chunk, payload in zip(chunks, payloads):
+        if isinstance(payload, WialonError):
+            logger.warning("Wialon unit/calc_last falló (%s ids): %s", len(chunk), payload)
             continue
         rows = payload if isinstance(payload, list) else []
         for row in rows:
@@ -612,22 +820,22 @@ def _assigned_units_count(
     return active
 
 
-def _resolve_item_name(sid: str, item_id: int) -> tuple[int, str]:
-    try:
-        data = _call("core/search_item", {"id": item_id, "flags": 1}, sid=sid)
-        if not isinstance(data, dict):
-            return item_id, ""
-        item = data.get("item") if isinstance(data.get("item"), dict) else {}
-        return item_id, str(item.get("nm") or "").strip()
-    except WialonError:
-        return item_id, ""
+def _item_from_search_item(data: Any) -> dict[str, Any] | None:
+    """Ítem de una respuesta ``core/search_item`` (``None`` si falló o no existe)."""
+    if not isinstance(data, dict):
+        return None
+    item = data.get("item")
+    return item if isinstance(item, dict) else None
 
 
 def _resolve_item_names(sid: str, item_ids: set[int], names_by_id: dict[int, str]) -> None:
     missing = [i for i in item_ids if i not in names_by_id or not names_by_id[i]]
     if not missing:
         return
-    for item_id, name in _parallel_map(lambda i: _resolve_item_name(sid, i), missing):
+    responses = _call_batch([("core/search_item", {"id": i, "flags": 1}) for i in missing], sid)
+    for item_id, data in zip(missing, responses):
+        item = _item_from_search_item(data) or {}
+        name = str(item.get("nm") or "").strip()
         if name:
             names_by_id[item_id] = name
 
@@ -636,22 +844,18 @@ def _format_unix_datetime(ts: int) -> str:
     return datetime.fromtimestamp(ts, tz=WIALON_TZ).strftime("%d/%m/%Y %H:%M")
 
 
-def _blocked_date_for_account(sid: str, account_id: int) -> tuple[int, str | None, int | None]:
-    """Devuelve (account_id, etiqueta legible, unix switchTime) si la cuenta está deshabilitada."""
-    try:
-        data = _call("account/get_account_data", {"itemId": account_id}, sid=sid)
-    except WialonError:
-        return account_id, None, None
+def _blocked_date_from_account_data(data: Any) -> tuple[str | None, int | None]:
+    """(etiqueta legible, unix switchTime) si ``account/get_account_data`` indica cuenta deshabilitada."""
     if not isinstance(data, dict) or data.get("enabled") != 0:
-        return account_id, None, None
+        return None, None
     switch_time = data.get("switchTime")
     if switch_time is None:
-        return account_id, None, None
+        return None, None
     try:
         ts = int(switch_time)
-        return account_id, _format_unix_datetime(ts), ts
+        return _format_unix_datetime(ts), ts
     except (TypeError, ValueError, OSError):
-        return account_id, None, None
+        return None, None
 
 
 def _fetch_blocked_dates(
@@ -659,14 +863,15 @@ def _fetch_blocked_dates(
 ) -> tuple[dict[int, str], dict[int, int]]:
     if not account_ids:
         return {}, {}
-    triples = _parallel_map(
-        lambda aid: _blocked_date_for_account(sid, aid),
-        list(account_ids),
-        max_workers=6,
+    ordered = sorted(account_ids)
+    responses = _call_batch(
+        [("account/get_account_data", {"itemId": aid}) for aid in ordered],
+        sid,
     )
     labels: dict[int, str] = {}
     timestamps: dict[int, int] = {}
-    for aid, label, ts in triples:
+    for aid, data in zip(ordered, responses):
+        label, ts = _blocked_date_from_account_data(data)
         if label:
             labels[aid] = label
         if ts is not None:
@@ -728,13 +933,14 @@ def _normalize_user(
         if blocked_ts_by_account:
             blocked_at = blocked_ts_by_account.get(acct_int)
 
+    # Creador y cuenta padre se repiten en cientos de filas: una sola copia por worker.
     return {
         "wialon_id": item.get("id"),
         "account_id": acct_int,
         "user_id": user_login or "—",
-        "name": account_name or user_login or "—",
-        "creator": creator_name or (str(creator_id) if creator_id is not None else "—"),
-        "parent_account": parent_name or "—",
+        "name": intern_str(account_name or user_login or "—"),
+        "creator": intern_str(creator_name or (str(creator_id) if creator_id is not None else "—")),
+        "parent_account": intern_str(parent_name or "—"),
         "dealer_rights": "Sí" if dealer_on else "No",
         "assigned_units": units_count,
         "status": "Bloqueado" if is_blocked else "Activo",
@@ -745,15 +951,17 @@ def _normalize_user(
 
 def _load_accounts_context(sid: str) -> dict[str, Any]:
     """Metadatos de cuentas Wialon (bloqueo, distribuidor, nombres) con caché compartida."""
-    global _accounts_context_cache
-    now = time.monotonic()
-    with _cache_lock:
-        if _accounts_context_cache and _accounts_context_cache[1] > now:
-            return _accounts_context_cache[0]
+    return single_flight(
+        "accounts_context",
+        lambda: _build_accounts_context(sid),
+        peek=_accounts_context_cache.get,
+    )
 
+
+def _build_accounts_context(sid: str) -> dict[str, Any]:
     with ThreadPoolExecutor(max_workers=3) as executor:
         fut_accounts = executor.submit(
-            _search_items,
+            in_request_context(_search_items),
             sid,
             items_type="avl_resource",
             prop_name="rel_is_account",
@@ -761,8 +969,12 @@ def _load_accounts_context(sid: str) -> dict[str, Any]:
             flags=ACCOUNT_FLAGS,
             force=0,
         )
-        fut_blocked = executor.submit(_account_ids_by_property, sid, "sys_account_disabled", "1")
-        fut_dealer = executor.submit(_account_ids_by_property, sid, "sys_account_enable_parent", "1")
+        fut_blocked = executor.submit(
+            in_request_context(_account_ids_by_property), sid, "sys_account_disabled", "1"
+        )
+        fut_dealer = executor.submit(
+            in_request_context(_account_ids_by_property), sid, "sys_account_enable_parent", "1"
+        )
         accounts = fut_accounts.result()
         blocked_account_ids = fut_blocked.result()
         dealer_account_ids = fut_dealer.result()
@@ -784,9 +996,7 @@ def _load_accounts_context(sid: str) -> dict[str, Any]:
         "blocked_dates_by_account": {},
         "blocked_ts_by_account": {},
     }
-    expires = time.monotonic() + _USERS_CACHE_TTL_SEC
-    with _cache_lock:
-        _accounts_context_cache = (ctx, expires)
+    _accounts_context_cache.set(ctx)
     return ctx
 
 
@@ -840,17 +1050,18 @@ def _build_users_payload(sid: str, users: list[dict[str, Any]]) -> list[dict[str
         ctx.get("blocked_ts_by_account") or {},
     )
     if blocked_dates_by_account or blocked_ts_by_account:
-        global _accounts_context_cache
-        with _cache_lock:
-            if _accounts_context_cache and _accounts_context_cache[1] > time.monotonic():
-                merged_ctx = dict(_accounts_context_cache[0])
-                merged_dates = dict(merged_ctx.get("blocked_dates_by_account") or {})
-                merged_dates.update(blocked_dates_by_account)
-                merged_ctx["blocked_dates_by_account"] = merged_dates
-                merged_ts = dict(merged_ctx.get("blocked_ts_by_account") or {})
-                merged_ts.update(blocked_ts_by_account)
-                merged_ctx["blocked_ts_by_account"] = merged_ts
-                _accounts_context_cache = (merged_ctx, _accounts_context_cache[1])
+
+        def _merge_blocked(cached_ctx: dict[str, Any]) -> dict[str, Any]:
+            merged_ctx = dict(cached_ctx)
+            merged_dates = dict(merged_ctx.get("blocked_dates_by_account") or {})
+            merged_dates.update(blocked_dates_by_account)
+            merged_ctx["blocked_dates_by_account"] = merged_dates
+            merged_ts = dict(merged_ctx.get("blocked_ts_by_account") or {})
+            merged_ts.update(blocked_ts_by_account)
+            merged_ctx["blocked_ts_by_account"] = merged_ts
+            return merged_ctx
+
+        _accounts_context_cache.update(_merge_blocked)
 
     missing_ids: set[int] = set()
     for item in users:
@@ -884,52 +1095,60 @@ def _build_users_payload(sid: str, users: list[dict[str, Any]]) -> list[dict[str
     return result
 
 
-def fetch_users(*, use_cache: bool = True) -> list[dict[str, Any]]:
-    """Lista usuarios Wialon con campos enriquecidos para la tabla de cuentas."""
-    global _users_list_cache, _users_raw_cache, _users_prp_cache
+def fetch_users(*, use_cache: bool = True) -> Sequence[dict[str, Any]]:
+    """
+    Lista usuarios Wialon con campos enriquecidos para la tabla de cuentas.
+
+    Devuelve la tupla cacheada tal cual (sin copiar): es de solo lectura.
+    """
+    if not use_cache:
+        return _build_users_list()
+    return get_or_refresh(_users_list_cache, _build_users_list, name="users")
 
-    now = time.monotonic()
-    if use_cache:
-        with _cache_lock:
-            if _users_list_cache and _users_list_cache[1] > now:
-                return list(_users_list_cache[0])
 
+def _build_users_list() -> tuple[dict[str, Any], ...]:
     sid = get_session()
-    users = _search_items(
-        sid,
-        items_type="user",
-        prop_name="sys_name",
-        flags=USER_FLAGS,
-        force=0,
-    )
+    users = [
+        UserRecord.from_item(item)
+        for item in _search_items(
+            sid,
+            items_type="user",
+            prop_name="sys_name",
+            flags=USER_FLAGS,
+            force=0,
+        )
+    ]
 
-    result = _build_users_payload(sid, users)
+    result = tuple(_build_users_payload(sid, users))
 
     prp_by_user: dict[int, dict[str, Any]] = {}
     for item in users:
         uid = item.get("id")
         if uid is not None:
-            prp = item.get("prp") if isinstance(item.get("prp"), dict) else {}
-            prp_by_user[int(uid)] = prp
+            prp_by_user[int(uid)] = item.get("prp") or {}
 
-    expires = time.monotonic() + _USERS_CACHE_TTL_SEC
     sharing_index = _build_unit_sharing_index(users, result)
-    with _cache_lock:
-        _users_list_cache = (result, expires)
-        _users_raw_cache = (users, expires)
-        _users_prp_cache = (prp_by_user, expires)
-        _unit_sharing_cache = (sharing_index, expires)
+    # La lista va al final: es la que ``fetch_users`` usa para saber que ya hay datos.
+    _users_raw_cache.set(tuple(users))
+    _users_prp_cache.set(prp_by_user)
+    _unit_sharing_cache.set(sharing_index)
+    _users_list_cache.set(result)
 
     return result
 
 
+def _units_index_ttl() -> int:
+    return _UNITS_POLL_SEC if _UNITS_INDEX_MODE == "incremental" else _UNITS_INDEX_TTL_SEC
+
+
 def _get_units_index(sid: str) -> dict[int, dict[str, Any]]:
-    global _units_index_cache
-    now = time.monotonic()
-    with _cache_lock:
-        if _units_index_cache and _units_index_cache[1] > now:
-            return _units_index_cache[0]
+    if _UNITS_INDEX_MODE == "incremental":
+        return get_or_refresh(_units_index_cache, _sync_units_index)
+    # La renovación puede correr en fondo cuando ``sid`` ya venció: pide la sesión vigente.
+    return get_or_refresh(_units_index_cache, lambda: _build_units_index(get_session()))
 
+
+def _build_units_index(sid: str) -> dict[int, dict[str, Any]]:
     items = _search_items(
         sid,
         items_type="avl_unit",
@@ -941,24 +1160,118 @@ def _get_units_index(sid: str) -> dict[int, dict[str, Any]]:
     for item in items:
         unit_id = item.get("id")
         if unit_id is not None:
-            index[int(unit_id)] = item
+            index[int(unit_id)] = UnitRecord.from_item(item)
 
-    with _cache_lock:
-        _units_index_cache = (index, time.monotonic() + _UNITS_INDEX_TTL_SEC)
+    _units_index_cache.set(index)
+    return index
+
+
+def _avl_events_url() -> str:
+    base = WIALON_API_BASE.split("/wialon/", 1)[0]
+    return f"{base}/avl_evts"
+
+
+def _register_units_stream() -> dict[int, dict[str, Any]]:
+    """Sesión nueva + ``core/update_data_flags`` sobre todas las unidades (datos completos)."""
+    previous = _units_stream_cache.get()
+    if previous:
+        try:
+            _call("core/logout", {}, sid=previous["sid"])
+        except WialonError:
+            pass
+    stream_sid = _login_fresh(_require_access_token())
+    payload = _call(
+        "core/update_data_flags",
+        {"spec": [{"type": "type", "data": "avl_unit", "flags": UNIT_FLAGS, "mode": 0}]},
+        sid=stream_sid,
+    )
+    index: dict[int, dict[str, Any]] = {}
+    for row in payload if isinstance(payload, list) else []:
+        if isinstance(row, dict) and row.get("i") is not None and isinstance(row.get("d"), dict):
+            index[int(row["i"])] = UnitRecord.from_item(row["d"])
+    if not index:
+        # Respuesta sin datos de ítems: carga completa con la misma sesión (ya registrada).
+        index = _build_units_index(stream_sid)
+    _units_stream_cache.set({"sid": stream_sid, "resync_at": time.time() + _UNITS_RESYNC_SEC})
+    _units_index_cache.set(index)
+    return index
+
+
+def _apply_unit_events(
+    sid: str,
+    index: dict[int, dict[str, Any]],
+    events: list[Any],
+) -> dict[int, dict[str, Any]]:
+    """Aplica eventos de avl_evts (``u`` cambio de datos, ``m`` mensaje, ``d`` borrado)."""
+    updated = dict(index)
+    unknown: set[int] = set()
+    for event in events:
+        if not isinstance(event, dict):
+            continue
+        unit_id = _coerce_wialon_id(event.get("i"))
+        kind = event.get("t")
+        data = event.get("d")
+        if unit_id is None:
+            continue
+        if kind == "d":
+            updated.pop(unit_id, None)
+            continue
+        if unit_id not in updated:
+            unknown.add(unit_id)
+            continue
+        if not isinstance(data, dict):
+            continue
+        item = dict(updated[unit_id])
+        if kind == "u":
+            item.update(data)
+        elif kind == "m":
+            item["lmsg"] = data
+            if isinstance(data.get("pos"), dict):
+                item["pos"] = data["pos"]
+        updated[unit_id] = UnitRecord.from_item(item)
+    if unknown:
+        responses = _call_batch(
+            [("core/search_item", {"id": uid, "flags": UNIT_FLAGS}) for uid in sorted(unknown)],
+            sid,
+        )
+        for resp in responses:
+            item = _item_from_search_item(resp)
+            if item is not None and item.get("id") is not None:
+                updated[int(item["id"])] = UnitRecord.from_item(item)
+    return updated
+
+
+def _sync_units_index() -> dict[int, dict[str, Any]]:
+    """Modo incremental: sondea avl_evts; registro completo solo sin sesión o al re-sincronizar."""
+    stream = _units_stream_cache.get()
+    # Lectura forzada: otro worker pudo aplicar eventos hace un instante.
+    current = _units_index_cache.peek(revalidate=True)
+    if not stream or current is None or time.time() >= stream["resync_at"]:
+        return _register_units_stream()
+    try:
+        payload = _request_json(_avl_events_url(), {"sid": stream["sid"]}, label="avl_evts")
+    except WialonError as exc:
+        if exc.code == _WIALON_INVALID_SESSION:
+            logger.info("Wialon avl_evts: sesión perdida, se registra de nuevo el índice")
+            return _register_units_stream()
+        logger.warning("Wialon avl_evts falló: %s", exc)
+        # Se conserva el índice actual hasta el siguiente sondeo.
+        _units_index_cache.set(current)
+        return current
+    events = payload.get("events") if isinstance(payload, dict) else None
+    index = _apply_unit_events(stream["sid"], current, events or [])
+    _units_stream_cache.set(stream)
+    _units_index_cache.set(index)
     return index
 
 
 def _get_hw_type_names(sid: str, hw_ids: set[int]) -> dict[int, str]:
-    global _hw_names_cache
     if not hw_ids:
         return {}
 
-    now = time.monotonic()
-    with _cache_lock:
-        if _hw_names_cache and _hw_names_cache[1] > now:
-            cached = _hw_names_cache[0]
-            if hw_ids.issubset(cached.keys()):
-                return {hid: cached[hid] for hid in hw_ids}
+    cached = _hw_names_cache.get()
+    if cached is not None and hw_ids.issubset(cached.keys()):
+        return {hid: cached[hid] for hid in hw_ids}
 
     payload = _call(
         "core/get_hw_types",
@@ -974,14 +1287,11 @@ def _get_hw_type_names(sid: str, hw_ids: set[int]) -> dict[int, str]:
         for entry in payload:
             if not isinstance(entry, dict) or entry.get("id") is None:
                 continue
-            names[int(entry["id"])] = str(entry.get("name") or entry.get("hw_category") or "").strip()
+            names[int(entry["id"])] = intern_str(str(entry.get("name") or entry.get("hw_category") or "").strip())
 
-    with _cache_lock:
-        if _hw_names_cache and _hw_names_cache[1] > now:
-            merged = {**_hw_names_cache[0], **names}
-        else:
-            merged = names
-        _hw_names_cache = (merged, time.monotonic() + _UNITS_INDEX_TTL_SEC)
+    if not _hw_names_cache.update(lambda prev: {**prev, **names}):
+        _hw_names_cache.set(names)
+    merged = _hw_names_cache.get() or names
 
     return {hid: names.get(hid) or merged.get(hid, "") for hid in hw_ids}
 
@@ -1170,31 +1480,22 @@ def _units_for_user(
 
 
 def _user_prp_from_cache(wialon_user_id: int) -> dict[str, Any] | None:
-    with _cache_lock:
-        if _users_prp_cache and _users_prp_cache[1] > time.monotonic():
-            return _users_prp_cache[0].get(int(wialon_user_id))
-    return None
+    prp_map = _users_prp_cache.peek()
+    if prp_map is None:
+        return None
+    return prp_map.get(int(wialon_user_id))
 
 
 def _users_raw_from_cache() -> list[dict[str, Any]] | None:
-    with _cache_lock:
-        if _users_raw_cache and _users_raw_cache[1] > time.monotonic():
-            return _users_raw_cache[0]
-    return None
+    return _users_raw_cache.peek()
 
 
 def _users_normalized_from_cache() -> list[dict[str, Any]] | None:
-    with _cache_lock:
-        if _users_list_cache and _users_list_cache[1] > time.monotonic():
-            return _users_list_cache[0]
-    return None
+    return _users_list_cache.peek()
 
 
 def _sharing_index_from_cache() -> dict[int, list[dict[str, Any]]] | None:
-    with _cache_lock:
-        if _unit_sharing_cache and _unit_sharing_cache[1] > time.monotonic():
-            return _unit_sharing_cache[0]
-    return None
+    return _unit_sharing_cache.peek()
 
 
 def _build_units_fast(sid: str, user_id: int) -> list[dict[str, Any]]:
@@ -1219,11 +1520,9 @@ def _build_units_fast(sid: str, user_id: int) -> list[dict[str, Any]]:
 
 
 def _user_login_from_cache(user_id: int) -> str:
-    with _cache_lock:
-        if _users_list_cache and _users_list_cache[1] > time.monotonic():
-            for row in _users_list_cache[0]:
-                if row.get("wialon_id") == user_id:
-                    return str(row.get("user_id") or "")
+    for row in _users_list_cache.peek() or []:
+        if row.get("wialon_id") == user_id:
+            return str(row.get("user_id") or "")
     return ""
 
 
@@ -1284,11 +1583,8 @@ def _sync_accounts_context_after_update(
     blocked_label: str | None,
     blocked_at: int | None = None,
 ) -> None:
-    global _accounts_context_cache
-    with _cache_lock:
-        if not _accounts_context_cache or _accounts_context_cache[1] <= time.monotonic():
-            return
-        ctx = dict(_accounts_context_cache[0])
+    def _patch(cached_ctx: dict[str, Any]) -> dict[str, Any]:
+        ctx = dict(cached_ctx)
         blocked = set(ctx.get("blocked_account_ids") or set())
         dealer = set(ctx.get("dealer_account_ids") or set())
         dates = dict(ctx.get("blocked_dates_by_account") or {})
@@ -1313,15 +1609,14 @@ def _sync_accounts_context_after_update(
         ctx["dealer_account_ids"] = dealer
         ctx["blocked_dates_by_account"] = dates
         ctx["blocked_ts_by_account"] = timestamps
-        _accounts_context_cache = (ctx, _accounts_context_cache[1])
+        return ctx
+
+    _accounts_context_cache.update(_patch)
 
 
 def _sync_account_name_in_context(account_id: int, name: str) -> None:
-    global _accounts_context_cache
-    with _cache_lock:
-        if not _accounts_context_cache or _accounts_context_cache[1] <= time.monotonic():
-            return
-        ctx = dict(_accounts_context_cache[0])
+    def _patch(cached_ctx: dict[str, Any]) -> dict[str, Any]:
+        ctx = dict(cached_ctx)
         names = dict(ctx.get("names_by_id") or {})
         accounts = dict(ctx.get("accounts_by_id") or {})
         names[int(account_id)] = name
@@ -1332,7 +1627,9 @@ def _sync_account_name_in_context(account_id: int, name: str) -> None:
             accounts[int(account_id)] = acct
         ctx["names_by_id"] = names
         ctx["accounts_by_id"] = accounts
-        _accounts_context_cache = (ctx, _accounts_context_cache[1])
+        return ctx
+
+    _accounts_context_cache.update(_patch)
 
 
 def update_wialon_user(
@@ -1422,7 +1719,7 @@ def update_wialon_user(
         tasks[0]()
     else:
         with ThreadPoolExecutor(max_workers=min(3, len(tasks))) as executor:
-            futs = [executor.submit(fn) for fn in tasks]
+            futs = [executor.submit(in_request_context(fn)) for fn in tasks]
             for fut in futs:
                 fut.result()
 
@@ -1456,12 +1753,7 @@ def update_wialon_user(
     _upsert_user_list_cache(row)
 
     prp = user_item.get("prp") if isinstance(user_item.get("prp"), dict) else {}
-    global _users_prp_cache
-    with _cache_lock:
-        if _users_prp_cache and _users_prp_cache[1] > time.monotonic():
-            prp_map = dict(_users_prp_cache[0])
-            prp_map[user_id] = prp
-            _users_prp_cache = (prp_map, _users_prp_cache[1])
+    _users_prp_cache.update(lambda prp_map: {**prp_map, user_id: compact_user_prp(prp)})
 
     return row
 
@@ -1571,15 +1863,30 @@ def _resolve_unit_owners_for_search(
     return owners
 
 
-def fetch_units_search_index(*, use_cache: bool = True) -> list[dict[str, Any]]:
-    """Índice unidad → cuentas asignadas para búsqueda en la vista de usuarios."""
-    global _units_search_index_cache
-    now = time.monotonic()
-    if use_cache:
-        with _cache_lock:
-            if _units_search_index_cache and _units_search_index_cache[1] > now:
-                return list(_units_search_index_cache[0])
+def fetch_units_search_index(*, use_cache: bool = True) -> Sequence[dict[str, Any]]:
+    """Índice unidad → cuentas asignadas para búsqueda (tupla cacheada, solo lectura)."""
+    if not use_cache:
+        return _build_units_search_index()
+    return get_or_refresh(_units_search_index_cache, _build_units_search_index)
+
+
+def _snapshot_meta(slot: CacheSlot) -> tuple[int | None, bool]:
+    snap = slot.snapshot()
+    if snap is None:
+        return None, False
+    return int(snap.age_s), not snap.fresh
+
 
+def users_snapshot_meta() -> tuple[int | None, bool]:
+    """``(antigüedad en segundos, vencido y renovándose)`` del listado de usuarios servido."""
+    return _snapshot_meta(_users_list_cache)
+
+
+def units_search_index_snapshot_meta() -> tuple[int | None, bool]:
+    return _snapshot_meta(_units_search_index_cache)
+
+
+def _build_units_search_index() -> tuple[dict[str, Any], ...]:
     sid = get_session()
     users_raw = _users_raw_from_cache()
     users_normalized = _users_normalized_from_cache()
@@ -1624,9 +1931,9 @@ def fetch_units_search_index(*, use_cache: bool = True) -> list[dict[str, Any]]:
         )
 
     entries.sort(key=lambda row: (row.get("name") or row.get("uid") or "").lower())
-    with _cache_lock:
-        _units_search_index_cache = (entries, now + _UNITS_INDEX_TTL_SEC)
-    return entries
+    result = tuple(entries)
+    _units_search_index_cache.set(result)
+    return result
 
 
 def fetch_user_units(wialon_user_id: int) -> dict[str, Any]:
@@ -1669,24 +1976,19 @@ def _build_units_on_demand(sid: str, user_id: int, user_login: str) -> list[dict
         }
     ]
     sharing_index = _build_unit_sharing_index(users_raw, users_normalized)
-    units_index = _get_units_index(sid)
+    # Copia superficial: las unidades faltantes no deben escribirse en el índice cacheado.
+    units_index = dict(_get_units_index(sid))
     prp = user.get("prp") if isinstance(user.get("prp"), dict) else {}
     unit_ids = _user_unit_ids_from_prp(prp)
     missing_ids = [int(uid) for uid in unit_ids if int(uid) not in units_index]
 
     if missing_ids:
-
-        def _fetch_unit(uid: int) -> dict[str, Any] | None:
-            try:
-                resp = _call("core/search_item", {"id": uid, "flags": UNIT_FLAGS}, sid=sid)
-            except WialonError:
-                return None
-            if not isinstance(resp, dict):
-                return None
-            item = resp.get("item")
-            return item if isinstance(item, dict) else None
-
-        for item in _parallel_map(_fetch_unit, missing_ids, max_workers=6):
+        responses = _call_batch(
+            [("core/search_item", {"id": uid, "flags": UNIT_FLAGS}) for uid in missing_ids],
+            sid,
+        )
+        for resp in responses:
+            item = _item_from_search_item(resp)
             if item is None:
                 continue
             uid = item.get("id")
@@ -1800,33 +2102,32 @@ def _parse_type_library_payload(payload: Any) -> list[dict[str, str]]:
 
 
 def _fetch_vehicle_types(sid: str, *, lang: str = "es") -> list[dict[str, str]]:
-    global _vehicle_types_cache
-    now = time.monotonic()
-    with _cache_lock:
-        if _vehicle_types_cache and _vehicle_types_cache[1] > now:
-            return list(_vehicle_types_cache[0])
-
-    payload = _call("file/type_library", {"lang": lang}, sid=sid)
-    catalog = _parse_type_library_payload(payload)
+    cached = _vehicle_types_cache.get()
+    if cached is not None:
+        record_cache("vehicle_types", "hits")
+        return list(cached)
+
+    with timed_rebuild("vehicle_types"):
+        payload = _call("file/type_library", {"lang": lang}, sid=sid)
+        catalog = _parse_type_library_payload(payload)
     if not catalog:
         catalog = list(WIALON_VEHICLE_TYPES)
-    with _cache_lock:
-        _vehicle_types_cache = (catalog, now + _UNITS_INDEX_TTL_SEC)
+    _vehicle_types_cache.set(catalog)
     return catalog
 
 
 def _fetch_all_hw_types(sid: str) -> list[dict[str, Any]]:
-    global _hw_catalog_cache
-    now = time.monotonic()
-    with _cache_lock:
-        if _hw_catalog_cache and _hw_catalog_cache[1] > now:
-            return list(_hw_catalog_cache[0])
-
-    payload = _call(
-        "core/get_hw_types",
-        {"filterType": "name", "filterValue": "", "includeType": True},
-        sid=sid,
-    )
+    cached = _hw_catalog_cache.get()
+    if cached is not None:
+        record_cache("hw_catalog", "hits")
+        return list(cached)
+
+    with timed_rebuild("hw_catalog"):
+        payload = _call(
+            "core/get_hw_types",
+            {"filterType": "name", "filterValue": "", "includeType": True},
+            sid=sid,
+        )
     catalog: list[dict[str, Any]] = []
     if isinstance(payload, list):
         for entry in payload:
@@ -1840,8 +2141,7 @@ def _fetch_all_hw_types(sid: str) -> list[dict[str, Any]]:
                 }
             )
     catalog.sort(key=lambda r: (r.get("name") or "").lower())
-    with _cache_lock:
-        _hw_catalog_cache = (catalog, now + _UNITS_INDEX_TTL_SEC)
+    _hw_catalog_cache.set(catalog)
     return catalog
 
 
@@ -1868,11 +2168,9 @@ def fetch_users_for_access() -> list[dict[str, Any]]:
 
 def _raw_unit_by_id(unit_id: int) -> dict[str, Any]:
     target = int(unit_id)
-    with _cache_lock:
-        if _units_index_cache and _units_index_cache[1] > time.monotonic():
-            cached = _units_index_cache[0].get(target)
-            if cached:
-                return cached
+    cached = (_units_index_cache.peek() or {}).get(target)
+    if cached:
+        return cached
     sid = get_session()
     resp = _call("core/search_item", {"id": target, "flags": UNIT_DETAIL_FLAGS}, sid=sid)
     if not isinstance(resp, dict):
@@ -1979,13 +2277,7 @@ def fetch_unit_detail(unit_id: int, *, context_user_id: int | None = None) -> di
 
 
 def _patch_units_index_entry(unit_id: int, item: dict[str, Any]) -> None:
-    global _units_index_cache
-    with _cache_lock:
-        if not _units_index_cache or _units_index_cache[1] <= time.monotonic():
-            return
-        index = dict(_units_index_cache[0])
-        index[int(unit_id)] = item
-        _units_index_cache = (index, _units_index_cache[1])
+    _units_index_cache.update(lambda index: {**index, int(unit_id): UnitRecord.from_item(item)})
 
 
 def update_wialon_unit(
@@ -2109,7 +2401,7 @@ def update_wialon_unit(
         tasks[0]()
     else:
         with ThreadPoolExecutor(max_workers=min(4, len(tasks))) as executor:
-            futs = [executor.submit(fn) for fn in tasks]
+            futs = [executor.submit(in_request_context(fn)) for fn in tasks]
             for fut in futs:
                 fut.result()
 
@@ -2117,9 +2409,7 @@ def update_wialon_unit(
     if isinstance(refreshed, dict) and isinstance(refreshed.get("item"), dict):
         _patch_units_index_entry(target, refreshed["item"])
 
-    global _unit_sharing_cache
-    with _cache_lock:
-        _unit_sharing_cache = None
+    _unit_sharing_cache.clear()
 
     return fetch_unit_detail(target)
 
@@ -2132,12 +2422,8 @@ def grant_unit_access(unit_id: int, user_id: int, *, access_mask: int | None = N
         {"userId": int(user_id), "itemId": int(unit_id), "accessMask": mask},
         sid=sid,
     )
-    global _unit_sharing_cache, _users_list_cache, _users_raw_cache, _users_prp_cache
-    with _cache_lock:
-        _unit_sharing_cache = None
-        _users_list_cache = None
-        _users_raw_cache = None
-        _users_prp_cache = None
+    for slot in (_unit_sharing_cache, _users_list_cache, _users_raw_cache, _users_prp_cache):
+        slot.clear()
 
 
 def revoke_unit_access(unit_id: int, user_id: int) -> None:
@@ -2147,12 +2433,8 @@ def revoke_unit_access(unit_id: int, user_id: int) -> None:
         {"userId": int(user_id), "itemId": int(unit_id), "accessMask": 0},
         sid=sid,
     )
-    global _unit_sharing_cache, _users_list_cache, _users_raw_cache, _users_prp_cache
-    with _cache_lock:
-        _unit_sharing_cache = None
-        _users_list_cache = None
-        _users_raw_cache = None
-        _users_prp_cache = None
+    for slot in (_unit_sharing_cache, _users_list_cache, _users_raw_cache, _users_prp_cache):
+        slot.clear()
 
 
 WIALON_BLOCKED_PURGE_DAYS_DEFAULT = 35
@@ -2173,10 +2455,8 @@ def set_wialon_unit_active(unit_id: int, active: bool, *, context_user_id: int |
     refreshed = _call("core/search_item", {"id": target, "flags": UNIT_DETAIL_FLAGS}, sid=sid)
     if isinstance(refreshed, dict) and isinstance(refreshed.get("item"), dict):
         _patch_units_index_entry(target, refreshed["item"])
-    global _unit_sharing_cache, _units_search_index_cache
-    with _cache_lock:
-        _unit_sharing_cache = None
-        _units_search_index_cache = None
+    _unit_sharing_cache.clear()
+    _units_search_index_cache.clear()
     return fetch_unit_detail(target, context_user_id=context_user_id)
 
 
@@ -2186,27 +2466,28 @@ def delete_wialon_user(user_id: int) -> None:
     _call("core/delete_item", {"itemId": int(user_id)}, sid=sid)
 
 
-def purge_blocked_accounts(
-    *,
-    days: int = WIALON_BLOCKED_PURGE_DAYS_DEFAULT,
-    dry_run: bool = False,
-) -> dict[str, Any]:
+def deactivate_wialon_units(unit_ids: list[int]) -> dict[int, str]:
     """
-    Para cuentas bloqueadas con más de `days` días:
-    1) desactiva las unidades asignadas al usuario (unit/set_active active=0)
-    2) elimina el usuario Wialon (core/delete_item)
-
-    No usa account/delete_account: varias cuentas pueden compartir el mismo bact.
+    Desactiva varias unidades con ``core/batch`` (unit/set_active active=0).
+    Devuelve ``{unit_id: detalle}`` de las que fallaron; no toca las cachés.
     """
+    targets = [int(uid) for uid in unit_ids]
+    if not targets:
+        return {}
+    sid = get_session()
+    results = _call_batch([("unit/set_active", {"itemId": uid, "active": 0}) for uid in targets], sid)
+    return {uid: str(res) for uid, res in zip(targets, results) if isinstance(res, WialonError)}
+
+
+def plan_blocked_purge(*, days: int = WIALON_BLOCKED_PURGE_DAYS_DEFAULT) -> dict[str, Any]:
+    """Cuentas bloqueadas hace más de ``days`` días (``candidates``) y las omitidas."""
     if days < 1:
         raise WialonError("days debe ser al menos 1.")
 
     users = fetch_users(use_cache=False)
     cutoff = int(time.time()) - int(days) * 86400
-    purged: list[dict[str, Any]] = []
+    candidates: list[dict[str, Any]] = []
     skipped: list[dict[str, Any]] = []
-    errors: list[dict[str, Any]] = []
-
     for user in users:
         if str(user.get("status") or "") != "Bloqueado":
             continue
@@ -2218,82 +2499,114 @@ def purge_blocked_accounts(
             blocked_ts = int(blocked_at) if blocked_at is not None else None
         except (TypeError, ValueError):
             blocked_ts = None
+        row = {
+            "wialon_id": user_id,
+            "user_id": user.get("user_id"),
+            "name": user.get("name"),
+            "blocked_at": blocked_ts,
+        }
         if blocked_ts is None or blocked_ts > cutoff:
-            skipped.append(
-                {
-                    "wialon_id": user_id,
-                    "user_id": user.get("user_id"),
-                    "name": user.get("name"),
-                    "blocked_at": blocked_ts,
-                    "reason": "sin_fecha" if blocked_ts is None else "dentro_de_plazo",
-                }
-            )
+            skipped.append({**row, "reason": "sin_fecha" if blocked_ts is None else "dentro_de_plazo"})
             continue
+        candidates.append(row)
+    return {"days": days, "cutoff": cutoff, "candidates": candidates, "skipped": skipped}
+
 
-        unit_ids: list[int] = []
+def purge_blocked_user(candidate: dict[str, Any], *, dry_run: bool = False) -> dict[str, Any]:
+    """
+    Pipeline de una cuenta: unidades asignadas → desactivación en lote → borrado del usuario.
+    Devuelve ``{"purged": fila o None, "errors": [...]}``; los errores no se propagan.
+    """
+    user_id = int(candidate["wialon_id"])
+    errors: list[dict[str, Any]] = []
+    unit_ids: list[int] = []
+    try:
+        payload = fetch_user_units(user_id)
+        for unit in payload.get("units") or []:
+            uid = _coerce_wialon_id(unit.get("wialon_id"))
+            if uid is not None:
+                unit_ids.append(uid)
+    except WialonError as exc:
+        errors.append(
+            {"wialon_id": user_id, "user_id": candidate.get("user_id"), "step": "list_units", "detail": str(exc)}
+        )
+        return {"purged": None, "errors": errors}
+
+    deactivated = list(unit_ids)
+    if not dry_run:
         try:
-            payload = fetch_user_units(user_id)
-            for unit in payload.get("units") or []:
-                uid = _coerce_wialon_id(unit.get("wialon_id"))
-                if uid is not None:
-                    unit_ids.append(uid)
+            failed = deactivate_wialon_units(unit_ids)
+        except WialonError as exc:
+            failed = {uid: str(exc) for uid in unit_ids}
+        for uid, detail in failed.items():
+            errors.append({"wialon_id": user_id, "unit_id": uid, "step": "deactivate_unit", "detail": detail})
+        deactivated = [uid for uid in unit_ids if uid not in failed]
+        try:
+            delete_wialon_user(user_id)
         except WialonError as exc:
             errors.append(
-                {
-                    "wialon_id": user_id,
-                    "user_id": user.get("user_id"),
-                    "step": "list_units",
-                    "detail": str(exc),
-                }
+                {"wialon_id": user_id, "user_id": candidate.get("user_id"), "step": "delete_user", "detail": str(exc)}
             )
-            continue
+            return {"purged": None, "errors": errors}
 
-        deactivated: list[int] = []
-        if not dry_run:
-            for uid in unit_ids:
-                try:
-                    set_wialon_unit_active(uid, False)
-                    deactivated.append(uid)
-                except WialonError as exc:
-                    errors.append(
-                        {
-                            "wialon_id": user_id,
-                            "unit_id": uid,
-                            "step": "deactivate_unit",
-                            "detail": str(exc),
-                        }
-                    )
-            try:
-                delete_wialon_user(user_id)
-            except WialonError as exc:
-                errors.append(
-                    {
-                        "wialon_id": user_id,
-                        "user_id": user.get("user_id"),
-                        "step": "delete_user",
-                        "detail": str(exc),
-                    }
-                )
-                continue
+    return {
+        "purged": {**candidate, "units_deactivated": deactivated, "dry_run": dry_run},
+        "errors": errors,
+    }
 
-        purged.append(
-            {
-                "wialon_id": user_id,
-                "user_id": user.get("user_id"),
-                "name": user.get("name"),
-                "blocked_at": blocked_ts,
-                "units_deactivated": deactivated if not dry_run else unit_ids,
-                "dry_run": dry_run,
-            }
-        )
+
+def iter_purge_outcomes(
+    candidates: list[dict[str, Any]],
+    *,
+    dry_run: bool = False,
+    workers: int | None = None,
+):
+    """Corre ``purge_blocked_user`` en paralelo (acotado); entrega ``(índice, resultado)`` al terminar cada uno."""
+    if not candidates:
+        return
+    max_workers = max(1, min(workers or _PURGE_WORKERS, len(candidates)))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wialon-purge") as executor:
+        futures = {
+            executor.submit(purge_blocked_user, candidate, dry_run=dry_run): idx
+            for idx, candidate in enumerate(candidates)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def purge_blocked_accounts(
+    *,
+    days: int = WIALON_BLOCKED_PURGE_DAYS_DEFAULT,
+    dry_run: bool = False,
+) -> dict[str, Any]:
+    """
+    Para cuentas bloqueadas con más de `days` días:
+    1) desactiva las unidades asignadas al usuario (unit/set_active active=0, en core/batch)
+    2) elimina el usuario Wialon (core/delete_item)
+
+    Las cuentas se procesan en paralelo (``WIALON_PURGE_WORKERS``). Para cientos de
+    cuentas conviene el trabajo en segundo plano (``wialon_purge_jobs``).
+    No usa account/delete_account: varias cuentas pueden compartir el mismo bact.
+    """
+    plan = plan_blocked_purge(days=days)
+    candidates = plan["candidates"]
+    outcomes: dict[int, dict[str, Any]] = dict(iter_purge_outcomes(candidates, dry_run=dry_run))
+    purged: list[dict[str, Any]] = []
+    errors: list[dict[str, Any]] = []
+    for idx in range(len(candidates)):
+        outcome = outcomes[idx]
+        errors.extend(outcome["errors"])
+        if outcome["purged"] is not None:
+            purged.append(outcome["purged"])
 
     if purged and not dry_run:
         invalidate_wialon_cache()
 
+    skipped = plan["skipped"]
     return {
         "days": days,
         "dry_run": dry_run,
-        "cutoff": cutoff,
+        "cutoff": plan["cutoff"],
         "purged_count": len(purged),
         "skipped_count": len(skipped),
         "error_count": len(errors),
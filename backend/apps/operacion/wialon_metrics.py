@@ -0,0 +1,239 @@
+"""Métricas de Wialon por worker: llamadas a la API y aciertos de caché.
+
+Dos vistas del mismo dato:
+
+- Acumulado del proceso (:func:`metrics_snapshot`): por ``svc`` cuenta de
+  llamadas, errores por código, bytes recibidos e histograma de latencia; por
+  caché aciertos, copias vencidas servidas, fallos y costo de reconstrucción.
+- Por request (:func:`request_timing`): un colector en ``contextvars`` que las
+  vistas Wialon convierten en el encabezado ``Server-Timing`` (tiempo en la API
+  de Wialon, tiempo reconstruyendo cachés y aciertos/fallos). Los hilos de
+  ``ThreadPoolExecutor`` no heredan el contexto; las tareas del request se
+  envuelven con :func:`in_request_context`.
+
+Las renovaciones en segundo plano suman al acumulado pero no al request.
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+# Límites superiores (ms) del histograma de latencia; lo demás cae en "+inf".
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class _Histogram:
+    __slots__ = ("counts", "total_ms", "max_ms")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q: float) -> float | None:
+        """Cota superior del cuantil ``q`` según los buckets (``None`` sin datos)."""
+        n = sum(self.counts)
+        if not n:
+            return None
+        target = q * n
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else round(self.max_ms, 1)
+        return round(self.max_ms, 1)
+
+    def to_dict(self) -> dict[str, Any]:
+        n = sum(self.counts)
+        labels = [f"le_{b}" for b in LATENCY_BUCKETS_MS] + ["inf"]
+        return {
+            "avg_ms": round(self.total_ms / n, 1) if n else None,
+            "max_ms": round(self.max_ms, 1),
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class _CallStats:
+    __slots__ = ("count", "errors", "bytes", "latency", "error_codes")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latency = _Histogram()
+        self.error_codes: dict[str, int] = {}
+
+
+class _CacheStats:
+    __slots__ = ("hits", "stale", "misses", "rebuilds", "rebuild_errors", "rebuild")
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.rebuild_errors = 0
+        self.rebuild = _Histogram()
+
+
+class RequestTiming:
+    """Lo que costó Wialon dentro de un request (para ``Server-Timing``)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.api_calls = 0
+        self.api_ms = 0.0
+        self.rebuild_ms = 0.0
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+
+    def add_call(self, ms: float) -> None:
+        with self._lock:
+            self.api_calls += 1
+            self.api_ms += ms
+
+    def add_cache(self, outcome: str, rebuild_ms: float = 0.0) -> None:
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self.rebuild_ms += rebuild_ms
+
+    def header(self) -> str:
+        total_ms = (time.monotonic() - self.started) * 1000
+        parts = [
+            f'wialon;dur={self.api_ms:.1f};desc="{self.api_calls} llamadas"',
+            f'rebuild;dur={self.rebuild_ms:.1f}',
+            f'cache;desc="hit={self.hits} stale={self.stale} miss={self.misses}"',
+            f"total;dur={total_ms:.1f}",
+        ]
+        return ", ".join(parts)
+
+
+_lock = threading.Lock()
+_calls: dict[str, _CallStats] = {}
+_caches: dict[str, _CacheStats] = {}
+_since = time.time()
+_current: contextvars.ContextVar[RequestTiming | None] = contextvars.ContextVar("wialon_timing", default=None)
+
+
+def record_call(svc: str, ms: float, *, nbytes: int = 0, error: str | None = None) -> None:
+    with _lock:
+        stats = _calls.get(svc)
+        if stats is None:
+            stats = _calls[svc] = _CallStats()
+        stats.count += 1
+        stats.bytes += nbytes
+        stats.latency.observe(ms)
+        if error is not None:
+            stats.errors += 1
+            stats.error_codes[error] = stats.error_codes.get(error, 0) + 1
+    timing = _current.get()
+    if timing is not None:
+        timing.add_call(ms)
+
+
+def record_cache(name: str, outcome: str, *, rebuild_ms: float | None = None, failed: bool = False) -> None:
+    """``outcome``: ``hits``, ``stale`` o ``misses``; ``rebuild_ms`` si este hilo reconstruyó."""
+    with _lock:
+        stats = _caches.get(name)
+        if stats is None:
+            stats = _caches[name] = _CacheStats()
+        setattr(stats, outcome, getattr(stats, outcome) + 1)
+        if rebuild_ms is not None:
+            stats.rebuilds += 1
+            stats.rebuild.observe(rebuild_ms)
+            if failed:
+                stats.rebuild_errors += 1
+    timing = _current.get()
+    if timing is not None:
+        timing.add_cache(outcome, rebuild_ms or 0.0)
+
+
+def record_rebuild(name: str, ms: float, *, failed: bool = False) -> None:
+    """Reconstrucción fuera de un acceso (renovación en segundo plano)."""
+    with _lock:
+        stats = _caches.get(name)
+        if stats is None:
+            stats = _caches[name] = _CacheStats()
+        stats.rebuilds += 1
+        stats.rebuild.observe(ms)
+        if failed:
+            stats.rebuild_errors += 1
+
+
+@contextmanager
+def timed_rebuild(name: str, outcome: str = "misses") -> Iterator[None]:
+    started = time.monotonic()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        record_cache(name, outcome, rebuild_ms=(time.monotonic() - started) * 1000, failed=failed)
+
+
+@contextmanager
+def request_timing() -> Iterator[RequestTiming]:
+    timing = RequestTiming()
+    token = _current.set(timing)
+    try:
+        yield timing
+    finally:
+        _current.reset(token)
+
+
+def in_request_context(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Envuelve una tarea de executor para que sus llamadas cuenten en el request actual."""
+    if _current.get() is None:
+        return fn
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+def metrics_snapshot() -> dict[str, Any]:
+    with _lock:
+        calls = {
+            svc: {
+                "count": s.count,
+                "errors": s.errors,
+                "error_codes": dict(s.error_codes),
+                "bytes": s.bytes,
+                **s.latency.to_dict(),
+            }
+            for svc, s in sorted(_calls.items())
+        }
+        caches = {
+            name: {
+                "hits": s.hits,
+                "stale": s.stale,
+                "misses": s.misses,
+                "hit_ratio": round((s.hits + s.stale) / total, 3) if (total := s.hits + s.stale + s.misses) else None,
+                "rebuilds": s.rebuilds,
+                "rebuild_errors": s.rebuild_errors,
+                **{f"rebuild_{k}": v for k, v in s.rebuild.to_dict().items() if k != "buckets"},
+            }
+            for name, s in sorted(_caches.items())
+        }
+    return {"pid": os.getpid(), "since": int(_since), "calls": calls, "caches": caches}
+
+
+def reset_metrics() -> None:
+    global _since
+    with _lock:
+        _calls.clear()
+        _caches.clear()
+        _since = time.time()
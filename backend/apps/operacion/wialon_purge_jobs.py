@@ -0,0 +1,244 @@
+"""Purga de cuentas Wialon bloqueadas como trabajo en segundo plano (``WialonPurgeJob``).
+
+El request solo crea la fila y responde 202; un hilo del proceso reclama el
+trabajo (``pendiente → en_proceso`` con ``UPDATE ... WHERE``), arma el plan
+(cuentas candidatas y omitidas) y corre los pipelines por cuenta en paralelo
+acotado (``WIALON_PURGE_WORKERS``). El resultado de cada cuenta se guarda en
+cuanto termina y un hilo de latido renueva ``heartbeat_at`` cada tercio de
+``WIALON_PURGE_STALE_SEC`` aunque una cuenta tarde más que eso.
+
+Si el worker se recicla a la mitad, el polling del estado detecta el latido
+vencido, devuelve el trabajo a ``pendiente`` y lo reanuda con las cuentas que
+seguían pendientes (desactivar una unidad dos veces es inocuo). Cada resultado
+se fusiona sobre la fila releída con ``select_for_update``: si dos ejecuciones
+llegan a coincidir, ninguna pisa lo que guardó la otra.
+
+Variables de entorno:
+
+- ``WIALON_PURGE_WORKERS`` (default 4): cuentas procesadas a la vez (``wialon_client``).
+- ``WIALON_PURGE_STALE_SEC`` (default 300): latido sin renovar → se reanuda.
+- ``WIALON_PURGE_TTL_DAYS`` (default 30): se borran trabajos terminados más viejos.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any
+
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from apps.common.background import ProcessExecutor, env_int, resubmit_orphan
+from apps.operacion import wialon_client
+from apps.operacion.models import WialonPurgeJob
+
+logger = logging.getLogger(__name__)
+
+ITEM_PENDIENTE = "pendiente"
+ITEM_LISTO = "listo"
+ITEM_ERROR = "error"
+
+
+# Un trabajo a la vez por worker; el paralelismo está dentro de cada trabajo.
+_executor = ProcessExecutor("wialon-purge-job")
+
+
+def _submit(job_id) -> None:
+    _executor.submit(run_purge_job, job_id)
+
+
+def purge_expired_jobs() -> int:
+    cutoff = timezone.now() - timedelta(days=env_int("WIALON_PURGE_TTL_DAYS", 30, 1))
+    deleted, _ = WialonPurgeJob.objects.filter(created_at__lt=cutoff).exclude(
+        status__in=WialonPurgeJob.ACTIVE_STATUSES
+    ).delete()
+    return deleted
+
+
+def active_purge_job() -> WialonPurgeJob | None:
+    return WialonPurgeJob.objects.filter(status__in=WialonPurgeJob.ACTIVE_STATUSES).first()
+
+
+def create_purge_job(*, user, days: int, dry_run: bool, enqueue: bool = True) -> WialonPurgeJob:
+    """Registra el trabajo; con ``enqueue`` lo encola al confirmar la transacción.
+
+    La restricción ``operacion_wialonpurgejob_una_activa`` admite una sola purga
+    activa: si otro request ganó la carrera, lanza ``IntegrityError``.
+    """
+    purge_expired_jobs()
+    with transaction.atomic():
+        job = WialonPurgeJob.objects.create(
+            creado_por=user if getattr(user, "is_authenticated", False) else None,
+            days=days,
+            dry_run=dry_run,
+        )
+    if enqueue:
+        job_id = job.pk
+        transaction.on_commit(lambda: _submit(job_id))
+    return job
+
+
+def _plan(job: WialonPurgeJob) -> None:
+    plan = wialon_client.plan_blocked_purge(days=job.days)
+    job.cutoff = plan["cutoff"]
+    job.items = [{**row, "estado": ITEM_PENDIENTE} for row in plan["candidates"]]
+    job.skipped = plan["skipped"]
+    job.total = len(job.items)
+    job.skipped_count = len(job.skipped)
+    job.heartbeat_at = timezone.now()
+    job.save(update_fields=["cutoff", "items", "skipped", "total", "skipped_count", "heartbeat_at"])
+
+
+_OUTCOME_FIELDS = ["items", "errors", "error_count", "processed", "purged_count", "heartbeat_at"]
+
+
+def _apply_outcome(job: WialonPurgeJob, idx: int, outcome: dict[str, Any]) -> None:
+    """Fusiona el resultado de una cuenta sobre la fila actual y lo refleja en ``job``."""
+    with transaction.atomic():
+        current = WialonPurgeJob.objects.select_for_update().only(*_OUTCOME_FIELDS).get(pk=job.pk)
+        row = current.items[idx]
+        # Otra ejecución del mismo trabajo ya guardó esta cuenta: no se duplican errores.
+        if row.get("estado") == ITEM_PENDIENTE:
+            purged = outcome.get("purged")
+            if purged is not None:
+                row["estado"] = ITEM_LISTO
+                row["units_deactivated"] = purged.get("units_deactivated") or []
+            else:
+                row["estado"] = ITEM_ERROR
+            current.errors = [*current.errors, *(outcome.get("errors") or [])]
+        current.error_count = len(current.errors)
+        current.processed = sum(1 for item in current.items if item.get("estado") != ITEM_PENDIENTE)
+        current.purged_count = sum(1 for item in current.items if item.get("estado") == ITEM_LISTO)
+        current.heartbeat_at = timezone.now()
+        current.save(update_fields=_OUTCOME_FIELDS)
+    for name in _OUTCOME_FIELDS:
+        setattr(job, name, getattr(current, name))
+
+
+def _heartbeat_interval() -> float:
+    return env_int("WIALON_PURGE_STALE_SEC", 300, 60) / 3
+
+
+@contextmanager
+def _heartbeat(job_id):
+    """Renueva ``heartbeat_at`` mientras corre el trabajo (una cuenta lenta no lo da por caído)."""
+    stop = threading.Event()
+    interval = _heartbeat_interval()
+
+    def _beat() -> None:
+        try:
+            while not stop.wait(interval):
+                try:
+                    WialonPurgeJob.objects.filter(pk=job_id, status=WialonPurgeJob.STATUS_EN_PROCESO).update(
+                        heartbeat_at=timezone.now()
+                    )
+                except Exception:
+                    logger.warning("Purga Wialon %s: no se pudo renovar el latido", job_id, exc_info=True)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=_beat, name="wialon-purge-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join(timeout=5)
+
+
+def run_purge_job(job_id) -> None:
+    """Ejecuta (o reanuda) un trabajo si sigue pendiente; seguro ante reencolados duplicados."""
+    close_old_connections()
+    try:
+        now = timezone.now()
+        claimed = WialonPurgeJob.objects.filter(pk=job_id, status=WialonPurgeJob.STATUS_PENDIENTE).update(
+            status=WialonPurgeJob.STATUS_EN_PROCESO, heartbeat_at=now
+        )
+        if not claimed:
+            return
+        job = WialonPurgeJob.objects.get(pk=job_id)
+        if job.started_at is None:
+            job.started_at = now
+            job.save(update_fields=["started_at"])
+        try:
+            with _heartbeat(job_id):
+                if job.cutoff is None:
+                    _plan(job)
+                pending = [i for i, row in enumerate(job.items) if row.get("estado") == ITEM_PENDIENTE]
+                candidates = [job.items[i] for i in pending]
+                for pos, outcome in wialon_client.iter_purge_outcomes(candidates, dry_run=job.dry_run):
+                    _apply_outcome(job, pending[pos], outcome)
+            if job.purged_count and not job.dry_run:
+                wialon_client.invalidate_wialon_cache()
+        except wialon_client.WialonError as exc:
+            logger.warning("Purga Wialon %s falló: %s", job_id, exc)
+            _finish(job_id, status=WialonPurgeJob.STATUS_ERROR, error=str(exc))
+        except Exception as exc:
+            logger.exception("Purga Wialon %s falló", job_id)
+            _finish(job_id, status=WialonPurgeJob.STATUS_ERROR, error=type(exc).__name__)
+        else:
+            _finish(job_id, status=WialonPurgeJob.STATUS_LISTO)
+    finally:
+        close_old_connections()
+
+
+def _finish(job_id, *, status: str, error: str = "") -> None:
+    WialonPurgeJob.objects.filter(pk=job_id).update(
+        status=status,
+        error=error[:500],
+        finished_at=timezone.now(),
+    )
+
+
+def resume_purge_job(job: WialonPurgeJob) -> bool:
+    """Devuelve a ``pendiente`` un trabajo ``en_proceso`` (worker caído); ``False`` si ya avanzó."""
+    updated = WialonPurgeJob.objects.filter(
+        pk=job.pk,
+        status=WialonPurgeJob.STATUS_EN_PROCESO,
+        heartbeat_at=job.heartbeat_at,
+    ).update(status=WialonPurgeJob.STATUS_PENDIENTE)
+    if updated:
+        job.status = WialonPurgeJob.STATUS_PENDIENTE
+    return bool(updated)
+
+
+def refresh_purge_job_state(job: WialonPurgeJob) -> WialonPurgeJob:
+    """Reencola pendientes huérfanos y reanuda los que dejaron de latir."""
+    now = timezone.now()
+    if job.status == WialonPurgeJob.STATUS_PENDIENTE:
+        resubmit_orphan(job, _submit, now=now)
+    elif job.status == WialonPurgeJob.STATUS_EN_PROCESO:
+        stale = timedelta(seconds=env_int("WIALON_PURGE_STALE_SEC", 300, 60))
+        if job.heartbeat_at and now - job.heartbeat_at > stale and resume_purge_job(job):
+            logger.warning("Purga Wialon %s sin latido; se reanuda", job.pk)
+            _submit(job.pk)
+    return job
+
+
+def purge_job_payload(job: WialonPurgeJob) -> dict[str, Any]:
+    from django.urls import reverse
+
+    return {
+        "id": str(job.pk),
+        "status": job.status,
+        "days": job.days,
+        "dry_run": job.dry_run,
+        "cutoff": job.cutoff,
+        "total": job.total,
+        "processed": job.processed,
+        "progress": round(job.processed * 100 / job.total, 1) if job.total else (100.0 if job.cutoff else 0.0),
+        "purged_count": job.purged_count,
+        "skipped_count": job.skipped_count,
+        "error_count": job.error_count,
+        "purged": [row for row in job.items if row.get("estado") == ITEM_LISTO],
+        "skipped": job.skipped,
+        "errors": job.errors,
+        "error": job.error or "",
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "status_url": reverse("wialon-purge-job-detail", args=[job.pk]),
+    }
@@ -0,0 +1,253 @@
+"""Registros compactos de Wialon para las cachés de unidades y usuarios.
+
+Los ítems crudos traen mapas de sensores, parámetros del último mensaje, perfil y
+propiedades completas; con flotas grandes eso se repite en la memoria de cada
+worker. Aquí se guardan solo los campos que leen los normalizadores de
+``wialon_client``, en un registro respaldado por tupla (``__slots__``) que se
+comporta como un ``Mapping`` de solo lectura: ``item.get("nm")``,
+``"netconn" in item`` y ``dict(item)`` siguen funcionando igual.
+
+Las cadenas repetidas (etiquetas de campos, tipos de sensor, nombres de
+cuenta/hardware) se internan con :func:`sys.intern`.
+"""
+
+from __future__ import annotations
+
+import sys
+from collections.abc import Mapping
+from typing import Any, Iterator
+
+# Heurística de encendido (la usa también wialon_client): claves de parámetros del
+# último mensaje, pistas en nombres y tipos de sensor.
+IGNITION_PARAM_KEYS = frozenset(
+    {
+        "acc",
+        "ign",
+        "ignition",
+        "engine",
+        "motor",
+        "io_239",
+        "io239",
+        "din1",
+        "digital_1",
+        "ignicion",
+        "encendido",
+    }
+)
+IGNITION_NAME_HINTS = ("ignition", "ignici", "motor", "acc", "encendido", "engine")
+IGNITION_TYPE_HINTS = ("engine operation", "ignition", "engine")
+_PROFILE_FIELDS = frozenset({"vehicle_class", "vehicle_type"})
+_MONU_KEYS = ("monu", "monuv", "m_monu")
+
+
+class _Missing:
+    """Marca de campo ausente (distinto de ``None``: ``"netconn" in item``)."""
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "<ausente>"
+
+    def __reduce__(self) -> str:
+        # Al deserializar (caché en archivo/Redis) se recupera el mismo objeto.
+        return "_MISSING"
+
+
+_MISSING = _Missing()
+
+
+def intern_str(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class _Record(Mapping):
+    """Mapping inmutable respaldado por una tupla alineada con ``_FIELDS``."""
+
+    __slots__ = ("_values",)
+    _FIELDS: tuple[str, ...] = ()
+    _INDEX: dict[str, int] = {}
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls._INDEX = {name: i for i, name in enumerate(cls._FIELDS)}
+
+    def __init__(self, values: tuple[Any, ...]) -> None:
+        self._values = values
+
+    @classmethod
+    def _from_fields(cls, fields: Mapping[str, Any]) -> "_Record":
+        return cls(tuple(fields.get(name, _MISSING) for name in cls._FIELDS))
+
+    def __getitem__(self, key: str) -> Any:
+        idx = self._INDEX.get(key)
+        if idx is None:
+            raise KeyError(key)
+        value = self._values[idx]
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        idx = self._INDEX.get(key)
+        if idx is None:
+            return default
+        value = self._values[idx]
+        return default if value is _MISSING else value
+
+    def __contains__(self, key: object) -> bool:
+        idx = self._INDEX.get(key) if isinstance(key, str) else None
+        return idx is not None and self._values[idx] is not _MISSING
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name, value in zip(self._FIELDS, self._values) if value is not _MISSING)
+
+    def __len__(self) -> int:
+        return sum(1 for value in self._values if value is not _MISSING)
+
+    def __reduce__(self):
+        return (type(self), (self._values,))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+def _is_ignition_key(key: str) -> bool:
+    low = key.strip().lower()
+    return low in IGNITION_PARAM_KEYS or any(hint in low for hint in IGNITION_NAME_HINTS)
+
+
+def _ignition_params(source: Any) -> dict[str, Any] | None:
+    if not isinstance(source, dict):
+        return None
+    kept = {intern_str(k): v for k, v in source.items() if isinstance(k, str) and _is_ignition_key(k)}
+    return kept or None
+
+
+def _compact_position(pos: Any) -> dict[str, Any] | None:
+    if not isinstance(pos, dict):
+        return None
+    # x/y se conservan: una posición sin velocidad cuenta como "Detenido".
+    out = {k: pos[k] for k in ("t", "s", "x", "y") if pos.get(k) is not None}
+    params = _ignition_params(pos.get("p"))
+    if params:
+        out["p"] = params
+    return out
+
+
+def _compact_message(lmsg: Any) -> dict[str, Any] | None:
+    if not isinstance(lmsg, dict):
+        return None
+    out: dict[str, Any] = {k: lmsg[k] for k in ("t", "s") if lmsg.get(k) is not None}
+    pos = lmsg.get("pos")
+    if isinstance(pos, dict) and pos.get("s") is not None:
+        out["pos"] = {"s": pos["s"]}
+    params = _ignition_params(lmsg.get("p"))
+    if params:
+        out["p"] = params
+    # Entradas en la raíz del mensaje que la heurística de encendido también revisa.
+    for key, value in lmsg.items():
+        if key not in {"t", "f", "tp", "pos", "p", "s"} and isinstance(key, str) and _is_ignition_key(key):
+            out[intern_str(key)] = value
+    return out
+
+
+def _compact_sensors(sens: Any) -> dict[str, Any] | None:
+    if not isinstance(sens, dict):
+        return None
+    kept: dict[str, Any] = {}
+    for key, entry in sens.items():
+        if not isinstance(entry, dict):
+            continue
+        tp = str(entry.get("tp") or "").strip().lower()
+        name = str(entry.get("nm") or "").strip().lower()
+        if any(hint in tp for hint in IGNITION_TYPE_HINTS) or any(hint in name for hint in IGNITION_NAME_HINTS):
+            kept[key] = {
+                "id": entry.get("id", key),
+                "tp": intern_str(entry.get("tp")),
+                "nm": intern_str(entry.get("nm")),
+            }
+    return kept
+
+
+def _compact_fields(flds: Any, *, only: frozenset[str] | None = None) -> dict[str, Any] | None:
+    if not isinstance(flds, dict):
+        return None
+    kept: dict[str, Any] = {}
+    for key, entry in flds.items():
+        if not isinstance(entry, dict):
+            continue
+        label = entry.get("n")
+        if only is not None and str(label or "").strip() not in only:
+            continue
+        kept[key] = {"id": entry.get("id"), "n": intern_str(label), "v": entry.get("v")}
+    return kept
+
+
+class UnitRecord(_Record):
+    """Unidad con lo que leen listado, detalle, búsqueda y estado de encendido."""
+
+    __slots__ = ()
+    _FIELDS = (
+        "id", "nm", "act", "dactt", "netconn", "hw", "ct", "uid", "uid2", "ph",
+        "bact", "crt", "psw", "lmsg", "pos", "sens", "flds", "pflds",
+    )
+
+    @classmethod
+    def from_item(cls, item: Mapping[str, Any]) -> "UnitRecord":
+        if isinstance(item, UnitRecord):
+            return item
+        fields = {name: item[name] for name in cls._FIELDS if name in item}
+        fields["nm"] = intern_str(fields.get("nm", ""))
+        if "psw" in fields:
+            # Solo importa si hay contraseña; no se guarda en la caché.
+            fields["psw"] = "*" if str(fields["psw"] or "").strip() else ""
+        for name, compact in (("lmsg", _compact_message), ("pos", _compact_position), ("sens", _compact_sensors)):
+            if name in fields:
+                fields[name] = compact(fields[name])
+        if "flds" in fields:
+            fields["flds"] = _compact_fields(fields["flds"])
+        if "pflds" in fields:
+            fields["pflds"] = _compact_fields(fields["pflds"], only=_PROFILE_FIELDS)
+        return cls._from_fields(fields)
+
+
+class UserRecord(_Record):
+    """Usuario Wialon: identidad, cuenta, creador y unidades asignadas (``prp.monu``)."""
+
+    __slots__ = ()
+    _FIELDS = ("id", "nm", "crt", "bact", "prp")
+
+    @classmethod
+    def from_item(cls, item: Mapping[str, Any]) -> "UserRecord":
+        if isinstance(item, UserRecord):
+            return item
+        fields = {name: item[name] for name in cls._FIELDS if name in item}
+        fields["nm"] = intern_str(fields.get("nm", ""))
+        fields["prp"] = compact_user_prp(fields.get("prp"))
+        return cls._from_fields(fields)
+
+
+def compact_user_prp(prp: Any) -> dict[str, Any]:
+    """Del mapa de propiedades del usuario solo importa la lista de unidades."""
+    if not isinstance(prp, dict):
+        return {}
+    for key in _MONU_KEYS:
+        if prp.get(key):
+            return {key: prp[key]}
+    return {}
+
+
+def deep_sizeof(obj: Any, _seen: set[int] | None = None) -> int:
+    """Tamaño aproximado en bytes (objeto + contenido; compartidos se cuentan una vez)."""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, _Record):
+        size += deep_sizeof(obj._values, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(v, seen) for v in obj)
+    return size
@@ -0,0 +1,193 @@
+"""Búsqueda de unidades Wialon en el servidor sobre un índice invertido.
+
+El índice de búsqueda (``fetch_units_search_index``) tiene una fila por unidad
+con sus cuentas. En vez de mandar la lista completa al navegador, cada worker
+arma sobre esa tupla un índice en memoria:
+
+- trigramas del texto compacto (minúsculas, sin acentos ni separadores) de
+  nombre, IMEI/uid, teléfono, campos personalizados, id y cuentas: resuelven
+  búsquedas por subcadena (``"abc-12"`` encuentra ``"ABC 123"``);
+- lista ordenada de tokens para términos de 1–2 caracteres (por prefijo);
+- cuentas → unidades para el filtro ``owner``.
+
+Los candidatos de los trigramas se confirman contra el texto compacto, así que
+el resultado es exacto. El índice se reconstruye solo cuando cambia la tupla
+cacheada (se compara por identidad) y la paginación es por cursor sobre el
+orden ``(nombre, unit_id)``, estable aunque el índice se reconstruya entre
+páginas.
+"""
+
+from __future__ import annotations
+
+import base64
+import bisect
+import json
+import re
+import threading
+import unicodedata
+from typing import Any, Iterable, NamedTuple, Sequence
+
+_SPLIT = re.compile(r"[^0-9a-z]+")
+_TRIGRAM = 3
+
+SEARCH_PAGE_DEFAULT = 50
+SEARCH_PAGE_MAX = 200
+
+
+def normalize_text(value: Any) -> str:
+    """Minúsculas y sin acentos (``"Camión"`` → ``"camion"``)."""
+    text = unicodedata.normalize("NFKD", str(value or "")).lower()
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def _compact(norm: str) -> str:
+    return _SPLIT.sub("", norm)
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i : i + _TRIGRAM] for i in range(len(text) - _TRIGRAM + 1)}
+
+
+def _sort_key(row: dict[str, Any]) -> tuple[str, int]:
+    # Sin acentos: "Camión" queda junto a "Camioneta" y no después de la "z".
+    return (normalize_text(row.get("name") or row.get("uid")), int(row.get("unit_id") or 0))
+
+
+class SearchPage(NamedTuple):
+    total: int
+    results: list[dict[str, Any]]
+    next_cursor: str | None
+
+
+def encode_cursor(key: tuple[str, int]) -> str:
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    """``ValueError`` si el cursor no viene de :func:`encode_cursor`."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        name, unit_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return str(name), int(unit_id)
+    except (TypeError, ValueError, UnicodeError) as exc:
+        raise ValueError("cursor inválido") from exc
+
+
+class UnitSearchIndex:
+    """Índice invertido (trigramas + tokens + cuentas) sobre las filas de búsqueda."""
+
+    def __init__(self, rows: Sequence[dict[str, Any]]) -> None:
+        ordered = sorted(rows, key=_sort_key)
+        self.rows: list[dict[str, Any]] = ordered
+        self.keys: list[tuple[str, int]] = [_sort_key(row) for row in ordered]
+        self._compact_text: list[str] = []
+        self._grams: dict[str, set[int]] = {}
+        self._owners: dict[int, set[int]] = {}
+        tokens: dict[str, set[int]] = {}
+        for pos, row in enumerate(ordered):
+            norm = normalize_text(self._haystack(row))
+            compact = _compact(norm)
+            self._compact_text.append(compact)
+            for gram in _trigrams(compact):
+                self._grams.setdefault(gram, set()).add(pos)
+            for token in _SPLIT.split(norm):
+                if token:
+                    tokens.setdefault(token, set()).add(pos)
+            for owner in row.get("users") or ():
+                wid = owner.get("wialon_id")
+                if wid is not None:
+                    self._owners.setdefault(int(wid), set()).add(pos)
+        self._token_list: list[str] = sorted(tokens)
+        self._token_docs: list[set[int]] = [tokens[t] for t in self._token_list]
+
+    @staticmethod
+    def _haystack(row: dict[str, Any]) -> str:
+        base = row.get("search_text")
+        if not base:
+            base = " ".join(str(row.get(k) or "") for k in ("name", "uid", "phone", "custom_fields", "unit_id"))
+        parts = [base]
+        for owner in row.get("users") or ():
+            parts.append(str(owner.get("user_id") or ""))
+            parts.append(str(owner.get("name") or ""))
+        return " ".join(parts)
+
+    def _prefix_docs(self, prefix: str) -> set[int]:
+        docs: set[int] = set()
+        i = bisect.bisect_left(self._token_list, prefix)
+        while i < len(self._token_list) and self._token_list[i].startswith(prefix):
+            docs |= self._token_docs[i]
+            i += 1
+        return docs
+
+    def _term_docs(self, term: str) -> set[int] | None:
+        """Posiciones que contienen ``term``; ``None`` = el término no filtra."""
+        compact = _compact(normalize_text(term))
+        if not compact:
+            return None
+        if len(compact) < _TRIGRAM:
+            return self._prefix_docs(compact)
+        postings = sorted((self._grams.get(g, set()) for g in _trigrams(compact)), key=len)
+        candidates = set(postings[0])
+        for other in postings[1:]:
+            candidates &= other
+            if not candidates:
+                break
+        return {pos for pos in candidates if compact in self._compact_text[pos]}
+
+    def match(self, query: str = "", *, owners: Iterable[int] = ()) -> list[int]:
+        """Posiciones (en orden) que cumplen todos los términos y alguna de las cuentas."""
+        matched: set[int] | None = None
+        owner_ids = list(owners)
+        if owner_ids:
+            matched = set().union(*(self._owners.get(int(o), set()) for o in owner_ids))
+        for term in str(query or "").split():
+            if matched is not None and not matched:
+                break
+            docs = self._term_docs(term)
+            if docs is None:
+                continue
+            matched = docs if matched is None else matched & docs
+        if matched is None:
+            return list(range(len(self.rows)))
+        return sorted(matched)
+
+    def search(
+        self,
+        query: str = "",
+        *,
+        owners: Iterable[int] = (),
+        cursor: str | None = None,
+        limit: int = SEARCH_PAGE_DEFAULT,
+    ) -> SearchPage:
+        positions = self.match(query, owners=owners)
+        start = 0
+        if cursor:
+            after = decode_cursor(cursor)
+            # Las posiciones siguen el orden de ``keys``: primer resultado posterior al cursor.
+            start = bisect.bisect_right(positions, after, key=self.keys.__getitem__)
+        page = positions[start : start + limit]
+        next_cursor = None
+        if page and start + limit < len(positions):
+            next_cursor = encode_cursor(self.keys[page[-1]])
+        results = [{k: v for k, v in self.rows[p].items() if k != "search_text"} for p in page]
+        return SearchPage(len(positions), results, next_cursor)
+
+
+_index_lock = threading.Lock()
+_index: tuple[Sequence[dict[str, Any]], UnitSearchIndex] | None = None
+
+
+def search_index_for(rows: Sequence[dict[str, Any]]) -> UnitSearchIndex:
+    """Índice del worker para ``rows``; se reconstruye solo si la tupla cacheada cambió."""
+    global _index
+    current = _index
+    if current is not None and current[0] is rows:
+        return current[1]
+    with _index_lock:
+        current = _index
+        if current is not None and current[0] is rows:
+            return current[1]
+        built = UnitSearchIndex(rows)
+        _index = (rows, built)
+        return built
@@ -0,0 +1,621 @@
+"""Simulador local de la Remote API de Wialon (pruebas de carga y benchmarks).
+
+Levanta un servidor HTTP en ``127.0.0.1`` que responde como
+``hst-api.wialon.com/wialon/ajax.html`` (y ``/avl_evts``) sobre una flota
+sintética y determinista: cuentas con jerarquía de distribuidores, usuarios con
+unidades en ``prp.monu`` (algunas compartidas), cuentas bloqueadas con fecha de
+bloqueo, sensores de ignición y campos personalizados.
+
+Servicios: ``token/login``, ``core/logout``, ``core/search_items``,
+``core/search_item``, ``core/batch``, ``core/update_data_flags``,
+``core/get_hw_types``, ``file/type_library``, ``account/get_account_data``,
+``unit/calc_last`` y las escrituras que usa ``wialon_client`` (nombre, perfil,
+dispositivo, teléfono, contraseña, campos, activo, accesos, borrado y cuenta).
+Los cambios a unidades se publican como eventos ``u`` para ``avl_evts``.
+
+``latency_ms``/``jitter_ms`` agregan espera por petición HTTP (una sola vez por
+``core/batch``, como el servidor real). El simulador no valida banderas ni
+permisos: entrega los ítems completos.
+
+Uso típico (comando ``wialon_benchmark`` y pruebas)::
+
+    fleet = SyntheticFleet(FleetSpec(users=100, units=1000))
+    with WialonSimulator(fleet, latency_ms=40) as sim, use_simulator(sim):
+        wialon_client.fetch_users()
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator
+
+_ACCOUNT_BASE = 10_000_000
+_USER_BASE = 20_000_000
+_UNIT_BASE = 30_000_000
+_HW_BASE = 100
+
+# Códigos de la Remote API.
+_ERR_INVALID_SESSION = 1
+_ERR_INVALID_SERVICE = 2
+_ERR_INVALID_INPUT = 4
+_ERR_ACCESS_DENIED = 7
+
+# Token con el formato que exige ``wialon_client`` (72 hex); el simulador acepta cualquiera.
+SIMULATOR_TOKEN = "5a" * 36
+
+_HW_NAMES = ("Teltonika FMB920", "Teltonika FMC130", "Queclink GV300", "Ruptela Eco5", "Concox GT06N")
+_UNIT_KINDS = ("Camión", "Camioneta", "Auto", "Moto", "Tractocamión", "Remolque")
+_VEHICLE_LIBRARY = [
+    {
+        "key": "cars",
+        "name": "Autos",
+        "items": [{"key": "car_sedan", "name": "Sedán"}, {"key": "car_pickup", "name": "Pickup"}],
+    },
+    {
+        "key": "trucks",
+        "name": "Camiones",
+        "items": [{"key": "truck_box", "name": "Caja seca"}, {"key": "truck_tractor", "name": "Tractocamión"}],
+    },
+    {"key": "empty_vehicle", "name": ""},
+]
+
+
+@dataclass(frozen=True)
+class FleetSpec:
+    users: int = 100
+    units: int = 1000
+    # Default: una cuenta por usuario, como en Wialon Hosting.
+    accounts: int | None = None
+    blocked_ratio: float = 0.05
+    dealer_ratio: float = 0.02
+    shared_ratio: float = 0.1
+    seed: int = 1
+
+
+class SyntheticFleet:
+    """Cuentas, usuarios y unidades sintéticos (mismo ``seed`` → misma flota)."""
+
+    def __init__(self, spec: FleetSpec) -> None:
+        self.spec = spec
+        rng = random.Random(spec.seed)
+        now = int(time.time())
+        n_users = max(1, spec.users)
+        n_accounts = max(1, spec.accounts if spec.accounts is not None else n_users)
+
+        self.hw_types = [
+            {"id": _HW_BASE + i, "name": name, "hw_category": "Rastreador", "uid2": 0}
+            for i, name in enumerate(_HW_NAMES)
+        ]
+
+        top = _ACCOUNT_BASE
+        n_dealers = max(1, int(n_accounts * spec.dealer_ratio))
+        dealer_ids = [top + i for i in range(n_dealers)]
+        self.accounts: dict[int, dict[str, Any]] = {}
+        for i in range(n_accounts):
+            aid = top + i
+            parent = top if i < n_dealers else dealer_ids[i % n_dealers]
+            self.accounts[aid] = {"id": aid, "nm": f"Cuenta {i:05d}", "cls": 3, "mu": 0, "bpact": parent}
+        self.dealers: set[int] = set(dealer_ids)
+        self.blocked: dict[int, int] = {}
+        for aid in list(self.accounts)[n_dealers:]:
+            if rng.random() < spec.blocked_ratio:
+                self.blocked[aid] = now - rng.randint(1, 120) * 86400
+
+        self.users: dict[int, dict[str, Any]] = {}
+        for i in range(n_users):
+            uid = _USER_BASE + i
+            self.users[uid] = {
+                "id": uid,
+                "nm": f"usuario{i:05d}",
+                "cls": 1,
+                "mu": 0,
+                "crt": _USER_BASE,
+                "bact": top + (i % n_accounts),
+                "fl": 0,
+                "ld": now - rng.randint(0, 30) * 86400,
+                "prp": {"tz": "-21600", "language": "es"},
+            }
+        monu: dict[int, list[int]] = {uid: [] for uid in self.users}
+        user_ids = list(self.users)
+
+        self.units: dict[int, dict[str, Any]] = {}
+        for j in range(max(0, spec.units)):
+            unit_id = _UNIT_BASE + j
+            owner = user_ids[j % n_users]
+            monu[owner].append(unit_id)
+            if n_users > 1 and rng.random() < spec.shared_ratio:
+                monu[user_ids[(j + 1) % n_users]].append(unit_id)
+            self.units[unit_id] = self._unit(unit_id, j, owner, rng, now)
+        for uid, ids in monu.items():
+            self.users[uid]["prp"]["monu"] = json.dumps(ids)
+
+    def _unit(self, unit_id: int, j: int, owner: int, rng: random.Random, now: int) -> dict[str, Any]:
+        active = rng.random() > 0.03
+        ts = now - rng.randint(0, 3 * 86400)
+        speed = rng.choice((0, 0, 0, rng.randint(5, 110)))
+        pos = {"t": ts, "x": -99.1 + rng.random(), "y": 19.4 + rng.random(), "z": 2240, "s": speed, "c": 90, "sc": 9}
+        return {
+            "id": unit_id,
+            "nm": f"{_UNIT_KINDS[j % len(_UNIT_KINDS)]} {j:05d}",
+            "cls": 2,
+            "mu": 0,
+            "uacl": -1,
+            "crt": owner,
+            "bact": self.users[owner]["bact"],
+            "hw": self.hw_types[j % len(self.hw_types)]["id"],
+            "uid": f"86{j:013d}",
+            "ph": f"+52155{j:08d}",
+            "psw": "1234" if j % 4 == 0 else "",
+            "act": 1 if active else 0,
+            "dactt": 0 if active else now - 86400,
+            "netconn": 1 if now - ts < 600 else 0,
+            "lmsg": {
+                "t": ts,
+                "f": 1,
+                "tp": "ud",
+                "pos": dict(pos),
+                "p": {"ign": 1 if speed else 0, "gsm": 4, "adc1": 12.6, "hdop": 0.8},
+            },
+            "pos": pos,
+            "sens": {
+                "1": {"id": 1, "nm": "Ignición", "tp": "engine operation", "p": "ign", "m": "On/Off", "tbl": []},
+                "2": {"id": 2, "nm": "Combustible", "tp": "fuel level", "p": "adc1", "m": "l", "tbl": [[0, 1, 0]]},
+            },
+            "pflds": {
+                "1": {"id": 1, "n": "vehicle_class", "v": "truck_box" if j % 2 else "car_pickup"},
+                "2": {"id": 2, "n": "brand", "v": "Marca"},
+            },
+            "flds": {"1": {"id": 1, "n": "Placa", "v": f"ABC-{j % 1000:03d}"}},
+        }
+
+    def item(self, item_id: int) -> dict[str, Any] | None:
+        return self.units.get(item_id) or self.users.get(item_id) or self.accounts.get(item_id)
+
+
+class WialonSimulator:
+    """Servidor HTTP local sobre una :class:`SyntheticFleet`."""
+
+    def __init__(
+        self,
+        fleet: SyntheticFleet,
+        *,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.fleet = fleet
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.calls: dict[str, int] = {}
+        self._host = host
+        self._port = port
+        self._lock = threading.RLock()
+        self._sessions: set[str] = set()
+        self._streams: dict[str, list[dict[str, Any]]] = {}
+        self._version = 0
+        # Respuestas de core/search_items ya serializadas: a 50k unidades el JSON domina.
+        self._encoded: dict[tuple[Any, ...], bytes] = {}
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    # -- servidor ---------------------------------------------------------
+
+    @property
+    def api_base(self) -> str:
+        if self._server is None:
+            raise RuntimeError("El simulador no está corriendo.")
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/wialon/ajax.html"
+
+    def start(self) -> WialonSimulator:
+        if self._server is None:
+            server = ThreadingHTTPServer((self._host, self._port), _Handler)
+            server.daemon_threads = True
+            server.simulator = self  # type: ignore[attr-defined]
+            self._server = server
+            self._thread = threading.Thread(target=server.serve_forever, name="wialon-simulator", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
+
+    def __enter__(self) -> WialonSimulator:
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def _sleep(self) -> None:
+        delay = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def respond(self, path: str, fields: dict[str, str]) -> bytes:
+        """Cuerpo JSON de una petición (``/wialon/ajax.html`` o ``/avl_evts``)."""
+        self._sleep()
+        sid = fields.get("sid") or ""
+        if path.rstrip("/").endswith("avl_evts"):
+            return _encode(self._avl_events(sid))
+        svc = fields.get("svc") or ""
+        try:
+            params = json.loads(fields.get("params") or "{}")
+        except json.JSONDecodeError:
+            return _encode({"error": _ERR_INVALID_INPUT})
+        if svc == "core/search_items" and self._valid_sid(svc, sid):
+            self._count(svc)
+            return self._search_items_encoded(params)
+        return _encode(self.handle_call(svc, params, sid))
+
+    # -- servicios --------------------------------------------------------
+
+    def handle_call(self, svc: str, params: Any, sid: str) -> Any:
+        self._count(svc)
+        if not self._valid_sid(svc, sid):
+            return {"error": _ERR_INVALID_SESSION}
+        if not isinstance(params, dict):
+            return {"error": _ERR_INVALID_INPUT}
+        handler = _SERVICES.get(svc)
+        if handler is None:
+            return {"error": _ERR_INVALID_SERVICE}
+        try:
+            with self._lock:
+                return handler(self, params, sid)
+        except (KeyError, TypeError, ValueError):
+            return {"error": _ERR_INVALID_INPUT}
+
+    def _count(self, svc: str) -> None:
+        with self._lock:
+            self.calls[svc] = self.calls.get(svc, 0) + 1
+
+    def _valid_sid(self, svc: str, sid: str) -> bool:
+        return svc == "token/login" or sid in self._sessions
+
+    def _login(self, params: dict[str, Any], sid: str) -> dict[str, Any]:
+        if not str(params.get("token") or "").strip():
+            return {"error": _ERR_ACCESS_DENIED}
+        new_sid = uuid.uuid4().hex
+        self._sessions.add(new_sid)
+        top = self.fleet.users[_USER_BASE]
+        return {"eid": new_sid, "tm": int(time.time()), "user": {"id": top["id"], "nm": top["nm"], "cls": 1}}
+
+    def _logout(self, params: dict[str, Any], sid: str) -> dict[str, Any]:
+        self._sessions.discard(sid)
+        self._streams.pop(sid, None)
+        return {"error": 0}
+
+    def _search_pool(self, spec: dict[str, Any]) -> list[dict[str, Any]]:
+        items_type = spec.get("itemsType")
+        prop = spec.get("propName")
+        mask = str(spec.get("propValueMask") or "*")
+        fleet = self.fleet
+        if items_type == "user":
+            pool = list(fleet.users.values())
+        elif items_type == "avl_unit":
+            pool = list(fleet.units.values())
+        elif items_type == "avl_resource":
+            if prop == "sys_account_disabled":
+                pool = [fleet.accounts[a] for a in fleet.blocked if a in fleet.accounts]
+            elif prop == "sys_account_enable_parent":
+                pool = [fleet.accounts[a] for a in fleet.dealers if a in fleet.accounts]
+            else:
+                pool = list(fleet.accounts.values())
+        else:
+            pool = []
+        if prop == "sys_name" and mask != "*":
+            pattern = mask.lower()
+            pool = [item for item in pool if fnmatch.fnmatchcase(str(item.get("nm") or "").lower(), pattern)]
+        return sorted(pool, key=lambda item: str(item.get("nm") or "").lower())
+
+    def _search_items(self, params: dict[str, Any], sid: str) -> dict[str, Any]:
+        items = self._search_pool(params.get("spec") or {})
+        return _search_payload(params, items)
+
+    def _search_items_encoded(self, params: dict[str, Any]) -> bytes:
+        spec = params.get("spec") or {}
+        key = (
+            self._version,
+            spec.get("itemsType"),
+            spec.get("propName"),
+            spec.get("propValueMask"),
+            params.get("flags"),
+        )
+        with self._lock:
+            cached = self._encoded.get(key)
+            if cached is None:
+                cached = _encode(_search_payload(params, self._search_pool(spec)))
+                self._encoded = {key: cached, **{k: v for k, v in self._encoded.items() if k[0] == self._version}}
+        return cached
+
+    def _search_item(self, params: dict[str, Any], sid: str) -> dict[str, Any]:
+        item = self.fleet.item(int(params["id"]))
+        if item is None:
+            return {"error": _ERR_ACCESS_DENIED}
+        flags = int(params.get("flags") or 0)
+        if flags == 1:
+            item = {k: item[k] for k in ("id", "nm", "cls", "mu", "uacl") if k in item}
+        return {"item": item, "flags": flags}
+
+    def _batch(self, params: dict[str, Any], sid: str) -> list[Any]:
+        out = []
+        for call in params.get("params") or []:
+            svc = str(call.get("svc") or "") if isinstance(call, dict) else ""
+            sub = call.get("params") if isinstance(call, dict) else None
+            out.append(self.handle_call(svc, sub if sub is not None else {}, sid))
+        return out
+
+    def _update_data_flags(self, params: dict[str, Any], sid: str) -> list[dict[str, Any]]:
+        self._streams[sid] = []
+        return [{"i": uid, "d": item, "f": 0} for uid, item in self.fleet.units.items()]
+
+    def _avl_events(self, sid: str) -> dict[str, Any]:
+        with self._lock:
+            if sid not in self._sessions:
+                return {"error": _ERR_INVALID_SESSION}
+            events = self._streams.get(sid, [])
+            self._streams[sid] = []
+        return {"tm": int(time.time()), "events": events}
+
+    def _hw_types(self, params: dict[str, Any], sid: str) -> list[dict[str, Any]]:
+        if params.get("filterType") == "id":
+            wanted = {int(x) for x in params.get("filterValue") or []}
+            return [hw for hw in self.fleet.hw_types if hw["id"] in wanted]
+        return list(self.fleet.hw_types)
+
+    def _type_library(self, params: dict[str, Any], sid: str) -> dict[str, Any]:
+        return {"items": _VEHICLE_LIBRARY}
+
+    def _account_data(self, params: dict[str, Any], sid: str) -> dict[str, Any]:
+        aid = int(params["itemId"])
+        if aid not in self.fleet.accounts:
+            return {"error": _ERR_ACCESS_DENIED}
+        switch = self.fleet.blocked.get(aid)
+        return {"enabled": 0 if switch is not None else 1, "switchTime": switch or 0, "dealerRights": aid in self.fleet.dealers}
+
+    def _calc_last(self, params: dict[str, Any], sid: str) -> list[dict[str, Any]]:
+        rows = []
+        for raw in params.get("itemIds") or []:
+            unit = self.fleet.units.get(int(raw))
+            if unit is None:
+                continue
+            ign = (unit.get("lmsg") or {}).get("p", {}).get("ign", 0)
+            rows.append({"i": unit["id"], "sensors": {"1": {"value": ign}, "2": {"value": 42.0}}})
+        return rows
+
+    # -- escrituras -------------------------------------------------------
+
+    def _touch(self, unit_id: int, changes: dict[str, Any]) -> None:
+        self._version += 1
+        if unit_id in self.fleet.units:
+            for events in self._streams.values():
+                events.append({"i": unit_id, "t": "u", "d": changes})
+
+    def _unit_for(self, params: dict[str, Any]) -> dict[str, Any] | None:
+        return self.fleet.units.get(int(params["itemId"]))
+
+    def _update_name(self, params: dict[str, Any], sid: str) -> dict[str, Any]:
+        item = self.fleet.item(int(params["itemId"]))
+        if item is None:
+            return {"error": _ERR_ACCESS_DENIED}
+        item["nm"] = str(params["name"])
+        self._touch(item["id"], {"nm": item["nm"]})
+        return {"nm": item["nm"]}
+
+    def _update_profile_field(self, params: dict[str, Any], sid: str) -> Any:
+        unit = self._unit_for(params)
+        if unit is None:
+            return {"error": _ERR_ACCESS_DENIED}
+        fields = unit.setdefault("pflds", {})
+        current = next((f for f in fields.values() if f.get("n") == params["n"]), None)
+        if current is None:
+            fid = max((int(k) for k in fields), default=0) + 1
+            current = fields[str(fid)] = {"id": fid, "n": params["n"], "v": ""}
+        current["v"] = str(params.get("v") or "")
+        self._touch(unit["id"], {"pflds": fields})
+        return [current["id"], current]
+
+    def _update_device_type(self, params: dict[str, Any], sid: str) -> dict[str, Any]:
+        unit = self._unit_for(params)
+        if unit is None:
+            return {"error": _ERR_ACCESS_DENIED}
+        unit["hw"] = int(params["deviceTypeId"])
+        unit["uid"] = str(params["uniqueId"])
+        self._touch(unit["id"], {"hw": unit["hw"], "uid": unit["uid"]})
+        return {"hw": unit["hw"], "uid": unit["uid"]}
+
+    def _update_phone(self, params: dict[str, Any], sid: str) -> dict[str, Any]:
+        unit = self._unit_for(params)
+        if unit is None:
+            return {"error": _ERR_ACCESS_DENIED}
+        unit["ph"] = str(params.get("phoneNumber") or "")
+        self._touch(unit["id"], {"ph": unit["ph"]})
+        return {"ph": unit["ph"]}
+
+    def _update_password(self, params: dict[str, Any], sid: str) -> dict[str, Any]:
+        unit = self._unit_for(params)
+        if unit is None:
+            return {"error": _ERR_ACCESS_DENIED}
+        unit["psw"] = str(params.get("accessPassword") or "")
+        self._touch(unit["id"], {"psw": unit["psw"]})
+        return {"psw": unit["psw"]}
+
+    def _update_custom_field(self, params: dict[str, Any], sid: str) -> Any:
+        unit = self._unit_for(params)
+        if unit is None:
+            return {"error": _ERR_ACCESS_DENIED}
+        fields = unit.setdefault("flds", {})
+        mode = params.get("callMode")
+        fid = int(params.get("id") or 0)
+        if mode == "delete":
+            fields.pop(str(fid), None)
+            result: Any = [fid, None]
+        else:
+            if mode == "create" or str(fid) not in fields:
+                fid = max((int(k) for k in fields), default=0) + 1
+            fields[str(fid)] = {"id": fid, "n": str(params.get("n") or ""), "v": str(params.get("v") or "")}
+            result = [fid, fields[str(fid)]]
+        self._touch(unit["id"], {"flds": fields})
+        return result
+
+    def _set_active(self, params: dict[str, Any], sid: str) -> dict[str, Any]:
+        unit = self._unit_for(params)
+        if unit is None:
+            return {"error": _ERR_ACCESS_DENIED}
+        active = bool(int(params.get("active") or 0))
+        unit["act"] = 1 if active else 0
+        unit["dactt"] = 0 if active else int(time.time())
+        self._touch(unit["id"], {"act": unit["act"], "dactt": unit["dactt"]})
+        return {"dactt": unit["dactt"]}
+
+    def _update_item_access(self, params: dict[str, Any], sid: str) -> dict[str, Any]:
+        user = self.fleet.users.get(int(params["userId"]))
+        unit_id = int(params["itemId"])
+        if user is None or unit_id not in self.fleet.units:
+            return {"error": _ERR_ACCESS_DENIED}
+        ids = [i for i in json.loads(user["prp"].get("monu") or "[]") if i != unit_id]
+        if int(params.get("accessMask") or 0):
+            ids.append(unit_id)
+        user["prp"]["monu"] = json.dumps(ids)
+        self._version += 1
+        return {}
+
+    def _delete_item(self, params: dict[str, Any], sid: str) -> dict[str, Any]:
+        item_id = int(params["itemId"])
+        fleet = self.fleet
+        removed = fleet.units.pop(item_id, None) or fleet.users.pop(item_id, None) or fleet.accounts.pop(item_id, None)
+        if removed is None:
+            return {"error": _ERR_ACCESS_DENIED}
+        self._version += 1
+        if removed.get("cls") == 2:
+            for events in self._streams.values():
+                events.append({"i": item_id, "t": "d", "d": None})
+        return {}
+
+    def _dealer_rights(self, params: dict[str, Any], sid: str) -> dict[str, Any]:
+        aid = int(params["itemId"])
+        if params.get("enable"):
+            self.fleet.dealers.add(aid)
+        else:
+            self.fleet.dealers.discard(aid)
+        self._version += 1
+        return {}
+
+    def _enable_account(self, params: dict[str, Any], sid: str) -> dict[str, Any]:
+        aid = int(params["itemId"])
+        if int(params.get("enable") or 0):
+            self.fleet.blocked.pop(aid, None)
+        else:
+            self.fleet.blocked[aid] = int(time.time())
+        self._version += 1
+        return {}
+
+
+_SERVICES = {
+    "token/login": WialonSimulator._login,
+    "core/logout": WialonSimulator._logout,
+    "core/search_items": WialonSimulator._search_items,
+    "core/search_item": WialonSimulator._search_item,
+    "core/batch": WialonSimulator._batch,
+    "core/update_data_flags": WialonSimulator._update_data_flags,
+    "core/get_hw_types": WialonSimulator._hw_types,
+    "file/type_library": WialonSimulator._type_library,
+    "account/get_account_data": WialonSimulator._account_data,
+    "unit/calc_last": WialonSimulator._calc_last,
+    "item/update_name": WialonSimulator._update_name,
+    "item/update_profile_field": WialonSimulator._update_profile_field,
+    "item/update_custom_field": WialonSimulator._update_custom_field,
+    "unit/update_device_type": WialonSimulator._update_device_type,
+    "unit/update_phone": WialonSimulator._update_phone,
+    "unit/update_access_password": WialonSimulator._update_password,
+    "unit/set_active": WialonSimulator._set_active,
+    "user/update_item_access": WialonSimulator._update_item_access,
+    "core/delete_item": WialonSimulator._delete_item,
+    "account/update_dealer_rights": WialonSimulator._dealer_rights,
+    "account/enable_account": WialonSimulator._enable_account,
+}
+
+
+def _encode(payload: Any) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _search_payload(params: dict[str, Any], items: list[dict[str, Any]]) -> dict[str, Any]:
+    return {
+        "searchSpec": params.get("spec") or {},
+        "dataFlags": params.get("flags") or 0,
+        "totalItemsCount": len(items),
+        "indexFrom": 0,
+        "indexTo": len(items),
+        "items": items,
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, fields: dict[str, str]) -> None:
+        body = self.server.simulator.respond(urllib.parse.urlsplit(self.path).path, fields)  # type: ignore[attr-defined]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:  # noqa: N802
+        query = urllib.parse.urlsplit(self.path).query
+        self._reply(dict(urllib.parse.parse_qsl(query, keep_blank_values=True)))
+
+    def do_POST(self) -> None:  # noqa: N802
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode("utf-8", errors="replace")
+        self._reply(dict(urllib.parse.parse_qsl(raw, keep_blank_values=True)))
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        pass
+
+
+@contextmanager
+def use_simulator(sim: WialonSimulator) -> Iterator[WialonSimulator]:
+    """
+    Apunta ``wialon_client`` al simulador con caché local y sin volcado en disco.
+
+    Restaura la URL y el entorno al salir e invalida lo cacheado, así nada de la
+    flota sintética se cuela en las cachés reales.
+    """
+    from apps.operacion import wialon_cache, wialon_client
+
+    overrides = {
+        "WIALON_CACHE_BACKEND": "local",
+        "WIALON_SNAPSHOT_PATH": "off",
+        "WIALON_ACCESS_TOKEN": SIMULATOR_TOKEN,
+    }
+    previous_env = {key: os.environ.get(key) for key in overrides}
+    previous_base = wialon_client.WIALON_API_BASE
+    os.environ.update(overrides)
+    wialon_client.WIALON_API_BASE = sim.api_base
+    wialon_cache.reset_tier()
+    try:
+        yield sim
+    finally:
+        wialon_client.WIALON_API_BASE = previous_base
+        for key, value in previous_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        wialon_cache.reset_tier()
@@ -2,7 +2,6 @@ import logging
 
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.views import APIView
 
 from apps.users.permissions import CuentasAntarixPermission
 
@@ -16,6 +15,7 @@ from .wialon_client import (
     set_wialon_unit_active,
     update_wialon_unit,
 )
+from .wialon_views import WialonAPIView
 
 logger = logging.getLogger(__name__)
 
@@ -37,7 +37,7 @@ def _request_has_cuentas_edit(request) -> bool:
     return module.get("edit") is True
 
 
-class WialonUnitCatalogsView(APIView):
+class WialonUnitCatalogsView(WialonAPIView):
     permission_classes = [IsAuthenticated, CuentasAntarixPermission]
 
     def get(self, request):
@@ -52,7 +52,7 @@ class WialonUnitCatalogsView(APIView):
         return Response({"source": "wialon", **catalogs})
 
 
-class WialonAccessUsersView(APIView):
+class WialonAccessUsersView(WialonAPIView):
     permission_classes = [IsAuthenticated, CuentasAntarixPermission]
 
     def get(self, request):
@@ -67,7 +67,7 @@ class WialonAccessUsersView(APIView):
         return Response({"source": "wialon", "count": len(users), "users": users})
 
 
-class WialonUnitDetailView(APIView):
+class WialonUnitDetailView(WialonAPIView):
     permission_classes = [IsAuthenticated, CuentasAntarixPermission]
 
     def get(self, request, unit_id: int):
@@ -121,7 +121,7 @@ class WialonUnitDetailView(APIView):
         return Response({"source": "wialon", "unit": unit})
 
 
-class WialonUnitActiveView(APIView):
+class WialonUnitActiveView(WialonAPIView):
     """Activa o desactiva una unidad (unit/set_active). No la elimina."""
 
     permission_classes = [IsAuthenticated, CuentasAntarixPermission]
@@ -161,7 +161,7 @@ class WialonUnitActiveView(APIView):
         return Response({"source": "wialon", "unit": unit})
 
 
-class WialonUnitAccessView(APIView):
+class WialonUnitAccessView(WialonAPIView):
     permission_classes = [IsAuthenticated, CuentasAntarixPermission]
 
     def post(self, request, unit_id: int):
@@ -180,7 +180,7 @@ class WialonUnitAccessView(APIView):
         return Response({"source": "wialon", "granted": True, "user_id": int(user_id)})
 
 
-class WialonUnitAccessRevokeView(APIView):
+class WialonUnitAccessRevokeView(WialonAPIView):
     permission_classes = [IsAuthenticated, CuentasAntarixPermission]
 
     def delete(self, request, unit_id: int, user_id: int):
@@ -1,11 +1,14 @@
 import logging
 
-from rest_framework.permissions import IsAuthenticated
+from django.db import IntegrityError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from apps.users.permissions import CuentasAntarixPermission
 
+from .models import WialonPurgeJob
+from .wialon_cache import memory_report
 from .wialon_client import (
     WialonError,
     fetch_units_search_index,
@@ -13,9 +16,19 @@ from .wialon_client import (
     fetch_users,
     invalidate_wialon_cache,
     purge_blocked_accounts,
+    units_search_index_snapshot_meta,
     update_wialon_user,
+    users_snapshot_meta,
     WIALON_BLOCKED_PURGE_DAYS_DEFAULT,
 )
+from .wialon_metrics import metrics_snapshot, request_timing
+from .wialon_purge_jobs import (
+    active_purge_job,
+    create_purge_job,
+    purge_job_payload,
+    refresh_purge_job_state,
+)
+from .wialon_search import SEARCH_PAGE_DEFAULT, SEARCH_PAGE_MAX, search_index_for
 
 logger = logging.getLogger(__name__)
 
@@ -42,7 +55,17 @@ def _wialon_error_response(exc: WialonError, fallback: str) -> Response:
     return Response({"detail": detail, "code": exc.code}, status=502)
 
 
-class WialonUsuariosView(APIView):
+class WialonAPIView(APIView):
+    """``APIView`` que agrega ``Server-Timing`` con lo que costó Wialon en el request."""
+
+    def dispatch(self, request, *args, **kwargs):
+        with request_timing() as timing:
+            response = super().dispatch(request, *args, **kwargs)
+            response["Server-Timing"] = timing.header()
+        return response
+
+
+class WialonUsuariosView(WialonAPIView):
     """Usuarios de Wialon (Antarix GPS) para la vista de Operación."""
 
     permission_classes = [IsAuthenticated, CuentasAntarixPermission]
@@ -54,7 +77,6 @@ class WialonUsuariosView(APIView):
 
         try:
             users = fetch_users(use_cache=not refresh)
-            units_index = fetch_units_search_index(use_cache=not refresh)
         except WialonError as exc:
             logger.warning("Wialon usuarios: %s", exc)
             return _wialon_error_response(exc, "No se pudieron cargar los usuarios de Wialon.")
@@ -62,19 +84,22 @@ class WialonUsuariosView(APIView):
             logger.exception("Error inesperado consultando usuarios Wialon")
             return Response({"detail": "No se pudieron cargar los usuarios de Wialon."}, status=502)
 
+        # Si la copia venció se sirve igual y se renueva en segundo plano.
+        # Las unidades se buscan aparte (``wialon/unidades/buscar/``), paginadas.
+        users_age, users_stale = users_snapshot_meta()
         return Response(
             {
                 "source": "wialon",
                 "items_type": "user",
                 "count": len(users),
                 "users": users,
-                "units_index": units_index,
-                "units_index_count": len(units_index),
+                "snapshot_age_sec": users_age,
+                "stale": users_stale,
             }
         )
 
 
-class WialonPurgeBlockedView(APIView):
+class WialonPurgeBlockedView(WialonAPIView):
     """Desactiva unidades y elimina usuarios bloqueados hace más de N días."""
 
     permission_classes = [IsAuthenticated, CuentasAntarixPermission]
@@ -107,7 +132,53 @@ class WialonPurgeBlockedView(APIView):
         return Response({"source": "wialon", **result})
 
 
-class WialonUnitsSearchIndexView(APIView):
+class WialonPurgeJobCreateView(WialonAPIView):
+    """Lanza la purga de bloqueados en segundo plano (202 + URL para consultar el avance)."""
+
+    permission_classes = [IsAuthenticated, CuentasAntarixPermission]
+
+    def post(self, request):
+        if not _request_has_cuentas_edit(request):
+            return Response(
+                {"detail": "Se requiere permiso de edición en Cuentas Antarix."},
+                status=403,
+            )
+        data = request.data if isinstance(request.data, dict) else {}
+        try:
+            days = int(data.get("days", WIALON_BLOCKED_PURGE_DAYS_DEFAULT))
+        except (TypeError, ValueError):
+            return Response({"detail": "days debe ser un entero."}, status=400)
+        if days < 1:
+            return Response({"detail": "days debe ser al menos 1."}, status=400)
+
+        running = active_purge_job()
+        if running is None:
+            try:
+                job = create_purge_job(user=request.user, days=days, dry_run=bool(data.get("dry_run", False)))
+            except IntegrityError:
+                # Otro request creó la purga entre la consulta y el INSERT.
+                running = active_purge_job()
+            else:
+                return Response(purge_job_payload(job), status=202)
+        payload = {"detail": "Ya hay una purga en curso."}
+        if running is not None:
+            payload["job"] = purge_job_payload(refresh_purge_job_state(running))
+        return Response(payload, status=409)
+
+
+class WialonPurgeJobDetailView(WialonAPIView):
+    """Avance de una purga en segundo plano (la reanuda si su worker se cayó)."""
+
+    permission_classes = [IsAuthenticated, CuentasAntarixPermission]
+
+    def get(self, request, job_id):
+        job = WialonPurgeJob.objects.filter(pk=job_id).first()
+        if job is None:
+            return Response({"detail": "Trabajo no encontrado."}, status=404)
+        return Response(purge_job_payload(refresh_purge_job_state(job)))
+
+
+class WialonUnitsSearchIndexView(WialonAPIView):
     """Índice de unidades con las cuentas a las que están asignadas (búsqueda global)."""
 
     permission_classes = [IsAuthenticated, CuentasAntarixPermission]
@@ -126,16 +197,67 @@ class WialonUnitsSearchIndexView(APIView):
             logger.exception("Error inesperado construyendo índice de unidades Wialon")
             return Response({"detail": "No se pudo cargar el índice de unidades."}, status=502)
 
+        snapshot_age, stale = units_search_index_snapshot_meta()
         return Response(
             {
                 "source": "wialon",
                 "count": len(units),
                 "units": units,
+                "snapshot_age_sec": snapshot_age,
+                "stale": stale,
+            }
+        )
+
+
+class WialonUnitsSearchView(WialonAPIView):
+    """Búsqueda paginada de unidades (subcadena/prefijo, filtro por cuenta, cursor)."""
+
+    permission_classes = [IsAuthenticated, CuentasAntarixPermission]
+
+    def get(self, request):
+        params = request.query_params
+        query = str(params.get("q") or "").strip()
+        try:
+            limit = int(params.get("limit") or SEARCH_PAGE_DEFAULT)
+            owners = [int(o) for o in params.getlist("owner") if str(o).strip()]
+        except (TypeError, ValueError):
+            return Response({"detail": "limit y owner deben ser enteros."}, status=400)
+        limit = max(1, min(limit, SEARCH_PAGE_MAX))
+
+        try:
+            rows = fetch_units_search_index(use_cache=True)
+        except WialonError as exc:
+            logger.warning("Wialon búsqueda unidades: %s", exc)
+            return Response({"detail": "No se pudo cargar el índice de unidades."}, status=502)
+        except Exception:
+            logger.exception("Error inesperado construyendo índice de unidades Wialon")
+            return Response({"detail": "No se pudo cargar el índice de unidades."}, status=502)
+
+        try:
+            page = search_index_for(rows).search(
+                query,
+                owners=owners,
+                cursor=params.get("cursor") or None,
+                limit=limit,
+            )
+        except ValueError:
+            return Response({"detail": "cursor inválido."}, status=400)
+
+        snapshot_age, stale = units_search_index_snapshot_meta()
+        return Response(
+            {
+                "source": "wialon",
+                "q": query,
+                "count": page.total,
+                "units": page.results,
+                "next_cursor": page.next_cursor,
+                "snapshot_age_sec": snapshot_age,
+                "stale": stale,
             }
         )
 
 
-class WialonUsuarioUnidadesView(APIView):
+class WialonUsuarioUnidadesView(WialonAPIView):
     """Unidades asignadas a un usuario Wialon."""
 
     permission_classes = [IsAuthenticated, CuentasAntarixPermission]
@@ -153,7 +275,7 @@ class WialonUsuarioUnidadesView(APIView):
         return Response({"source": "wialon", **payload})
 
 
-class WialonUsuarioDetailView(APIView):
+class WialonUsuarioDetailView(WialonAPIView):
     """Actualiza la cuenta de facturación del usuario en Wialon (CMS)."""
 
     permission_classes = [IsAuthenticated, CuentasAntarixPermission]
@@ -213,3 +335,21 @@ class WialonUsuarioDetailView(APIView):
             return Response({"detail": "No se pudo actualizar el usuario en Wialon."}, status=502)
 
         return Response({"source": "wialon", "user": row})
+
+
+class WialonCacheMemoryView(WialonAPIView):
+    """Memoria que ocupan las cachés Wialon en el worker que atiende la petición."""
+
+    permission_classes = [IsAuthenticated, CuentasAntarixPermission]
+
+    def get(self, request):
+        return Response({"source": "wialon", **memory_report()})
+
+
+class WialonMetricsView(APIView):
+    """Latencia, errores y aciertos de caché de Wialon en este worker (solo staff)."""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({"source": "wialon", **metrics_snapshot()})
@@ -4,11 +4,21 @@ import logging
 from apps.common.document_folio import FOLIO_SERIE_ODT, resolve_document_folio
 from apps.common.marca import logo_data_uri_for_pdf
 from apps.common.pdf_html import esc, load_public_image_data_uri
-from apps.common.pdf_images import img_url_to_data_uri
+from apps.common.pdf_images import MAX_EMBED_REMOTE_BYTES, embed_remote_images
 from apps.ordenes.pdf_limits import orden_max_fotos
 
 logger = logging.getLogger(__name__)
 
+# Cada descarga tiene su timeout; el documento completo no espera más que el presupuesto.
+ORDEN_PDF_IMAGE_TIMEOUT_S = 12
+ORDEN_PDF_IMAGES_BUDGET_S = 20
+
+
+def _firma_placeholder(url: str) -> str:
+    if url:
+        return "<div class='muted'>Firma no disponible</div>"
+    return "<div class='muted'>Sin firma</div>"
+
 
 def generate_orden_pdf_html(orden) -> str:
     """Genera el HTML para el PDF de la orden."""
@@ -22,13 +32,22 @@ def generate_orden_pdf_html(orden) -> str:
     servicios = orden.servicios_realizados if isinstance(orden.servicios_realizados, list) else []
     fotos = orden.fotos_urls if isinstance(orden.fotos_urls, list) else []
     fotos = fotos[:orden_max_fotos(fotos_extra_max=orden.fotos_extra_max)]
-    fotos_limpias = [url for url in fotos if url]
-    fotos_embedded = [img_url_to_data_uri(url) for url in fotos_limpias]
-    fotos_embedded = [src for src in fotos_embedded if src]
-    has_photos = bool(fotos_embedded)
+    fotos_limpias = [url.strip() for url in fotos if isinstance(url, str) and url.strip()]
+    firma_tecnico_url = str(getattr(orden, 'firma_encargado_url', None) or '').strip()
+    firma_cliente_url = str(getattr(orden, 'firma_cliente_url', None) or '').strip()
+
+    # Todas las imágenes en paralelo (miniatura Cloudinary) con tope por documento.
+    embedded = embed_remote_images(
+        [*fotos_limpias, firma_tecnico_url, firma_cliente_url],
+        timeout=ORDEN_PDF_IMAGE_TIMEOUT_S,
+        max_bytes=MAX_EMBED_REMOTE_BYTES,
+        total_budget=ORDEN_PDF_IMAGES_BUDGET_S,
+    )
+    fotos_embedded = [embedded.get(url, '') for url in fotos_limpias]
+    has_photos = bool(fotos_limpias)
 
-    firma_tecnico = img_url_to_data_uri(getattr(orden, 'firma_encargado_url', None) or '')
-    firma_cliente = img_url_to_data_uri(getattr(orden, 'firma_cliente_url', None) or '')
+    firma_tecnico = embedded.get(firma_tecnico_url, '')
+    firma_cliente = embedded.get(firma_cliente_url, '')
 
     status_text = "RESUELTO" if orden.status == "resuelto" else "PENDIENTE"
     status_bg = "#dcfce7" if orden.status == "resuelto" else "#fef3c7"
@@ -47,7 +66,10 @@ def generate_orden_pdf_html(orden) -> str:
     ) or "<span class='muted'>-</span>"
 
     fotos_grid_html = "".join(
-        f"<div class='photo-box'><img src='{esc(src)}' /></div>" for src in fotos_embedded
+        f"<div class='photo-box'><img src='{esc(src)}' /></div>"
+        if src
+        else "<div class='photo-box'><div class='muted'>Imagen no disponible</div></div>"
+        for src in fotos_embedded
     ) or "<div class='muted'>No hay fotos adjuntas.</div>"
 
     logo_data_uri = logo_data_uri_for_pdf()
@@ -220,14 +242,14 @@ def generate_orden_pdf_html(orden) -> str:
       <div class='sigbox'>
         <div class='label'>Firma técnico</div>
         <div class='sigimgwrap'>
-          {f"<img src='{firma_tecnico}' />" if firma_tecnico else "<div class='muted'>Sin firma</div>"}
+          {f"<img src='{firma_tecnico}' />" if firma_tecnico else _firma_placeholder(firma_tecnico_url)}
         </div>
         <div class='sigline'><b>Nombre:</b> {esc(tecnico_nombre or orden.nombre_encargado or '-') }</div>
       </div>
       <div class='sigbox'>
         <div class='label'>Firma cliente</div>
         <div class='sigimgwrap'>
-          {f"<img src='{firma_cliente}' />" if firma_cliente else "<div class='muted'>Sin firma</div>"}
+          {f"<img src='{firma_cliente}' />" if firma_cliente else _firma_placeholder(firma_cliente_url)}
         </div>
         <div class='sigline'><b>Nombre:</b> {esc(orden.nombre_cliente or '-') }</div>
       </div>
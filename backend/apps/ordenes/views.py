@@ -23,7 +23,10 @@ from rest_framework.response import Response
 
 from apps.common.document_folio import FOLIO_SERIE_ODT, resolve_document_folio
 from apps.common.marca import logo_data_uri_for_pdf
+from apps.common.pdf_batch import BatchDoc, batch_max_docs, batch_pdf_response, parse_id_list
+from apps.common.pdf_jobs import create_pdf_job, pdf_job_payload
 from apps.common.ssrf import is_cloudinary_host
+from apps.cotizaciones.pdf_cache import apply_pdf_etag, not_modified_response, pdf_cache_key
 from apps.cotizaciones.pdf_render import (
     PdfRenderError,
     any_provider_configured,
@@ -168,11 +171,12 @@ class ReportesPermission(ModulePermission):
     module_key = 'reportes'
 
 
-def _pdf_response_from_html(html: str, filename: str):
+def _pdf_response_from_html(html: str, filename: str, request=None):
     """Convierte HTML a PDF (htmldocs opcional, luego Playwright en servidor).
 
     Si no hay htmldocs ni paquete Playwright instalado, regresa HTML para
     vista previa en el navegador. Si el motor falla, 502 con detalle.
+    Con ``request`` responde 304 cuando ``If-None-Match`` coincide con el ETag.
     """
     if not html:
         return Response({"detail": "No se pudo generar el HTML del PDF."}, status=500)
@@ -180,6 +184,11 @@ def _pdf_response_from_html(html: str, filename: str):
     if not any_provider_configured():
         return HttpResponse(html, content_type="text/html; charset=utf-8")
 
+    cache_key = pdf_cache_key(html, size="A4", landscape=False)
+    not_modified = not_modified_response(request, cache_key)
+    if not_modified is not None:
+        return not_modified
+
     try:
         pdf_bytes = render_html_to_pdf(html, size="A4", landscape=False, timeout=90)
     except PdfRenderError as e:
@@ -188,7 +197,17 @@ def _pdf_response_from_html(html: str, filename: str):
 
     response = HttpResponse(pdf_bytes, content_type="application/pdf")
     response["Content-Disposition"] = f'inline; filename="{filename}"'
-    return response
+    return apply_pdf_etag(response, cache_key)
+
+
+def _pdf_job_response(request, tipo: str, html: str, filename: str):
+    """Crea un ``PdfRenderJob`` (render fuera del request) y responde 202."""
+    if not html:
+        return Response({"detail": "No se pudo generar el HTML del PDF."}, status=500)
+    if not any_provider_configured():
+        return Response({"detail": "No hay motor de PDF disponible en el servidor."}, status=503)
+    job = create_pdf_job(user=request.user, tipo=tipo, html=html, filename=filename, timeout=90)
+    return Response(pdf_job_payload(job), status=202)
 
 
 MESES_ES_PDF = (
@@ -487,6 +506,40 @@ def _resolve_fotos_extra_max(data: dict, instance=None) -> int:
     return _normalize_fotos_extra_max(getattr(instance, 'fotos_extra_max', 0))
 
 
+def _filter_ordenes_mes(qs, mes: str):
+    """Órdenes cuya fecha de inicio (o creación, si no tiene) cae en YYYY-MM."""
+    if not re.match(r'^\d{4}-\d{2}$', mes):
+        return qs
+    year_s, month_s = mes.split('-')
+    year, month = int(year_s), int(month_s)
+    if not 1 <= month <= 12:
+        return qs
+    start = date(year, month, 1)
+    end = date(year, month, monthrange(year, month)[1])
+    # Evitar fecha_creacion__date (no usa índice): rango DateTime half-open.
+    start_naive = datetime.combine(start, time.min)
+    end_exclusive_naive = datetime.combine(end + timedelta(days=1), time.min)
+    if timezone.get_default_timezone_name() and timezone.is_aware(timezone.now()):
+        tz = timezone.get_current_timezone()
+        start_dt = timezone.make_aware(start_naive, tz)
+        end_exclusive = timezone.make_aware(end_exclusive_naive, tz)
+    else:
+        start_dt = start_naive
+        end_exclusive = end_exclusive_naive
+    return qs.filter(
+        Q(fecha_inicio__gte=start, fecha_inicio__lte=end)
+        | Q(
+            fecha_inicio__isnull=True,
+            fecha_creacion__gte=start_dt,
+            fecha_creacion__lt=end_exclusive,
+        )
+    )
+
+
+def _orden_pdf_filename(orden) -> str:
+    return f"Ordenes_Servicio_{orden.id}.pdf"
+
+
 class OrdenViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, OrdenesPermission]
     # Evitar paginación por defecto para que el frontend reciba todas las órdenes
@@ -494,12 +547,19 @@ class OrdenViewSet(viewsets.ModelViewSet):
     pagination_class = None
     queryset = Orden.objects.all()
     serializer_class = OrdenSerializer
+    # Encolar PDFs es lectura: basta `view` (ModulePermission).
+    read_only_post_actions = ('listado_mes_pdf_async', 'reporte_semanal_pdf_async')
 
     def get_permissions(self):
         # Administrative reindex must be limited to staff/admin users.
         if self.action == 'reindex':
             return [IsAdminUser()]
-        if self.action in ('reportes_semanales', 'reporte_semanal_pdf', 'reporte_semanal_delete'):
+        if self.action in (
+            'reportes_semanales',
+            'reporte_semanal_pdf',
+            'reporte_semanal_pdf_async',
+            'reporte_semanal_delete',
+        ):
             return [IsAuthenticated(), ReportesPermission()]
         if self.action == 'reportes_tecnico_opciones':
             return [IsAuthenticated()]
@@ -612,33 +672,7 @@ class OrdenViewSet(viewsets.ModelViewSet):
             return qs
         params = request.query_params
 
-        mes = (params.get('mes') or '').strip()
-        if re.match(r'^\d{4}-\d{2}$', mes):
-            year_s, month_s = mes.split('-')
-            year, month = int(year_s), int(month_s)
-            if 1 <= month <= 12:
-                start = date(year, month, 1)
-                end = date(year, month, monthrange(year, month)[1])
-                # Evitar fecha_creacion__date (no usa índice): rango DateTime half-open.
-                start_naive = datetime.combine(start, time.min)
-                end_exclusive_naive = datetime.combine(end + timedelta(days=1), time.min)
-                if timezone.get_default_timezone_name() and timezone.is_aware(
-                    timezone.now()
-                ):
-                    tz = timezone.get_current_timezone()
-                    start_dt = timezone.make_aware(start_naive, tz)
-                    end_exclusive = timezone.make_aware(end_exclusive_naive, tz)
-                else:
-                    start_dt = start_naive
-                    end_exclusive = end_exclusive_naive
-                qs = qs.filter(
-                    Q(fecha_inicio__gte=start, fecha_inicio__lte=end)
-                    | Q(
-                        fecha_inicio__isnull=True,
-                        fecha_creacion__gte=start_dt,
-                        fecha_creacion__lt=end_exclusive,
-                    )
-                )
+        qs = _filter_ordenes_mes(qs, (params.get('mes') or '').strip())
 
         tipo = (params.get('tipo_orden') or '').strip().lower()
         if tipo == 'levantamiento':
@@ -1332,7 +1366,7 @@ class OrdenViewSet(viewsets.ModelViewSet):
         ordenes = self._ordenes_for_month(mes)
         html = self._generate_listado_mes_pdf_html(mes, ordenes)
         filename = _filename_listado_mes_pdf(mes)
-        return _pdf_response_from_html(html, filename)
+        return _pdf_response_from_html(html, filename, request)
 
     @action(
         detail=False,
@@ -1343,7 +1377,29 @@ class OrdenViewSet(viewsets.ModelViewSet):
         reporte = self._get_reporte_semanal_for_user(request, reporte_id)
         html = self._generate_reporte_semanal_pdf_html(reporte)
         filename = _filename_reporte_semanal_pdf(reporte)
-        return _pdf_response_from_html(html, filename)
+        return _pdf_response_from_html(html, filename, request)
+
+    @action(detail=False, methods=['post'], url_path='listado-mes-pdf/async')
+    def listado_mes_pdf_async(self, request):
+        """Encola el PDF mensual; responde 202 con el id para consultar /api/pdf-jobs/<id>/."""
+        body = request.data if isinstance(request.data, dict) else {}
+        mes = str(request.query_params.get('mes') or body.get('mes') or '').strip()
+        if not re.match(r'^\d{4}-\d{2}$', mes):
+            raise ValidationError({'mes': 'Formato requerido: YYYY-MM (ej. 2026-06).'})
+        html = self._generate_listado_mes_pdf_html(mes, self._ordenes_for_month(mes))
+        return _pdf_job_response(request, 'ordenes_listado_mes', html, _filename_listado_mes_pdf(mes))
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path=r'reportes-semanales/(?P<reporte_id>[^/.]+)/pdf/async',
+    )
+    def reporte_semanal_pdf_async(self, request, reporte_id=None):
+        reporte = self._get_reporte_semanal_for_user(request, reporte_id)
+        html = self._generate_reporte_semanal_pdf_html(reporte)
+        return _pdf_job_response(
+            request, 'ordenes_reporte_semanal', html, _filename_reporte_semanal_pdf(reporte)
+        )
 
     @action(detail=False, methods=['delete'], url_path=r'reportes-semanales/(?P<reporte_id>[^/.]+)')
     def reporte_semanal_delete(self, request, reporte_id=None):
@@ -1821,8 +1877,38 @@ class OrdenViewSet(viewsets.ModelViewSet):
     def pdf(self, request, pk=None):
         orden = self.get_object()
         html = self._generate_pdf_html(orden)
-        filename = f"Ordenes_Servicio_{orden.id}.pdf"
-        return _pdf_response_from_html(html, filename)
+        return _pdf_response_from_html(html, _orden_pdf_filename(orden), request)
+
+    @action(detail=False, methods=['get'], url_path='pdf-lote')
+    def pdf_lote(self, request):
+        """Varias órdenes en un ZIP (o un PDF unido con ``formato=pdf``).
+
+        Query: ``ids=1,2,3`` o ``mes=YYYY-MM``. Solo entran las órdenes que el
+        usuario puede ver; las que fallan se listan en ``errores.txt``.
+        """
+        params = request.query_params
+        ids = parse_id_list(params.get('ids') or '')
+        mes = (params.get('mes') or '').strip()
+        qs = self.get_queryset()
+        if ids:
+            qs = qs.filter(pk__in=ids)
+            basename = 'Ordenes_Servicio'
+        elif re.match(r'^\d{4}-\d{2}$', mes) and 1 <= int(mes[5:]) <= 12:
+            qs = _filter_ordenes_mes(qs, mes)
+            basename = f'Ordenes_Servicio_{mes}'
+        else:
+            raise ValidationError({'mes': 'Indica ids=1,2,3 o mes=YYYY-MM (ej. 2026-06).'})
+        ordenes = list(qs[: batch_max_docs() + 1])
+        if ids:
+            posicion = {pk: i for i, pk in enumerate(ids)}
+            ordenes.sort(key=lambda o: posicion.get(o.pk, 0))
+
+        def _builder(orden):
+            return lambda: self._generate_pdf_html(orden)
+
+        docs = [BatchDoc(_orden_pdf_filename(o), _builder(o)) for o in ordenes]
+        formato = (params.get('formato') or 'zip').strip().lower()
+        return batch_pdf_response(docs, basename=basename, formato=formato)
 
     @action(
         detail=True,
@@ -101,6 +101,9 @@ class ModulePermission(BasePermission):
     - PUT/PATCH: requires 'edit' permission
     - DELETE: requires 'delete' permission
 
+    Views may list actions in `read_only_post_actions` whose POST only reads
+    (e.g. queueing a PDF render); those require 'view'.
+
     Superusers and staff always have access.
     """
     module_key = None  # Must be overridden in subclass
@@ -184,6 +187,9 @@ class ModulePermission(BasePermission):
 
         # Map HTTP method to permission key
         method = (request.method or '').upper()
+        # POST que solo lee (p. ej. encolar un PDF): la vista lo declara y se exige `view`.
+        if getattr(view, 'action', None) in getattr(view, 'read_only_post_actions', ()):
+            method = 'GET'
         if method in ('GET', 'HEAD', 'OPTIONS'):
             # Deny by default: if permissions_profile/module_key/view is missing,
             # we must not grant read access implicitly.
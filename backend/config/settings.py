@@ -191,8 +191,8 @@ else:
     else:
         CSRF_TRUSTED_ORIGINS = CORS_ALLOWED_ORIGINS
 
-# Cabeceras visibles en fetch() desde el frontend (p. ej. nombre de archivo en PDF).
-CORS_EXPOSE_HEADERS = ['Content-Disposition']
+# Cabeceras visibles en fetch() desde el frontend (p. ej. nombre de archivo y ETag en PDF).
+CORS_EXPOSE_HEADERS = ['Content-Disposition', 'ETag', 'X-Pdf-Batch-Errores']
 
 # CSRF/Session cookie settings
 # In production (Render), frontend and backend may be on different domains.
@@ -254,6 +254,17 @@ else:
         }
     }
 
+# Caché compartida entre workers (opcional). Sin REDIS_URL queda LocMem por proceso.
+# Requiere el paquete ``redis``; Wialon la usa con WIALON_CACHE_BACKEND=django.
+_redis_url = os.environ.get("REDIS_URL", "").strip()
+if _redis_url:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": _redis_url,
+        }
+    }
+
 
 # =====================
 # Password validation
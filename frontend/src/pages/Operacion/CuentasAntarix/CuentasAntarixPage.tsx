@@ -91,32 +91,30 @@ function DealerBadge({ value }: { value: string }) {
   );
 }
 
-function compactSearchToken(value: string): string {
-  return value.replace(/[\s\-_./:;]+/g, "").toLowerCase();
-}
-
-function digitsOnly(value: string): string {
-  return value.replace(/\D/g, "");
-}
-
-function unitEntryMatchesQuery(entry: WialonUnitSearchEntry, query: string): boolean {
-  const haystack = (
-    entry.search_text ??
-    [entry.name, entry.uid, entry.phone, entry.custom_fields, String(entry.unit_id)].join(" ")
-  ).toLowerCase();
-  if (haystack.includes(query)) return true;
-
-  const queryDigits = digitsOnly(query);
-  const uidDigits = digitsOnly(String(entry.uid ?? ""));
-  const phoneDigits = digitsOnly(String(entry.phone ?? ""));
-  if (queryDigits.length >= 6) {
-    if (uidDigits.includes(queryDigits) || phoneDigits.includes(queryDigits)) return true;
-    if (digitsOnly(haystack).includes(queryDigits)) return true;
+const UNIT_SEARCH_DEBOUNCE_MS = 300;
+const UNIT_SEARCH_PAGE_SIZE = 200;
+/** Tope de páginas por búsqueda: un término muy corto no descarga toda la flota. */
+const UNIT_SEARCH_MAX_PAGES = 5;
+
+/** Unidades que coinciden con ``q`` (búsqueda en el servidor, siguiendo el cursor). */
+async function searchUnits(q: string, signal: AbortSignal): Promise<WialonUnitSearchEntry[]> {
+  const found: WialonUnitSearchEntry[] = [];
+  let cursor: string | null = null;
+  for (let page = 0; page < UNIT_SEARCH_MAX_PAGES; page += 1) {
+    const params = new URLSearchParams({ q, limit: String(UNIT_SEARCH_PAGE_SIZE) });
+    if (cursor) params.set("cursor", cursor);
+    const res = await fetchApi(`/api/wialon/unidades/buscar/?${params.toString()}`, {
+      method: "GET",
+      cache: "no-store" as RequestCache,
+      signal,
+    });
+    const data = await res.json().catch(() => null);
+    if (!res.ok) throw new Error(String(data?.detail || `Error HTTP ${res.status}`));
+    if (Array.isArray(data?.units)) found.push(...(data.units as WialonUnitSearchEntry[]));
+    cursor = typeof data?.next_cursor === "string" ? data.next_cursor : null;
+    if (!cursor) break;
   }
-
-  const compactQuery = compactSearchToken(query);
-  if (compactQuery.length < 3) return false;
-  return compactSearchToken(haystack).includes(compactQuery);
+  return found;
 }
 
 function MetaItem({ label, value, className }: { label: string; value: string; className?: string }) {
@@ -135,10 +133,13 @@ export default function CuentasAntarixPage() {
   const canView = isAdmin || cuentasPerms?.view === true;
   const canEdit = isAdmin || cuentasPerms?.edit === true;
   const [rows, setRows] = useState<WialonUserRow[]>([]);
-  const [unitSearchIndex, setUnitSearchIndex] = useState<WialonUnitSearchEntry[]>([]);
+  const [unitMatches, setUnitMatches] = useState<WialonUnitSearchEntry[]>([]);
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
-  const [unitIndexLoading, setUnitIndexLoading] = useState(true);
+  const [unitSearchLoading, setUnitSearchLoading] = useState(false);
+  const [unitSearchFailed, setUnitSearchFailed] = useState(false);
+  /** Se incrementa al sincronizar con Wialon para repetir la búsqueda de unidades. */
+  const [unitSearchVersion, setUnitSearchVersion] = useState(0);
   const [error, setError] = useState("");
   const [search, setSearch] = useState("");
   const [alert, setAlert] = useState<{
@@ -155,7 +156,6 @@ export default function CuentasAntarixPage() {
     const showFullPageLoader = rows.length === 0;
     if (showFullPageLoader) setLoading(true);
     if (forceRefresh && !showFullPageLoader) setRefreshing(true);
-    setUnitIndexLoading(true);
     setError("");
     try {
       const url = forceRefresh ? "/api/wialon/usuarios/?refresh=1" : "/api/wialon/usuarios/";
@@ -184,25 +184,15 @@ export default function CuentasAntarixPage() {
       }
       const list = Array.isArray(data?.users) ? (data.users as WialonUserRow[]) : [];
       setRows(list);
-      const bundledUnits = Array.isArray(data?.units_index)
-        ? (data.units_index as WialonUnitSearchEntry[])
-        : null;
-      if (bundledUnits) {
-        setUnitSearchIndex(bundledUnits);
-        setUnitIndexLoading(false);
-      } else {
-        await loadUnitSearchIndex(forceRefresh);
-      }
+      if (forceRefresh) setUnitSearchVersion((v) => v + 1);
       return true;
     } catch {
       setRows([]);
-      setUnitSearchIndex([]);
       setError("No se pudo conectar con el servidor.");
       return false;
     } finally {
       setLoading(false);
       setRefreshing(false);
-      setUnitIndexLoading(false);
     }
   };
 
@@ -222,33 +212,43 @@ export default function CuentasAntarixPage() {
     }
   };
 
-  const loadUnitSearchIndex = async (forceRefresh = false) => {
-    setUnitIndexLoading(true);
-    try {
-      const url = forceRefresh ? "/api/wialon/indice-unidades/?refresh=1" : "/api/wialon/indice-unidades/";
-      const res = await fetchApi(url, {
-        method: "GET",
-        cache: "no-store" as RequestCache,
-      });
-      const data = await res.json().catch(() => null);
-      if (!res.ok) {
-        setUnitSearchIndex([]);
-        return;
-      }
-      const list = Array.isArray(data?.units) ? (data.units as WialonUnitSearchEntry[]) : [];
-      setUnitSearchIndex(list);
-    } catch {
-      setUnitSearchIndex([]);
-    } finally {
-      setUnitIndexLoading(false);
-    }
-  };
-
   useEffect(() => {
     if (authLoading || !isAuthenticated || !canView) return;
     void loadUsers();
   }, [authLoading, isAuthenticated, canView]);
 
+  useEffect(() => {
+    const q = search.trim();
+    if (!q || authLoading || !isAuthenticated || !canView) {
+      setUnitMatches([]);
+      setUnitSearchLoading(false);
+      setUnitSearchFailed(false);
+      return;
+    }
+    const controller = new AbortController();
+    setUnitSearchLoading(true);
+    const timer = window.setTimeout(() => {
+      void (async () => {
+        try {
+          const units = await searchUnits(q, controller.signal);
+          if (controller.signal.aborted) return;
+          setUnitMatches(units);
+          setUnitSearchFailed(false);
+        } catch {
+          if (controller.signal.aborted) return;
+          setUnitMatches([]);
+          setUnitSearchFailed(true);
+        } finally {
+          if (!controller.signal.aborted) setUnitSearchLoading(false);
+        }
+      })();
+    }, UNIT_SEARCH_DEBOUNCE_MS);
+    return () => {
+      window.clearTimeout(timer);
+      controller.abort();
+    };
+  }, [search, authLoading, isAuthenticated, canView, unitSearchVersion]);
+
   const activosCount = useMemo(() => rows.filter((r) => r.status === "Activo").length, [rows]);
 
   const { filteredRows, matchedUnitsByUser } = useMemo(() => {
@@ -260,9 +260,7 @@ export default function CuentasAntarixPage() {
     const matchedUnitsByUser = new Map<number, string[]>();
     const userIdsFromUnits = new Set<number>();
 
-    for (const entry of unitSearchIndex) {
-      if (!unitEntryMatchesQuery(entry, q)) continue;
-
+    for (const entry of unitMatches) {
       const unitLabel = entry.name || entry.uid || `Unidad ${entry.unit_id}`;
       for (const owner of entry.users) {
         const ownerId = Number(owner.wialon_id);
@@ -293,7 +291,7 @@ export default function CuentasAntarixPage() {
     });
 
     return { filteredRows, matchedUnitsByUser };
-  }, [rows, search, unitSearchIndex]);
+  }, [rows, search, unitMatches]);
 
   const showAlert = (
     variant: "success" | "error" | "warning" | "info",
@@ -486,7 +484,7 @@ export default function CuentasAntarixPage() {
                 {!loading && search.trim() ? (
                   <p className={cn("mt-1 truncate", uiCaption)}>
                     Filtro: {search.trim()}
-                    {unitIndexLoading ? " · unidades…" : ""}
+                    {unitSearchLoading ? " · unidades…" : ""}
                   </p>
                 ) : null}
               </div>
@@ -546,12 +544,12 @@ export default function CuentasAntarixPage() {
             {loading || refreshing ? "Actualizando…" : "Actualizar"}
           </button>
         </div>
-        {search.trim() && unitIndexLoading ? (
-          <p className={cn("-mt-1", uiCaption)}>Cargando índice de unidades para búsqueda por IMEI…</p>
+        {search.trim() && unitSearchLoading ? (
+          <p className={cn("-mt-1", uiCaption)}>Buscando unidades por nombre, IMEI o campo personalizado…</p>
         ) : null}
-        {search.trim() && !unitIndexLoading && unitSearchIndex.length === 0 ? (
+        {search.trim() && !unitSearchLoading && unitSearchFailed ? (
           <p className={cn("-mt-1 text-amber-800 dark:text-amber-300", uiCaption)}>
-            El índice de unidades no está disponible. Pulsa Actualizar e intenta de nuevo.
+            No se pudo buscar en las unidades. Pulsa Actualizar e intenta de nuevo.
           </p>
         ) : null}
 
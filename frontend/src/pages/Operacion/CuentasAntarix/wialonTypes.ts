@@ -108,7 +108,6 @@ export type WialonUnitSearchEntry = {
   uid: string;
   phone?: string;
   custom_fields?: string;
-  search_text?: string;
   users: Array<{
     wialon_id: number;
     user_id: string;